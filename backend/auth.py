@@ -1,21 +1,38 @@
 # auth.py
 from fastapi import HTTPException, Header
-from typing import Optional
+from fastapi.concurrency import run_in_threadpool
+from typing import Callable, Dict, Optional
 import jwt
-import requests
 import os
 from dotenv import load_dotenv
-from functools import lru_cache
+from collections import OrderedDict
 import base64
+import hashlib
 import json
+import threading
 import time
 
+from http_client import get_session
+from metrics import metrics
+
 # Load environment variables
 load_dotenv()
 
 CLERK_SECRET_KEY = os.getenv("CLERK_SECRET_KEY")
 CLERK_PUBLISHABLE_KEY = os.getenv("CLERK_PUBLISHABLE_KEY")
 
+# Offline mode: load signing keys from a local JWKS file instead of Clerk
+AUTH_JWKS_FILE = os.getenv("AUTH_JWKS_FILE")
+
+# JWKS key cache configuration (seconds)
+JWKS_CACHE_TTL = float(os.getenv("JWKS_CACHE_TTL", "3600"))
+JWKS_UNKNOWN_KID_REFETCH_INTERVAL = float(os.getenv("JWKS_UNKNOWN_KID_REFETCH_INTERVAL", "30"))
+JWKS_RETRY_INTERVAL = float(os.getenv("JWKS_RETRY_INTERVAL", "5"))
+
+# Verified-token cache configuration
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_EXPIRY_MARGIN = float(os.getenv("TOKEN_CACHE_EXPIRY_MARGIN", "5"))  # seconds before exp
+
 
 def get_clerk_frontend_api() -> str:
     """Extract Clerk frontend API domain from publishable key"""
@@ -35,51 +52,285 @@ def get_clerk_frontend_api() -> str:
     return "capital-grouper-91.clerk.accounts.dev"
 
 
-@lru_cache()
-def get_clerk_jwks():
-    """Fetch Clerk JWKS (cached). Retries if fails."""
-    try:
-        frontend_api = get_clerk_frontend_api().rstrip('$').strip()
-        jwks_url = f"https://{frontend_api}/.well-known/jwks.json"
+def fetch_clerk_jwks() -> dict:
+    """Fetch Clerk JWKS. Retries with backoff through the shared session."""
+    frontend_api = get_clerk_frontend_api().rstrip('$').strip()
+    jwks_url = f"https://{frontend_api}/.well-known/jwks.json"
 
-        print(f"Fetching JWKS from: {jwks_url}")
-        response = requests.get(jwks_url, timeout=10)
-        response.raise_for_status()
-        return response.json()
-    except Exception as e:
-        print(f"First JWKS fetch failed: {e}")
-        time.sleep(1)  # retry after 1s
+    print(f"Fetching JWKS from: {jwks_url}")
+    response = get_session().get(jwks_url)
+    response.raise_for_status()
+    return response.json()
+
+
+def load_local_jwks(path: str = None) -> dict:
+    """Load a JWKS document from a local file (see mint_tokens.py)"""
+    path = path or AUTH_JWKS_FILE
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def get_jwks_fetcher() -> Callable[[], dict]:
+    """Pick the JWKS source: local file when AUTH_JWKS_FILE is set, else Clerk"""
+    if AUTH_JWKS_FILE:
+        print(f"✓ Offline auth mode: using local JWKS file {AUTH_JWKS_FILE}")
+        return load_local_jwks
+    return fetch_clerk_jwks
+
+
+class JWKSKeyManager:
+    """Parsed signing keys indexed by kid, refreshed in the background on a TTL"""
+
+    def __init__(
+        self,
+        fetcher: Callable[[], dict],
+        ttl: float = JWKS_CACHE_TTL,
+        unknown_kid_interval: float = JWKS_UNKNOWN_KID_REFETCH_INTERVAL,
+        retry_interval: float = JWKS_RETRY_INTERVAL
+    ):
+        self._fetcher = fetcher
+        self.ttl = ttl
+        self.unknown_kid_interval = unknown_kid_interval
+        self.retry_interval = retry_interval
+
+        self._keys: Dict[str, object] = {}
+        self._fetched_at = 0.0
+        self._last_attempt = 0.0
+        self._lock = threading.Lock()
+        self._inflight: Optional[threading.Event] = None
+        self._refresher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+        self.fetch_count = 0
+        self.fetch_failures = 0
+
+    @staticmethod
+    def _parse(jwks: dict) -> Dict[str, object]:
+        """Parse a JWKS document into a kid -> public key dict"""
+        keys = {}
+        for key in (jwks or {}).get("keys", []):
+            kid = key.get("kid")
+            if not kid or key.get("kty") != "RSA":
+                continue
+            try:
+                keys[kid] = jwt.algorithms.RSAAlgorithm.from_jwk(json.dumps(key))
+            except Exception as e:
+                print(f"⚠️  Skipping unparseable JWK {kid}: {e}")
+        return keys
+
+    def refresh(self) -> bool:
+        """Refetch the JWKS; concurrent callers share a single in-flight fetch"""
+        with self._lock:
+            event = self._inflight
+            leader = event is None
+            if leader:
+                event = self._inflight = threading.Event()
+
+        if not leader:
+            event.wait()
+            return bool(self._keys)
 
         try:
-            response = requests.get(jwks_url, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except Exception as e2:
-            print(f"Second JWKS fetch failed: {e2}")
-            return None
+            self._last_attempt = time.monotonic()
+            self.fetch_count += 1
+            keys = self._parse(self._fetcher())
+            if not keys:
+                raise ValueError("JWKS contained no usable RSA keys")
 
+            self._keys = keys
+            self._fetched_at = time.monotonic()
+            print(f"✓ JWKS loaded: {len(keys)} key(s)")
+            return True
 
-def verify_clerk_token(token: str) -> dict:
-    """Verify and decode Clerk JWT token"""
+        except Exception as e:
+            self.fetch_failures += 1
+            if self._keys:
+                print(f"⚠️  JWKS refresh failed, serving {len(self._keys)} cached key(s): {e}")
+            else:
+                print(f"✗ JWKS fetch failed: {e}")
+            return False
+
+        finally:
+            with self._lock:
+                self._inflight = None
+            event.set()
+
+    def _next_refresh_in(self) -> float:
+        if self._fetched_at and self._last_attempt <= self._fetched_at:
+            return max(self._fetched_at + self.ttl - time.monotonic(), 0)
+        # Last attempt failed (or none yet): retry sooner, serving stale keys meanwhile
+        return max(self._last_attempt + self.retry_interval - time.monotonic(), 0)
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self._next_refresh_in()):
+            self.refresh()
+
+    def start(self):
+        """Start the background refresh thread (idempotent)"""
+        with self._lock:
+            if self._refresher is not None and self._refresher.is_alive():
+                return
+            self._stop.clear()
+            self._refresher = threading.Thread(
+                target=self._refresh_loop, name="jwks-refresh", daemon=True
+            )
+            self._refresher.start()
+
+    def stop(self):
+        """Stop the background refresh thread"""
+        self._stop.set()
+
+    def get_cached_key(self, kid: str):
+        """Get a parsed key without any network access"""
+        return self._keys.get(kid)
+
+    def get_signing_key(self, kid: str):
+        """Get the public key for kid, refetching on demand for unknown kids"""
+        key = self._keys.get(kid)
+        if key is not None:
+            return key
+
+        # Unknown kid (key rotation) or empty cache: refetch, throttled so a
+        # stream of bad tokens cannot hammer the JWKS endpoint.
+        interval = self.unknown_kid_interval if self._keys else self.retry_interval
+        if time.monotonic() - self._last_attempt >= interval or self._inflight is not None:
+            self.refresh()
+
+        if self._refresher is None:
+            self.start()
+
+        return self._keys.get(kid)
+
+    def stats(self) -> dict:
+        """Get key cache statistics"""
+        return {
+            "keys": len(self._keys),
+            "age_seconds": round(time.monotonic() - self._fetched_at, 1) if self._fetched_at else None,
+            "fetches": self.fetch_count,
+            "fetch_failures": self.fetch_failures
+        }
+
+
+jwks_manager = JWKSKeyManager(get_jwks_fetcher())
+metrics.register_collector("jwks", jwks_manager.stats)
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of verified token claims, keyed by a hash of the token"""
+
+    def __init__(self, max_size: int = TOKEN_CACHE_SIZE, expiry_margin: float = TOKEN_CACHE_EXPIRY_MARGIN):
+        self.max_size = max_size
+        self.expiry_margin = expiry_margin
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        """Get cached claims for a token that is still valid"""
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, payload = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def put(self, token: str, payload: dict):
+        """Cache verified claims until just before the token's exp"""
+        if self.max_size <= 0:
+            return
+
+        exp = payload.get("exp")
+        if not exp:
+            return
+
+        expires_at = float(exp) - self.expiry_margin
+        if expires_at <= time.time():
+            return
+
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (expires_at, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Get hit-rate statistics"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+token_cache = VerifiedTokenCache()
+metrics.register_collector("token_cache", token_cache.stats)
+
+
+def _unverified_kid(token: str) -> Optional[str]:
     try:
-        jwks = get_clerk_jwks()
-        if not jwks:
-            raise HTTPException(status_code=500, detail="Unable to fetch JWKS")
+        return jwt.get_unverified_header(token).get("kid")
+    except jwt.InvalidTokenError:
+        return None
+
+
+def verify_clerk_token(token: str) -> dict:
+    """Verify and decode Clerk JWT token (verified claims are cached until exp)"""
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
 
+    return _verify_and_cache(token)
+
+
+def _verify_and_cache(token: str, cached_keys_only: bool = False) -> dict:
+    """Full RS256 verification of a token that is not in the cache
+
+    cached_keys_only: never refetch the JWKS (or wait on another caller's fetch);
+    used on the event loop once the key has been resolved in the threadpool.
+    """
+    try:
         # Extract key ID
         unverified_header = jwt.get_unverified_header(token)
         kid = unverified_header.get("kid")
         if not kid:
             raise HTTPException(status_code=401, detail="Token missing key ID")
 
-        # Find matching key
-        signing_key = None
-        for key in jwks.get("keys", []):
-            if key.get("kid") == kid:
-                signing_key = jwt.algorithms.RSAAlgorithm.from_jwk(json.dumps(key))
-                break
+        # Find matching key (parsed once per JWKS fetch)
+        if cached_keys_only:
+            signing_key = jwks_manager.get_cached_key(kid)
+        else:
+            signing_key = jwks_manager.get_signing_key(kid)
 
         if not signing_key:
+            if not jwks_manager.stats()["keys"]:
+                raise HTTPException(status_code=500, detail="Unable to fetch JWKS")
             raise HTTPException(status_code=401, detail="Invalid token key")
 
         # Decode token
@@ -90,8 +341,12 @@ def verify_clerk_token(token: str) -> dict:
             options={"verify_exp": True, "verify_aud": False}
         )
 
+        token_cache.put(token, payload)
         return payload
 
+    except HTTPException:
+        raise
+
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token has expired")
 
@@ -104,6 +359,18 @@ def verify_clerk_token(token: str) -> dict:
         raise HTTPException(status_code=401, detail=f"Authentication failed: {str(e)}")
 
 
+async def averify_clerk_token(token: str) -> dict:
+    """Verify a token from async code without blocking the event loop on a JWKS fetch"""
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+
+    kid = _unverified_kid(token)
+    if kid and jwks_manager.get_cached_key(kid) is None:
+        await run_in_threadpool(jwks_manager.get_signing_key, kid)
+    return _verify_and_cache(token, cached_keys_only=True)
+
+
 async def get_current_user(authorization: Optional[str] = Header(None)) -> dict:
     """Get current user — raises 401 if unauthorized"""
     if not authorization:
@@ -116,7 +383,7 @@ async def get_current_user(authorization: Optional[str] = Header(None)) -> dict:
     except ValueError:
         raise HTTPException(status_code=401, detail="Invalid authorization header format")
 
-    payload = verify_clerk_token(token)
+    payload = await averify_clerk_token(token)
 
     return {
         "user_id": payload.get("sub"),
@@ -136,7 +403,7 @@ async def get_optional_user(authorization: Optional[str] = Header(None)) -> Opti
         if scheme.lower() != "bearer":
             return None
 
-        payload = verify_clerk_token(token)
+        payload = await averify_clerk_token(token)
         return {
             "user_id": payload.get("sub"),
             "email": payload.get("email"),
@@ -0,0 +1,100 @@
+"""
+Breed Statistics Backfill
+Seeds each user's `user_stats` breed histogram from their prediction
+documents. Users whose stats are already maintained (seeded by the backfill
+or by their first save since) are left alone, so it is safe to run while
+predictions are being saved.
+
+--rebuild overwrites maintained histograms too, for when they are suspected
+to have drifted. That races with concurrent saves: pause writes first.
+
+Usage:
+    python backfill_breed_stats.py                  # all users
+    python backfill_breed_stats.py --user user_123  # one user
+    python backfill_breed_stats.py --dry-run        # report only
+    python backfill_breed_stats.py --rebuild        # overwrite maintained stats too
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+USE_FIREBASE = os.getenv("USE_FIREBASE", "true").lower() == "true"
+
+
+def get_prediction_db():
+    """Get the prediction DB for the configured backend"""
+    if USE_FIREBASE:
+        from firebase_db import firebase_db, firebase_prediction_db
+        if not firebase_db.is_connected():
+            return None
+        return firebase_prediction_db
+
+    from database import prediction_db
+    return prediction_db
+
+
+async def backfill(prediction_db, user_ids, dry_run, rebuild=False):
+    """Seed (or rebuild) histograms; returns (users processed, stats written)"""
+    user_ids = user_ids or await prediction_db.list_prediction_user_ids()
+    written = 0
+
+    for user_id in user_ids:
+        if not rebuild and not dry_run:
+            # Computes the history itself, guarded against concurrent saves
+            if await prediction_db.seed_breed_stats(user_id):
+                written += 1
+                print(f"  ✓ {user_id}: seeded")
+            else:
+                print(f"  - {user_id}: already maintained (or the write failed)")
+            continue
+
+        histogram = await prediction_db.compute_breed_histogram(user_id)
+        total = sum(entry["count"] for entry in histogram.values())
+        if not histogram:
+            continue
+
+        if dry_run:
+            print(f"  {user_id}: {len(histogram)} breed(s), {total} prediction(s) (dry run)")
+            continue
+
+        if await prediction_db.write_breed_stats(user_id, histogram):
+            written += 1
+            print(f"  ✓ {user_id}: {len(histogram)} breed(s), {total} prediction(s)")
+        else:
+            print(f"  ✗ {user_id}: failed to write stats")
+
+    return len(user_ids), written
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Rebuild per-user breed statistics")
+    parser.add_argument("--user", action="append", dest="users", help="User ID (repeatable)")
+    parser.add_argument("--dry-run", action="store_true", help="Compute histograms without writing them")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Overwrite stats that are already maintained (pause writes first)")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("📊 BREED STATISTICS BACKFILL")
+    print("=" * 60)
+
+    prediction_db = get_prediction_db()
+    if prediction_db is None:
+        print("❌ Database is not connected!")
+        return 1
+
+    processed, written = asyncio.run(backfill(prediction_db, args.users, args.dry_run, args.rebuild))
+
+    print(f"\n📊 Users processed: {processed}, stats written: {written}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,445 @@
+"""
+Adaptive Batch Scheduler
+Groups concurrent predictions into model batches, sizing each batch and how
+long it waits to fill from a live latency model instead of a fixed window.
+
+- Every request gets a deadline of PREDICT_SLO_MS after it arrives (queueing
+  plus the forward pass; decoding and the rest of /predict come on top).
+- The latency model keeps a moving average of measured forward-pass time
+  per batch size and interpolates sizes it has not run yet.
+- A batch waits for more requests only while the oldest request can still
+  make its deadline with the bigger batch, and only as long as the current
+  arrival rate needs to fill it: no waiting at low load, full batches at
+  high load.
+- A safety margin on the estimates grows while the observed p95 is over the
+  SLO and decays back when it is comfortably under.
+- Requests that cannot meet their deadline are shed early (on submit) or
+  late (still queued when it becomes impossible) with OverloadedError,
+  which /predict turns into a 503.
+- Requests wait in priority lanes (authenticated before anonymous). Batches
+  are filled from the lanes by weighted fair queueing, so under overload the
+  authenticated lane gets PREDICT_LANE_WEIGHTS times the anonymous share of
+  the model and is shed last, while anonymous traffic still gets its share.
+- With PREDICT_USER_MAX_IN_FLIGHT set, one user can only have that many
+  images queued or running; more raise QuotaExceededError (a 429). The rows
+  of one image (TTA views, detected dogs' crops) go through submit_many and
+  count once.
+"""
+
+import asyncio
+import math
+import os
+from collections import deque
+from typing import Callable, Deque, Dict, Hashable, List, Optional
+
+import numpy as np
+
+from metrics import LatencyHistogram
+
+PREDICT_SLO_MS = float(os.getenv("PREDICT_SLO_MS", "500"))
+PREDICT_MAX_BATCH = int(os.getenv("PREDICT_MAX_BATCH", "16"))
+PREDICT_MAX_QUEUE = int(os.getenv("PREDICT_MAX_QUEUE", "256"))
+# Forward-pass estimate before anything has been measured
+PREDICT_INITIAL_LATENCY_MS = float(os.getenv("PREDICT_INITIAL_LATENCY_MS", "50"))
+
+# Requests between margin adjustments, and the bounds of the margin
+MARGIN_WINDOW = 50
+MARGIN_MIN = 1.0
+MARGIN_MAX = 3.0
+
+# Lanes in priority order (ties in fair share go to the earlier lane)
+LANE_AUTHENTICATED = "authenticated"
+LANE_ANONYMOUS = "anonymous"
+LANES = (LANE_AUTHENTICATED, LANE_ANONYMOUS)
+# Share of the model each lane gets while both are backlogged
+PREDICT_LANE_WEIGHTS = os.getenv("PREDICT_LANE_WEIGHTS", "authenticated:4,anonymous:1")
+# Images one user may have queued or running at once (0 = no quota)
+PREDICT_USER_MAX_IN_FLIGHT = int(os.getenv("PREDICT_USER_MAX_IN_FLIGHT", "0"))
+
+
+class OverloadedError(Exception):
+    """The request was shed because its deadline cannot be met"""
+
+
+class QuotaExceededError(OverloadedError):
+    """The user already has PREDICT_USER_MAX_IN_FLIGHT images in the scheduler"""
+
+
+def parse_lane_weights(value: str) -> Dict[str, float]:
+    """"authenticated:4,anonymous:1" -> weights for every lane (missing lanes weigh 1)"""
+    weights = {lane: 1.0 for lane in LANES}
+    for part in value.split(","):
+        lane, _, weight = part.partition(":")
+        if lane.strip() in weights and weight.strip():
+            weights[lane.strip()] = max(float(weight), 0.01)
+    return weights
+
+
+def batch_buckets(max_batch: int) -> List[int]:
+    """Batch sizes to run (powers of two up to max_batch): few shapes to trace and warm"""
+    sizes = [1]
+    while sizes[-1] * 2 < max_batch:
+        sizes.append(sizes[-1] * 2)
+    if sizes[-1] != max_batch:
+        sizes.append(max_batch)
+    return sizes
+
+
+class LatencyModel:
+    """Online estimate of forward-pass time (ms) by batch size"""
+
+    def __init__(self, initial_ms: float = PREDICT_INITIAL_LATENCY_MS, alpha: float = 0.2):
+        self.initial_ms = initial_ms
+        self.alpha = alpha
+        self._ewma: Dict[int, float] = {}
+
+    def observe(self, batch_size: int, elapsed_ms: float):
+        previous = self._ewma.get(batch_size)
+        self._ewma[batch_size] = elapsed_ms if previous is None else (
+            self.alpha * elapsed_ms + (1 - self.alpha) * previous
+        )
+
+    def estimate(self, batch_size: int) -> float:
+        if batch_size in self._ewma:
+            return self._ewma[batch_size]
+        if not self._ewma:
+            return self.initial_ms * batch_size
+        if len(self._ewma) == 1:
+            size, ms = next(iter(self._ewma.items()))
+            return ms * max(1.0, batch_size / size)
+
+        # Least-squares line (fixed cost + per-item cost) through the measured sizes
+        sizes = np.array(list(self._ewma.keys()), dtype=float)
+        times = np.array(list(self._ewma.values()))
+        slope, intercept = np.polyfit(sizes, times, 1)
+        return max(float(intercept + max(slope, 0.0) * batch_size), min(times))
+
+    def snapshot(self) -> Dict[str, float]:
+        return {str(size): round(ms, 2) for size, ms in sorted(self._ewma.items())}
+
+
+class _Lane:
+    """One priority lane: its queue, fair-share position and counters"""
+
+    def __init__(self, name: str, weight: float):
+        self.name = name
+        self.weight = weight
+        self.queue: Deque["_Request"] = deque()
+        # Virtual time: advances by 1/weight per request taken into a batch
+        self.vtime = 0.0
+        self.completed = 0
+        self.shed = 0
+        self.quota_rejected = 0
+        self.latency = LatencyHistogram()
+
+    def stats(self) -> Dict:
+        return {
+            "weight": self.weight,
+            "queue_depth": len(self.queue),
+            "completed": self.completed,
+            "shed": self.shed,
+            "quota_rejected": self.quota_rejected,
+            "latency": self.latency.snapshot()
+        }
+
+
+class _Request:
+    __slots__ = ("row", "arrival", "deadline", "future", "lane")
+
+    def __init__(self, row: np.ndarray, arrival: float, deadline: float, future: asyncio.Future, lane: _Lane):
+        self.row = row
+        self.arrival = arrival
+        self.deadline = deadline
+        self.future = future
+        self.lane = lane
+
+
+class AdaptiveBatchScheduler:
+    """Batches single-image requests for a blocking predict(batch) function"""
+
+    def __init__(self, predict: Callable[[np.ndarray], np.ndarray], slo_ms: float = PREDICT_SLO_MS,
+                 max_batch: int = PREDICT_MAX_BATCH, max_queue: int = PREDICT_MAX_QUEUE,
+                 latency_model: Optional[LatencyModel] = None, lane_weights: Optional[Dict[str, float]] = None,
+                 user_max_in_flight: int = PREDICT_USER_MAX_IN_FLIGHT):
+        self._predict = predict
+        self.slo = slo_ms / 1000
+        self.max_batch = max_batch
+        self.max_queue = max_queue
+        self.buckets = batch_buckets(max_batch)
+        self.latency_model = latency_model or LatencyModel()
+        self.margin = MARGIN_MIN
+        self.user_max_in_flight = user_max_in_flight
+
+        weights = lane_weights or parse_lane_weights(PREDICT_LANE_WEIGHTS)
+        self.lanes: Dict[str, _Lane] = {lane: _Lane(lane, weights.get(lane, 1.0)) for lane in LANES}
+        self._vtime = 0.0
+        self._user_in_flight: Dict[Hashable, int] = {}
+        self._arrival = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._busy_until = 0.0
+        self._last_arrival: Optional[float] = None
+        self._interarrival: Optional[float] = None
+        self._recent: Deque[float] = deque(maxlen=MARGIN_WINDOW)
+
+        self.completed = 0
+        self.batches = 0
+        self.shed_early = 0
+        self.shed_late = 0
+        self.quota_rejected = 0
+        self.errors = 0
+        self.latency = LatencyHistogram()
+        self.batch_wait = LatencyHistogram()
+
+    @property
+    def queued(self) -> int:
+        return sum(len(lane.queue) for lane in self.lanes.values())
+
+    def _ahead(self, lane: _Lane, rows: int = 1) -> int:
+        """Requests served before the last of `rows` joining `lane` now, themselves included
+
+        Under weighted fair queueing, while this lane drains its n requests
+        every other lane gets through at most n * (its weight / this weight).
+        """
+        mine = len(lane.queue) + rows
+        ahead = mine
+        for other in self.lanes.values():
+            if other is not lane:
+                ahead += min(len(other.queue), math.ceil(mine * other.weight / lane.weight))
+        return ahead
+
+    def _bucket(self, rows: int) -> int:
+        return next(size for size in self.buckets if size >= rows)
+
+    def _estimate(self, rows: int) -> float:
+        """Forward-pass estimate in seconds for `rows` requests, with the safety margin"""
+        return self.latency_model.estimate(self._bucket(rows)) * self.margin / 1000
+
+    def _expected_wait(self, now: float, backlog: int) -> float:
+        """Seconds until a request joining `backlog` queued requests would finish"""
+        wait = max(0.0, self._busy_until - now)
+        full_batches, rest = divmod(backlog, self.max_batch)
+        if full_batches:
+            wait += full_batches * self._estimate(self.max_batch)
+        if rest:
+            wait += self._estimate(rest)
+        return wait
+
+    async def submit(self, row: np.ndarray, lane: str = LANE_ANONYMOUS, user: Optional[Hashable] = None) -> np.ndarray:
+        """Class probabilities for one preprocessed image
+
+        Raises OverloadedError when shed, QuotaExceededError when `user`
+        already has user_max_in_flight images in the scheduler.
+        """
+        return (await self.submit_many(row[None], lane, user))[0]
+
+    async def submit_many(self, rows: np.ndarray, lane: str = LANE_ANONYMOUS,
+                          user: Optional[Hashable] = None) -> np.ndarray:
+        """Class probabilities for the rows of one image (TTA views, dog crops)
+
+        The rows are admitted or shed together and count once against the
+        user's quota. When one row fails, the others still queued are
+        withdrawn instead of being computed for nothing.
+        """
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+        state = self.lanes[lane]
+
+        if user is not None and self.user_max_in_flight and \
+                self._user_in_flight.get(user, 0) >= self.user_max_in_flight:
+            self.quota_rejected += 1
+            state.quota_rejected += 1
+            raise QuotaExceededError(f"At most {self.user_max_in_flight} predictions in flight per user")
+
+        now = loop.time()
+        deadline = now + self.slo
+        if self.queued + len(rows) > self.max_queue or \
+                now + self._expected_wait(now, self._ahead(state, len(rows))) > deadline:
+            self.shed_early += 1
+            state.shed += 1
+            raise OverloadedError("Prediction queue cannot meet the latency target")
+
+        for _ in rows:
+            if self._last_arrival is not None:
+                gap = now - self._last_arrival
+                self._interarrival = gap if self._interarrival is None else 0.2 * gap + 0.8 * self._interarrival
+            self._last_arrival = now
+
+        if not state.queue:
+            # A lane coming back from idle starts at the current virtual time: no saved-up credit
+            state.vtime = max(state.vtime, self._vtime)
+        requests = [_Request(row, now, deadline, loop.create_future(), state) for row in rows]
+        state.queue.extend(requests)
+        self._arrival.set()
+
+        def withdraw(future: Optional[asyncio.Future] = None):
+            """Drop the siblings still queued; ones already in a batch are just ignored"""
+            if future is not None and (future.cancelled() or future.exception() is None):
+                return
+            withdrawn = {id(request) for request in requests}
+            state.queue = deque(request for request in state.queue if id(request) not in withdrawn)
+            for request in requests:
+                if not request.future.done():
+                    request.future.cancel()
+
+        if len(requests) > 1:
+            # Runs before the scheduler forms its next batch, unlike the caller's own except
+            for request in requests:
+                request.future.add_done_callback(withdraw)
+        if user is not None:
+            self._user_in_flight[user] = self._user_in_flight.get(user, 0) + 1
+        try:
+            return np.stack(await asyncio.gather(*(request.future for request in requests)))
+        except BaseException:
+            withdraw()
+            raise
+        finally:
+            if user is not None:
+                remaining = self._user_in_flight[user] - 1
+                if remaining:
+                    self._user_in_flight[user] = remaining
+                else:
+                    del self._user_in_flight[user]
+
+    def _shed_expired(self, now: float):
+        """Fail queued requests that can no longer finish in time in the batch about to run"""
+        run = self._estimate(min(self.queued, self.max_batch))
+        for lane in self.lanes.values():
+            kept = deque()
+            for request in lane.queue:
+                if now + run > request.deadline and not request.future.done():
+                    self.shed_late += 1
+                    lane.shed += 1
+                    request.future.set_exception(OverloadedError("Prediction deadline passed in the queue"))
+                elif not request.future.done():
+                    kept.append(request)
+            lane.queue = kept
+
+    def _take(self) -> _Request:
+        """Next request for the batch: the backlogged lane furthest behind its fair share"""
+        lane = min((lane for lane in self.lanes.values() if lane.queue), key=lambda lane: lane.vtime)
+        self._vtime = lane.vtime
+        lane.vtime += 1 / lane.weight
+        return lane.queue.popleft()
+
+    def _fill_wait(self, now: float) -> float:
+        """How long to hold the batch for more requests (0 = dispatch now)"""
+        rows = min(self.queued, self.max_batch)
+        if rows >= self.max_batch or self._interarrival is None:
+            return 0.0
+        target = next(size for size in self.buckets if size > rows)
+        fill = (target - rows) * self._interarrival
+        # Holding longer than a forward pass loses to just running what we have
+        if fill > self._estimate(rows):
+            return 0.0
+        # Only worth it if the bigger batch still meets the oldest request's deadline
+        oldest = min(lane.queue[0].deadline for lane in self.lanes.values() if lane.queue)
+        slack = oldest - now - fill - self._estimate(target)
+        return fill if slack > 0 else 0.0
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self.queued:
+                self._arrival.clear()
+                await self._arrival.wait()
+                continue
+
+            wait = self._fill_wait(loop.time())
+            if wait > 0:
+                target = self._bucket(min(self.queued, self.max_batch) + 1)
+                hold_until = loop.time() + wait
+                while self.queued < target and loop.time() < hold_until:
+                    self._arrival.clear()
+                    try:
+                        await asyncio.wait_for(self._arrival.wait(), hold_until - loop.time())
+                    except asyncio.TimeoutError:
+                        break
+
+            now = loop.time()
+            self._shed_expired(now)
+            if not self.queued:
+                continue
+
+            batch = [self._take() for _ in range(min(self.queued, self.max_batch))]
+            await self._run_batch(batch, now)
+            # Let callers whose row just failed withdraw their queued rows first
+            await asyncio.sleep(0)
+
+    async def _run_batch(self, batch: List[_Request], started: float):
+        loop = asyncio.get_running_loop()
+        size = self._bucket(len(batch))
+        inputs = np.zeros((size,) + batch[0].row.shape, dtype=np.float32)
+        for i, request in enumerate(batch):
+            inputs[i] = request.row
+            self.batch_wait.observe((started - request.arrival) * 1000)
+
+        self._busy_until = started + self._estimate(len(batch))
+        try:
+            outputs = await asyncio.to_thread(self._predict, inputs)
+        except Exception as e:
+            self.errors += 1
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+        finished = loop.time()
+        self._busy_until = finished
+
+        self.latency_model.observe(size, (finished - started) * 1000)
+        self.batches += 1
+        for i, request in enumerate(batch):
+            if not request.future.done():
+                request.future.set_result(outputs[i])
+            elapsed_ms = (finished - request.arrival) * 1000
+            self.latency.observe(elapsed_ms)
+            request.lane.latency.observe(elapsed_ms)
+            request.lane.completed += 1
+            self._recent.append(elapsed_ms)
+            self.completed += 1
+            if self.completed % MARGIN_WINDOW == 0:
+                self._adjust_margin()
+
+    def _adjust_margin(self):
+        """Grow the estimate margin while the recent p95 misses the SLO, decay it when well under"""
+        p95 = float(np.percentile(self._recent, 95))
+        slo_ms = self.slo * 1000
+        if p95 > slo_ms:
+            self.margin = min(MARGIN_MAX, self.margin * 1.2)
+        elif p95 < 0.8 * slo_ms:
+            self.margin = max(MARGIN_MIN, self.margin * 0.95)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for lane in self.lanes.values():
+            for request in lane.queue:
+                if not request.future.done():
+                    request.future.set_exception(OverloadedError("Scheduler stopped"))
+            lane.queue.clear()
+
+    def stats(self) -> Dict:
+        return {
+            "slo_ms": self.slo * 1000,
+            "max_batch": self.max_batch,
+            "queue_depth": self.queued,
+            "completed": self.completed,
+            "batches": self.batches,
+            "avg_batch": round(self.completed / self.batches, 2) if self.batches else 0,
+            "shed_early": self.shed_early,
+            "shed_late": self.shed_late,
+            "quota_rejected": self.quota_rejected,
+            "users_in_flight": len(self._user_in_flight),
+            "errors": self.errors,
+            "margin": round(self.margin, 3),
+            "arrival_rate_per_s": round(1 / self._interarrival, 1) if self._interarrival else 0,
+            "latency_model_ms": self.latency_model.snapshot(),
+            "latency": self.latency.snapshot(),
+            "batch_wait": self.batch_wait.snapshot(),
+            "lanes": {name: lane.stats() for name, lane in self.lanes.items()}
+        }
@@ -0,0 +1,68 @@
+"""
+Auth Micro-Benchmark
+Measures per-request token verification cost with and without the verified-token cache.
+Uses a locally generated RSA key, so no network access or Clerk account is needed.
+
+Usage: python benchmark_auth.py [iterations]
+"""
+
+import asyncio
+import sys
+import time
+
+import auth
+from mint_tokens import build_jwks, generate_signing_key, mint_token
+
+
+def build_local_signer():
+    """Create an RSA key pair and point the auth module's key manager at it"""
+    private_key, kid = generate_signing_key("bench-key")
+    jwks = build_jwks(private_key, kid)
+    auth.jwks_manager = auth.JWKSKeyManager(lambda: jwks)
+    return private_key, kid
+
+
+def time_dependency(token: str, iterations: int) -> float:
+    """Average microseconds per get_current_user call"""
+    header = f"Bearer {token}"
+
+    async def run():
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await auth.get_current_user(header)
+        return time.perf_counter() - start
+
+    elapsed = asyncio.run(run())
+    return elapsed / iterations * 1_000_000
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    print("=" * 60)
+    print("🔐 Auth Micro-Benchmark")
+    print("=" * 60)
+
+    private_key, kid = build_local_signer()
+    token = mint_token(private_key, kid, sub="user_benchmark", lifetime=300)
+
+    # Warm the key cache so neither run pays the JWKS parse
+    auth.verify_clerk_token(token)
+
+    auth.token_cache = auth.VerifiedTokenCache(max_size=0)
+    uncached_us = time_dependency(token, iterations)
+
+    auth.token_cache = auth.VerifiedTokenCache()
+    cached_us = time_dependency(token, iterations)
+
+    print(f"\nIterations: {iterations}")
+    print(f"  Full RS256 verification: {uncached_us:10.2f} µs/request")
+    print(f"  Verified-token cache:    {cached_us:10.2f} µs/request")
+    print(f"  Speedup:                 {uncached_us / cached_us:10.1f}x")
+    print(f"\nCache stats: {auth.token_cache.stats()}")
+    print("=" * 60)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+Detection Stage Benchmark
+Times the /predict detection stage and the classifier separately: decoding,
+the dog detector, cropping, and one batched forward pass over every dog's
+crop, compared with classifying the whole image. The detector-only time is
+what a photo without a dog costs (the classifier never runs).
+
+Usage:
+    python benchmark_detector.py --image dogs.jpg            # models at DETECTOR_MODEL_PATH / MODEL_PATH
+    python benchmark_detector.py --image dogs.jpg --stub     # stub classifier with a fixed + per-image cost
+    python benchmark_detector.py --dogs 3                    # classify 3 crops even if none are detected
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from benchmark_scheduler import StubModel
+from dog_detector import Box, DogDetector
+from model_runtime import ModelRuntime, decode_image, preprocess_crops, preprocess_image, synthetic_image
+
+
+def timed(fn, iterations):
+    """(p50, p95) milliseconds of fn() over `iterations` runs"""
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.percentile(timings, 50)), float(np.percentile(timings, 95))
+
+
+def grid_boxes(width, height, count):
+    """`count` side-by-side boxes, for images where the detector finds fewer dogs"""
+    step = width / count
+    return [Box(int(i * step), 0, int((i + 1) * step), height, 1.0) for i in range(count)]
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Benchmark the dog detection stage and the classifier")
+    parser.add_argument("--image", default=None, help="Image to predict (default: synthetic 640x480 JPEG)")
+    parser.add_argument("--dogs", type=int, default=0, help="Classify this many crops when fewer are detected")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--stub", action="store_true", help="Use a stub classifier instead of loading one")
+    parser.add_argument("--base-ms", type=float, default=30, help="Stub forward-pass fixed cost")
+    parser.add_argument("--per-item-ms", type=float, default=5, help="Stub forward-pass cost per image")
+    args = parser.parse_args()
+
+    if args.image:
+        with open(args.image, "rb") as f:
+            image_bytes = f.read()
+    else:
+        image_bytes = synthetic_image((640, 480))
+
+    detector = DogDetector(enabled=True)
+    if not detector.load():
+        print(f"❌ No dog detector loaded ({detector.error or detector.path})")
+        return 1
+
+    if args.stub:
+        predict = StubModel(args.base_ms, args.per_item_ms, jitter=0).predict
+        model_name = f"stub {args.base_ms:g} ms + {args.per_item_ms:g} ms/image"
+    else:
+        runtime = ModelRuntime(server="")
+        if not runtime.load():
+            print(f"❌ {runtime.error} (use --stub to benchmark without a classifier)")
+            return 1
+        predict = runtime.predict
+        model_name = runtime.runtime_name
+
+    img = decode_image(image_bytes)
+    boxes = detector.detect(img)
+    detected = len(boxes)
+    if len(boxes) < args.dogs:
+        boxes = grid_boxes(*img.size, args.dogs)
+    whole = preprocess_image(image_bytes)
+    crops = preprocess_crops(img, boxes) if boxes else None
+    for _ in range(2):
+        predict(whole)
+        if crops is not None:
+            predict(crops)
+
+    decode = timed(lambda: decode_image(image_bytes), args.iterations)
+    detect = timed(lambda: detector.detect(img), args.iterations)
+    whole_ms = timed(lambda: predict(whole), args.iterations)
+
+    print("=" * 70)
+    print(f"🐕 DETECTION STAGE ({detected} dog(s) detected, {len(boxes)} classified, {model_name})")
+    print("=" * 70)
+    print(f"  {'':<36} {'p50 ms':>10} {'p95 ms':>10}")
+    print(f"  {'decode':<36} {decode[0]:>10.1f} {decode[1]:>10.1f}")
+    print(f"  {'detector':<36} {detect[0]:>10.1f} {detect[1]:>10.1f}")
+    if crops is not None:
+        crop = timed(lambda: preprocess_crops(img, boxes), args.iterations)
+        classify = timed(lambda: predict(crops), args.iterations)
+        print(f"  {f'crop {len(boxes)} dog(s)':<36} {crop[0]:>10.1f} {crop[1]:>10.1f}")
+        print(f"  {f'classifier, batch of {len(boxes)} crop(s)':<36} {classify[0]:>10.1f} {classify[1]:>10.1f}")
+    print(f"  {'classifier, whole image (no detector)':<36} {whole_ms[0]:>10.1f} {whole_ms[1]:>10.1f}")
+    print("-" * 70)
+    no_dog = decode[0] + detect[0]
+    print(f"  {'no dog: decode + detector':<36} {no_dog:>10.1f}")
+    if crops is not None:
+        total = no_dog + crop[0] + classify[0]
+        print(f"  {'with dogs: detection + classifier':<36} {total:>10.1f}")
+        print(f"\n✅ Detection adds {detect[0]:.1f} ms; {len(boxes)} crop(s) classify in one pass "
+              f"({classify[0]:.1f} ms vs {whole_ms[0]:.1f} ms for the whole image)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""
+Authenticated Endpoint Load Test
+Drives a running API with locally minted tokens and reports throughput and latency.
+
+Usage:
+    python mint_tokens.py keys
+    AUTH_JWKS_FILE=.local_auth/jwks.json uvicorn main:app --port 8000
+    # ...or without any external database (STORAGE_BACKEND=memory or sqlite)
+    STORAGE_BACKEND=sqlite AUTH_JWKS_FILE=.local_auth/jwks.json uvicorn main:app --port 8000
+    python benchmark_endpoints.py --endpoint /history --users 20 --concurrency 32 --requests 2000
+    python benchmark_endpoints.py --endpoint /predict --image dog.jpg --concurrency 8
+
+    # Highest concurrency one worker sustains within a p95 budget (run once per
+    # build to compare, e.g. before/after a change to the database layer)
+    python benchmark_endpoints.py --endpoint /vaccinations --sweep 1,4,16,64,256 --p95-slo 250
+
+Start the API with RATE_LIMIT_ENABLED=false when load testing /predict or the
+stats endpoints, or most requests measure the 429 path.
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+
+import httpx
+
+from metrics import LatencyHistogram
+from mint_tokens import LOCAL_AUTH_DIR, load_local_signer, mint_token
+
+
+async def run_load(args, tokens, concurrency=None):
+    concurrency = concurrency or args.concurrency
+    histogram = LatencyHistogram()
+    status_counts = {}
+    image_bytes = None
+    if args.image:
+        with open(args.image, 'rb') as f:
+            image_bytes = f.read()
+
+    queue = asyncio.Queue()
+    for i in range(args.requests):
+        queue.put_nowait(i)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60) as client:
+
+        async def worker():
+            while True:
+                try:
+                    i = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+
+                headers = {"Authorization": f"Bearer {tokens[i % len(tokens)]}"}
+                start = time.perf_counter()
+                try:
+                    if args.endpoint == "/predict":
+                        files = {"file": ("dog.jpg", image_bytes, "image/jpeg")}
+                        response = await client.post(args.endpoint, headers=headers, files=files)
+                    else:
+                        response = await client.get(args.endpoint, headers=headers)
+                    status = response.status_code
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                histogram.observe((time.perf_counter() - start) * 1000)
+                status_counts[status] = status_counts.get(status, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return elapsed, histogram.snapshot(), status_counts
+
+
+def run_sweep(args, tokens):
+    """Ramp concurrency and report the highest level that stays within the p95 SLO"""
+    levels = [int(level) for level in args.sweep.split(",")]
+    sustained = None
+
+    print(f"  {'conc':>6} {'req/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for concurrency in levels:
+        elapsed, latency, status_counts = asyncio.run(run_load(args, tokens, concurrency))
+        errors = sum(count for status, count in status_counts.items() if status != 200)
+        print(f"  {concurrency:>6} {args.requests / elapsed:>10.1f} {latency['p50_ms']:>9.1f} "
+              f"{latency['p95_ms']:>9.1f} {latency['p99_ms']:>9.1f} {errors:>7}")
+
+        if errors or latency["p95_ms"] > args.p95_slo:
+            break
+        sustained = concurrency
+
+    print("-" * 60)
+    if sustained is None:
+        print(f"  ❌ No level met p95 <= {args.p95_slo:.0f} ms without errors")
+    else:
+        print(f"  ✅ Sustained concurrency: {sustained} (p95 <= {args.p95_slo:.0f} ms, no errors)")
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Load-test authenticated endpoints")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--endpoint", default="/history",
+                        help="/predict, /history, /stats, /vaccinations, ...")
+    parser.add_argument("--image", default=None, help="Image file for /predict")
+    parser.add_argument("--users", type=int, default=10, help="Distinct users to mint tokens for")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--dir", default=LOCAL_AUTH_DIR, help="Key directory from mint_tokens.py")
+    parser.add_argument("--sweep", default=None,
+                        help="Comma-separated concurrency levels, e.g. 1,4,16,64")
+    parser.add_argument("--p95-slo", type=float, default=250.0,
+                        help="p95 latency budget (ms) for --sweep")
+    args = parser.parse_args()
+
+    if args.endpoint == "/predict" and not args.image:
+        print("❌ --image is required for /predict")
+        return 1
+
+    try:
+        private_key, kid = load_local_signer(args.dir)
+    except FileNotFoundError:
+        print(f"❌ No local key in {args.dir}. Run: python mint_tokens.py keys")
+        return 1
+
+    tokens = [mint_token(private_key, kid, sub=f"user_load_{i}") for i in range(args.users)]
+
+    if args.sweep:
+        print("=" * 60)
+        print(f"🚀 Concurrency sweep: {args.endpoint} ({args.requests} requests per level)")
+        print("=" * 60)
+        run_sweep(args, tokens)
+        print("=" * 60)
+        return 0
+
+    print("=" * 60)
+    print(f"🚀 Load test: {args.endpoint} ({args.requests} requests, concurrency {args.concurrency})")
+    print("=" * 60)
+
+    elapsed, latency, status_counts = asyncio.run(run_load(args, tokens))
+
+    print(f"\n  Throughput: {args.requests / elapsed:10.1f} req/s")
+    print(f"  p50:        {latency['p50_ms']:10.1f} ms")
+    print(f"  p95:        {latency['p95_ms']:10.1f} ms")
+    print(f"  p99:        {latency['p99_ms']:10.1f} ms")
+    print(f"  max:        {latency['max_ms']:10.1f} ms")
+    print(f"  Statuses:   {status_counts}")
+    print("=" * 60)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+"""
+Pre-fork Serving Benchmark
+Starts gunicorn (gunicorn.conf.py) with an increasing number of workers and
+reports, for each worker count, memory per worker (RSS, PSS and how much of
+it is shared with the master) and /predict throughput and latency.
+
+Usage (Linux; reads /proc):
+    STORAGE_BACKEND=memory python benchmark_prefork.py --workers 1,2,4 --image dog.jpg
+    STORAGE_BACKEND=memory python benchmark_prefork.py --workers 1,2 --requests 500 --concurrency 16
+
+PSS (proportional set size) splits shared pages between the processes that
+map them, so PSS per worker well below RSS per worker means the preloaded
+pages are being shared instead of copied.
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import httpx
+
+from metrics import LatencyHistogram
+from model_runtime import synthetic_image
+
+
+def children(pid: int):
+    """Direct child PIDs (the gunicorn workers)"""
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def memory_mb(pid: int):
+    """RSS, PSS and shared memory of one process in MB (from smaps_rollup)"""
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    except OSError:
+        return None
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0)
+    }
+
+
+def start_server(workers: int, port: int, threads):
+    # Measure the model, not the per-client /predict budget
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), PORT=str(port), RATE_LIMIT_ENABLED="false")
+    env.pop("MODEL_THREADS", None)
+    if threads:
+        env["MODEL_THREADS"] = str(threads)
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "main:app", "-c", "gunicorn.conf.py"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True
+    )
+
+
+def wait_ready(url: str, workers: int, timeout: float) -> bool:
+    """Wait until every worker answers /health/ready with 200 (consecutive successes)"""
+    deadline = time.monotonic() + timeout
+    streak = 0
+    with httpx.Client(base_url=url, timeout=5) as client:
+        while time.monotonic() < deadline:
+            try:
+                ok = client.get("/health/ready").status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            streak = streak + 1 if ok else 0
+            if streak >= workers * 4:
+                return True
+            time.sleep(0.05 if ok else 0.5)
+    return False
+
+
+async def run_load(url: str, image: bytes, requests: int, concurrency: int):
+    histogram = LatencyHistogram()
+    errors = 0
+    queue = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(i)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=120) as client:
+
+        async def worker():
+            nonlocal errors
+            while True:
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                start = time.perf_counter()
+                try:
+                    files = {"file": ("dog.jpg", image, "image/jpeg")}
+                    response = await client.post("/predict", files=files)
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                histogram.observe((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return requests / elapsed, histogram.snapshot(), errors
+
+
+def benchmark(workers: int, args, image: bytes):
+    url = f"http://127.0.0.1:{args.port}"
+    server = start_server(workers, args.port, args.threads)
+    try:
+        ready = wait_ready(url, workers, args.ready_timeout)
+        worker_pids = children(server.pid)
+        master = memory_mb(server.pid)
+        per_worker = [m for m in (memory_mb(pid) for pid in worker_pids) if m]
+
+        result = {
+            "workers": len(worker_pids),
+            "ready": ready,
+            "master_rss": master["rss"] if master else 0,
+            "rss": sum(m["rss"] for m in per_worker) / max(1, len(per_worker)),
+            "pss": sum(m["pss"] for m in per_worker) / max(1, len(per_worker)),
+            "shared": sum(m["shared"] for m in per_worker) / max(1, len(per_worker)),
+            "rps": None
+        }
+        if ready:
+            rps, latency, errors = asyncio.run(run_load(url, image, args.requests, args.concurrency))
+            result.update(rps=rps, p50=latency["p50_ms"], p95=latency["p95_ms"], errors=errors)
+        return result
+    finally:
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait(timeout=60)
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Benchmark pre-fork serving across worker counts")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="MODEL_THREADS per worker (default: cores / workers)")
+    parser.add_argument("--image", default=None, help="Image for /predict (default: synthetic JPEG)")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--ready-timeout", type=float, default=300,
+                        help="Seconds to wait for workers to load and warm up the model")
+    args = parser.parse_args()
+
+    if args.image:
+        with open(args.image, "rb") as f:
+            image = f.read()
+    else:
+        image = synthetic_image()
+
+    print("=" * 86)
+    print(f"🚀 PRE-FORK BENCHMARK ({os.cpu_count()} cores)")
+    print("=" * 86)
+    print(f"  {'workers':>7} {'master MB':>10} {'RSS/wkr':>9} {'PSS/wkr':>9} {'shared':>8}"
+          f" {'req/s':>9} {'scaling':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+
+    baseline = None
+    for workers in [int(count) for count in args.workers.split(",")]:
+        r = benchmark(workers, args, image)
+        line = (f"  {r['workers']:>7} {r['master_rss']:>10.1f} {r['rss']:>9.1f} {r['pss']:>9.1f}"
+                f" {r['shared']:>8.1f}")
+        if r["rps"] is None:
+            print(f"{line}   ⚠️  workers not ready within {args.ready_timeout:g}s (model missing?)")
+            continue
+        baseline = baseline or r["rps"]
+        print(f"{line} {r['rps']:>9.1f} {r['rps'] / baseline:>7.2f}x {r['p50']:>8.1f}"
+              f" {r['p95']:>8.1f} {r['errors']:>7}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""
+Batch Scheduler Benchmark
+Drives the adaptive batch scheduler with open-loop Poisson traffic at several
+request rates against a stub model whose forward pass costs a fixed amount
+plus a per-image amount, and reports goodput, shedding and latency against
+the SLO. Use it to see where the knee is for a given SLO and batch cap
+before touching the real model.
+
+Usage:
+    python benchmark_scheduler.py                                  # default sweep
+    python benchmark_scheduler.py --rates 50,100,200,400 --slo-ms 300
+    python benchmark_scheduler.py --base-ms 20 --per-item-ms 4 --max-batch 32
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+
+import numpy as np
+
+from batch_scheduler import AdaptiveBatchScheduler, LatencyModel, OverloadedError
+
+
+class StubModel:
+    """Sleeps like a model with a fixed cost per batch plus a cost per image"""
+
+    def __init__(self, base_ms: float, per_item_ms: float, jitter: float = 0.1):
+        self.base_ms = base_ms
+        self.per_item_ms = per_item_ms
+        self.jitter = jitter
+        self.rng = np.random.default_rng(0)
+
+    def predict(self, batch):
+        ms = (self.base_ms + self.per_item_ms * batch.shape[0]) * (1 + self.rng.uniform(-self.jitter, self.jitter))
+        time.sleep(ms / 1000)
+        return batch.reshape(batch.shape[0], -1)[:, :4]
+
+
+async def run_rate(rate, args):
+    """Offer `rate` requests/s for args.duration seconds; returns the result dict"""
+    model = StubModel(args.base_ms, args.per_item_ms)
+    scheduler = AdaptiveBatchScheduler(model.predict, args.slo_ms, args.max_batch,
+                                       latency_model=LatencyModel(args.base_ms + args.per_item_ms))
+    rng = np.random.default_rng(1)
+    row = np.zeros((8,), dtype=np.float32)
+    latencies, shed = [], 0
+
+    async def one():
+        nonlocal shed
+        start = time.perf_counter()
+        try:
+            await scheduler.submit(row)
+            latencies.append((time.perf_counter() - start) * 1000)
+        except OverloadedError:
+            shed += 1
+
+    tasks = []
+    end = time.perf_counter() + args.duration
+    while time.perf_counter() < end:
+        tasks.append(asyncio.create_task(one()))
+        await asyncio.sleep(rng.exponential(1 / rate))
+    await asyncio.gather(*tasks)
+    stats = scheduler.stats()
+    await scheduler.close()
+
+    within = sum(1 for ms in latencies if ms <= args.slo_ms)
+    return {
+        "offered": len(tasks) / args.duration,
+        "goodput": within / args.duration,
+        "shed_pct": 100 * shed / len(tasks),
+        "p50": float(np.percentile(latencies, 50)) if latencies else 0.0,
+        "p95": float(np.percentile(latencies, 95)) if latencies else 0.0,
+        "avg_batch": stats["avg_batch"],
+        "margin": stats["margin"]
+    }
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Benchmark the adaptive batch scheduler under open-loop load")
+    parser.add_argument("--rates", default="10,50,100,200,400,800", help="Offered requests per second")
+    parser.add_argument("--duration", type=float, default=5, help="Seconds per rate")
+    parser.add_argument("--slo-ms", type=float, default=500)
+    parser.add_argument("--max-batch", type=int, default=16)
+    parser.add_argument("--base-ms", type=float, default=30, help="Stub forward-pass fixed cost")
+    parser.add_argument("--per-item-ms", type=float, default=5, help="Stub forward-pass cost per image")
+    args = parser.parse_args()
+
+    print("=" * 90)
+    print(f"📊 BATCH SCHEDULER (SLO {args.slo_ms:g} ms, max batch {args.max_batch}, "
+          f"model {args.base_ms:g} ms + {args.per_item_ms:g} ms/image)")
+    print("=" * 90)
+    print(f"  {'offered/s':>10} {'goodput/s':>10} {'shed %':>8} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'avg batch':>10} {'margin':>7}")
+
+    for rate in [float(r) for r in args.rates.split(",")]:
+        result = asyncio.run(run_rate(rate, args))
+        flag = "✓" if result["p95"] <= args.slo_ms else "✗"
+        print(f"  {result['offered']:>10.1f} {result['goodput']:>10.1f} {result['shed_pct']:>8.1f} "
+              f"{result['p50']:>9.1f} {result['p95']:>9.1f} {result['avg_batch']:>10.2f} "
+              f"{result['margin']:>7.3f} {flag}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
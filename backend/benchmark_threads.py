@@ -0,0 +1,165 @@
+"""
+Inference Threading Benchmark
+Sweeps intra-op / inter-op thread counts, CPU pinning and oneDNN on this host
+for batch sizes 1-64, then recommends the settings with the lowest batch-1
+latency and with the highest large-batch throughput.
+
+Each configuration runs in a fresh process, because TensorFlow's thread pools
+and oneDNN can only be configured before its runtime starts.
+
+Usage:
+    python benchmark_threads.py                                  # default sweep
+    python benchmark_threads.py --intra 1,2,4 --inter 1,2 --onednn on,off --pin
+    python benchmark_threads.py --batch-sizes 1,8,32 --iterations 10
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+RESULT_PREFIX = "RESULT "
+
+
+def default_thread_counts():
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    counts = [1]
+    while counts[-1] * 2 <= cpus:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cpus:
+        counts.append(cpus)
+    return counts
+
+
+def run_child(config):
+    """Load the model with one configuration and time every batch size"""
+    from model_runtime import ModelRuntime, ThreadingConfig
+
+    runtime = ModelRuntime(server="")
+    runtime.threading = ThreadingConfig(config["intra"], config["inter"], config["affinity"], config["onednn"])
+    if not runtime.load():
+        print(RESULT_PREFIX + json.dumps({"error": runtime.error}))
+        return 1
+
+    results = {}
+    for batch_size in config["batch_sizes"]:
+        batch = np.random.default_rng(0).uniform(0, 255, (batch_size, 224, 224, 3)).astype(np.float32)
+        for _ in range(2):
+            runtime.predict(batch)
+
+        timings = []
+        for _ in range(config["iterations"]):
+            start = time.perf_counter()
+            runtime.predict(batch)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        p50 = float(np.percentile(timings, 50))
+        results[str(batch_size)] = {
+            "p50_ms": round(p50, 2),
+            "p95_ms": round(float(np.percentile(timings, 95)), 2),
+            "images_per_s": round(batch_size * 1000 / p50, 1)
+        }
+
+    print(RESULT_PREFIX + json.dumps({"runtime": runtime.runtime_name, "batches": results}))
+    return 0
+
+
+def benchmark(config, timeout):
+    """Run one configuration in a subprocess; returns its result dict"""
+    try:
+        completed = subprocess.run(
+            [sys.executable, __file__, "--child", json.dumps(config)],
+            capture_output=True, text=True, timeout=timeout
+        )
+    except subprocess.TimeoutExpired:
+        return {"error": f"timed out after {timeout:g}s"}
+
+    for line in completed.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    return {"error": (completed.stderr.strip().splitlines() or ["no result"])[-1]}
+
+
+def describe(config):
+    pinned = f"cpus {config['affinity']}" if config["affinity"] else "unpinned"
+    return f"intra={config['intra']} inter={config['inter']} onednn={config['onednn']} {pinned}"
+
+
+def env_lines(config):
+    lines = [f"MODEL_INTRA_OP_THREADS={config['intra']}", f"MODEL_INTER_OP_THREADS={config['inter']}"]
+    if config["onednn"] != "auto":
+        lines.append(f"MODEL_ONEDNN={config['onednn']}")
+    if config["affinity"]:
+        lines.append(f"MODEL_CPU_AFFINITY={config['affinity']}")
+    return " ".join(lines)
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Sweep inference threading settings")
+    parser.add_argument("--intra", default=",".join(map(str, default_thread_counts())),
+                        help="Intra-op thread counts")
+    parser.add_argument("--inter", default="1,2", help="Inter-op thread counts")
+    parser.add_argument("--onednn", default="on,off", help="oneDNN settings (on, off, auto)")
+    parser.add_argument("--pin", action="store_true", help="Also try each thread count pinned to the first N CPUs")
+    parser.add_argument("--batch-sizes", default="1,2,4,8,16,32,64")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=900, help="Seconds per configuration")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child(json.loads(args.child))
+
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",")]
+    cpu_ids = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else []
+    configs = []
+    for onednn in args.onednn.split(","):
+        for intra in [int(count) for count in args.intra.split(",")]:
+            for inter in [int(count) for count in args.inter.split(",")]:
+                affinities = [""]
+                if args.pin and cpu_ids and intra <= len(cpu_ids):
+                    affinities.append(",".join(map(str, cpu_ids[:intra])))
+                for affinity in affinities:
+                    configs.append({"intra": intra, "inter": inter, "onednn": onednn, "affinity": affinity,
+                                    "batch_sizes": batch_sizes, "iterations": args.iterations})
+
+    print("=" * 90)
+    print(f"🧵 INFERENCE THREADING SWEEP ({len(configs)} configurations, {len(cpu_ids) or os.cpu_count()} CPUs)")
+    print("=" * 90)
+    print(f"  {'configuration':<44} {'b1 p50 ms':>10} " + " ".join(f"{'img/s@' + str(b):>10}" for b in batch_sizes))
+
+    results = []
+    for config in configs:
+        result = benchmark(config, args.timeout)
+        if "error" in result:
+            print(f"  {describe(config):<44} ✗ {result['error']}")
+            continue
+        batches = result["batches"]
+        first = batches[str(batch_sizes[0])]
+        print(f"  {describe(config):<44} {first['p50_ms']:>10.1f} "
+              + " ".join(f"{batches[str(b)]['images_per_s']:>10.1f}" for b in batch_sizes))
+        results.append((config, batches))
+
+    if not results:
+        print("\n❌ No configuration produced results (is the model at MODEL_PATH / TFLITE_MODEL_PATH?)")
+        return 1
+
+    smallest, largest = str(batch_sizes[0]), str(batch_sizes[-1])
+    latency_config, latency = min(results, key=lambda r: r[1][smallest]["p50_ms"])
+    throughput_config, throughput = max(results, key=lambda r: r[1][largest]["images_per_s"])
+
+    print("\n✅ Recommendations for this host")
+    print(f"  Lowest latency (batch {smallest}, p50 {latency[smallest]['p50_ms']} ms):")
+    print(f"    {env_lines(latency_config)}")
+    print(f"  Highest throughput (batch {largest}, {throughput[largest]['images_per_s']} img/s):")
+    print(f"    {env_lines(throughput_config)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+Test-Time Augmentation Benchmark
+Measures what /predict?tta=true costs over a plain prediction: the K
+augmented views run as one batch, compared with K sequential single-image
+calls, with decoding and view building timed separately.
+
+Usage:
+    python benchmark_tta.py                          # model at MODEL_PATH / TFLITE_MODEL_PATH
+    python benchmark_tta.py --image dog.jpg --iterations 50
+    python benchmark_tta.py --stub                   # no model: stub with a fixed + per-image cost
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from benchmark_scheduler import StubModel
+from model_runtime import PREDICT_TTA_VIEWS, ModelRuntime, preprocess_image, preprocess_views, synthetic_image
+
+
+def timed(fn, iterations):
+    """p50 milliseconds of fn() over `iterations` runs"""
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.percentile(timings, 50))
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Benchmark batched test-time augmentation")
+    parser.add_argument("--image", default=None, help="Image to predict (default: synthetic 640x480 JPEG)")
+    parser.add_argument("--views", default=",".join(PREDICT_TTA_VIEWS))
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--stub", action="store_true", help="Use a stub model instead of loading one")
+    parser.add_argument("--base-ms", type=float, default=30, help="Stub forward-pass fixed cost")
+    parser.add_argument("--per-item-ms", type=float, default=5, help="Stub forward-pass cost per image")
+    args = parser.parse_args()
+
+    views = args.views.split(",")
+    if args.image:
+        with open(args.image, "rb") as f:
+            image_bytes = f.read()
+    else:
+        image_bytes = synthetic_image((640, 480))
+
+    if args.stub:
+        predict = StubModel(args.base_ms, args.per_item_ms, jitter=0).predict
+        model_name = f"stub {args.base_ms:g} ms + {args.per_item_ms:g} ms/image"
+    else:
+        runtime = ModelRuntime(server="")
+        if not runtime.load():
+            print(f"❌ {runtime.error} (use --stub to benchmark without a model)")
+            return 1
+        predict = runtime.predict
+        model_name = runtime.runtime_name
+
+    single = preprocess_image(image_bytes)
+    batch = preprocess_views(image_bytes, views)
+    for _ in range(2):
+        predict(single)
+        predict(batch)
+
+    decode_ms = timed(lambda: preprocess_image(image_bytes), args.iterations)
+    views_ms = timed(lambda: preprocess_views(image_bytes, views), args.iterations)
+    single_ms = timed(lambda: predict(single), args.iterations)
+    sequential_ms = timed(lambda: [predict(batch[i:i + 1]) for i in range(len(views))], args.iterations)
+    batched_ms = timed(lambda: predict(batch), args.iterations)
+
+    plain = decode_ms + single_ms
+    with_batched = views_ms + batched_ms
+    with_sequential = views_ms + sequential_ms
+
+    print("=" * 70)
+    print(f"🪞 TEST-TIME AUGMENTATION ({len(views)} views, {model_name})")
+    print("=" * 70)
+    print(f"  {'':<34} {'p50 ms':>10} {'vs plain':>10}")
+    print(f"  {'decode + resize (1 view)':<34} {decode_ms:>10.1f}")
+    print(f"  {'decode + build views':<34} {views_ms:>10.1f}")
+    print(f"  {'forward pass, 1 image':<34} {single_ms:>10.1f}")
+    print(f"  {f'forward pass, {len(views)} sequential':<34} {sequential_ms:>10.1f}")
+    print(f"  {f'forward pass, batch of {len(views)}':<34} {batched_ms:>10.1f}")
+    print("-" * 70)
+    print(f"  {'plain prediction':<34} {plain:>10.1f} {1:>9.2f}x")
+    print(f"  {'TTA, sequential views':<34} {with_sequential:>10.1f} {with_sequential / plain:>9.2f}x")
+    print(f"  {'TTA, batched views':<34} {with_batched:>10.1f} {with_batched / plain:>9.2f}x")
+    print(f"\n✅ Batching the views saves {1 - batched_ms / sequential_ms:.0%} of the forward-pass time "
+          f"({sequential_ms:.1f} → {batched_ms:.1f} ms)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
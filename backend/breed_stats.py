@@ -0,0 +1,61 @@
+"""
+Breed Statistics Helpers
+Shared logic for the per-user breed histogram documents maintained at
+prediction-save time (Firestore `user_stats` / Mongo `user_stats`)
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional
+
+STATS_COLLECTION = "user_stats"
+
+
+def breed_key(breed: str) -> str:
+    """Field-safe key for a breed name (no dots, spaces or $)"""
+    key = re.sub(r"[^a-z0-9]+", "_", (breed or "unknown").lower()).strip("_")
+    return key or "unknown"
+
+
+def group_records(records: Iterable[Dict]) -> Dict[str, Dict[str, Dict]]:
+    """Aggregate prediction records into {user_id: {breed_key: entry}} deltas"""
+    per_user: Dict[str, Dict[str, Dict]] = {}
+    for record in records:
+        accumulate(
+            per_user.setdefault(record["user_id"], {}),
+            record.get("breed"),
+            record.get("confidence") or 0.0,
+            record.get("created_at")
+        )
+    return per_user
+
+
+def accumulate(histogram: Dict[str, Dict], breed: str, confidence: float, seen_at: Optional[str]):
+    """Add one prediction to an in-memory breed histogram"""
+    entry = histogram.setdefault(breed_key(breed), {
+        "breed": breed or "Unknown",
+        "count": 0,
+        "confidence_sum": 0.0,
+        "last_seen": None
+    })
+    entry["count"] += 1
+    entry["confidence_sum"] += float(confidence)
+    if seen_at and (entry["last_seen"] is None or seen_at > entry["last_seen"]):
+        entry["last_seen"] = seen_at
+
+
+def summarize(breeds: Dict[str, Dict], limit: Optional[int] = None) -> List[Dict]:
+    """Turn a stored breed histogram into the /stats response format"""
+    stats = []
+    for entry in (breeds or {}).values():
+        count = entry.get("count", 0)
+        if count <= 0:
+            continue
+        stats.append({
+            "breed": entry.get("breed", "Unknown"),
+            "count": count,
+            "avg_confidence": entry.get("confidence_sum", 0.0) / count,
+            "last_seen": entry.get("last_seen")
+        })
+
+    stats.sort(key=lambda s: s["count"], reverse=True)
+    return stats[:limit] if limit else stats
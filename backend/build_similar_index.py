@@ -0,0 +1,113 @@
+"""
+Similar-Dogs Index Builder
+Embeds a reference gallery with the serving model and writes the index
+/similar searches (SIMILAR_INDEX_PATH). The gallery is one folder per breed:
+
+    gallery/
+        golden_retriever/001.jpg
+        beagle/xyz.png
+
+Gallery entries are visible to every user; the API adds signed-in users'
+own predictions at run time. Images must be reachable at --url-prefix
+followed by their path inside the gallery (e.g. a CDN or Cloudinary folder).
+
+Usage:
+    python build_similar_index.py gallery/ --url-prefix https://cdn.example.com/gallery/
+    python build_similar_index.py gallery/ --url-prefix ... --append   # add to the saved index
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from model_runtime import ModelRuntime, preprocess_image
+from similarity_index import SIMILAR_INDEX_PATH, SimilarDogs
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+def gallery_images(root: str):
+    """(path relative to root, breed) for every image, sorted"""
+    for breed in sorted(os.listdir(root)):
+        folder = os.path.join(root, breed)
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                yield f"{breed}/{name}", breed.replace("_", " ").title()
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Build the /similar index from a reference gallery")
+    parser.add_argument("gallery", help="Folder with one sub-folder of images per breed")
+    parser.add_argument("--url-prefix", required=True, help="Public URL the gallery folder is served at")
+    parser.add_argument("--thumbnail-prefix", default=None, help="Public URL of thumbnails (default: the images)")
+    parser.add_argument("--output", default=SIMILAR_INDEX_PATH)
+    parser.add_argument("--append", action="store_true", help="Add to the existing index instead of replacing it")
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    runtime = ModelRuntime(server="")
+    if not runtime.load():
+        print(f"❌ {runtime.error}")
+        return 1
+    width = runtime.embedding_dim
+    if not width:
+        print("❌ The model does not expose an embedding; re-export it with convert_model.py")
+        return 1
+
+    index = SimilarDogs(args.output)
+    if args.append:
+        index.load()
+
+    images = list(gallery_images(args.gallery))
+    if not images:
+        print(f"❌ No images found under {args.gallery}")
+        return 1
+    thumbnail_prefix = args.thumbnail_prefix or args.url_prefix
+    print(f"🐕 Embedding {len(images)} gallery images ({runtime.runtime_name}, {width}-d)")
+
+    started = time.perf_counter()
+    skipped = 0
+    embeddings, entries = [], []
+    for start in range(0, len(images), args.batch_size):
+        rows = []
+        for path, breed in images[start:start + args.batch_size]:
+            try:
+                with open(os.path.join(args.gallery, path), "rb") as f:
+                    rows.append(preprocess_image(f.read())[0])
+            except Exception as e:
+                skipped += 1
+                print(f"⚠️  Skipping {path}: {e}")
+                continue
+            entries.append({
+                "source": "gallery",
+                "breed": breed,
+                "image_url": args.url_prefix + path,
+                "thumbnail_url": thumbnail_prefix + path,
+                "user_id": None
+            })
+        if rows:
+            embeddings.append(runtime.forward(np.stack(rows))[:, -width:])
+        print(f"   {min(start + args.batch_size, len(images))}/{len(images)}")
+
+    if not entries:
+        print("❌ No gallery image could be read")
+        return 1
+    # Added in one go, so the index trains its lists on the whole gallery
+    index.add_many(np.concatenate(embeddings), entries)
+    elapsed = time.perf_counter() - started
+    if not index.save():
+        return 1
+    stats = index.stats()
+    print(f"✅ {stats['entries']} entries ({'IVF, ' + str(stats['lists']) + ' lists' if stats['trained'] else 'flat'}, "
+          f"{stats['memory_mb']} MB) in {elapsed:.1f}s, {skipped} skipped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""
+Model Conversion
+Converts the Keras model to TensorFlow Lite so the API can serve it without
+importing TensorFlow (see model_runtime.py; install ai-edge-litert or
+tflite-runtime on the server). Needs TensorFlow on the machine running it.
+
+The converted model has a second output, the penultimate-layer embedding
+used by /similar, unless --no-embedding is given.
+
+Usage:
+    python convert_model.py                     # float32
+    python convert_model.py --quantize float16  # half-size weights
+    python convert_model.py --quantize dynamic  # int8 weights, float activations
+"""
+
+import argparse
+import os
+import sys
+
+from model_runtime import MODEL_PATH, TFLITE_MODEL_PATH, with_embedding_output
+
+
+def convert(model_path: str, output_path: str, quantize: str, embedding: bool = True) -> int:
+    """Write the converted model; returns its size in bytes"""
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(model_path)
+    if embedding:
+        model, _ = with_embedding_output(tf, model)
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+
+    if quantize in ("float16", "dynamic"):
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantize == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+
+    with open(output_path, "wb") as f:
+        f.write(converter.convert())
+    return os.path.getsize(output_path)
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Convert the Keras model to TensorFlow Lite")
+    parser.add_argument("--model", default=MODEL_PATH, help="Keras model to convert")
+    parser.add_argument("--output", default=TFLITE_MODEL_PATH, help="Where to write the .tflite file")
+    parser.add_argument("--quantize", choices=["none", "float16", "dynamic"], default="none")
+    parser.add_argument("--no-embedding", action="store_true", help="Export class probabilities only")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        print(f"❌ Model file not found: {args.model}")
+        return 1
+
+    size = convert(args.model, args.output, args.quantize, not args.no_embedding)
+    print(f"✅ Wrote {args.output} ({size / 1024 / 1024:.1f} MB, quantize={args.quantize})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
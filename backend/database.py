@@ -1,12 +1,26 @@
 # database.py
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, ConnectionFailure, DuplicateKeyError
+from bson import ObjectId
 import os
 from dotenv import load_dotenv
-from datetime import datetime
+from datetime import datetime, timezone
+import threading
+import time
+
+from breed_stats import STATS_COLLECTION, accumulate, breed_key, group_records, summarize
+from user_profile import profile_updates
+from pagination import (
+    HISTORY_DEFAULT_LIMIT, HISTORY_LIST_FIELDS, clamp_limit, decode_cursor, encode_cursor
+)
 
 load_dotenv()
 
+PREDICTION_COUNT_CACHE_TTL = float(os.getenv("PREDICTION_COUNT_CACHE_TTL", "300"))  # seconds
+# Prediction ids remembered per stats document, so a retried increment is not applied twice
+BREED_STATS_APPLIED_IDS = int(os.getenv("BREED_STATS_APPLIED_IDS", "500"))
+
 class MongoDB:
     _instance = None
     _client = None
@@ -18,11 +32,11 @@ class MongoDB:
         return cls._instance
 
     def __init__(self):
-        if self._client is None:
-            self.connect()
+        # The client is created on first use, so importing this module never connects
+        self._lock = threading.Lock()
 
     def connect(self):
-        """Connect to MongoDB"""
+        """Create the MongoDB client (connections are opened lazily by motor)"""
         try:
             mongodb_uri = os.getenv("MONGODB_URI")
             db_name = os.getenv("MONGODB_DB_NAME", "dog_breed_predictor")
@@ -30,27 +44,46 @@ class MongoDB:
             if not mongodb_uri:
                 raise ValueError("MONGODB_URI not found in environment variables")
             
-            self._client = MongoClient(mongodb_uri)
+            self._client = AsyncIOMotorClient(mongodb_uri)
             self._db = self._client[db_name]
+            print(f"✓ MongoDB client created: {db_name}")
             
-            # Test connection
-            self._client.admin.command('ping')
-            print(f"✓ Connected to MongoDB: {db_name}")
-            
-        except ConnectionFailure as e:
-            print(f"✗ MongoDB connection failed: {e}")
-            raise
         except Exception as e:
             print(f"✗ MongoDB initialization error: {e}")
             raise
+    
+    def _ensure_client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self.connect()
+
+    async def ping(self):
+        """Test the connection (call from the running event loop)"""
+        self._ensure_client()
+        try:
+            await self._client.admin.command('ping')
+            print("✓ Connected to MongoDB")
+            return True
+        except ConnectionFailure as e:
+            print(f"✗ MongoDB connection failed: {e}")
+            return False
 
     def get_database(self):
         """Get database instance"""
+        self._ensure_client()
         return self._db
 
     def get_collection(self, collection_name):
         """Get collection by name"""
-        return self._db[collection_name]
+        return self.get_database()[collection_name]
+
+    def __getitem__(self, collection_name):
+        return self.get_collection(collection_name)
+
+    def is_connected(self):
+        """Check if the client has been created"""
+        return self._client is not None
 
     def close(self):
         """Close MongoDB connection"""
@@ -66,43 +99,267 @@ class PredictionDB:
     """Handles prediction-related database operations"""
     
     def __init__(self):
-        self.collection = mongodb.get_collection("predictions")
-        # Create indexes
-        self.collection.create_index("user_id")
-        self.collection.create_index("timestamp")
+        # user_id -> (expires_at, count)
+        self._count_cache = {}
+        self._count_lock = threading.Lock()
+        # Users whose stats document is known to be backfilled
+        self._seeded_users = set()
     
-    def save_prediction(self, user_id, breed, confidence, image_name=None):
+    @property
+    def collection(self):
+        return mongodb.get_collection("predictions")
+    
+    @property
+    def stats_collection(self):
+        # Per-user breed histograms maintained at save time
+        return mongodb.get_collection(STATS_COLLECTION)
+    
+    async def ensure_indexes(self):
+        """Create indexes (call once from the running event loop)"""
+        await self.collection.create_index("user_id")
+        await self.collection.create_index("timestamp")
+        # Serves keyset-paginated history pages
+        await self.collection.create_index([("user_id", 1), ("timestamp", -1), ("_id", -1)])
+        await self.stats_collection.create_index("user_id", unique=True)
+    
+    async def save_prediction(self, user_id, breed, confidence, image_name=None,
+                        top_predictions=None, image_url=None, thumbnail_url=None):
         """Save a prediction to database"""
         prediction = {
             "user_id": user_id,
             "breed": breed,
             "confidence": confidence,
             "image_name": image_name,
-            "timestamp": datetime.utcnow()
+            "top_predictions": top_predictions or [],
+            "image_url": image_url,
+            "thumbnail_url": thumbnail_url,
+            "timestamp": datetime.utcnow(),
+            "stats_pending": True
         }
-        result = self.collection.insert_one(prediction)
+        result = await self.collection.insert_one(prediction)
+        self._adjust_cached_count(user_id, 1)
+        await self._apply_breed_stats([{
+            "id": str(result.inserted_id),
+            "user_id": user_id,
+            "breed": breed,
+            "confidence": confidence,
+            "created_at": prediction["timestamp"].isoformat()
+        }])
         return str(result.inserted_id)
     
-    def get_user_predictions(self, user_id, limit=50):
+    def new_prediction_id(self):
+        """Generate a prediction ID client-side"""
+        return str(ObjectId())
+    
+    async def save_predictions_batch(self, records):
+        """Save many buffered predictions with one insert_many"""
+        documents = [{
+            "_id": ObjectId(record["id"]),
+            "user_id": record["user_id"],
+            "breed": record["breed"],
+            "confidence": record["confidence"],
+            "image_name": record.get("image_name"),
+            "top_predictions": record.get("top_predictions") or [],
+            "image_url": record.get("image_url"),
+            "thumbnail_url": record.get("thumbnail_url"),
+            "timestamp": datetime.fromisoformat(record["created_at"]) if record.get("created_at") else datetime.utcnow(),
+            # Cleared once the prediction is in its owner's breed stats
+            "stats_pending": True
+        } for record in records]
+        
+        unapplied = []
+        try:
+            await self.collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            # Replayed spool records may already exist; anything else is a real failure
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != 11000 for error in errors):
+                raise
+            # Only count the records that were actually inserted
+            duplicates = {error["index"] for error in errors}
+            existing = [record for i, record in enumerate(records) if i in duplicates]
+            records = [record for i, record in enumerate(records) if i not in duplicates]
+            # Inserted by an attempt whose stats update then failed
+            pending = {doc["_id"] async for doc in self.collection.find(
+                {"_id": {"$in": [ObjectId(record["id"]) for record in existing]}, "stats_pending": True},
+                {"_id": 1}
+            )}
+            inserted = {record["id"] for record in records}
+            unapplied = list({record["id"]: record for record in existing
+                              if ObjectId(record["id"]) in pending and record["id"] not in inserted}.values())
+        
+        for record in records:
+            self._adjust_cached_count(record["user_id"], 1)
+        await self._apply_breed_stats(records + unapplied)
+        return True
+    
+    async def _apply_breed_stats(self, records):
+        """Add newly saved (stats_pending) predictions to the per-user breed histograms
+
+        A user without a backfilled stats document first gets one seeded from
+        the predictions already counted, so the increments never produce a
+        document that only knows about recent predictions. Each increment is
+        conditional on its prediction id not being in the document's recent
+        `applied_ids`, so a retry after the stats_pending cleanup failed does
+        not count it again.
+        """
+        per_user = group_records(records)
+        for user_id in per_user:
+            if user_id in self._seeded_users:
+                continue
+            await self.seed_breed_stats(user_id)
+            self._seeded_users.add(user_id)
+        
+        operations = []
+        for record in {record["id"]: record for record in records}.values():
+            key = breed_key(record.get("breed"))
+            update = {
+                "$inc": {
+                    f"breeds.{key}.count": 1,
+                    f"breeds.{key}.confidence_sum": float(record.get("confidence") or 0.0)
+                },
+                "$set": {f"breeds.{key}.breed": record.get("breed") or "Unknown", "updated_at": datetime.utcnow()},
+                "$push": {"applied_ids": {"$each": [record["id"]], "$slice": -BREED_STATS_APPLIED_IDS}}
+            }
+            if record.get("created_at"):
+                update["$max"] = {f"breeds.{key}.last_seen": record["created_at"]}
+            operations.append(UpdateOne({"user_id": record["user_id"], "applied_ids": {"$ne": record["id"]}}, update))
+        
+        if operations:
+            await self.stats_collection.bulk_write(operations, ordered=False)
+            await self.collection.update_many(
+                {"_id": {"$in": [ObjectId(record["id"]) for record in records]}},
+                {"$unset": {"stats_pending": ""}}
+            )
+    
+    async def get_user_predictions(self, user_id, limit=50):
         """Get user's prediction history"""
-        predictions = self.collection.find(
+        predictions = await self.collection.find(
             {"user_id": user_id}
-        ).sort("timestamp", -1).limit(limit)
+        ).sort("timestamp", -1).limit(limit).to_list(length=None)
         
         return [{
             "id": str(pred["_id"]),
             "breed": pred["breed"],
             "confidence": pred["confidence"],
             "image_name": pred.get("image_name"),
+            "image_url": pred.get("image_url"),
+            "thumbnail_url": pred.get("thumbnail_url"),
             "timestamp": pred["timestamp"].isoformat()
         } for pred in predictions]
     
-    def get_prediction_count(self, user_id):
-        """Get total predictions for a user"""
-        return self.collection.count_documents({"user_id": user_id})
+    async def get_user_predictions_page(self, user_id, limit=HISTORY_DEFAULT_LIMIT, cursor=None):
+        """Get one page of a user's history (list fields only, keyset cursor)"""
+        limit = clamp_limit(limit)
+        after = decode_cursor(cursor)
+        
+        query = {"user_id": user_id}
+        if after:
+            # Stored timestamps are naive UTC
+            timestamp = after[0].astimezone(timezone.utc).replace(tzinfo=None)
+            last_id = ObjectId(after[1]) if ObjectId.is_valid(after[1]) else after[1]
+            query["$or"] = [
+                {"timestamp": {"$lt": timestamp}},
+                {"timestamp": timestamp, "_id": {"$lt": last_id}}
+            ]
+        
+        projection = {field: 1 for field in HISTORY_LIST_FIELDS}
+        # One extra document tells us whether another page exists
+        docs = await (self.collection.find(query, projection)
+                      .sort([("timestamp", -1), ("_id", -1)])
+                      .limit(limit + 1)
+                      .to_list(length=None))
+        has_more = len(docs) > limit
+        docs = docs[:limit]
+        
+        next_cursor = None
+        if has_more and docs:
+            next_cursor = encode_cursor(docs[-1]["timestamp"], str(docs[-1]["_id"]))
+        
+        return {
+            "predictions": [{
+                "id": str(pred["_id"]),
+                "breed": pred["breed"],
+                "confidence": pred["confidence"],
+                "thumbnail_url": pred.get("thumbnail_url"),
+                "timestamp": pred["timestamp"].isoformat()
+            } for pred in docs],
+            "next_cursor": next_cursor,
+            "has_more": has_more
+        }
     
-    def get_breed_stats(self, user_id):
-        """Get breed prediction statistics for a user"""
+    async def get_prediction(self, prediction_id, user_id):
+        """Get the full document for one of a user's predictions"""
+        if ObjectId.is_valid(prediction_id):
+            prediction_id = ObjectId(prediction_id)
+        
+        pred = await self.collection.find_one({"_id": prediction_id, "user_id": user_id})
+        if not pred:
+            return None
+        
+        pred["id"] = str(pred.pop("_id"))
+        pred["timestamp"] = pred["timestamp"].isoformat()
+        return pred
+    
+    async def get_prediction_count(self, user_id):
+        """Get total predictions for a user (cached count_documents)"""
+        now = time.monotonic()
+        with self._count_lock:
+            cached = self._count_cache.get(user_id)
+            if cached and cached[0] > now:
+                return cached[1]
+        
+        count = await self.collection.count_documents({"user_id": user_id})
+        with self._count_lock:
+            self._count_cache[user_id] = (now + PREDICTION_COUNT_CACHE_TTL, count)
+        return count
+    
+    def _adjust_cached_count(self, user_id, delta):
+        """Write-through update of a cached count after an insert/delete"""
+        with self._count_lock:
+            cached = self._count_cache.get(user_id)
+            if cached:
+                self._count_cache[user_id] = (cached[0], max(cached[1] + delta, 0))
+    
+    def invalidate_count(self, user_id):
+        """Drop a cached count so the next read recounts"""
+        with self._count_lock:
+            self._count_cache.pop(user_id, None)
+    
+    async def delete_prediction(self, prediction_id, user_id=None):
+        """Delete a specific prediction"""
+        if not ObjectId.is_valid(prediction_id):
+            return False
+        query = {"_id": ObjectId(prediction_id)}
+        if user_id:
+            query["user_id"] = user_id
+        doc = await self.collection.find_one_and_delete(
+            query, projection={"user_id": 1, "breed": 1, "confidence": 1, "stats_pending": 1}
+        )
+        if not doc:
+            return False
+        self._adjust_cached_count(doc["user_id"], -1)
+        key = breed_key(doc.get("breed"))
+        stats_query = {"user_id": doc["user_id"]}
+        if doc.get("stats_pending"):
+            # Only counted if its increment landed before the cleanup failed
+            stats_query["applied_ids"] = prediction_id
+        await self.stats_collection.update_one(
+            stats_query,
+            {"$inc": {
+                f"breeds.{key}.count": -1,
+                f"breeds.{key}.confidence_sum": -(doc.get("confidence") or 0.0)
+            }}
+        )
+        return True
+    
+    async def get_breed_stats(self, user_id):
+        """Get breed prediction statistics for a user (single document read)"""
+        stats_doc = await self.stats_collection.find_one({"user_id": user_id}, {"breeds": 1, "backfilled": 1})
+        if stats_doc and stats_doc.get("backfilled"):
+            return summarize(stats_doc.get("breeds", {}), limit=10)
+        
+        # Not backfilled yet: fall back to the aggregation pipeline
         pipeline = [
             {"$match": {"user_id": user_id}},
             {"$group": {
@@ -114,22 +371,74 @@ class PredictionDB:
             {"$limit": 10}
         ]
         
-        results = self.collection.aggregate(pipeline)
+        results = await self.collection.aggregate(pipeline).to_list(length=None)
         return [{
             "breed": stat["_id"],
             "count": stat["count"],
             "avg_confidence": stat["avg_confidence"]
         } for stat in results]
+    
+    async def list_prediction_user_ids(self):
+        """Get every user ID that owns at least one prediction"""
+        return await self.collection.distinct("user_id")
+    
+    async def compute_breed_histogram(self, user_id):
+        """Build a user's breed histogram by streaming their predictions
+
+        Predictions whose stats increment is still pending are left out; the
+        save (or its retry) that inserted them applies it.
+        """
+        histogram = {}
+        cursor = self.collection.find(
+            {"user_id": user_id, "stats_pending": {"$ne": True}},
+            {"_id": 0, "breed": 1, "confidence": 1, "timestamp": 1}
+        )
+        async for doc in cursor:
+            timestamp = doc.get("timestamp")
+            accumulate(histogram, doc.get("breed"), doc.get("confidence") or 0.0,
+                       timestamp.isoformat() if timestamp else None)
+        return histogram
+    
+    async def seed_breed_stats(self, user_id):
+        """Create a user's stats document from their history unless it is already maintained
+
+        The upsert is guarded on the backfilled flag, so it never replaces
+        increments made since; returns False when the document was backfilled.
+        """
+        histogram = await self.compute_breed_histogram(user_id)
+        try:
+            await self.stats_collection.update_one(
+                {"user_id": user_id, "backfilled": {"$ne": True}},
+                {"$set": {"breeds": histogram, "backfilled": True, "updated_at": datetime.utcnow()}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # Backfilled already: the upsert collided with the existing document
+            return False
+        return True
+    
+    async def write_breed_stats(self, user_id, histogram):
+        """Overwrite a user's stats document (backfill --rebuild; races with concurrent saves)"""
+        await self.stats_collection.update_one(
+            {"user_id": user_id},
+            {"$set": {"breeds": histogram, "backfilled": True, "updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+        return True
 
 class UserDB:
     """Handles user-related database operations"""
     
-    def __init__(self):
-        self.collection = mongodb.get_collection("users")
-        # Create unique index on user_id
-        self.collection.create_index("user_id", unique=True)
+    @property
+    def collection(self):
+        return mongodb.get_collection("users")
     
-    def create_or_update_user(self, user_id, email=None, name=None):
+    async def ensure_indexes(self):
+        """Create indexes (call once from the running event loop)"""
+        # Unique index on user_id
+        await self.collection.create_index("user_id", unique=True)
+    
+    async def create_or_update_user(self, user_id, email=None, name=None):
         """Create or update user profile"""
         user_data = {
             "user_id": user_id,
@@ -139,7 +448,7 @@ class UserDB:
             "updated_at": datetime.utcnow()
         }
         
-        result = self.collection.update_one(
+        result = await self.collection.update_one(
             {"user_id": user_id},
             {
                 "$set": user_data,
@@ -149,20 +458,55 @@ class UserDB:
         )
         
         return result.upserted_id or result.matched_count > 0
-    
-    def get_user(self, user_id):
+
+    async def create_user(self, user_id, email=None, name=None, **kwargs):
+        """Create a user profile if it doesn't exist yet"""
+        now = datetime.utcnow()
+        await self.collection.update_one(
+            {"user_id": user_id},
+            {
+                "$set": {"last_active": now, "updated_at": now},
+                "$setOnInsert": {
+                    "user_id": user_id,
+                    "email": email,
+                    "name": name,
+                    "created_at": now,
+                    "total_predictions": 0,
+                    **kwargs
+                }
+            },
+            upsert=True
+        )
+        return True
+
+    async def update_user(self, user_id, updates):
+        """Update profile fields (see user_profile.PROFILE_FIELDS) on an existing user"""
+        result = await self.collection.update_one(
+            {"user_id": user_id},
+            {"$set": {**profile_updates(updates), "updated_at": datetime.utcnow()}}
+        )
+        return result.matched_count > 0
+
+    async def get_user(self, user_id):
         """Get user by ID"""
-        user = self.collection.find_one({"user_id": user_id})
+        user = await self.collection.find_one({"user_id": user_id})
         if user:
             user["_id"] = str(user["_id"])
         return user
     
-    def update_last_active(self, user_id):
+    async def update_last_active(self, user_id):
         """Update user's last active timestamp"""
-        self.collection.update_one(
+        await self.collection.update_one(
             {"user_id": user_id},
             {"$set": {"last_active": datetime.utcnow()}}
         )
+    
+    async def update_last_active_many(self, user_ids):
+        """Update last active timestamp for many users in one write"""
+        await self.collection.update_many(
+            {"user_id": {"$in": list(user_ids)}},
+            {"$set": {"last_active": datetime.utcnow()}}
+        )
 
 # Initialize database handlers
 prediction_db = PredictionDB()
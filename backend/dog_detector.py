@@ -0,0 +1,168 @@
+"""
+Dog Detector
+Optional detection stage in front of the breed classifier. A small TFLite
+SSD (e.g. the COCO SSD MobileNet detect.tflite, exported with
+TFLite_Detection_PostProcess) finds the dogs in an upload; /predict then
+classifies a crop of each one instead of the whole squashed photo, and
+answers photos without a dog without running the classifier at all.
+
+- DETECTOR_MODEL_PATH: the .tflite detector; the stage is off when it is
+  missing (or DETECTOR_ENABLED=false)
+- DETECTOR_DOG_CLASS: the detector's class id for "dog" (17 in the COCO
+  label map, which skips the unused ids)
+- DETECTOR_MIN_SCORE: detections below this confidence are ignored
+- DETECTOR_MAX_DOGS: at most this many dogs are classified per photo
+- DETECTOR_CROP_MARGIN: each box grows by this fraction of its size on every
+  side, so ears and tails are not cut off
+
+Runs with ai-edge-litert / tflite-runtime when installed, else tf.lite.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+from PIL import Image
+
+from metrics import metrics
+from model_runtime import MODEL_INTRA_OP_THREADS, _lightweight_interpreter
+from startup_profile import startup_profile
+
+DETECTOR_ENABLED = os.getenv("DETECTOR_ENABLED", "true").lower() == "true"
+DETECTOR_MODEL_PATH = os.getenv("DETECTOR_MODEL_PATH", "models/dog_detector.tflite")
+DETECTOR_DOG_CLASS = int(os.getenv("DETECTOR_DOG_CLASS", "17"))
+DETECTOR_MIN_SCORE = float(os.getenv("DETECTOR_MIN_SCORE", "0.4"))
+DETECTOR_MAX_DOGS = int(os.getenv("DETECTOR_MAX_DOGS", "5"))
+DETECTOR_CROP_MARGIN = float(os.getenv("DETECTOR_CROP_MARGIN", "0.1"))
+DETECTOR_THREADS = int(os.getenv("DETECTOR_THREADS", str(MODEL_INTRA_OP_THREADS)))
+
+
+class Box(NamedTuple):
+    """A detected dog in image pixels"""
+    left: int
+    top: int
+    right: int
+    bottom: int
+    score: float
+
+    def as_dict(self) -> Dict:
+        return {"left": self.left, "top": self.top, "right": self.right, "bottom": self.bottom,
+                "score": round(self.score, 4)}
+
+
+def dog_boxes(boxes: np.ndarray, classes: np.ndarray, scores: np.ndarray, width: int, height: int,
+              dog_class: int = DETECTOR_DOG_CLASS, min_score: float = DETECTOR_MIN_SCORE,
+              max_dogs: int = DETECTOR_MAX_DOGS, margin: float = DETECTOR_CROP_MARGIN) -> List[Box]:
+    """Dogs among SSD detections (normalized ymin, xmin, ymax, xmax), best first, with margins, in pixels"""
+    dogs = []
+    for (ymin, xmin, ymax, xmax), label, score in zip(boxes, classes, scores):
+        if int(round(float(label))) != dog_class or score < min_score:
+            continue
+        pad_x, pad_y = (xmax - xmin) * margin, (ymax - ymin) * margin
+        left, right = max(0.0, xmin - pad_x) * width, min(1.0, xmax + pad_x) * width
+        top, bottom = max(0.0, ymin - pad_y) * height, min(1.0, ymax + pad_y) * height
+        if right - left < 1 or bottom - top < 1:
+            continue
+        dogs.append(Box(*(int(round(value)) for value in (left, top, right, bottom)), float(score)))
+    dogs.sort(key=lambda box: box.score, reverse=True)
+    return dogs[:max_dogs]
+
+
+class DogDetector:
+    """TFLite SSD run on a decoded upload; thread-safe"""
+
+    def __init__(self, path: str = DETECTOR_MODEL_PATH, enabled: bool = DETECTOR_ENABLED):
+        self.path = path
+        self.enabled = enabled
+        self._interpreter = None
+        self._lock = threading.Lock()
+        self.error: Optional[str] = None
+        self.detections = 0
+        self.no_dog = 0
+        self.dogs = 0
+        self.detect_ms = 0.0
+
+    @property
+    def loaded(self) -> bool:
+        return self._interpreter is not None
+
+    def load(self) -> bool:
+        """Load the detector, if one is configured (blocking)"""
+        if not self.enabled:
+            return False
+        if not os.path.exists(self.path):
+            print(f"⚠️  No dog detector at {self.path}; /predict classifies the whole image")
+            return False
+        try:
+            with startup_profile.phase("detector_load"):
+                interpreter_class = _lightweight_interpreter()
+                if interpreter_class is None:
+                    import tensorflow as tf
+                    interpreter_class = tf.lite.Interpreter
+                interpreter = interpreter_class(model_path=self.path, num_threads=DETECTOR_THREADS or None)
+                interpreter.allocate_tensors()
+            self._input = interpreter.get_input_details()[0]
+            outputs = interpreter.get_output_details()
+            # TFLite_Detection_PostProcess: boxes (1, N, 4), classes and scores (1, N) in that order, count (1,)
+            self._boxes = next(detail for detail in outputs if len(detail["shape"]) == 3)
+            self._classes, self._scores = [detail for detail in outputs if len(detail["shape"]) == 2][:2]
+            self._interpreter = interpreter
+            # Warm up (allocations happen on the first invoke)
+            self._run(Image.new("RGB", (320, 240)))
+        except Exception as e:
+            self._interpreter = None
+            self.error = str(e)
+            print(f"❌ Failed to load dog detector: {e}")
+            return False
+        height, width = (int(size) for size in self._input["shape"][1:3])
+        print(f"✓ Dog detector loaded ({self.path}, {width}x{height} input)")
+        return True
+
+    def _run(self, img: Image.Image) -> List[Box]:
+        height, width = (int(size) for size in self._input["shape"][1:3])
+        pixels = np.asarray(img.resize((width, height)))[None]
+        if self._input["dtype"] == np.float32:
+            # Float SSDs take pixels scaled to [-1, 1]
+            pixels = (pixels.astype(np.float32) - 127.5) / 127.5
+        else:
+            pixels = pixels.astype(self._input["dtype"])
+
+        with self._lock:
+            self._interpreter.set_tensor(self._input["index"], pixels)
+            self._interpreter.invoke()
+            boxes = np.array(self._interpreter.get_tensor(self._boxes["index"])[0])
+            classes = np.array(self._interpreter.get_tensor(self._classes["index"])[0])
+            scores = np.array(self._interpreter.get_tensor(self._scores["index"])[0])
+        if scores.max(initial=0) > 1:
+            # Some exports put scores before classes
+            classes, scores = scores, classes
+
+        return dog_boxes(boxes, classes, scores, *img.size)
+
+    def detect(self, img: Image.Image) -> List[Box]:
+        """Dogs in a decoded RGB image, best first"""
+        started = time.perf_counter()
+        dogs = self._run(img)
+        self.detections += 1
+        self.dogs += len(dogs)
+        self.no_dog += not dogs
+        self.detect_ms += (time.perf_counter() - started) * 1000
+        return dogs
+
+    def stats(self) -> Dict:
+        return {
+            "loaded": self.loaded,
+            "path": self.path,
+            "error": self.error,
+            "detections": self.detections,
+            "no_dog": self.no_dog,
+            "dogs": self.dogs,
+            "avg_detect_ms": round(self.detect_ms / self.detections, 2) if self.detections else 0.0
+        }
+
+
+# Global instance
+dog_detector = DogDetector()
+metrics.register_collector("detector", dog_detector.stats)
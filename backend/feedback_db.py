@@ -3,11 +3,8 @@
 
 from datetime import datetime
 from typing import List, Optional, Dict
-import firebase_admin
 from firebase_admin import firestore
-from database import mongodb
 from bson import ObjectId
-import os
 
 # ============================================
 # FIREBASE FEEDBACK DATABASE
@@ -18,9 +15,12 @@ class FirebaseFeedbackDB:
     
     def __init__(self, db):
         self.db = db
-        self.collection = db.collection('feedback')
     
-    def submit_feedback(
+    @property
+    def collection(self):
+        return self.db.collection('feedback')
+    
+    async def submit_feedback(
         self,
         user_id: str,
         feedback_type: str,
@@ -53,7 +53,7 @@ class FirebaseFeedbackDB:
             }
             
             doc_ref = self.collection.document()
-            doc_ref.set(feedback_data)
+            await doc_ref.set(feedback_data)
             
             print(f"✅ Feedback submitted: {doc_ref.id} (Private: {is_private})")
             return doc_ref.id
@@ -62,7 +62,7 @@ class FirebaseFeedbackDB:
             print(f"❌ Error submitting feedback: {e}")
             return None
     
-    def get_user_feedback(
+    async def get_user_feedback(
         self,
         user_id: str,
         limit: int = 50,
@@ -81,7 +81,7 @@ class FirebaseFeedbackDB:
             docs = query.stream()
             
             feedback_list = []
-            for doc in docs:
+            async for doc in docs:
                 feedback_data = doc.to_dict()
                 feedback_data['id'] = doc.id
                 
@@ -101,7 +101,7 @@ class FirebaseFeedbackDB:
             print(f"❌ Error fetching user feedback: {e}")
             return []
     
-    def get_all_feedback(
+    async def get_all_feedback(
         self,
         limit: int = 100,
         status: Optional[str] = None,
@@ -123,7 +123,7 @@ class FirebaseFeedbackDB:
             docs = query.stream()
             
             feedback_list = []
-            for doc in docs:
+            async for doc in docs:
                 feedback_data = doc.to_dict()
                 feedback_data['id'] = doc.id
                 
@@ -142,7 +142,65 @@ class FirebaseFeedbackDB:
             print(f"❌ Error fetching all feedback: {e}")
             return []
     
-    def update_feedback_status(
+    async def get_public_feedback(
+        self,
+        limit: int = 50,
+        feedback_type: Optional[str] = None
+    ) -> List[Dict]:
+        """Get public feedback with the author anonymized"""
+        try:
+            query = self.collection.where('is_private', '==', False)
+            
+            if feedback_type:
+                query = query.where('type', '==', feedback_type)
+            
+            query = query.order_by('created_at', direction=firestore.Query.DESCENDING)
+            query = query.limit(limit)
+            
+            feedback_list = []
+            async for doc in query.stream():
+                feedback_data = doc.to_dict()
+                feedback_data['id'] = doc.id
+                
+                if feedback_data.get('created_at'):
+                    feedback_data['created_at'] = feedback_data['created_at'].isoformat()
+                if feedback_data.get('updated_at'):
+                    feedback_data['updated_at'] = feedback_data['updated_at'].isoformat()
+                
+                feedback_data['user_id'] = 'anonymous'
+                
+                feedback_list.append(feedback_data)
+            
+            return feedback_list
+            
+        except Exception as e:
+            print(f"❌ Error fetching public feedback: {e}")
+            return []
+    
+    async def get_feedback(self, feedback_id: str) -> Optional[Dict]:
+        """Get a single feedback entry (None if it doesn't exist)"""
+        doc = await self.collection.document(feedback_id).get()
+        if not doc.exists:
+            return None
+        
+        feedback_data = doc.to_dict()
+        feedback_data['id'] = doc.id
+        return feedback_data
+    
+    async def update_feedback_privacy(self, feedback_id: str, is_private: bool) -> bool:
+        """Change whether a feedback entry is private"""
+        try:
+            await self.collection.document(feedback_id).update({
+                'is_private': is_private,
+                'updated_at': firestore.SERVER_TIMESTAMP
+            })
+            return True
+            
+        except Exception as e:
+            print(f"❌ Error updating feedback privacy: {e}")
+            return False
+    
+    async def update_feedback_status(
         self,
         feedback_id: str,
         status: str,
@@ -161,7 +219,7 @@ class FirebaseFeedbackDB:
                 update_data['admin_response'] = admin_response
                 update_data['admin_responded_at'] = firestore.SERVER_TIMESTAMP
             
-            doc_ref.update(update_data)
+            await doc_ref.update(update_data)
             
             print(f"✅ Feedback status updated: {feedback_id}")
             return True
@@ -170,7 +228,7 @@ class FirebaseFeedbackDB:
             print(f"❌ Error updating feedback status: {e}")
             return False
     
-    def get_feedback_stats(self) -> Dict:
+    async def get_feedback_stats(self) -> Dict:
         """Get feedback statistics"""
         try:
             all_feedback = self.collection.stream()
@@ -197,7 +255,7 @@ class FirebaseFeedbackDB:
             correct_predictions = 0
             wrong_predictions = 0
             
-            for doc in all_feedback:
+            async for doc in all_feedback:
                 data = doc.to_dict()
                 stats['total'] += 1
                 
@@ -249,9 +307,13 @@ class MongoFeedbackDB:
     """MongoDB implementation for feedback storage"""
     
     def __init__(self, db):
-        self.collection = db['feedback']
+        self.db = db
     
-    def submit_feedback(
+    @property
+    def collection(self):
+        return self.db['feedback']
+    
+    async def submit_feedback(
         self,
         user_id: str,
         feedback_type: str,
@@ -283,7 +345,7 @@ class MongoFeedbackDB:
                 'helpful_count': 0
             }
             
-            result = self.collection.insert_one(feedback_doc)
+            result = await self.collection.insert_one(feedback_doc)
             print(f"✅ Feedback submitted: {result.inserted_id} (Private: {is_private})")
             return str(result.inserted_id)
             
@@ -291,7 +353,7 @@ class MongoFeedbackDB:
             print(f"❌ Error submitting feedback: {e}")
             return None
     
-    def get_user_feedback(
+    async def get_user_feedback(
         self,
         user_id: str,
         limit: int = 50,
@@ -306,7 +368,7 @@ class MongoFeedbackDB:
             cursor = self.collection.find(query).sort('created_at', -1).limit(limit)
             
             feedback_list = []
-            for doc in cursor:
+            async for doc in cursor:
                 doc['id'] = str(doc['_id'])
                 del doc['_id']
                 
@@ -325,7 +387,7 @@ class MongoFeedbackDB:
             print(f"❌ Error fetching user feedback: {e}")
             return []
     
-    def get_all_feedback(
+    async def get_all_feedback(
         self,
         limit: int = 100,
         status: Optional[str] = None,
@@ -342,7 +404,7 @@ class MongoFeedbackDB:
             cursor = self.collection.find(query).sort('created_at', -1).limit(limit)
             
             feedback_list = []
-            for doc in cursor:
+            async for doc in cursor:
                 doc['id'] = str(doc['_id'])
                 del doc['_id']
                 
@@ -361,7 +423,67 @@ class MongoFeedbackDB:
             print(f"❌ Error fetching all feedback: {e}")
             return []
     
-    def update_feedback_status(
+    async def get_public_feedback(
+        self,
+        limit: int = 50,
+        feedback_type: Optional[str] = None
+    ) -> List[Dict]:
+        """Get public feedback with the author anonymized"""
+        try:
+            query = {'is_private': False}
+            if feedback_type:
+                query['type'] = feedback_type
+            
+            cursor = self.collection.find(query).sort('created_at', -1).limit(limit)
+            
+            feedback_list = []
+            async for doc in cursor:
+                doc['id'] = str(doc['_id'])
+                del doc['_id']
+                
+                if doc.get('created_at'):
+                    doc['created_at'] = doc['created_at'].isoformat()
+                if doc.get('updated_at'):
+                    doc['updated_at'] = doc['updated_at'].isoformat()
+                
+                doc['user_id'] = 'anonymous'
+                feedback_list.append(doc)
+            
+            return feedback_list
+            
+        except Exception as e:
+            print(f"❌ Error fetching public feedback: {e}")
+            return []
+    
+    async def get_feedback(self, feedback_id: str) -> Optional[Dict]:
+        """Get a single feedback entry (None if it doesn't exist)"""
+        if not ObjectId.is_valid(feedback_id):
+            return None
+        
+        doc = await self.collection.find_one({'_id': ObjectId(feedback_id)})
+        if not doc:
+            return None
+        
+        doc['id'] = str(doc.pop('_id'))
+        return doc
+    
+    async def update_feedback_privacy(self, feedback_id: str, is_private: bool) -> bool:
+        """Change whether a feedback entry is private"""
+        try:
+            result = await self.collection.update_one(
+                {'_id': ObjectId(feedback_id)},
+                {'$set': {
+                    'is_private': is_private,
+                    'updated_at': datetime.now()
+                }}
+            )
+            return result.matched_count > 0
+            
+        except Exception as e:
+            print(f"❌ Error updating feedback privacy: {e}")
+            return False
+    
+    async def update_feedback_status(
         self,
         feedback_id: str,
         status: str,
@@ -378,7 +500,7 @@ class MongoFeedbackDB:
                 update_data['admin_response'] = admin_response
                 update_data['admin_responded_at'] = datetime.now()
             
-            result = self.collection.update_one(
+            result = await self.collection.update_one(
                 {'_id': ObjectId(feedback_id)},
                 {'$set': update_data}
             )
@@ -389,10 +511,10 @@ class MongoFeedbackDB:
             print(f"❌ Error updating feedback status: {e}")
             return False
     
-    def get_feedback_stats(self) -> Dict:
+    async def get_feedback_stats(self) -> Dict:
         """Get feedback statistics"""
         try:
-            all_docs = list(self.collection.find())
+            all_docs = await self.collection.find().to_list(length=None)
             
             stats = {
                 'total': len(all_docs),
@@ -443,20 +565,3 @@ class MongoFeedbackDB:
         except Exception as e:
             print(f"❌ Error getting stats: {e}")
             return {}
-
-
-# ============================================
-# Initialize Feedback Database
-# ============================================
-
-from firebase_db import firebase_db
-from database import mongodb
-
-USE_FIREBASE = os.getenv("USE_FIREBASE", "true").lower() == "true"
-
-if USE_FIREBASE:
-    feedback_db = FirebaseFeedbackDB(firebase_db._db)
-    print("✓ Firebase Feedback DB initialized")
-else:
-    feedback_db = MongoFeedbackDB(mongodb._db)
-    print("✓ MongoDB Feedback DB initialized")
\ No newline at end of file
@@ -1,23 +1,32 @@
 import firebase_admin
-from firebase_admin import credentials, firestore
+from firebase_admin import credentials, firestore, firestore_async
 from datetime import datetime
 from typing import Optional, Dict, List
 import os
 import json
+import threading
+import uuid
+
+from breed_stats import STATS_COLLECTION, accumulate, breed_key, group_records, summarize
+from user_profile import profile_updates
+from pagination import (
+    HISTORY_DEFAULT_LIMIT, HISTORY_LIST_FIELDS, clamp_limit, decode_cursor, encode_cursor
+)
 
 class FirebaseDB:
-    """Firebase Firestore Database Manager"""
+    """Firebase Firestore Database Manager (async client)"""
     
     def __init__(self):     
+        # Initialized on first use, so importing this module has no side effects
         self._db = None
-        self._initialize_firebase()
+        self._lock = threading.Lock()
     
     def _initialize_firebase(self):
         """Initialize Firebase Admin SDK"""
         try:
             # Check if already initialized
             if firebase_admin._apps:
-                self._db = firestore.client()
+                self._db = firestore_async.client()
                 print("✓ Firebase already initialized")
                 return
             
@@ -36,7 +45,7 @@ class FirebaseDB:
                     raise FileNotFoundError("Firebase service account credentials not found")
             
             firebase_admin.initialize_app(cred)
-            self._db = firestore.client()
+            self._db = firestore_async.client()
             print("✓ Firebase initialized successfully")
             
         except Exception as e:
@@ -45,12 +54,20 @@ class FirebaseDB:
     
     @property
     def db(self):
-        """Get Firestore database instance"""
+        """Get the Firestore AsyncClient (initializing Firebase on first use)"""
+        if self._db is None:
+            with self._lock:
+                if self._db is None:
+                    self._initialize_firebase()
         return self._db
     
+    def collection(self, name: str):
+        """Get a collection reference"""
+        return self.db.collection(name)
+    
     def is_connected(self) -> bool:
         """Check if Firebase is connected"""
-        return self._db is not None
+        return self.db is not None
 
 
 class FirebaseUserDB:
@@ -60,7 +77,7 @@ class FirebaseUserDB:
         self.firebase = firebase_db
         self.collection_name = "users"
     
-    def create_user(self, user_id: str, email: str, name: str = None, **kwargs) -> bool:
+    async def create_user(self, user_id: str, email: str, name: str = None, **kwargs) -> bool:
         """Create a new user in Firestore"""
         try:
             if not self.firebase.is_connected():
@@ -92,7 +109,7 @@ class FirebaseUserDB:
                 if key not in user_data:
                     user_data[key] = value
             
-            self.firebase.db.collection(self.collection_name).document(user_id).set(user_data)
+            await self.firebase.db.collection(self.collection_name).document(user_id).set(user_data)
             print(f"✓ User {user_id} created in Firebase")
             return True
             
@@ -100,13 +117,13 @@ class FirebaseUserDB:
             print(f"✗ Error creating user in Firebase: {e}")
             return False
     
-    def get_user(self, user_id: str) -> Optional[Dict]:
+    async def get_user(self, user_id: str) -> Optional[Dict]:
         """Get user by ID"""
         try:
             if not self.firebase.is_connected():
                 return None
             
-            doc = self.firebase.db.collection(self.collection_name).document(user_id).get()
+            doc = await self.firebase.db.collection(self.collection_name).document(user_id).get()
             
             if doc.exists:
                 user_data = doc.to_dict()
@@ -118,28 +135,28 @@ class FirebaseUserDB:
             print(f"✗ Error getting user from Firebase: {e}")
             return None
     
-    def update_user(self, user_id: str, updates: Dict) -> bool:
+    async def update_user(self, user_id: str, updates: Dict) -> bool:
         """Update user information"""
         try:
             if not self.firebase.is_connected():
                 return False
             
-            updates['updated_at'] = firestore.SERVER_TIMESTAMP
+            updates = {**profile_updates(updates), 'updated_at': firestore.SERVER_TIMESTAMP}
             
-            self.firebase.db.collection(self.collection_name).document(user_id).update(updates)
+            await self.firebase.db.collection(self.collection_name).document(user_id).update(updates)
             return True
             
         except Exception as e:
             print(f"✗ Error updating user in Firebase: {e}")
             return False
     
-    def update_last_active(self, user_id: str) -> bool:
+    async def update_last_active(self, user_id: str) -> bool:
         """Update user's last active timestamp"""
         try:
             if not self.firebase.is_connected():
                 return False
             
-            self.firebase.db.collection(self.collection_name).document(user_id).update({
+            await self.firebase.db.collection(self.collection_name).document(user_id).update({
                 'last_active': firestore.SERVER_TIMESTAMP
             })
             return True
@@ -148,13 +165,42 @@ class FirebaseUserDB:
             print(f"✗ Error updating last active: {e}")
             return False
     
-    def increment_prediction_count(self, user_id: str) -> bool:
+    async def update_last_active_many(self, user_ids: List[str]) -> bool:
+        """Update last active timestamp for many users with batched writes"""
+        try:
+            if not self.firebase.is_connected():
+                return False
+            
+            collection = self.firebase.db.collection(self.collection_name)
+            
+            # Firestore batches are limited to 500 writes
+            for start in range(0, len(user_ids), 500):
+                chunk = user_ids[start:start + 500]
+                batch = self.firebase.db.batch()
+                for user_id in chunk:
+                    batch.update(collection.document(user_id), {
+                        'last_active': firestore.SERVER_TIMESTAMP
+                    })
+                try:
+                    await batch.commit()
+                except Exception as batch_error:
+                    # One missing user fails the whole batch; fall back to single updates
+                    print(f"⚠️  Batched last_active update failed, retrying individually: {batch_error}")
+                    for user_id in chunk:
+                        await self.update_last_active(user_id)
+            return True
+            
+        except Exception as e:
+            print(f"✗ Error updating last active (batch): {e}")
+            return False
+    
+    async def increment_prediction_count(self, user_id: str) -> bool:
         """Increment user's total prediction count"""
         try:
             if not self.firebase.is_connected():
                 return False
             
-            self.firebase.db.collection(self.collection_name).document(user_id).update({
+            await self.firebase.db.collection(self.collection_name).document(user_id).update({
                 'total_predictions': firestore.Increment(1),
                 'last_active': firestore.SERVER_TIMESTAMP
             })
@@ -164,20 +210,20 @@ class FirebaseUserDB:
             print(f"✗ Error incrementing prediction count: {e}")
             return False
     
-    def delete_user(self, user_id: str) -> bool:
+    async def delete_user(self, user_id: str) -> bool:
         """Delete a user"""
         try:
             if not self.firebase.is_connected():
                 return False
             
-            self.firebase.db.collection(self.collection_name).document(user_id).delete()
+            await self.firebase.db.collection(self.collection_name).document(user_id).delete()
             return True
             
         except Exception as e:
             print(f"✗ Error deleting user from Firebase: {e}")
             return False
     
-    def get_all_users(self, limit: int = 100) -> List[Dict]:
+    async def get_all_users(self, limit: int = 100) -> List[Dict]:
         """Get all users (with limit)"""
         try:
             if not self.firebase.is_connected():
@@ -186,7 +232,7 @@ class FirebaseUserDB:
             users = []
             docs = self.firebase.db.collection(self.collection_name).limit(limit).stream()
             
-            for doc in docs:
+            async for doc in docs:
                 user_data = doc.to_dict()
                 user_data['user_id'] = doc.id
                 users.append(user_data)
@@ -197,13 +243,13 @@ class FirebaseUserDB:
             print(f"✗ Error getting all users: {e}")
             return []
     
-    def update_preferences(self, user_id: str, preferences: Dict) -> bool:
+    async def update_preferences(self, user_id: str, preferences: Dict) -> bool:
         """Update user preferences"""
         try:
             if not self.firebase.is_connected():
                 return False
             
-            self.firebase.db.collection(self.collection_name).document(user_id).update({
+            await self.firebase.db.collection(self.collection_name).document(user_id).update({
                 'preferences': preferences,
                 'updated_at': firestore.SERVER_TIMESTAMP
             })
@@ -213,13 +259,13 @@ class FirebaseUserDB:
             print(f"✗ Error updating preferences: {e}")
             return False
     
-    def add_favorite_breed(self, user_id: str, breed_name: str) -> bool:
+    async def add_favorite_breed(self, user_id: str, breed_name: str) -> bool:
         """Add a breed to user's favorites"""
         try:
             if not self.firebase.is_connected():
                 return False
             
-            self.firebase.db.collection(self.collection_name).document(user_id).update({
+            await self.firebase.db.collection(self.collection_name).document(user_id).update({
                 'profile.favorite_breeds': firestore.ArrayUnion([breed_name])
             })
             return True
@@ -228,13 +274,13 @@ class FirebaseUserDB:
             print(f"✗ Error adding favorite breed: {e}")
             return False
     
-    def remove_favorite_breed(self, user_id: str, breed_name: str) -> bool:
+    async def remove_favorite_breed(self, user_id: str, breed_name: str) -> bool:
         """Remove a breed from user's favorites"""
         try:
             if not self.firebase.is_connected():
                 return False
             
-            self.firebase.db.collection(self.collection_name).document(user_id).update({
+            await self.firebase.db.collection(self.collection_name).document(user_id).update({
                 'profile.favorite_breeds': firestore.ArrayRemove([breed_name])
             })
             return True
@@ -251,8 +297,9 @@ class FirebasePredictionDB:
         self.firebase = firebase_db
         self.collection_name = "predictions"
     
-    def save_prediction(self, user_id: str, breed: str, confidence: float, 
-                       image_name: str = None, top_predictions: List = None) -> Optional[str]:
+    async def save_prediction(self, user_id: str, breed: str, confidence: float, 
+                       image_name: str = None, top_predictions: List = None,
+                       image_url: str = None, thumbnail_url: str = None) -> Optional[str]:
         """Save a prediction to Firebase"""
         try:
             if not self.firebase.is_connected():
@@ -267,18 +314,106 @@ class FirebasePredictionDB:
                 "top_predictions": top_predictions or [],
                 "timestamp": firestore.SERVER_TIMESTAMP,
                 "created_at": datetime.utcnow().isoformat(),
-                'image_url': image_url,  # 🔥 ADD THIS
-                'thumbnail_url': thumbnail_url  # 🔥 ADD THIS
+                'image_url': image_url,
+                'thumbnail_url': thumbnail_url
             }
             
-            doc_ref = self.firebase.db.collection(self.collection_name).add(prediction_data)
+            doc_ref = await self.firebase.db.collection(self.collection_name).add(prediction_data)
             return doc_ref[1].id
             
         except Exception as e:
             print(f"✗ Error saving prediction to Firebase: {e}")
             return None
     
-    def get_user_predictions(self, user_id: str, limit: int = 50) -> List[Dict]:
+    def new_prediction_id(self) -> str:
+        """Generate a prediction document ID client-side"""
+        if self.firebase.is_connected():
+            return self.firebase.db.collection(self.collection_name).document().id
+        return uuid.uuid4().hex
+    
+    @staticmethod
+    def _record_to_document(record: Dict) -> Dict:
+        """Convert a buffered prediction record into a Firestore document"""
+        created_at = record.get("created_at") or datetime.utcnow().isoformat()
+        return {
+            "user_id": record["user_id"],
+            "breed": record["breed"],
+            "confidence": record["confidence"],
+            "percentage": round(record["confidence"] * 100, 2),
+            "image_name": record.get("image_name"),
+            "top_predictions": record.get("top_predictions") or [],
+            # Client time, so replayed records keep their original order
+            "timestamp": datetime.fromisoformat(created_at),
+            "created_at": created_at,
+            "image_url": record.get("image_url"),
+            "thumbnail_url": record.get("thumbnail_url")
+        }
+    
+    async def save_predictions_batch(self, records: List[Dict]) -> bool:
+        """Save many predictions plus user counters, one transaction per chunk
+
+        Records whose prediction document already exists (a chunk that
+        committed before a retry, or a replayed spool) are skipped, so the
+        user and breed-stats counters only count each prediction once. A user
+        whose stats document is missing (or predates the backfill) is only
+        marked in the transaction, then seeded from their history afterwards.
+        """
+        try:
+            if not self.firebase.is_connected():
+                return False
+            
+            db = self.firebase.db
+            predictions = db.collection(self.collection_name)
+            users = db.collection("users")
+            
+            @firestore.async_transactional
+            async def save_chunk(transaction, chunk):
+                # Reads first (transactions require it): which predictions are already stored
+                refs = [predictions.document(record["id"]) for record in chunk]
+                existing = {snapshot.id async for snapshot in await transaction.get_all(refs) if snapshot.exists}
+                new = list({record["id"]: record for record in chunk if record["id"] not in existing}.values())
+                
+                # Stats documents that are maintained already (the others get seeded afterwards)
+                histograms = group_records(new)
+                stats_refs = [self._stats_ref(user_id) for user_id in histograms]
+                stats = {snapshot.id: snapshot.to_dict() async for snapshot in await transaction.get_all(stats_refs)
+                         if snapshot.exists and (snapshot.to_dict() or {}).get("backfilled")} if stats_refs else {}
+                
+                per_user = {}
+                for record in new:
+                    transaction.set(predictions.document(record["id"]), self._record_to_document(record))
+                    per_user[record["user_id"]] = per_user.get(record["user_id"], 0) + 1
+                
+                for user_id, count in per_user.items():
+                    transaction.set(users.document(user_id), {
+                        'total_predictions': firestore.Increment(count),
+                        'last_active': firestore.SERVER_TIMESTAMP
+                    }, merge=True)
+                
+                for user_id, histogram in histograms.items():
+                    if user_id in stats:
+                        update = self._stats_increment(histogram, stats[user_id].get("breeds", {}))
+                    else:
+                        # Bumping the version makes a seed computed before this commit start over
+                        update = {"version": firestore.Increment(1)}
+                    transaction.set(self._stats_ref(user_id), update, merge=True)
+                return [user_id for user_id in histograms if user_id not in stats]
+            
+            # Max 500 writes per transaction: predictions + user counters + stats docs
+            unseeded = set()
+            for start in range(0, len(records), 160):
+                unseeded.update(await save_chunk(db.transaction(), records[start:start + 160]))
+            
+        except Exception as e:
+            print(f"✗ Error saving prediction batch to Firebase: {e}")
+            return False
+        
+        # The predictions are saved: a seed that fails is retried by the user's next save
+        for user_id in unseeded:
+            await self.seed_breed_stats(user_id)
+        return True
+    
+    async def get_user_predictions(self, user_id: str, limit: int = 50) -> List[Dict]:
         """Get user's prediction history"""
         try:
             if not self.firebase.is_connected():
@@ -291,7 +426,7 @@ class FirebasePredictionDB:
                    .limit(limit)
                    .stream())
             
-            for doc in docs:
+            async for doc in docs:
                 pred_data = doc.to_dict()
                 pred_data['id'] = doc.id
                 predictions.append(pred_data)
@@ -302,53 +437,253 @@ class FirebasePredictionDB:
             print(f"✗ Error getting predictions: {e}")
             return []
     
-    def get_prediction_count(self, user_id: str) -> int:
-        """Get total number of predictions for a user"""
+    async def get_user_predictions_page(self, user_id: str, limit: int = HISTORY_DEFAULT_LIMIT,
+                                  cursor: Optional[str] = None) -> Dict:
+        """Get one page of a user's history (list fields only, keyset cursor)"""
+        page = {"predictions": [], "next_cursor": None, "has_more": False}
+        if not self.firebase.is_connected():
+            return page
+        
+        limit = clamp_limit(limit)
+        after = decode_cursor(cursor)
+        
+        query = (self.firebase.db.collection(self.collection_name)
+                 .where('user_id', '==', user_id)
+                 .order_by('timestamp', direction=firestore.Query.DESCENDING)
+                 .order_by('__name__', direction=firestore.Query.DESCENDING)
+                 .select(HISTORY_LIST_FIELDS))
+        if after:
+            query = query.start_after({'timestamp': after[0], '__name__': after[1]})
+        
+        # One extra document tells us whether another page exists
+        docs = [doc async for doc in query.limit(limit + 1).stream()]
+        page["has_more"] = len(docs) > limit
+        docs = docs[:limit]
+        
+        for doc in docs:
+            data = doc.to_dict() or {}
+            timestamp = data.get('timestamp')
+            page["predictions"].append({
+                "id": doc.id,
+                "breed": data.get('breed'),
+                "confidence": data.get('confidence'),
+                "thumbnail_url": data.get('thumbnail_url'),
+                "timestamp": timestamp.isoformat() if timestamp else None
+            })
+        
+        if page["has_more"] and docs:
+            last = docs[-1]
+            page["next_cursor"] = encode_cursor(last.to_dict()['timestamp'], last.id)
+        return page
+    
+    async def get_prediction(self, prediction_id: str, user_id: str) -> Optional[Dict]:
+        """Get the full document for one of a user's predictions"""
+        if not self.firebase.is_connected():
+            return None
+        
+        doc = await self.firebase.db.collection(self.collection_name).document(prediction_id).get()
+        if not doc.exists:
+            return None
+        
+        data = doc.to_dict() or {}
+        if data.get('user_id') != user_id:
+            return None
+        
+        data['id'] = doc.id
+        if data.get('timestamp'):
+            data['timestamp'] = data['timestamp'].isoformat()
+        return data
+    
+    async def get_prediction_count(self, user_id: str) -> int:
+        """Get total number of predictions for a user (constant cost)"""
         try:
             if not self.firebase.is_connected():
                 return 0
             
-            docs = (self.firebase.db.collection(self.collection_name)
-                   .where('user_id', '==', user_id)
-                   .stream())
+            # Maintained counter on the user document: one read
+            user_doc = await self.firebase.db.collection("users").document(user_id).get(
+                field_paths=["total_predictions"]
+            )
+            if user_doc.exists:
+                total = (user_doc.to_dict() or {}).get("total_predictions")
+                if isinstance(total, int) and total >= 0:
+                    return total
             
-            return len(list(docs))
+            # No counter yet: server-side aggregation instead of streaming every document
+            return await self.count_predictions(user_id)
             
         except Exception as e:
             print(f"✗ Error getting prediction count: {e}")
             return 0
     
-    def get_breed_stats(self, user_id: str) -> List[Dict]:
-        """Get breed prediction statistics for a user"""
+    async def count_predictions(self, user_id: str) -> int:
+        """Count a user's predictions with a Firestore aggregation query"""
+        query = (self.firebase.db.collection(self.collection_name)
+                 .where('user_id', '==', user_id))
+        result = await query.count(alias="total").get()
+        return int(result[0][0].value)
+    
+    async def reconcile_prediction_counts(self, user_ids: List[str] = None, dry_run: bool = False) -> List[Dict]:
+        """Repair drift between users.total_predictions and the real prediction count"""
+        repairs = []
+        if not self.firebase.is_connected():
+            return repairs
+        
+        users = self.firebase.db.collection("users")
+        if user_ids:
+            docs = [await users.document(user_id).get(field_paths=["total_predictions"]) for user_id in user_ids]
+        else:
+            docs = [doc async for doc in users.select(["total_predictions"]).stream()]
+        
+        for doc in docs:
+            if not doc.exists:
+                continue
+            
+            stored = (doc.to_dict() or {}).get("total_predictions")
+            actual = await self.count_predictions(doc.id)
+            
+            if stored != actual:
+                repairs.append({"user_id": doc.id, "stored": stored, "actual": actual})
+                if not dry_run:
+                    await users.document(doc.id).update({"total_predictions": actual})
+        
+        return repairs
+    
+    def _stats_ref(self, user_id: str):
+        return self.firebase.db.collection(STATS_COLLECTION).document(user_id)
+    
+    @staticmethod
+    def _stats_increment(histogram: Dict[str, Dict], current: Dict[str, Dict]) -> Dict:
+        """Merge payload that adds a histogram delta to a stats document (its `breeds` are `current`)"""
+        breeds = {}
+        for key, entry in histogram.items():
+            update = {
+                "breed": entry["breed"],
+                "count": firestore.Increment(entry["count"]),
+                "confidence_sum": firestore.Increment(entry["confidence_sum"])
+            }
+            # Replayed or out-of-order chunks must not move it backwards
+            if entry.get("last_seen") and entry["last_seen"] > ((current.get(key) or {}).get("last_seen") or ""):
+                update["last_seen"] = entry["last_seen"]
+            breeds[key] = update
+        return {"breeds": breeds, "updated_at": firestore.SERVER_TIMESTAMP}
+    
+    @staticmethod
+    def _stats_seed(histogram: Dict[str, Dict]) -> Dict:
+        """Full stats document for a histogram computed from a user's history"""
+        return {"breeds": histogram, "backfilled": True, "updated_at": firestore.SERVER_TIMESTAMP}
+    
+    async def get_breed_stats(self, user_id: str) -> List[Dict]:
+        """Get breed prediction statistics for a user (single document read)"""
         try:
             if not self.firebase.is_connected():
                 return []
             
-            predictions = self.get_user_predictions(user_id, limit=1000)
+            doc = await self._stats_ref(user_id).get()
+            data = doc.to_dict() or {}
+            if data.get("backfilled"):
+                return summarize(data.get("breeds", {}))
             
-            breed_counts = {}
-            for pred in predictions:
-                breed = pred.get('breed', 'Unknown')
-                breed_counts[breed] = breed_counts.get(breed, 0) + 1
-            
-            stats = [
-                {"breed": breed, "count": count}
-                for breed, count in sorted(breed_counts.items(), key=lambda x: x[1], reverse=True)
-            ]
-            
-            return stats
+            # Not backfilled yet: compute from a projected stream (no 1000 cap)
+            return summarize(await self.compute_breed_histogram(user_id))
             
         except Exception as e:
             print(f"✗ Error getting breed stats: {e}")
             return []
     
-    def delete_prediction(self, prediction_id: str) -> bool:
-        """Delete a specific prediction"""
+    async def list_prediction_user_ids(self) -> List[str]:
+        """Get every user ID with a user document (candidates for a stats backfill)"""
+        if not self.firebase.is_connected():
+            return []
+        return [doc.id async for doc in self.firebase.db.collection("users").select([]).stream()]
+    
+    async def compute_breed_histogram(self, user_id: str) -> Dict[str, Dict]:
+        """Build a user's breed histogram by streaming their predictions"""
+        histogram = {}
+        docs = (self.firebase.db.collection(self.collection_name)
+                .where('user_id', '==', user_id)
+                .select(['breed', 'confidence', 'created_at'])
+                .stream())
+        async for doc in docs:
+            data = doc.to_dict() or {}
+            accumulate(histogram, data.get('breed'), data.get('confidence') or 0.0, data.get('created_at'))
+        return histogram
+    
+    async def seed_breed_stats(self, user_id: str, attempts: int = 5) -> bool:
+        """Create a user's stats document from their history unless it is already maintained
+
+        The history is streamed outside any transaction. Saves and deletes
+        for an unseeded user bump the document's `version`, and the seed only
+        commits if the version is still the one read before streaming, so no
+        prediction is missed; otherwise it starts over. Returns False when the
+        document was already backfilled (or seeding kept losing the race).
+        """
+        ref = self._stats_ref(user_id)
+        
+        @firestore.async_transactional
+        async def commit(transaction, histogram, version):
+            data = (await ref.get(transaction=transaction)).to_dict() or {}
+            if data.get("backfilled") or data.get("version", 0) != version:
+                return False
+            transaction.set(ref, self._stats_seed(histogram))
+            return True
+        
+        try:
+            for _ in range(attempts):
+                data = (await ref.get()).to_dict() or {}
+                if data.get("backfilled"):
+                    return False
+                histogram = await self.compute_breed_histogram(user_id)
+                if await commit(self.firebase.db.transaction(), histogram, data.get("version", 0)):
+                    return True
+            print(f"⚠️  Breed stats for {user_id} changed while seeding; left to the next save")
+        except Exception as e:
+            print(f"✗ Error seeding breed stats: {e}")
+        return False
+    
+    async def write_breed_stats(self, user_id: str, histogram: Dict[str, Dict]) -> bool:
+        """Overwrite a user's stats document (backfill --rebuild; races with concurrent saves)"""
+        try:
+            await self._stats_ref(user_id).set(self._stats_seed(histogram))
+            return True
+        except Exception as e:
+            print(f"✗ Error writing breed stats: {e}")
+            return False
+    
+    async def delete_prediction(self, prediction_id: str, user_id: str = None) -> bool:
+        """Delete a specific prediction (and decrement the owner's counter)
+
+        When user_id is given, only that user's prediction can be deleted.
+        """
         try:
             if not self.firebase.is_connected():
                 return False
             
-            self.firebase.db.collection(self.collection_name).document(prediction_id).delete()
+            doc_ref = self.firebase.db.collection(self.collection_name).document(prediction_id)
+            doc = await doc_ref.get(field_paths=["user_id", "breed", "confidence"])
+            if not doc.exists:
+                return False
+            
+            data = doc.to_dict() or {}
+            if user_id and data.get("user_id") != user_id:
+                return False
+            
+            batch = self.firebase.db.batch()
+            batch.delete(doc_ref)
+            user_id = data.get("user_id")
+            if user_id:
+                batch.set(self.firebase.db.collection("users").document(user_id), {
+                    'total_predictions': firestore.Increment(-1)
+                }, merge=True)
+                batch.set(self._stats_ref(user_id), {
+                    "breeds": {breed_key(data.get("breed")): {
+                        "count": firestore.Increment(-1),
+                        "confidence_sum": firestore.Increment(-(data.get("confidence") or 0.0))
+                    }},
+                    # Restarts a seed that is streaming this user's history
+                    "version": firestore.Increment(1)
+                }, merge=True)
+            await batch.commit()
             return True
             
         except Exception as e:
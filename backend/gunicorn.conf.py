@@ -0,0 +1,83 @@
+"""
+Gunicorn Configuration (pre-fork serving)
+One master imports the app, loads the breed catalogs and imports the
+inference library, then forks uvicorn workers that share those pages
+copy-on-write. Each worker loads (or, for a converted TFLite model,
+memory-maps) the model and warms it up before /health/ready reports 200.
+With INFERENCE_SERVER set, workers hold no model at all and forward to the
+shared inference process instead (see inference_server.py).
+
+Usage:
+    gunicorn main:app                      # picks up this file from the working directory
+    WEB_CONCURRENCY=4 gunicorn main:app    # explicit worker count
+
+Environment:
+    WEB_CONCURRENCY  workers (default: one per available core)
+    MODEL_THREADS    inference threads per worker (default: cores / workers)
+    PIN_WORKERS      "true" pins each worker's inference threads to its own slice of cores
+    PORT             listen port (default: 8000)
+
+State per worker process (multiply by WEB_CONCURRENCY on one host):
+    - Rate-limit buckets and the response cache live in each worker's memory
+      unless REDIS_URL is set, so every client gets N x the configured budget
+      and each worker warms its own cache.
+    - The /similar index is loaded by every worker and only holds what that
+      worker added since; on shutdown each saves its copy and the last writer
+      wins, dropping the other workers' additions. Run a single worker (or
+      rebuild with build_similar_index.py) if /similar must keep every upload.
+    - The prediction spool is per worker (PREDICTION_SPOOL_PATH.<pid>) and
+      locked while the worker lives; a restarted worker replays the spools of
+      workers that are gone.
+"""
+
+import gc
+import os
+
+CPU_IDS = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+CPUS = len(CPU_IDS)
+PIN_WORKERS = os.getenv("PIN_WORKERS", "false").lower() == "true"
+
+workers = int(os.getenv("WEB_CONCURRENCY", str(CPUS)))
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+preload_app = True
+# Model loading happens in the background after boot, so workers answer heartbeats
+timeout = 120
+graceful_timeout = 30
+
+# Split the cores between workers instead of every worker starting one
+# thread per core. Set before the app (and any inference library) is imported.
+_threads = str(max(1, CPUS // max(1, workers)))
+os.environ.setdefault("MODEL_THREADS", _threads)
+os.environ.setdefault("OMP_NUM_THREADS", os.environ["MODEL_THREADS"])
+
+
+def when_ready(server):
+    """Runs in the master after the app is imported, before workers are forked"""
+    import main
+
+    main.preload()
+    # Keep the garbage collector from writing to (and so un-sharing) every
+    # object the workers inherit
+    gc.collect()
+    gc.freeze()
+    server.log.info(f"Preloaded catalogs and inference runtime; {workers} workers x "
+                    f"{os.environ['MODEL_THREADS']} inference threads")
+
+
+def pre_fork(server, worker):
+    """Master: give the new worker the first core slice no live worker holds"""
+    if PIN_WORKERS:
+        taken = {getattr(live, "cpu_slot", None) for live in server.WORKERS.values()}
+        worker.cpu_slot = next((slot for slot in range(workers) if slot not in taken), 0)
+
+
+def post_fork(server, worker):
+    """Worker: pin the inference thread pools (started later, at model load) to its slice"""
+    if PIN_WORKERS:
+        from model_runtime import model_runtime
+
+        threads = int(os.environ["MODEL_THREADS"])
+        cpus = CPU_IDS[worker.cpu_slot * threads:(worker.cpu_slot + 1) * threads]
+        if cpus:
+            model_runtime.threading.cpu_affinity = set(cpus)
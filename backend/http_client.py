@@ -0,0 +1,288 @@
+"""
+Shared Outbound HTTP Client
+Connection-pooled, keep-alive HTTP sessions with timeouts,
+retry/backoff and per-host latency and connection-reuse metrics
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from metrics import LatencyHistogram, metrics
+
+# Pool configuration
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))  # Hosts kept in the pool
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "10"))  # Keep-alive connections per host
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "10"))
+HTTP_UPLOAD_TIMEOUT = float(os.getenv("HTTP_UPLOAD_TIMEOUT", "60"))
+
+# Retry / backoff policy
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", "0.5"))
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+DEFAULT_TIMEOUT = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+
+# ============================================
+# PER-HOST METRICS
+# ============================================
+
+class HostStats:
+    """Request, connection and latency counters for one remote host"""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+        self.latency = LatencyHistogram()
+
+    def snapshot(self) -> Dict:
+        tracked = self.new_connections + self.reused_connections
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "new_connections": self.new_connections,
+            "reused_connections": self.reused_connections,
+            "reuse_ratio": round(self.reused_connections / tracked, 4) if tracked else 0.0,
+            "latency": self.latency.snapshot()
+        }
+
+
+_host_stats: Dict[str, HostStats] = {}
+_stats_lock = threading.Lock()
+
+
+def _stats_for(host: str) -> HostStats:
+    with _stats_lock:
+        stats = _host_stats.get(host)
+        if stats is None:
+            stats = HostStats()
+            _host_stats[host] = stats
+        return stats
+
+
+def _record(host: str, elapsed_ms: float, new_connection: Optional[bool] = None,
+            retries: int = 0, error: bool = False):
+    stats = _stats_for(host)
+    with _stats_lock:
+        stats.requests += 1
+        stats.retries += retries
+        if error:
+            stats.errors += 1
+        if new_connection is True:
+            stats.new_connections += 1
+        elif new_connection is False:
+            stats.reused_connections += 1
+    stats.latency.observe(elapsed_ms)
+
+
+def get_http_metrics() -> Dict:
+    """Get per-host outbound HTTP metrics"""
+    with _stats_lock:
+        hosts = dict(_host_stats)
+    return {host: stats.snapshot() for host, stats in hosts.items()}
+
+
+def reset_http_metrics():
+    """Clear all per-host metrics"""
+    with _stats_lock:
+        _host_stats.clear()
+
+
+metrics.register_collector("http_client", get_http_metrics)
+
+
+def _host_of(url: str) -> str:
+    parts = urlsplit(str(url))
+    return parts.netloc or "unknown"
+
+
+def _build_retry(total: int = HTTP_MAX_RETRIES, allowed_methods=IDEMPOTENT_METHODS) -> Retry:
+    return Retry(
+        total=total,
+        connect=total,
+        read=total,
+        status=total,
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=allowed_methods,
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+
+
+# ============================================
+# SYNC CLIENT (requests)
+# ============================================
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter with default timeouts and per-host connection-reuse tracking"""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def _pool_for(self, request, kwargs):
+        try:
+            if hasattr(self, "get_connection_with_tls_context"):
+                return self.get_connection_with_tls_context(
+                    request, kwargs.get("verify", True),
+                    proxies=kwargs.get("proxies"), cert=kwargs.get("cert")
+                )
+            return self.get_connection(request.url, kwargs.get("proxies"))
+        except Exception:
+            return None
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+
+        host = _host_of(request.url)
+        pool = self._pool_for(request, kwargs)
+        connections_before = pool.num_connections if pool is not None else None
+        start = time.perf_counter()
+
+        try:
+            response = super().send(request, **kwargs)
+        except Exception:
+            _record(host, (time.perf_counter() - start) * 1000, error=True)
+            raise
+
+        # Under concurrent use the delta can be attributed to the wrong request;
+        # the totals per host stay accurate.
+        new_connection = None
+        if connections_before is not None:
+            new_connection = pool.num_connections > connections_before
+
+        retry_state = getattr(response.raw, "retries", None)
+        retries = len(retry_state.history) if retry_state is not None else 0
+
+        _record(
+            host,
+            (time.perf_counter() - start) * 1000,
+            new_connection=new_connection,
+            retries=retries,
+            error=response.status_code >= 500
+        )
+        return response
+
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def create_session(pool_maxsize: int = HTTP_POOL_MAXSIZE, max_retries: int = HTTP_MAX_RETRIES,
+                   timeout=DEFAULT_TIMEOUT) -> requests.Session:
+    """Create a new pooled, keep-alive requests session"""
+    session = requests.Session()
+    adapter = PooledHTTPAdapter(
+        timeout=timeout,
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=pool_maxsize,
+        max_retries=_build_retry(max_retries)
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """Get the process-wide shared session"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+def close():
+    """Close the shared sync session"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+# ============================================
+# CLOUDINARY SDK POOL
+# ============================================
+
+try:
+    from cloudinary.api_client.tcp_keep_alive_manager import TCPKeepAlivePoolManager as _BasePoolManager
+except ImportError:
+    _BasePoolManager = urllib3.PoolManager
+
+
+class InstrumentedPoolManager(_BasePoolManager):
+    """urllib3 PoolManager that records per-host latency and connection reuse"""
+
+    def urlopen(self, method, url, redirect=True, **kw):
+        host = _host_of(url)
+        try:
+            pool = self.connection_from_url(url)
+            connections_before = pool.num_connections
+        except Exception:
+            pool, connections_before = None, None
+
+        start = time.perf_counter()
+        try:
+            response = super().urlopen(method, url, redirect=redirect, **kw)
+        except Exception:
+            _record(host, (time.perf_counter() - start) * 1000, error=True)
+            raise
+
+        retry_state = getattr(response, "retries", None)
+        _record(
+            host,
+            (time.perf_counter() - start) * 1000,
+            new_connection=(pool.num_connections > connections_before) if pool is not None else None,
+            retries=len(retry_state.history) if retry_state is not None else 0,
+            error=response.status >= 500
+        )
+        return response
+
+
+def create_pool_manager(timeout: float = HTTP_UPLOAD_TIMEOUT) -> urllib3.PoolManager:
+    """Create a pooled urllib3 manager for SDKs built on urllib3"""
+    return InstrumentedPoolManager(
+        num_pools=HTTP_POOL_CONNECTIONS,
+        maxsize=HTTP_POOL_MAXSIZE,
+        block=False,
+        timeout=urllib3.Timeout(connect=HTTP_CONNECT_TIMEOUT, read=timeout),
+        # Uploads are not idempotent: only retry failures before the request was sent
+        retries=Retry(total=HTTP_MAX_RETRIES, connect=HTTP_MAX_RETRIES, read=0, status=0,
+                      backoff_factor=HTTP_BACKOFF_FACTOR)
+    )
+
+
+def install_cloudinary_pool():
+    """Route Cloudinary uploader calls through the shared, instrumented pool"""
+    try:
+        import cloudinary
+        import cloudinary.uploader
+
+        if getattr(cloudinary.config(), "api_proxy", None):
+            return False
+
+        if not isinstance(cloudinary.uploader._http, InstrumentedPoolManager):
+            cloudinary.uploader._http = create_pool_manager()
+        return True
+
+    except Exception as e:
+        print(f"⚠️  Could not install Cloudinary HTTP pool: {e}")
+        return False
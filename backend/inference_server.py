@@ -0,0 +1,503 @@
+"""
+Inference Server
+A standalone process that owns the classifier and batches requests from every
+API worker on the host, so the model is in memory once and batches fill from
+all workers' traffic.
+
+Transport:
+- Each API worker (RemoteModel) creates a shared-memory ring of slots
+  (multiprocessing.shared_memory); a slot holds one preprocessed image
+  followed by room for its class probabilities and embedding.
+- A Unix socket carries small fixed-size frames: the server's HELLO (tensor
+  shape, classes, embedding width), the worker's REGISTER (ring name, slots), then one REQUEST
+  (request id, slot, priority lane, user key) per image and one RESPONSE
+  (request id, status) per result.
+  Tensors never go through the socket.
+- Requests from all workers go through one AdaptiveBatchScheduler
+  (batch_scheduler.py): batch size and fill time follow the latency SLO, and
+  shed requests come back as STATUS_SHED (a 503 from the worker's /predict)
+  and requests over the per-user quota as STATUS_QUOTA (a 429). Users are
+  sent as a 32-bit hash of their id, so the quota holds across workers.
+  Only the first row of a multi-row request (TTA views, dog crops) carries
+  the user, so one image counts once against the quota.
+
+Usage:
+    python inference_server.py                            # socket at INFERENCE_SOCKET
+    INFERENCE_SERVER=/tmp/dog_breed_inference.sock gunicorn main:app
+
+Environment:
+    INFERENCE_SOCKET            socket path to listen on
+    INFERENCE_MAX_BATCH         largest batch run through the model (default 32)
+    PREDICT_SLO_MS              p95 target for queueing plus the forward pass (default 500)
+    INFERENCE_SLOTS             ring slots per API worker (default 32)
+    INFERENCE_TIMEOUT           seconds an API worker waits for a result (default 30)
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import itertools
+import os
+import queue
+import socket
+import struct
+import sys
+import threading
+import time
+import zlib
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from batch_scheduler import (LANE_ANONYMOUS, LANES, PREDICT_SLO_MS, AdaptiveBatchScheduler, OverloadedError,
+                             QuotaExceededError, batch_buckets)
+from metrics import LatencyHistogram
+from model_runtime import IMAGE_SIZE, ModelRuntime
+
+INFERENCE_SOCKET = os.getenv("INFERENCE_SOCKET", "/tmp/dog_breed_inference.sock")
+INFERENCE_MAX_BATCH = int(os.getenv("INFERENCE_MAX_BATCH", "32"))
+INFERENCE_SLOTS = int(os.getenv("INFERENCE_SLOTS", "32"))
+INFERENCE_TIMEOUT = float(os.getenv("INFERENCE_TIMEOUT", "30"))
+INFERENCE_CONNECT_TIMEOUT = float(os.getenv("INFERENCE_CONNECT_TIMEOUT", "120"))
+INFERENCE_STATS_INTERVAL = float(os.getenv("INFERENCE_STATS_INTERVAL", "60"))
+
+MAGIC = b"DBIS"
+# magic, height, width, channels, max batch, classes, embedding width
+HELLO = struct.Struct("<4sHHHHII")
+# ring name length, slots, client pid (name bytes follow)
+REGISTER = struct.Struct("<HHI")
+# request id, slot, lane index (batch_scheduler.LANES), user key (0 = anonymous)
+REQUEST = struct.Struct("<IHBI")
+# request id, status
+RESPONSE = struct.Struct("<IB")
+STATUS_OK = 0
+STATUS_ERROR = 1
+STATUS_SHED = 2
+STATUS_QUOTA = 3
+
+INPUT_SHAPE = (IMAGE_SIZE[1], IMAGE_SIZE[0], 3)
+
+
+class SlotRing:
+    """Fixed-size input/output slots over one shared-memory block"""
+
+    def __init__(self, shm: shared_memory.SharedMemory, slots: int, outputs: int):
+        self.shm = shm
+        self.slots = slots
+        self.outputs = outputs
+        self.input_bytes = int(np.prod(INPUT_SHAPE)) * 4
+        self.slot_bytes = self.input_bytes + outputs * 4
+
+    @staticmethod
+    def size(slots: int, outputs: int) -> int:
+        return slots * (int(np.prod(INPUT_SHAPE)) * 4 + outputs * 4)
+
+    def input(self, slot: int) -> np.ndarray:
+        return np.ndarray(INPUT_SHAPE, dtype=np.float32, buffer=self.shm.buf, offset=slot * self.slot_bytes)
+
+    def output(self, slot: int) -> np.ndarray:
+        return np.ndarray((self.outputs,), dtype=np.float32, buffer=self.shm.buf,
+                          offset=slot * self.slot_bytes + self.input_bytes)
+
+
+class _Client:
+    """One connected API worker"""
+
+    def __init__(self, ring: SlotRing, writer: asyncio.StreamWriter):
+        self.ring = ring
+        self.writer = writer
+        self.closed = False
+
+
+class InferenceServer:
+    """Accepts API workers and runs their requests through the model in shared batches"""
+
+    def __init__(self, runtime, socket_path: str = INFERENCE_SOCKET, max_batch: int = INFERENCE_MAX_BATCH,
+                 slo_ms: float = PREDICT_SLO_MS, scheduler: Optional[AdaptiveBatchScheduler] = None):
+        self.runtime = runtime
+        self.socket_path = socket_path
+        self.max_batch = max_batch
+        # A ModelRuntime's forward() also returns the embedding after the probabilities
+        forward = getattr(runtime, "forward", runtime.predict)
+        self.scheduler = scheduler or AdaptiveBatchScheduler(forward, slo_ms=slo_ms, max_batch=max_batch)
+        self.buckets = self.scheduler.buckets
+        self.num_classes: Optional[int] = None
+        self.embedding_dim = 0
+        self._requests = set()
+        self.clients = 0
+
+    async def serve(self, started: Optional[threading.Event] = None):
+        """Listen until cancelled"""
+        probe = np.zeros((1,) + INPUT_SHAPE, dtype=np.float32)
+        self.num_classes = int((await asyncio.to_thread(self.runtime.predict, probe)).shape[-1])
+        self.embedding_dim = int(getattr(self.runtime, "embedding_dim", 0))
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        server = await asyncio.start_unix_server(self._handle_client, path=self.socket_path)
+        tasks = []
+        if INFERENCE_STATS_INTERVAL > 0:
+            tasks.append(asyncio.create_task(self._report_loop()))
+        print(f"✅ Inference server listening on {self.socket_path} "
+              f"({self.num_classes} classes, embedding {self.embedding_dim or 'none'}, batches {self.buckets})")
+        if started:
+            started.set()
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await self.scheduler.close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        height, width, channels = INPUT_SHAPE
+        writer.write(HELLO.pack(MAGIC, height, width, channels, self.max_batch, self.num_classes,
+                                self.embedding_dim))
+        await writer.drain()
+
+        client = None
+        try:
+            name_length, slots, pid = REGISTER.unpack(await reader.readexactly(REGISTER.size))
+            name = (await reader.readexactly(name_length)).decode()
+            shm = shared_memory.SharedMemory(name=name)
+            if pid != os.getpid():
+                # The worker owns (and unlinks) the ring; don't let this process's tracker remove it
+                resource_tracker.unregister(shm._name, "shared_memory")
+            client = _Client(SlotRing(shm, slots, self.num_classes + self.embedding_dim), writer)
+            self.clients += 1
+
+            while True:
+                request_id, slot, lane, user = REQUEST.unpack(await reader.readexactly(REQUEST.size))
+                lane = LANES[lane] if lane < len(LANES) else LANE_ANONYMOUS
+                task = asyncio.create_task(self._serve_request(client, request_id, slot, lane, user or None))
+                self._requests.add(task)
+                task.add_done_callback(self._requests.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            print(f"⚠️  Inference client error: {e}")
+        finally:
+            writer.close()
+            if client:
+                client.closed = True
+                self.clients -= 1
+                try:
+                    client.ring.shm.close()
+                except BufferError:
+                    # A request still holds a view; the mapping goes when it is released
+                    pass
+
+    async def _serve_request(self, client: _Client, request_id: int, slot: int, lane: str,
+                             user: Optional[int]):
+        """Run one image through the shared scheduler and answer in the client's slot"""
+        status = STATUS_OK
+        try:
+            output = await self.scheduler.submit(client.ring.input(slot).copy(), lane, user)
+        except QuotaExceededError:
+            status = STATUS_QUOTA
+        except OverloadedError:
+            status = STATUS_SHED
+        except Exception as e:
+            print(f"❌ Inference failed: {e}")
+            status = STATUS_ERROR
+
+        if client.closed:
+            return
+        if status == STATUS_OK:
+            client.ring.output(slot)[:] = output
+        client.writer.write(RESPONSE.pack(request_id, status))
+
+    async def _report_loop(self):
+        while True:
+            await asyncio.sleep(INFERENCE_STATS_INTERVAL)
+            stats = self.stats()
+            print(f"📊 Inference: {stats['completed']} requests in {stats['batches']} batches "
+                  f"(avg fill {stats['avg_batch']}), {stats['clients']} clients, "
+                  f"shed {stats['shed_early'] + stats['shed_late']}, p95 {stats['latency']['p95_ms']} ms "
+                  f"(SLO {stats['slo_ms']:g} ms)")
+
+    def stats(self) -> Dict:
+        return {"clients": self.clients, **self.scheduler.stats()}
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Inference server closed the connection")
+        data += chunk
+    return data
+
+
+def user_key(user: Optional[str]) -> int:
+    """Non-zero 32-bit key for a user id (0 = no user)"""
+    return (zlib.crc32(user.encode()) or 1) if user else 0
+
+
+def _resolve(future: concurrent.futures.Future, result=None, error: Optional[Exception] = None):
+    """Complete a future unless the waiter already gave up on it"""
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    except concurrent.futures.InvalidStateError:
+        pass
+
+
+class RemoteModel:
+    """Model interface (predict / predict_async) backed by the inference server"""
+
+    name = "remote"
+
+    def __init__(self, socket_path: str, slots: int = INFERENCE_SLOTS, timeout: float = INFERENCE_TIMEOUT,
+                 connect_timeout: float = INFERENCE_CONNECT_TIMEOUT):
+        self.socket_path = socket_path
+        self.slots = slots
+        self.timeout = timeout
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._pending: Dict[int, tuple] = {}
+        self._abandoned: Dict[int, int] = {}
+        self._sock = None
+        self._ring: Optional[SlotRing] = None
+        # (ring, slot) pairs: slots of a previous connection's ring are dropped when taken
+        self._free: "queue.Queue[Tuple[SlotRing, int]]" = queue.Queue()
+        self.requests = 0
+        self.reconnects = 0
+        self.latency = LatencyHistogram()
+        self._connect(connect_timeout)
+
+    def _connect(self, connect_timeout: float):
+        """Connect (waiting for the server to come up), create the ring and register it"""
+        deadline = time.monotonic() + connect_timeout
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.socket_path)
+                break
+            except OSError:
+                sock.close()
+                if time.monotonic() >= deadline:
+                    raise ConnectionError(f"Inference server not reachable at {self.socket_path}")
+                time.sleep(0.5)
+
+        magic, height, width, channels, self.max_batch, self.num_classes, self.embedding_dim = HELLO.unpack(
+            _recv_exactly(sock, HELLO.size)
+        )
+        if magic != MAGIC or (height, width, channels) != INPUT_SHAPE:
+            sock.close()
+            raise ConnectionError(f"Unexpected inference server handshake ({magic}, {(height, width, channels)})")
+
+        outputs = self.num_classes + self.embedding_dim
+        shm = shared_memory.SharedMemory(create=True, size=SlotRing.size(self.slots, outputs))
+        name = shm.name.encode()
+        sock.sendall(REGISTER.pack(len(name), self.slots, os.getpid()) + name)
+
+        ring = SlotRing(shm, self.slots, outputs)
+        # Keep the queue object: callers may be blocked on it waiting for a slot
+        while True:
+            try:
+                self._free.get_nowait()
+            except queue.Empty:
+                break
+        self._ring = ring
+        for slot in range(self.slots):
+            self._free.put((ring, slot))
+        self._sock = sock
+        threading.Thread(target=self._read_responses, args=(sock, ring), daemon=True,
+                         name="inference-client").start()
+        print(f"✓ Connected to inference server at {self.socket_path} ({self.slots} slots)")
+
+    def _read_responses(self, sock: socket.socket, ring: SlotRing):
+        """Complete futures as results arrive (copying outputs out so slots free immediately)"""
+        try:
+            while True:
+                request_id, status = RESPONSE.unpack(_recv_exactly(sock, RESPONSE.size))
+                with self._lock:
+                    entry = self._pending.pop(request_id, None)
+                    abandoned = self._abandoned.pop(request_id, None) if entry is None else None
+                if entry is None:
+                    # Late answer to a request its caller gave up on: only the slot is reusable now
+                    if abandoned is not None:
+                        self._free.put((ring, abandoned))
+                    continue
+
+                future, slot, started = entry
+                if status == STATUS_OK:
+                    result = ring.output(slot).copy()
+                self._free.put((ring, slot))
+                self.latency.observe((time.perf_counter() - started) * 1000)
+                if status == STATUS_OK:
+                    _resolve(future, result=result)
+                elif status == STATUS_QUOTA:
+                    _resolve(future, error=QuotaExceededError("Inference server quota exceeded for this user"))
+                elif status == STATUS_SHED:
+                    _resolve(future, error=OverloadedError("Inference server shed the request"))
+                else:
+                    _resolve(future, error=RuntimeError("Inference server failed the batch"))
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._abandoned.clear()
+                if self._sock is sock:
+                    self._sock = None
+            for future, _, _ in pending.values():
+                _resolve(future, error=ConnectionError("Inference server connection lost"))
+            sock.close()
+            try:
+                ring.shm.close()
+            except BufferError:
+                pass
+            ring.shm.unlink()
+
+    def _ensure_connected(self):
+        with self._send_lock:
+            if self._sock is None:
+                self.reconnects += 1
+                self._connect(self.timeout)
+
+    def _take_slot(self, timeout: float) -> Tuple[SlotRing, int]:
+        """Wait for a free slot of the current ring; OverloadedError when none frees in time"""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                ring, slot = self._free.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                raise OverloadedError("No free inference slot")
+            if ring is self._ring:
+                return ring, slot
+
+    def _abandon(self, request_ids: List[int]):
+        """Forget requests whose caller gave up (answered ids are no-ops); each slot is freed
+        when its late response arrives"""
+        with self._lock:
+            for request_id in request_ids:
+                entry = self._pending.pop(request_id, None)
+                if entry is not None:
+                    self._abandoned[request_id] = entry[1]
+                    entry[0].cancel()
+
+    def _send(self, ring: SlotRing, slot: int, row: np.ndarray, lane: str = LANE_ANONYMOUS,
+              user: Optional[str] = None) -> Tuple[int, concurrent.futures.Future]:
+        sock = self._sock
+        if sock is None or ring is not self._ring:
+            raise ConnectionError("Inference server connection lost")
+
+        ring.input(slot)[:] = row
+        request_id = next(self._ids) & 0xFFFFFFFF
+        future = concurrent.futures.Future()
+        with self._lock:
+            self._pending[request_id] = (future, slot, time.perf_counter())
+        try:
+            with self._send_lock:
+                sock.sendall(REQUEST.pack(request_id, slot, LANES.index(lane), user_key(user)))
+        except OSError as e:
+            with self._lock:
+                self._pending.pop(request_id, None)
+            self._free.put((ring, slot))
+            raise ConnectionError(f"Inference server connection lost: {e}")
+        self.requests += 1
+        return request_id, future
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        """Blocking predict (warmup, scripts); not for use on an event loop"""
+        return self.predict_with_embeddings(batch)[0]
+
+    def predict_with_embeddings(self, batch: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        self._ensure_connected()
+        sent = []
+        try:
+            for row in batch:
+                sent.append(self._send(*self._take_slot(self.timeout), row))
+            rows = np.stack([future.result(timeout=self.timeout) for _, future in sent])
+        finally:
+            self._abandon([request_id for request_id, _ in sent])
+        if not self.embedding_dim:
+            return rows, None
+        return rows[:, :self.num_classes], rows[:, self.num_classes:]
+
+    async def predict_async(self, batch: np.ndarray, lane: str = LANE_ANONYMOUS,
+                            user: Optional[str] = None) -> np.ndarray:
+        """Rows of [probabilities | embedding] without blocking the event loop while the server batches"""
+        if self._sock is None:
+            await asyncio.to_thread(self._ensure_connected)
+        sent = []
+        try:
+            for i, row in enumerate(batch):
+                try:
+                    ring, slot = self._take_slot(0)
+                except OverloadedError:
+                    ring, slot = await asyncio.to_thread(self._take_slot, self.timeout)
+                sent.append(self._send(ring, slot, row, lane, user if i == 0 else None))
+            futures = [asyncio.wrap_future(future) for _, future in sent]
+            return np.stack(await asyncio.wait_for(asyncio.gather(*futures), self.timeout))
+        except asyncio.TimeoutError:
+            raise OverloadedError("Inference server did not answer in time")
+        finally:
+            # A timeout, a failed sibling or a cancelled caller must not keep the others pending
+            self._abandon([request_id for request_id, _ in sent])
+
+    def close(self):
+        """Disconnect; the response reader then releases the ring"""
+        sock = self._sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def stats(self) -> Dict:
+        return {
+            "socket": self.socket_path,
+            "connected": self._sock is not None,
+            "slots": self.slots,
+            "free_slots": self._free.qsize(),
+            "in_flight": len(self._pending),
+            "abandoned": len(self._abandoned),
+            "requests": self.requests,
+            "reconnects": self.reconnects,
+            "latency": self.latency.snapshot()
+        }
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Serve the breed classifier to API workers over shared memory")
+    parser.add_argument("--socket", default=INFERENCE_SOCKET)
+    parser.add_argument("--max-batch", type=int, default=INFERENCE_MAX_BATCH)
+    parser.add_argument("--slo-ms", type=float, default=PREDICT_SLO_MS, help="p95 latency target")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("🧠 INFERENCE SERVER")
+    print("=" * 60)
+
+    # Never forward to another inference server, whatever INFERENCE_SERVER says
+    runtime = ModelRuntime(server="")
+    if not runtime.load():
+        return 1
+
+    runtime.warmup(batch_buckets(args.max_batch))
+    scheduler = AdaptiveBatchScheduler(runtime.forward, slo_ms=args.slo_ms, max_batch=args.max_batch,
+                                       latency_model=runtime.latency_model())
+    server = InferenceServer(runtime, args.socket, args.max_batch, scheduler=scheduler)
+
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        print("\n👋 Inference server stopped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
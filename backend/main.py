@@ -1,10 +1,14 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Request, Form
+# Imported first: the startup profile's clock starts here (see /ready)
+from startup_profile import startup_profile
+
+import asyncio
+import time
+from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Request, Form, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-import tensorflow as tf
 import numpy as np
-from PIL import Image
-import io
 import json
 import os
 from datetime import datetime
@@ -27,17 +31,40 @@ cloudinary.config(
     api_secret=os.getenv('CLOUDINARY_API_SECRET')
 )
 
-# Import authentication
-from auth import get_current_user, get_optional_user
-
-# Import both database systems
-from database import mongodb, prediction_db as mongo_prediction_db, user_db as mongo_user_db
-from firebase_db import firebase_db, firebase_user_db, firebase_prediction_db
+# Shared outbound HTTP client (pooled keep-alive connections + metrics)
+import http_client
+from metrics import metrics
 
-# Import feedback database
-from feedback_db import feedback_db
-# Add this import
-from vaccination_db import vaccination_db
+# Import authentication
+from auth import get_current_user, get_optional_user, jwks_manager
+
+# Storage repositories for the configured backend (STORAGE_BACKEND / USE_FIREBASE),
+# connected lazily and prepared in the background
+from repositories import repositories
+
+# Known-user cache and coalesced last_active writes
+from user_activity import KnownUserCache, LastActiveCoalescer
+# Write-behind buffer for prediction persistence
+from prediction_writer import PredictionWriteBuffer
+# Keyset cursors for /history
+from pagination import HISTORY_DEFAULT_LIMIT, InvalidCursorError, clamp_limit
+# Per-user cache of /history and /stats responses
+from response_cache import response_cache
+# Per-route token buckets for the expensive endpoints
+from rate_limit import rate_limit, rate_limiter
+# Model loading (TensorFlow imported lazily, or a converted TFLite model) and preprocessing
+from model_runtime import (MODEL_PATH, PREDICT_TTA_THRESHOLD, PREDICT_TTA_VIEWS, decode_image, model_runtime,
+                           preprocess_crops, preprocess_image)
+from batch_scheduler import LANE_ANONYMOUS, LANE_AUTHENTICATED, OverloadedError, QuotaExceededError
+# Nearest-neighbour index over model embeddings for /similar
+from similarity_index import SIMILAR_MAX_RESULTS, similar_dogs
+# Optional detection stage: finds the dogs to classify (or that there are none)
+from dog_detector import dog_detector
+
+startup_profile.mark("imports")
+metrics.register_collector("startup", startup_profile.report)
+metrics.register_collector("model", model_runtime.stats)
+metrics.register_collector("storage", repositories.status)
 
 app = FastAPI(title="Dog Breed Predictor API", version="2.4.0")
 
@@ -56,15 +83,35 @@ app.add_middleware(
 )
 
 # Configuration
-MODEL_PATH = "models/best_phaseB.keras"
 BREED_INFO_PATH = "models/breed_info.json"
 CLASS_INDICES_PATH = "models/class_indices.json"
-USE_FIREBASE = os.getenv("USE_FIREBASE", "true").lower() == "true"
 
 # Global variables
-model = None
 breed_database = {}
 class_names = []
+catalogs_loaded = False
+
+# Background task loading catalogs, model and storage (see startup_event)
+_startup_task = None
+
+known_users = KnownUserCache()
+# Resolved per call, so the storage backend is only built once it is used
+last_active_updater = LastActiveCoalescer(lambda user_ids: repositories.users.update_last_active_many(user_ids))
+metrics.register_collector("known_users", known_users.stats)
+metrics.register_collector("last_active", last_active_updater.stats)
+
+
+async def _invalidate_cached_responses(records):
+    """Drop cached history/stats for users whose predictions were just persisted"""
+    await response_cache.invalidate_many(record["user_id"] for record in records)
+
+
+prediction_writer = PredictionWriteBuffer(
+    save_batch=lambda records: repositories.predictions.save_predictions_batch(records),
+    new_id=lambda: repositories.predictions.new_prediction_id(),
+    on_flushed=_invalidate_cached_responses
+)
+metrics.register_collector("prediction_writer", prediction_writer.stats)
 
 # ============================================
 # PYDANTIC MODELS FOR FEEDBACK
@@ -145,36 +192,33 @@ def load_class_indices():
         return False
 
 def load_model():
-    """Load the trained model"""
-    global model
-    try:
-        if os.path.exists(MODEL_PATH):
-            model = tf.keras.models.load_model(MODEL_PATH)
-            print(f"✓ Model loaded successfully from {MODEL_PATH}")
-            return True
-        else:
-            print(f"✗ Model file not found: {MODEL_PATH}")
-            return False
-    except Exception as e:
-        print(f"✗ Error loading model: {e}")
-        return False
-
-def preprocess_image(image_bytes):
-    """Preprocess image for model prediction"""
-    try:
-        img = Image.open(io.BytesIO(image_bytes))
-        
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
-        
-        img = img.resize((224, 224))
-        img_array = np.array(img, dtype=np.float32)
-        img_array = tf.keras.applications.efficientnet_v2.preprocess_input(img_array)
-        img_array = np.expand_dims(img_array, axis=0)
-        
-        return img_array
-    except Exception as e:
-        raise ValueError(f"Image preprocessing failed: {str(e)}")
+    """Load the trained model (blocking; TensorFlow is only imported here)"""
+    started = time.perf_counter()
+    loaded = model_runtime.load()
+    startup_profile.record("model", started, ok=loaded)
+    return loaded
+
+def load_catalogs():
+    """Load the breed database, then the class names that fall back to it"""
+    global catalogs_loaded
+    if catalogs_loaded:
+        return
+    with startup_profile.phase("catalogs"):
+        load_breed_database()
+        load_class_indices()
+    catalogs_loaded = True
+
+def preload():
+    """Load what forked workers can share copy-on-write (gunicorn master, see gunicorn.conf.py)"""
+    load_catalogs()
+    model_runtime.preload()
+
+def warmup_model():
+    """Warm the model, decoder and response builder up with synthetic batches (blocking)"""
+    started = time.perf_counter()
+    warmed = model_runtime.warmup(build_response=lambda row: jsonable_encoder(build_prediction(row)))
+    startup_profile.record("warmup", started, ok=warmed)
+    return warmed
 
 def normalize_breed_name(name):
     """Normalize breed name for consistent lookup"""
@@ -251,70 +295,54 @@ async def ensure_user_exists(current_user: dict) -> dict:
     name = current_user.get("name", "")
     email_verified = current_user.get("email_verified", False)
     
+    # Fast path: user confirmed recently, last_active is written in the background
+    if known_users.contains(user_id):
+        last_active_updater.touch(user_id)
+        return current_user
+    
     print(f"🔍 Checking user existence: {user_id}")
     
     try:
-        if USE_FIREBASE:
-            existing_user = firebase_user_db.get_user(user_id)
-            
-            if not existing_user:
-                print(f"🆕 New Firebase user detected: {user_id}")
-                print(f"   Email: {email}")
-                print(f"   Name: {name}")
-                
-                try:
-                    firebase_user_db.create_user(
-                        user_id=user_id,
-                        email=email,
-                        name=name,
-                        email_verified=email_verified
-                    )
-                    print(f"✅ Firebase user created successfully: {user_id}")
-                    existing_user = firebase_user_db.get_user(user_id)
-                    
-                    if existing_user:
-                        print(f"✅ User verified in database: {user_id}")
-                    else:
-                        print(f"⚠️  User created but not found in get_user: {user_id}")
-                        
-                except Exception as create_error:
-                    print(f"❌ Error creating Firebase user: {create_error}")
-                    import traceback
-                    traceback.print_exc()
-                    
-                    return {
-                        "user_id": user_id,
-                        "email": email,
-                        "name": name,
-                        "created_at": datetime.now(),
-                        "total_predictions": 0
-                    }
-            else:
-                print(f"✓ User exists: {user_id}")
-                try:
-                    firebase_user_db.update_last_active(user_id)
-                    print(f"✓ Updated last_active for: {user_id}")
-                except Exception as update_error:
-                    print(f"⚠️  Could not update last_active: {update_error}")
-            
-            return existing_user
-            
-        else:
-            existing_user = mongo_user_db.get_user(user_id)
+        existing_user = await repositories.users.get_user(user_id)
+        
+        if not existing_user:
+            print(f"🆕 New user detected: {user_id}")
+            print(f"   Email: {email}")
+            print(f"   Name: {name}")
             
-            if not existing_user:
-                print(f"🆕 New MongoDB user detected: {user_id}")
-                mongo_user_db.create_or_update_user(
+            try:
+                created = await repositories.users.create_user(
                     user_id=user_id,
                     email=email,
-                    name=name
+                    name=name,
+                    email_verified=email_verified
                 )
-                print(f"✅ MongoDB user created: {user_id}")
-            else:
-                print(f"✓ User exists: {user_id}")
-                mongo_user_db.update_last_active(user_id)
-            
-            return mongo_user_db.get_user(user_id)
+                
+                if created:
+                    print(f"✅ User created successfully: {user_id}")
+                    known_users.add(user_id)
+                    existing_user = current_user
+                else:
+                    print(f"⚠️  User could not be created: {user_id}")
+                    
+            except Exception as create_error:
+                print(f"❌ Error creating user: {create_error}")
+                import traceback
+                traceback.print_exc()
+                
+                return {
+                    "user_id": user_id,
+                    "email": email,
+                    "name": name,
+                    "created_at": datetime.now(),
+                    "total_predictions": 0
+                }
+        else:
+            print(f"✓ User exists: {user_id}")
+            known_users.add(user_id)
+            last_active_updater.touch(user_id)
+        
+        return existing_user
     
     except Exception as e:
         print(f"❌ Critical error in ensure_user_exists: {e}")
@@ -337,14 +365,18 @@ async def startup_event():
     print("Dog Breed Predictor API - Starting")
     print("=" * 50)
     
-    load_breed_database()
-    load_class_indices()
+    # Connect the storage backend and create indexes in the background (see /ready)
+    repositories.start()
     
-    model_loaded = load_model()
+    # Prefetch Clerk signing keys in the background
+    jwks_manager.start()
+    last_active_updater.start()
+    prediction_writer.start()
     
-    if not model_loaded:
-        print("\n⚠ WARNING: Model not loaded. API will not work properly.")
-        print(f"Please ensure model file exists at: {MODEL_PATH}\n")
+    # Catalogs and the model load in worker threads while the server starts accepting
+    # requests; /predict answers 503 and /ready stays 503 until they finish
+    global _startup_task
+    _startup_task = asyncio.create_task(_background_startup())
     
     # Check Cloudinary configuration
     cloudinary_configured = all([
@@ -353,23 +385,63 @@ async def startup_event():
         os.getenv('CLOUDINARY_API_SECRET')
     ])
     
+    # Reuse pooled keep-alive connections for all Cloudinary uploader calls
+    http_client.install_cloudinary_pool()
+    
     print(f"\nDatabase Status:")
-    print(f"  MongoDB: {'✓ Connected' if mongodb._client else '✗ Not connected'}")
-    print(f"  Firebase: {'✓ Connected' if firebase_db.is_connected() else '✗ Not connected'}")
-    print(f"  Primary DB: {'Firebase' if USE_FIREBASE else 'MongoDB'}")
+    print(f"  Storage backend: {repositories.name} (connecting in background)")
     print(f"  Cloudinary: {'✓ Configured' if cloudinary_configured else '✗ Not configured'}")
     print(f"  Auto User Creation: ✓ Enabled")
     print(f"  Feedback System: ✓ Enabled (with Public/Private)")
     print(f"  Vaccination Tracking: ✓ Enabled")
     
+    startup_profile.mark("serving")
+    
     print("=" * 50)
-    print("API is ready with Cloudinary Image Upload!")
+    print("API is accepting requests (model and storage loading in background)")
     print("=" * 50)
 
+async def _wait_for_storage():
+    """Record how long the storage backend took to become ready"""
+    started = time.perf_counter()
+    await repositories.wait_ready()
+    startup_profile.record("storage", started)
+
+async def _background_startup():
+    """Load catalogs, the model and storage concurrently, warm the model up, then print the startup profile"""
+    storage = asyncio.create_task(_wait_for_storage())
+    model_loaded, _, _ = await asyncio.gather(
+        asyncio.to_thread(load_model),
+        asyncio.to_thread(load_catalogs),
+        asyncio.to_thread(dog_detector.load)
+    )
+    
+    if model_loaded:
+        # Needs the class names, so it runs once the catalogs are in
+        await asyncio.to_thread(warmup_model)
+    else:
+        print("\n⚠ WARNING: Model not loaded. API will not work properly.")
+        print(f"Please ensure model file exists at: {MODEL_PATH}\n")
+    
+    await storage
+    await asyncio.to_thread(similar_dogs.load)
+    startup_profile.complete()
+    startup_profile.print_report()
+
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown"""
-    mongodb.close()
+    if _startup_task is not None and not _startup_task.done():
+        _startup_task.cancel()
+    await prediction_writer.stop()
+    await last_active_updater.stop()
+    await repositories.close()
+    await model_runtime.close()
+    jwks_manager.stop()
+    http_client.close()
+    await response_cache.close()
+    await rate_limiter.close()
+    await asyncio.to_thread(similar_dogs.save)
 
 @app.get("/")
 async def root():
@@ -388,27 +460,38 @@ async def root():
             "vaccination-tracking",
             "cloudinary-storage"
         ],
-        "primary_db": "firebase" if USE_FIREBASE else "mongodb"
+        "primary_db": repositories.name
+    }
+
+def readiness_checks():
+    """What must be true before a load balancer should send this worker traffic"""
+    return {
+        "model_loaded": model_runtime.loaded,
+        "model_warmed": model_runtime.warmed,
+        "storage_ready": repositories.ready
     }
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """Health check endpoint (always 200 while the process is up; see `ready`)"""
     cloudinary_configured = all([
         os.getenv('CLOUDINARY_CLOUD_NAME'),
         os.getenv('CLOUDINARY_API_KEY'),
         os.getenv('CLOUDINARY_API_SECRET')
     ])
+    checks = readiness_checks()
     
     return {
         "status": "healthy",
-        "model_loaded": model is not None,
+        "live": True,
+        "ready": all(checks.values()),
+        "checks": checks,
+        "model_loaded": model_runtime.loaded,
         "breeds_in_database": len(breed_database),
         "total_classes": len(class_names),
-        "mongodb_connected": mongodb._client is not None,
-        "firebase_connected": firebase_db.is_connected(),
+        "database_connected": repositories.ready,
         "cloudinary_configured": cloudinary_configured,
-        "primary_database": "firebase" if USE_FIREBASE else "mongodb",
+        "primary_database": repositories.name,
         "auto_user_creation": "enabled",
         "feedback_system": "enabled",
         "public_feedback": "enabled",
@@ -416,14 +499,58 @@ async def health_check():
         "timestamp": datetime.now().isoformat()
     }
 
-@app.post("/predict")
+@app.get("/health/live")
+async def liveness_check():
+    """Liveness probe: 200 whenever the event loop is serving requests"""
+    return {"live": True}
+
+@app.get("/ready")
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness probe: 200 once the model is loaded and warmed up and storage is prepared, 503 until then"""
+    checks = readiness_checks()
+    ready = all(checks.values())
+    
+    return JSONResponse(status_code=200 if ready else 503, content={
+        "ready": ready,
+        "checks": checks,
+        "storage": repositories.status(),
+        "model": model_runtime.stats(),
+        "startup": startup_profile.report()
+    })
+
+@app.get("/metrics")
+async def get_metrics():
+    """Process metrics (outbound HTTP, caches, latency histograms)"""
+    return {
+        "success": True,
+        "metrics": metrics.snapshot(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.post("/predict", dependencies=[Depends(rate_limit("predict", get_optional_user))])
 async def predict(
     file: UploadFile = File(...),
     user_id: Optional[str] = Form(None),
+    tta: bool = False,
+    detect: bool = True,
     current_user: dict = Depends(get_optional_user)
 ):
-    """Predict dog breed from uploaded image (Public - Auth Optional)"""
-    if model is None:
+    """Predict dog breed from uploaded image (Public - Auth Optional)
+
+    ?tta=true averages over flipped and cropped views of the image; the same
+    happens automatically when top-1 confidence is below PREDICT_TTA_THRESHOLD.
+
+    With a dog detector loaded (dog_detector.py) each detected dog is cropped
+    and classified, all crops in one batch; "dogs" lists them and the most
+    confident detection is the headline prediction. A photo without a dog
+    gets a 422 without running the classifier. ?detect=false and ?tta=true
+    classify the whole image instead.
+    """
+    request_started = time.perf_counter()
+    # Signed-in users get the priority lane (and the per-user quota) in the batch scheduler
+    lane = LANE_AUTHENTICATED if current_user else LANE_ANONYMOUS
+    if not model_runtime.loaded:
         raise HTTPException(
             status_code=503,
             detail="Model not loaded. Server is not ready."
@@ -444,31 +571,68 @@ async def predict(
             print(f"{'='*60}\n")
         
         image_bytes = await file.read()
-        processed_image = preprocess_image(image_bytes)
+        user_key = current_user["user_id"] if current_user else None
+        tta_info = None
+        embedding = None
+        boxes = None
+        detector_ms = None
         
-        # Make prediction
-        predictions = model.predict(processed_image, verbose=0)
-        predicted_idx = int(np.argmax(predictions[0]))
-        confidence = float(predictions[0][predicted_idx])
+        if detect and not tta and dog_detector.loaded:
+            img, boxes, detector_ms = await detect_dogs(image_bytes)
         
-        if predicted_idx < len(class_names):
-            breed_name = class_names[predicted_idx]
+        # Make prediction
+        inference_started = time.perf_counter()
+        if boxes:
+            # Every dog's crop in one batch; the most confident detection comes first
+            crops = await asyncio.to_thread(preprocess_crops, img, boxes)
+            crop_probabilities, embeddings = await model_runtime.predict_embed_async(crops, lane, user_key)
+            probabilities = crop_probabilities[0]
+            if embeddings is not None:
+                embedding = embeddings[0]
+        elif tta:
+            # Every view in one batch; shed like any other prediction when overloaded
+            probabilities = await model_runtime.predict_tta(image_bytes, lane=lane, user=user_key)
+            tta_info = {"reason": "requested", "views": len(PREDICT_TTA_VIEWS)}
         else:
-            breed_name = f"Unknown_Breed_{predicted_idx}"
-        
-        breed_display = normalize_breed_name(breed_name).title()
-        breed_info = get_breed_info(breed_name)
-        
-        top_3_indices = np.argsort(predictions[0])[-3:][::-1]
-        top_predictions = []
-        
-        for idx in top_3_indices:
-            if idx < len(class_names):
-                top_breed = normalize_breed_name(class_names[idx]).title()
-                top_predictions.append({
-                    "breed": top_breed,
-                    "confidence": float(predictions[0][idx]),
-                    "percentage": round(float(predictions[0][idx]) * 100, 2)
+            processed_image = preprocess_image(image_bytes)
+            probabilities, embeddings = await model_runtime.predict_embed_async(processed_image, lane, user_key)
+            probabilities = probabilities[0]
+            if embeddings is not None:
+                embedding = embeddings[0]
+            base_confidence = float(np.max(probabilities))
+            if base_confidence < PREDICT_TTA_THRESHOLD:
+                # Unsure: add the augmented views, best effort (keep the plain answer if shed)
+                try:
+                    probabilities = await model_runtime.predict_tta(image_bytes, probabilities, lane, user_key)
+                    tta_info = {"reason": "low_confidence", "views": len(PREDICT_TTA_VIEWS),
+                                "base_confidence": base_confidence}
+                except OverloadedError as e:
+                    # The client sees why the answer is not augmented
+                    tta_info = {"reason": "skipped",
+                                "cause": "quota" if isinstance(e, QuotaExceededError) else "overloaded",
+                                "base_confidence": base_confidence}
+        classifier_ms = (time.perf_counter() - inference_started) * 1000
+        metrics.observe("predict.inference", classifier_ms)
+        if tta_info:
+            metrics.inc(f"predict.tta.{tta_info['reason']}")
+        
+        result = build_prediction(probabilities)
+        breed_display = result["breed"]
+        confidence = result["confidence"]
+        top_predictions = result["top_predictions"]
+        breed_info = result["breed_info"]
+        
+        dogs = None
+        if boxes:
+            dogs = []
+            for box, row in zip(boxes, crop_probabilities):
+                dog = build_prediction(row)
+                dogs.append({
+                    "box": box.as_dict(),
+                    "breed": dog["breed"],
+                    "confidence": dog["confidence"],
+                    "percentage": round(dog["confidence"] * 100, 2),
+                    "top_predictions": dog["top_predictions"]
                 })
         
         prediction_id = None
@@ -501,32 +665,39 @@ async def predict(
                 print(f"⚠️  Image upload failed, continuing without image: {img_error}")
                 # Continue without failing the prediction
         
-        # Save prediction to database (only for authenticated users)
+        # Queue prediction for batched persistence (only for authenticated users).
+        # The ID is generated client-side so it can be returned immediately;
+        # the user's total_predictions/last_active are updated in the same batch.
         if current_user:
-            if USE_FIREBASE:
-                firebase_user_db.update_last_active(current_user["user_id"])
-                firebase_user_db.increment_prediction_count(current_user["user_id"])
-                prediction_id = firebase_prediction_db.save_prediction(
-                    user_id=current_user["user_id"],
-                    breed=breed_display,
-                    confidence=confidence,
-                    image_name=file.filename,
-                    top_predictions=top_predictions,
-                    image_url=image_url,
-                    thumbnail_url=thumbnail_url
-                )
-                print(f"✅ Prediction saved to Firebase: {prediction_id}")
-            else:
-                mongo_user_db.update_last_active(current_user["user_id"])
-                prediction_id = mongo_prediction_db.save_prediction(
-                    user_id=current_user["user_id"],
-                    breed=breed_display,
-                    confidence=confidence,
-                    image_name=file.filename,
-                    image_url=image_url,
-                    thumbnail_url=thumbnail_url
-                )
-                print(f"✅ Prediction saved to MongoDB: {prediction_id}")
+            prediction_id = prediction_writer.enqueue({
+                "user_id": current_user["user_id"],
+                "breed": breed_display,
+                "confidence": confidence,
+                "image_name": file.filename,
+                "top_predictions": top_predictions,
+                "image_url": image_url,
+                "thumbnail_url": thumbnail_url,
+                "created_at": datetime.utcnow().isoformat()
+            })
+            print(f"✅ Prediction queued for {repositories.name}: {prediction_id}")
+        
+        # Make the photo findable by /similar, only by its (signed-in) owner. TTA
+        # predictions average several views, so they have no single embedding to index.
+        if embedding is not None and image_url and current_user:
+            asyncio.get_running_loop().run_in_executor(None, index_prediction, embedding, {
+                "source": "prediction",
+                "prediction_id": prediction_id,
+                "breed": breed_display,
+                "confidence": confidence,
+                "image_url": image_url,
+                "thumbnail_url": thumbnail_url,
+                "user_id": current_user["user_id"]
+            })
+        
+        latency_ms = (time.perf_counter() - request_started) * 1000
+        metrics.observe("predict.request", latency_ms)
+        metrics.observe(f"predict.request.{lane}", latency_ms)
+        model_runtime.record_request(latency_ms)
         
         return {
             "success": True,
@@ -542,9 +713,32 @@ async def predict(
             "thumbnail_url": thumbnail_url,
             "timestamp": datetime.now().isoformat(),
             "authenticated": current_user is not None,
-            "database_used": "firebase" if USE_FIREBASE else "mongodb"
+            "database_used": repositories.name,
+            "tta": tta_info,
+            "dogs": dogs,
+            "timings": {
+                "detector_ms": round(detector_ms, 2) if detector_ms is not None else None,
+                "classifier_ms": round(classifier_ms, 2)
+            }
         }
         
+    except HTTPException:
+        raise
+    except QuotaExceededError as e:
+        metrics.inc("predict.quota_exceeded")
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": "1"}
+        )
+    except OverloadedError as e:
+        metrics.inc("predict.shed")
+        metrics.inc(f"predict.shed.{lane}")
+        raise HTTPException(
+            status_code=503,
+            detail=f"Server is overloaded: {e}",
+            headers={"Retry-After": "1"}
+        )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -556,6 +750,143 @@ async def predict(
             detail=f"Prediction failed: {str(e)}"
         )
 
+async def detect_dogs(image_bytes):
+    """(decoded image, dog boxes, detector ms) for an upload; a 422 when there is no dog"""
+    started = time.perf_counter()
+    img = await asyncio.to_thread(decode_image, image_bytes)
+    boxes = await asyncio.to_thread(dog_detector.detect, img)
+    detector_ms = (time.perf_counter() - started) * 1000
+    metrics.observe("predict.detector", detector_ms)
+    if not boxes:
+        # Fast path: nothing to classify
+        metrics.inc("predict.no_dog")
+        raise HTTPException(
+            status_code=422,
+            detail="No dog detected in the image. Try a photo where the dog is clearly visible."
+        )
+    return img, boxes, detector_ms
+
+def index_prediction(embedding, entry):
+    """Add a prediction to the similar-dogs index (in a worker thread: adding can train the index)"""
+    try:
+        similar_dogs.add(embedding, entry)
+    except Exception as e:
+        print(f"⚠️  Could not index prediction for /similar: {e}")
+
+@app.post("/similar", dependencies=[Depends(rate_limit("similar", get_optional_user))])
+async def similar(
+    file: UploadFile = File(...),
+    k: int = Query(8, ge=1, le=SIMILAR_MAX_RESULTS),
+    current_user: dict = Depends(get_optional_user)
+):
+    """Find dogs that look like the uploaded one (Public - Auth Optional)
+
+    Searches the reference gallery and, for signed-in users, their own past
+    predictions, by cosine similarity of the model's embeddings. With a dog
+    detector loaded the most confident dog's crop is searched, as in /predict.
+    """
+    request_started = time.perf_counter()
+    lane = LANE_AUTHENTICATED if current_user else LANE_ANONYMOUS
+    if not model_runtime.loaded:
+        raise HTTPException(
+            status_code=503,
+            detail="Model not loaded. Server is not ready."
+        )
+    
+    if not model_runtime.embedding_dim:
+        raise HTTPException(
+            status_code=501,
+            detail="The loaded model does not expose embeddings; re-export it with convert_model.py"
+        )
+    
+    if not file.content_type.startswith("image/"):
+        raise HTTPException(
+            status_code=400,
+            detail="File must be an image (JPG, PNG, WebP)"
+        )
+    
+    try:
+        image_bytes = await file.read()
+        user_key = current_user["user_id"] if current_user else None
+        if dog_detector.loaded:
+            img, boxes, _ = await detect_dogs(image_bytes)
+            processed_image = await asyncio.to_thread(preprocess_crops, img, boxes[:1])
+        else:
+            processed_image = preprocess_image(image_bytes)
+        probabilities, embeddings = await model_runtime.predict_embed_async(processed_image, lane, user_key)
+        
+        search_started = time.perf_counter()
+        matches = await asyncio.to_thread(similar_dogs.search, embeddings[0], k, user_key)
+        metrics.observe("similar.search", (time.perf_counter() - search_started) * 1000)
+        
+        result = build_prediction(probabilities[0])
+        metrics.observe("similar.request", (time.perf_counter() - request_started) * 1000)
+        
+        return {
+            "success": True,
+            "prediction": {
+                "breed": result["breed"],
+                "confidence": result["confidence"],
+                "percentage": round(result["confidence"] * 100, 2)
+            },
+            "matches": matches,
+            "index_size": similar_dogs.size,
+            "timestamp": datetime.now().isoformat()
+        }
+        
+    except HTTPException:
+        raise
+    except QuotaExceededError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": "1"}
+        )
+    except OverloadedError as e:
+        metrics.inc("similar.shed")
+        raise HTTPException(
+            status_code=503,
+            detail=f"Server is overloaded: {e}",
+            headers={"Retry-After": "1"}
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"❌ Similar search error: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Similar search failed: {str(e)}"
+        )
+
+def build_prediction(probabilities):
+    """Decode one row of class probabilities into the breed, top 3 and breed info"""
+    predicted_idx = int(np.argmax(probabilities))
+    confidence = float(probabilities[predicted_idx])
+    
+    if predicted_idx < len(class_names):
+        breed_name = class_names[predicted_idx]
+    else:
+        breed_name = f"Unknown_Breed_{predicted_idx}"
+    
+    top_3_indices = np.argsort(probabilities)[-3:][::-1]
+    top_predictions = []
+    
+    for idx in top_3_indices:
+        if idx < len(class_names):
+            top_breed = normalize_breed_name(class_names[idx]).title()
+            top_predictions.append({
+                "breed": top_breed,
+                "confidence": float(probabilities[idx]),
+                "percentage": round(float(probabilities[idx]) * 100, 2)
+            })
+    
+    return {
+        "breed": normalize_breed_name(breed_name).title(),
+        "confidence": confidence,
+        "top_predictions": top_predictions,
+        "breed_info": get_breed_info(breed_name)
+    }
+
 # ============================================
 # FEEDBACK ENDPOINTS
 # ============================================
@@ -571,7 +902,7 @@ async def submit_feedback(
         
         user_id = current_user["user_id"]
         
-        feedback_id = feedback_db.submit_feedback(
+        feedback_id = await repositories.feedback.submit_feedback(
             user_id=user_id,
             feedback_type=feedback.feedback_type,
             message=feedback.message,
@@ -619,7 +950,7 @@ async def get_my_feedback(
     try:
         await ensure_user_exists(current_user)
         
-        feedback_list = feedback_db.get_user_feedback(
+        feedback_list = await repositories.feedback.get_user_feedback(
             user_id=current_user["user_id"],
             limit=limit,
             feedback_type=feedback_type
@@ -651,51 +982,10 @@ async def get_public_feedback(
     try:
         await ensure_user_exists(current_user)
         
-        if USE_FIREBASE:
-            from google.cloud import firestore
-            
-            query = firebase_db._db.collection('feedback').where('is_private', '==', False)
-            
-            if feedback_type:
-                query = query.where('type', '==', feedback_type)
-            
-            query = query.order_by('created_at', direction=firestore.Query.DESCENDING)
-            query = query.limit(limit)
-            
-            docs = query.stream()
-            
-            feedback_list = []
-            for doc in docs:
-                feedback_data = doc.to_dict()
-                feedback_data['id'] = doc.id
-                
-                if feedback_data.get('created_at'):
-                    feedback_data['created_at'] = feedback_data['created_at'].isoformat()
-                if feedback_data.get('updated_at'):
-                    feedback_data['updated_at'] = feedback_data['updated_at'].isoformat()
-                
-                feedback_data['user_id'] = 'anonymous'
-                
-                feedback_list.append(feedback_data)
-        else:
-            query = {'is_private': False}
-            if feedback_type:
-                query['type'] = feedback_type
-            
-            cursor = mongodb._db['feedback'].find(query).sort('created_at', -1).limit(limit)
-            
-            feedback_list = []
-            for doc in cursor:
-                doc['id'] = str(doc['_id'])
-                del doc['_id']
-                
-                if doc.get('created_at'):
-                    doc['created_at'] = doc['created_at'].isoformat()
-                if doc.get('updated_at'):
-                    doc['updated_at'] = doc['updated_at'].isoformat()
-                
-                doc['user_id'] = 'anonymous'
-                feedback_list.append(doc)
+        feedback_list = await repositories.feedback.get_public_feedback(
+            limit=limit,
+            feedback_type=feedback_type
+        )
         
         return {
             "success": True,
@@ -725,45 +1015,17 @@ async def update_feedback_privacy(
         
         user_id = current_user["user_id"]
         
-        if USE_FIREBASE:
-            doc_ref = firebase_db._db.collection('feedback').document(feedback_id)
-            doc = doc_ref.get()
-            
-            if not doc.exists:
-                raise HTTPException(status_code=404, detail="Feedback not found")
-            
-            feedback_data = doc.to_dict()
-            
-            if feedback_data.get('user_id') != user_id:
-                raise HTTPException(status_code=403, detail="You can only modify your own feedback")
-            
-            from google.cloud import firestore
-            doc_ref.update({
-                'is_private': privacy_update.is_private,
-                'updated_at': firestore.SERVER_TIMESTAMP
-            })
-            
-            print(f"✅ Privacy updated for feedback {feedback_id}: {privacy_update.is_private}")
-        else:
-            from bson import ObjectId
-            
-            feedback = mongodb._db['feedback'].find_one({'_id': ObjectId(feedback_id)})
-            
-            if not feedback:
-                raise HTTPException(status_code=404, detail="Feedback not found")
-            
-            if feedback.get('user_id') != user_id:
-                raise HTTPException(status_code=403, detail="You can only modify your own feedback")
-            
-            mongodb._db['feedback'].update_one(
-                {'_id': ObjectId(feedback_id)},
-                {'$set': {
-                    'is_private': privacy_update.is_private,
-                    'updated_at': datetime.now()
-                }}
-            )
-            
-            print(f"✅ Privacy updated for feedback {feedback_id}: {privacy_update.is_private}")
+        feedback = await repositories.feedback.get_feedback(feedback_id)
+        
+        if not feedback:
+            raise HTTPException(status_code=404, detail="Feedback not found")
+        
+        if feedback.get('user_id') != user_id:
+            raise HTTPException(status_code=403, detail="You can only modify your own feedback")
+        
+        await repositories.feedback.update_feedback_privacy(feedback_id, privacy_update.is_private)
+        
+        print(f"✅ Privacy updated for feedback {feedback_id}: {privacy_update.is_private}")
         
         return {
             "success": True,
@@ -793,7 +1055,7 @@ async def get_all_feedback_admin(
 ):
     """Get all feedback (Admin only)"""
     try:
-        feedback_list = feedback_db.get_all_feedback(
+        feedback_list = await repositories.feedback.get_all_feedback(
             limit=limit,
             status=status,
             feedback_type=feedback_type
@@ -823,7 +1085,7 @@ async def update_feedback_status_endpoint(
 ):
     """Update feedback status (Admin only)"""
     try:
-        success = feedback_db.update_feedback_status(
+        success = await repositories.feedback.update_feedback_status(
             feedback_id=feedback_id,
             status=status_update.status,
             admin_response=status_update.admin_response
@@ -851,13 +1113,13 @@ async def update_feedback_status_endpoint(
         )
 
 
-@app.get("/feedback/stats")
+@app.get("/feedback/stats", dependencies=[Depends(rate_limit("feedback_stats", get_current_user))])
 async def get_feedback_stats_endpoint(
     current_user: dict = Depends(get_current_user)
 ):
     """Get feedback statistics (Admin only)"""
     try:
-        stats = feedback_db.get_feedback_stats()
+        stats = await repositories.feedback.get_feedback_stats()
         
         return {
             "success": True,
@@ -889,7 +1151,7 @@ async def create_vaccination(
         
         user_id = current_user["user_id"]
         
-        vaccination_id = vaccination_db.create_vaccination(
+        vaccination_id = await repositories.vaccinations.create_vaccination(
             user_id=user_id,
             name=vaccination.name,
             due_date=vaccination.due_date,
@@ -944,7 +1206,7 @@ async def get_my_vaccinations(
         
         user_id = current_user["user_id"]
         
-        vaccinations = vaccination_db.get_user_vaccinations(
+        vaccinations = await repositories.vaccinations.get_user_vaccinations(
             user_id=user_id,
             limit=limit,
             status=status
@@ -978,7 +1240,7 @@ async def get_vaccination(
         
         user_id = current_user["user_id"]
         
-        vaccination = vaccination_db.get_vaccination_by_id(
+        vaccination = await repositories.vaccinations.get_vaccination_by_id(
             vaccination_id=vaccination_id,
             user_id=user_id
         )
@@ -1038,7 +1300,7 @@ async def update_vaccination(
                 detail="No fields to update"
             )
         
-        success = vaccination_db.update_vaccination(
+        success = await repositories.vaccinations.update_vaccination(
             vaccination_id=vaccination_id,
             user_id=user_id,
             update_data=update_data
@@ -1050,7 +1312,7 @@ async def update_vaccination(
                 detail="Vaccination record not found or you don't have access"
             )
         
-        updated_vaccination = vaccination_db.get_vaccination_by_id(
+        updated_vaccination = await repositories.vaccinations.get_vaccination_by_id(
             vaccination_id=vaccination_id,
             user_id=user_id
         )
@@ -1084,7 +1346,7 @@ async def delete_vaccination(
         
         user_id = current_user["user_id"]
         
-        success = vaccination_db.delete_vaccination(
+        success = await repositories.vaccinations.delete_vaccination(
             vaccination_id=vaccination_id,
             user_id=user_id
         )
@@ -1111,7 +1373,8 @@ async def delete_vaccination(
         )
 
 
-@app.get("/vaccinations/stats/summary")
+@app.get("/vaccinations/stats/summary",
+         dependencies=[Depends(rate_limit("vaccination_stats", get_current_user))])
 async def get_vaccination_stats(
     current_user: dict = Depends(get_current_user)
 ):
@@ -1121,7 +1384,7 @@ async def get_vaccination_stats(
         
         user_id = current_user["user_id"]
         
-        stats = vaccination_db.get_vaccination_stats(user_id)
+        stats = await repositories.vaccinations.get_vaccination_stats(user_id)
         
         return {
             "success": True,
@@ -1148,7 +1411,7 @@ async def get_upcoming_vaccinations(
         
         user_id = current_user["user_id"]
         
-        upcoming = vaccination_db.get_upcoming_vaccinations(
+        upcoming = await repositories.vaccinations.get_upcoming_vaccinations(
             user_id=user_id,
             days=days
         )
@@ -1175,43 +1438,122 @@ async def get_upcoming_vaccinations(
 
 @app.get("/history")
 async def get_prediction_history(
-    limit: int = 50,
+    limit: int = HISTORY_DEFAULT_LIMIT,
+    cursor: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
-    """Get user's prediction history (Protected)"""
+    """Get one page of the user's prediction history (Protected)
+
+    Returns list fields only; pass `next_cursor` back as `cursor` for the next
+    page and use /history/{prediction_id} for the full prediction.
+    """
     try:
         await ensure_user_exists(current_user)
+        user_id = current_user["user_id"]
+        # Clamped before it becomes part of the cache key: ?limit=1000 and ?limit=100 share a page
+        limit = clamp_limit(limit)
         
-        if USE_FIREBASE:
-            predictions = firebase_prediction_db.get_user_predictions(
-                user_id=current_user["user_id"],
-                limit=limit
-            )
-            total_count = firebase_prediction_db.get_prediction_count(
-                user_id=current_user["user_id"]
+        async def build():
+            page = await repositories.predictions.get_user_predictions_page(
+                user_id=user_id,
+                limit=limit,
+                cursor=cursor
             )
-        else:
-            predictions = mongo_prediction_db.get_user_predictions(
-                user_id=current_user["user_id"],
-                limit=limit
+            total_count = await repositories.predictions.get_prediction_count(user_id)
+            
+            return {
+                "success": True,
+                "total_predictions": total_count,
+                "predictions": page["predictions"],
+                "next_cursor": page["next_cursor"],
+                "has_more": page["has_more"],
+                "source": repositories.name
+            }
+        
+        return await response_cache.get_or_build(user_id, f"history:{limit}:{cursor or ''}", build)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"❌ Error in /history: {e}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to fetch history: {str(e)}"
+        )
+
+
+@app.get("/history/{prediction_id}")
+async def get_prediction_detail(
+    prediction_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get a full prediction (including top predictions) from history (Protected)"""
+    try:
+        await ensure_user_exists(current_user)
+        
+        prediction = await repositories.predictions.get_prediction(
+            prediction_id=prediction_id,
+            user_id=current_user["user_id"]
+        )
+        
+        if not prediction:
+            raise HTTPException(
+                status_code=404,
+                detail="Prediction not found or you don't have access"
             )
-            total_count = mongo_prediction_db.get_prediction_count(
-                user_id=current_user["user_id"]
+        
+        return {
+            "success": True,
+            "prediction": prediction
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Error fetching prediction: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to fetch prediction: {str(e)}"
+        )
+
+
+@app.delete("/history/{prediction_id}")
+async def delete_prediction_from_history(
+    prediction_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Delete one of the user's predictions (Protected)"""
+    try:
+        await ensure_user_exists(current_user)
+        user_id = current_user["user_id"]
+        
+        deleted = await repositories.predictions.delete_prediction(
+            prediction_id=prediction_id,
+            user_id=user_id
+        )
+        
+        if not deleted:
+            raise HTTPException(
+                status_code=404,
+                detail="Prediction not found or you don't have access"
             )
         
+        await response_cache.invalidate(user_id)
+        similar_dogs.remove(prediction_id, user_id)
+        
         return {
             "success": True,
-            "total_predictions": total_count,
-            "predictions": predictions,
-            "source": "firebase" if USE_FIREBASE else "mongodb"
+            "message": "Prediction deleted successfully"
         }
+        
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"❌ Error in /history: {e}")
-        import traceback
-        traceback.print_exc()
+        print(f"❌ Error deleting prediction: {e}")
         raise HTTPException(
             status_code=500,
-            detail=f"Failed to fetch history: {str(e)}"
+            detail=f"Failed to delete prediction: {str(e)}"
         )
 
 
@@ -1220,21 +1562,18 @@ async def get_user_stats(current_user: dict = Depends(get_current_user)):
     """Get user statistics (Protected)"""
     try:
         await ensure_user_exists(current_user)
+        user_id = current_user["user_id"]
         
-        if USE_FIREBASE:
-            breed_stats = firebase_prediction_db.get_breed_stats(current_user["user_id"])
-            total_predictions = firebase_prediction_db.get_prediction_count(current_user["user_id"])
-        else:
-            breed_stats = mongo_prediction_db.get_breed_stats(current_user["user_id"])
-            total_predictions = mongo_prediction_db.get_prediction_count(current_user["user_id"])
+        async def build():
+            return {
+                "success": True,
+                "total_predictions": await repositories.predictions.get_prediction_count(user_id),
+                "breed_statistics": await repositories.predictions.get_breed_stats(user_id),
+                "user_id": user_id,
+                "source": repositories.name
+            }
         
-        return {
-            "success": True,
-            "total_predictions": total_predictions,
-            "breed_statistics": breed_stats,
-            "user_id": current_user["user_id"],
-            "source": "firebase" if USE_FIREBASE else "mongodb"
-        }
+        return await response_cache.get_or_build(user_id, "stats", build)
     except Exception as e:
         print(f"❌ Error in /stats: {e}")
         import traceback
@@ -1298,24 +1637,18 @@ async def update_user_profile(
         except:
             body = {}
         
-        if USE_FIREBASE:
-            firebase_user_db.update_user(user_id, {
-                "email": email,
-                "name": name,
-                **body
-            })
-        else:
-            mongo_user_db.create_or_update_user(
-                user_id=user_id,
-                email=email,
-                name=name
-            )
+        # Only the display name may come from the client; the email is the verified one.
+        # The repositories drop anything that is not a profile field.
+        await repositories.users.update_user(user_id, {
+            "name": body.get("name", name) if isinstance(body, dict) else name,
+            "email": email
+        })
         
         return {
             "success": True,
             "message": "User profile updated",
             "user_id": user_id,
-            "database": "firebase" if USE_FIREBASE else "mongodb"
+            "database": repositories.name
         }
     except Exception as e:
         print(f"❌ Error in /user/profile POST: {e}")
@@ -1333,10 +1666,7 @@ async def get_user_profile(current_user: dict = Depends(get_current_user)):
     try:
         await ensure_user_exists(current_user)
         
-        if USE_FIREBASE:
-            user = firebase_user_db.get_user(current_user["user_id"])
-        else:
-            user = mongo_user_db.get_user(current_user["user_id"])
+        user = await repositories.users.get_user(current_user["user_id"])
         
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
@@ -0,0 +1,497 @@
+"""
+In-Memory Database
+Dict-backed implementations of the user, prediction, feedback and vaccination
+repositories. Used by the repository contract tests and for running the API
+without MongoDB or Firebase (benchmarks, offline development).
+Nothing is persisted; all data is lost when the process exits.
+"""
+
+import bisect
+import copy
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from breed_stats import accumulate, breed_key, group_records, summarize
+from pagination import HISTORY_DEFAULT_LIMIT, clamp_limit, decode_cursor, encode_cursor
+from user_profile import profile_updates
+from vaccination_db import VaccinationDB
+
+
+def _new_id() -> str:
+    return uuid.uuid4().hex
+
+
+class MemoryUserDB:
+    """User profiles kept in a dict"""
+
+    def __init__(self):
+        self._users: Dict[str, Dict] = {}
+
+    async def create_user(self, user_id: str, email: str = None, name: str = None, **kwargs) -> bool:
+        """Create a user profile if it doesn't exist yet"""
+        if user_id in self._users:
+            return True
+
+        now = datetime.utcnow()
+        user_data = {
+            "user_id": user_id,
+            "email": email,
+            "name": name or (email.split('@')[0] if email else None),
+            "created_at": now,
+            "updated_at": now,
+            "last_active": now,
+            "total_predictions": 0,
+            "email_verified": kwargs.get("email_verified", False),
+            "preferences": {
+                "theme": "light",
+                "notifications_enabled": True,
+                "sound_enabled": True
+            },
+            "profile": {
+                "avatar_url": kwargs.get("avatar_url"),
+                "bio": kwargs.get("bio", ""),
+                "favorite_breeds": []
+            }
+        }
+        for key, value in kwargs.items():
+            if key not in user_data:
+                user_data[key] = value
+
+        self._users[user_id] = user_data
+        return True
+
+    async def get_user(self, user_id: str) -> Optional[Dict]:
+        """Get user by ID"""
+        user = self._users.get(user_id)
+        return copy.deepcopy(user) if user else None
+
+    async def update_user(self, user_id: str, updates: Dict) -> bool:
+        """Update profile fields (see user_profile.PROFILE_FIELDS) on an existing user"""
+        user = self._users.get(user_id)
+        if user is None:
+            return False
+        user.update(profile_updates(updates))
+        user["updated_at"] = datetime.utcnow()
+        return True
+
+    async def update_last_active(self, user_id: str) -> bool:
+        """Update user's last active timestamp"""
+        return await self.update_last_active_many([user_id])
+
+    async def update_last_active_many(self, user_ids: List[str]) -> bool:
+        """Update last active timestamp for many users"""
+        now = datetime.utcnow()
+        for user_id in user_ids:
+            if user_id in self._users:
+                self._users[user_id]["last_active"] = now
+        return True
+
+    def adjust_prediction_count(self, user_id: str, delta: int):
+        """Keep total_predictions in step with saves/deletes"""
+        user = self._users.get(user_id)
+        if user is not None:
+            user["total_predictions"] = max(user.get("total_predictions", 0) + delta, 0)
+
+
+class MemoryPredictionDB:
+    """Predictions kept in a dict with a per-user (timestamp, id) index"""
+
+    def __init__(self, user_db: Optional[MemoryUserDB] = None):
+        self.user_db = user_db
+        self._predictions: Dict[str, Dict] = {}
+        # user_id -> sorted [(timestamp, id)], oldest first
+        self._by_user: Dict[str, List[tuple]] = {}
+        self._stats: Dict[str, Dict[str, Dict]] = {}
+
+    def new_prediction_id(self) -> str:
+        """Generate a prediction ID client-side"""
+        return _new_id()
+
+    def _insert(self, prediction_id: str, document: Dict) -> bool:
+        if prediction_id in self._predictions:
+            # Replayed spool record
+            return False
+
+        self._predictions[prediction_id] = document
+        bisect.insort(self._by_user.setdefault(document["user_id"], []), (document["timestamp"], prediction_id))
+        accumulate(self._stats.setdefault(document["user_id"], {}), document["breed"],
+                   document["confidence"] or 0.0, document["timestamp"].isoformat())
+        if self.user_db:
+            self.user_db.adjust_prediction_count(document["user_id"], 1)
+        return True
+
+    async def save_prediction(self, user_id: str, breed: str, confidence: float,
+                              image_name: str = None, top_predictions: List = None,
+                              image_url: str = None, thumbnail_url: str = None) -> Optional[str]:
+        """Save a prediction"""
+        prediction_id = self.new_prediction_id()
+        self._insert(prediction_id, {
+            "user_id": user_id,
+            "breed": breed,
+            "confidence": confidence,
+            "image_name": image_name,
+            "top_predictions": top_predictions or [],
+            "image_url": image_url,
+            "thumbnail_url": thumbnail_url,
+            "timestamp": datetime.utcnow()
+        })
+        return prediction_id
+
+    async def save_predictions_batch(self, records: List[Dict]) -> bool:
+        """Save many buffered predictions (records already stored are skipped)"""
+        for record in records:
+            created_at = record.get("created_at")
+            self._insert(record["id"], {
+                "user_id": record["user_id"],
+                "breed": record["breed"],
+                "confidence": record["confidence"],
+                "image_name": record.get("image_name"),
+                "top_predictions": record.get("top_predictions") or [],
+                "image_url": record.get("image_url"),
+                "thumbnail_url": record.get("thumbnail_url"),
+                "timestamp": datetime.fromisoformat(created_at) if created_at else datetime.utcnow()
+            })
+        return True
+
+    def _newest_first(self, user_id: str):
+        for _, prediction_id in reversed(self._by_user.get(user_id, [])):
+            yield prediction_id, self._predictions[prediction_id]
+
+    @staticmethod
+    def _to_response(prediction_id: str, document: Dict) -> Dict:
+        data = copy.deepcopy(document)
+        data["id"] = prediction_id
+        data["timestamp"] = document["timestamp"].isoformat()
+        return data
+
+    async def get_user_predictions(self, user_id: str, limit: int = 50) -> List[Dict]:
+        """Get user's prediction history"""
+        predictions = []
+        for prediction_id, document in self._newest_first(user_id):
+            if len(predictions) >= limit:
+                break
+            predictions.append(self._to_response(prediction_id, document))
+        return predictions
+
+    async def get_user_predictions_page(self, user_id: str, limit: int = HISTORY_DEFAULT_LIMIT,
+                                        cursor: Optional[str] = None) -> Dict:
+        """Get one page of a user's history (list fields only, keyset cursor)"""
+        limit = clamp_limit(limit)
+        after = decode_cursor(cursor)
+        keys = self._by_user.get(user_id, [])
+
+        end = len(keys)
+        if after:
+            # Stored timestamps are naive UTC
+            end = bisect.bisect_left(keys, (after[0].astimezone(timezone.utc).replace(tzinfo=None), after[1]))
+
+        start = max(end - limit, 0)
+        page_keys = list(reversed(keys[start:end]))
+        has_more = start > 0
+
+        return {
+            "predictions": [{
+                "id": prediction_id,
+                "breed": self._predictions[prediction_id]["breed"],
+                "confidence": self._predictions[prediction_id]["confidence"],
+                "thumbnail_url": self._predictions[prediction_id].get("thumbnail_url"),
+                "timestamp": timestamp.isoformat()
+            } for timestamp, prediction_id in page_keys],
+            "next_cursor": encode_cursor(*page_keys[-1]) if has_more and page_keys else None,
+            "has_more": has_more
+        }
+
+    async def get_prediction(self, prediction_id: str, user_id: str) -> Optional[Dict]:
+        """Get the full document for one of a user's predictions"""
+        document = self._predictions.get(prediction_id)
+        if not document or document["user_id"] != user_id:
+            return None
+        return self._to_response(prediction_id, document)
+
+    async def get_prediction_count(self, user_id: str) -> int:
+        """Get total number of predictions for a user"""
+        return len(self._by_user.get(user_id, []))
+
+    async def delete_prediction(self, prediction_id: str, user_id: str = None) -> bool:
+        """Delete a specific prediction
+
+        When user_id is given, only that user's prediction can be deleted.
+        """
+        document = self._predictions.get(prediction_id)
+        if not document or (user_id and document["user_id"] != user_id):
+            return False
+
+        del self._predictions[prediction_id]
+        owner = document["user_id"]
+        keys = self._by_user[owner]
+        keys.pop(bisect.bisect_left(keys, (document["timestamp"], prediction_id)))
+
+        entry = self._stats.get(owner, {}).get(breed_key(document["breed"]))
+        if entry:
+            entry["count"] -= 1
+            entry["confidence_sum"] -= document["confidence"] or 0.0
+        if self.user_db:
+            self.user_db.adjust_prediction_count(owner, -1)
+        return True
+
+    async def get_breed_stats(self, user_id: str) -> List[Dict]:
+        """Get breed prediction statistics for a user"""
+        return summarize(self._stats.get(user_id, {}))
+
+    async def list_prediction_user_ids(self) -> List[str]:
+        """Get every user ID that owns at least one prediction"""
+        return [user_id for user_id, keys in self._by_user.items() if keys]
+
+    async def compute_breed_histogram(self, user_id: str) -> Dict[str, Dict]:
+        """Build a user's breed histogram from their predictions"""
+        records = [{
+            "user_id": user_id,
+            "breed": document["breed"],
+            "confidence": document["confidence"],
+            "created_at": document["timestamp"].isoformat()
+        } for _, document in self._newest_first(user_id)]
+        return group_records(records).get(user_id, {})
+
+    async def seed_breed_stats(self, user_id: str) -> bool:
+        """Build a user's stats from their history unless they are already maintained"""
+        if user_id in self._stats:
+            return False
+        self._stats[user_id] = await self.compute_breed_histogram(user_id)
+        return True
+
+    async def write_breed_stats(self, user_id: str, histogram: Dict[str, Dict]) -> bool:
+        """Overwrite a user's stats (used by the backfill)"""
+        self._stats[user_id] = copy.deepcopy(histogram)
+        return True
+
+
+class MemoryFeedbackDB:
+    """Feedback entries kept in a dict"""
+
+    def __init__(self):
+        self._feedback: Dict[str, Dict] = {}
+
+    @staticmethod
+    def _to_response(feedback_id: str, document: Dict) -> Dict:
+        data = copy.deepcopy(document)
+        data["id"] = feedback_id
+        for field in ("created_at", "updated_at", "admin_responded_at"):
+            if data.get(field):
+                data[field] = data[field].isoformat()
+        return data
+
+    def _newest_first(self, **filters) -> List[tuple]:
+        matches = [
+            (feedback_id, document) for feedback_id, document in self._feedback.items()
+            if all(value is None or document.get(field) == value for field, value in filters.items())
+        ]
+        matches.sort(key=lambda item: item[1]["created_at"], reverse=True)
+        return matches
+
+    async def submit_feedback(
+        self,
+        user_id: str,
+        feedback_type: str,
+        message: str,
+        rating: Optional[int] = None,
+        prediction_id: Optional[str] = None,
+        breed_predicted: Optional[str] = None,
+        actual_breed: Optional[str] = None,
+        is_private: bool = False,
+        metadata: Optional[Dict] = None
+    ) -> str:
+        """Submit new feedback"""
+        now = datetime.utcnow()
+        feedback_id = _new_id()
+        self._feedback[feedback_id] = {
+            'user_id': user_id,
+            'type': feedback_type,
+            'message': message,
+            'rating': rating,
+            'prediction_id': prediction_id,
+            'breed_predicted': breed_predicted,
+            'actual_breed': actual_breed,
+            'is_private': is_private,
+            'status': 'pending',
+            'created_at': now,
+            'updated_at': now,
+            'metadata': metadata or {},
+            'admin_response': None,
+            'admin_responded_at': None,
+            'helpful_count': 0
+        }
+        return feedback_id
+
+    async def get_user_feedback(self, user_id: str, limit: int = 50,
+                                feedback_type: Optional[str] = None) -> List[Dict]:
+        """Get all feedback from a specific user"""
+        matches = self._newest_first(user_id=user_id, type=feedback_type)
+        return [self._to_response(*item) for item in matches[:limit]]
+
+    async def get_all_feedback(self, limit: int = 100, status: Optional[str] = None,
+                               feedback_type: Optional[str] = None) -> List[Dict]:
+        """Get all feedback (for admin)"""
+        matches = self._newest_first(status=status, type=feedback_type)
+        return [self._to_response(*item) for item in matches[:limit]]
+
+    async def get_public_feedback(self, limit: int = 50,
+                                  feedback_type: Optional[str] = None) -> List[Dict]:
+        """Get public feedback with the author anonymized"""
+        feedback_list = []
+        for item in self._newest_first(is_private=False, type=feedback_type)[:limit]:
+            data = self._to_response(*item)
+            data['user_id'] = 'anonymous'
+            feedback_list.append(data)
+        return feedback_list
+
+    async def get_feedback(self, feedback_id: str) -> Optional[Dict]:
+        """Get a single feedback entry (None if it doesn't exist)"""
+        document = self._feedback.get(feedback_id)
+        if document is None:
+            return None
+        data = copy.deepcopy(document)
+        data['id'] = feedback_id
+        return data
+
+    async def update_feedback_privacy(self, feedback_id: str, is_private: bool) -> bool:
+        """Change whether a feedback entry is private"""
+        document = self._feedback.get(feedback_id)
+        if document is None:
+            return False
+        document['is_private'] = is_private
+        document['updated_at'] = datetime.utcnow()
+        return True
+
+    async def update_feedback_status(self, feedback_id: str, status: str,
+                                     admin_response: Optional[str] = None) -> bool:
+        """Update feedback status (for admin)"""
+        document = self._feedback.get(feedback_id)
+        if document is None:
+            return False
+        now = datetime.utcnow()
+        document['status'] = status
+        document['updated_at'] = now
+        if admin_response:
+            document['admin_response'] = admin_response
+            document['admin_responded_at'] = now
+        return True
+
+    async def get_feedback_stats(self) -> Dict:
+        """Get feedback statistics"""
+        stats = {
+            'total': len(self._feedback),
+            'by_type': {
+                'prediction_correct': 0,
+                'prediction_wrong': 0,
+                'feature': 0,
+                'bug': 0,
+                'general': 0
+            },
+            'by_status': {'pending': 0, 'reviewed': 0, 'resolved': 0},
+            'average_rating': 0,
+            'total_ratings': 0,
+            'prediction_accuracy': 0,
+            'public_feedback': 0,
+            'private_feedback': 0
+        }
+
+        ratings = []
+        for document in self._feedback.values():
+            stats['private_feedback' if document.get('is_private') else 'public_feedback'] += 1
+            feedback_type = document.get('type', 'general')
+            if feedback_type in stats['by_type']:
+                stats['by_type'][feedback_type] += 1
+            status = document.get('status', 'pending')
+            if status in stats['by_status']:
+                stats['by_status'][status] += 1
+            if document.get('rating'):
+                ratings.append(document['rating'])
+
+        if ratings:
+            stats['average_rating'] = round(sum(ratings) / len(ratings), 2)
+            stats['total_ratings'] = len(ratings)
+
+        correct = stats['by_type']['prediction_correct']
+        total_prediction_feedback = correct + stats['by_type']['prediction_wrong']
+        if total_prediction_feedback > 0:
+            stats['prediction_accuracy'] = round((correct / total_prediction_feedback) * 100, 2)
+
+        return stats
+
+
+class MemoryVaccinationDB(VaccinationDB):
+    """Vaccination records kept in a dict"""
+
+    def __init__(self):
+        self._vaccinations: Dict[str, Dict] = {}
+
+    @staticmethod
+    def _to_response(vaccination_id: str, document: Dict) -> Dict:
+        data = copy.deepcopy(document)
+        data['id'] = vaccination_id
+        data['created_at'] = document['created_at'].isoformat()
+        data['updated_at'] = document['updated_at'].isoformat()
+        return data
+
+    async def create_vaccination(
+        self,
+        user_id: str,
+        name: str,
+        due_date: str,
+        status: str = "pending",
+        last_date: Optional[str] = None,
+        notes: str = "",
+        required: bool = False,
+        pet_name: Optional[str] = None
+    ) -> str:
+        """Create a new vaccination record"""
+        now = datetime.utcnow()
+        vaccination_id = _new_id()
+        self._vaccinations[vaccination_id] = {
+            "user_id": user_id,
+            "name": name,
+            "due_date": due_date,
+            "status": status,
+            "last_date": last_date,
+            "notes": notes,
+            "required": required,
+            "pet_name": pet_name,
+            "created_at": now,
+            "updated_at": now
+        }
+        return vaccination_id
+
+    async def get_user_vaccinations(self, user_id: str, limit: int = 100,
+                                    status: Optional[str] = None) -> List[Dict]:
+        """Get all vaccinations for a user"""
+        matches = [
+            (vaccination_id, document) for vaccination_id, document in self._vaccinations.items()
+            if document['user_id'] == user_id and (status is None or document['status'] == status)
+        ]
+        matches.sort(key=lambda item: item[1]['due_date'])
+        return [self._to_response(*item) for item in matches[:limit]]
+
+    async def get_vaccination_by_id(self, vaccination_id: str, user_id: str) -> Optional[Dict]:
+        """Get a specific vaccination by ID (with user ownership check)"""
+        document = self._vaccinations.get(vaccination_id)
+        if not document or document['user_id'] != user_id:
+            return None
+        return self._to_response(vaccination_id, document)
+
+    async def update_vaccination(self, vaccination_id: str, user_id: str, update_data: Dict) -> bool:
+        """Update a vaccination record"""
+        document = self._vaccinations.get(vaccination_id)
+        if not document or document['user_id'] != user_id:
+            return False
+        document.update(update_data)
+        document['updated_at'] = datetime.utcnow()
+        return True
+
+    async def delete_vaccination(self, vaccination_id: str, user_id: str) -> bool:
+        """Delete a vaccination record"""
+        document = self._vaccinations.get(vaccination_id)
+        if not document or document['user_id'] != user_id:
+            return False
+        del self._vaccinations[vaccination_id]
+        return True
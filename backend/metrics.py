@@ -0,0 +1,140 @@
+"""
+Metrics Module
+Lightweight in-process counters and latency histograms, exposed through /metrics
+"""
+
+import threading
+from typing import Callable, Dict, Optional
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram (milliseconds)"""
+
+    BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(self.BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, value_ms: float):
+        """Record a single observation"""
+        index = len(self.BUCKETS_MS)
+        for i, bound in enumerate(self.BUCKETS_MS):
+            if value_ms <= bound:
+                index = i
+                break
+
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.total_ms += value_ms
+            if value_ms > self.max_ms:
+                self.max_ms = value_ms
+
+    def percentile(self, q: float) -> float:
+        """Estimate a percentile from the bucket upper bounds"""
+        with self._lock:
+            if self.count == 0:
+                return 0.0
+
+            target = q * self.count
+            running = 0
+            for i, bucket_count in enumerate(self._counts):
+                running += bucket_count
+                if running >= target:
+                    if i < len(self.BUCKETS_MS):
+                        return min(float(self.BUCKETS_MS[i]), self.max_ms)
+                    return self.max_ms
+            return self.max_ms
+
+    def snapshot(self) -> Dict:
+        """Get a JSON-serializable view of the histogram"""
+        with self._lock:
+            count = self.count
+            total_ms = self.total_ms
+            max_ms = self.max_ms
+            buckets = {
+                (f"le_{bound}" if i < len(self.BUCKETS_MS) else "le_inf"): bucket_count
+                for i, (bound, bucket_count) in enumerate(
+                    zip(list(self.BUCKETS_MS) + [None], self._counts)
+                )
+            }
+
+        return {
+            "count": count,
+            "avg_ms": round(total_ms / count, 3) if count else 0.0,
+            "max_ms": round(max_ms, 3),
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "buckets": buckets
+        }
+
+
+class MetricsRegistry:
+    """Process-wide registry of counters, histograms and component collectors"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._collectors: Dict[str, Callable[[], Dict]] = {}
+
+    def inc(self, name: str, amount: float = 1):
+        """Increment a counter"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def get_counter(self, name: str) -> float:
+        """Get the current value of a counter"""
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def histogram(self, name: str) -> LatencyHistogram:
+        """Get (or create) a named latency histogram"""
+        with self._lock:
+            hist = self._histograms.get(name)
+            if hist is None:
+                hist = LatencyHistogram()
+                self._histograms[name] = hist
+            return hist
+
+    def observe(self, name: str, value_ms: float):
+        """Record a latency observation on a named histogram"""
+        self.histogram(name).observe(value_ms)
+
+    def register_collector(self, name: str, collector: Callable[[], Dict]):
+        """Register a callable that reports a component's own stats"""
+        with self._lock:
+            self._collectors[name] = collector
+
+    def snapshot(self, name: Optional[str] = None) -> Dict:
+        """Get all metrics (or a single collector's metrics)"""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = dict(self._histograms)
+            collectors = dict(self._collectors)
+
+        if name is not None:
+            collector = collectors.get(name)
+            return collector() if collector else {}
+
+        result = {
+            "counters": counters,
+            "histograms": {key: hist.snapshot() for key, hist in histograms.items()}
+        }
+
+        for key, collector in collectors.items():
+            try:
+                result[key] = collector()
+            except Exception as e:
+                result[key] = {"error": str(e)}
+
+        return result
+
+
+# Global instance
+metrics = MetricsRegistry()
@@ -0,0 +1,142 @@
+"""
+Local Token Minting Tool
+Creates a local RS256 signing key + JWKS file and mints Clerk-shaped session tokens,
+so protected endpoints can be exercised and load-tested with no network access.
+
+Usage:
+    python mint_tokens.py keys                      # writes .local_auth/private_key.pem + jwks.json
+    python mint_tokens.py mint --sub user_1         # prints a token
+    python mint_tokens.py mint --count 100 > tokens.txt
+
+Then start the API with:
+    AUTH_JWKS_FILE=.local_auth/jwks.json uvicorn main:app
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from typing import Optional, Tuple
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt.algorithms import RSAAlgorithm
+
+LOCAL_AUTH_DIR = os.getenv("LOCAL_AUTH_DIR", ".local_auth")
+PRIVATE_KEY_FILE = "private_key.pem"
+JWKS_FILE = "jwks.json"
+
+
+def build_jwks(private_key, kid: str) -> dict:
+    """Build a JWKS document containing the public half of private_key"""
+    public_jwk = json.loads(RSAAlgorithm.to_jwk(private_key.public_key()))
+    public_jwk.update({"kid": kid, "alg": "RS256", "use": "sig"})
+    return {"keys": [public_jwk]}
+
+
+def generate_signing_key(kid: Optional[str] = None) -> Tuple[object, str]:
+    """Generate an in-memory RSA key pair and kid"""
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    return private_key, kid or f"local-{uuid.uuid4().hex[:12]}"
+
+
+def create_local_keys(key_dir: str = LOCAL_AUTH_DIR, kid: Optional[str] = None) -> str:
+    """Write a new private key and matching JWKS file; returns the JWKS path"""
+    private_key, kid = generate_signing_key(kid)
+    os.makedirs(key_dir, exist_ok=True)
+
+    pem = private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption()
+    )
+    private_path = os.path.join(key_dir, PRIVATE_KEY_FILE)
+    with open(private_path, 'wb') as f:
+        f.write(pem)
+    os.chmod(private_path, 0o600)
+
+    jwks_path = os.path.join(key_dir, JWKS_FILE)
+    with open(jwks_path, 'w', encoding='utf-8') as f:
+        json.dump(build_jwks(private_key, kid), f, indent=2)
+
+    return jwks_path
+
+
+def load_local_signer(key_dir: str = LOCAL_AUTH_DIR) -> Tuple[object, str]:
+    """Load the private key and kid written by create_local_keys"""
+    with open(os.path.join(key_dir, PRIVATE_KEY_FILE), 'rb') as f:
+        private_key = serialization.load_pem_private_key(f.read(), password=None)
+
+    with open(os.path.join(key_dir, JWKS_FILE), 'r', encoding='utf-8') as f:
+        kid = json.load(f)["keys"][0]["kid"]
+
+    return private_key, kid
+
+
+def mint_token(
+    private_key,
+    kid: str,
+    sub: str = "user_local_test",
+    email: Optional[str] = None,
+    name: Optional[str] = None,
+    lifetime: int = 3600,
+    email_verified: bool = True
+) -> str:
+    """Mint an RS256 token with the claims the auth module reads"""
+    now = int(time.time())
+    claims = {
+        "sub": sub,
+        "email": email or f"{sub}@example.com",
+        "name": name or sub,
+        "email_verified": email_verified,
+        "iat": now,
+        "nbf": now,
+        "exp": now + lifetime
+    }
+    return jwt.encode(claims, private_key, algorithm="RS256", headers={"kid": kid})
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Mint local RS256 tokens for offline testing")
+    parser.add_argument("--dir", default=LOCAL_AUTH_DIR, help="Key directory")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    keys_parser = subparsers.add_parser("keys", help="Generate a signing key and JWKS file")
+    keys_parser.add_argument("--kid", default=None, help="Key ID (random if omitted)")
+
+    mint_parser = subparsers.add_parser("mint", help="Mint one or more tokens")
+    mint_parser.add_argument("--sub", default="user_local_test", help="User ID (sub claim)")
+    mint_parser.add_argument("--email", default=None)
+    mint_parser.add_argument("--name", default=None)
+    mint_parser.add_argument("--ttl", type=int, default=3600, help="Lifetime in seconds")
+    mint_parser.add_argument("--count", type=int, default=1,
+                             help="Number of tokens; >1 mints one per user <sub>_<n>")
+
+    args = parser.parse_args()
+
+    if args.command == "keys":
+        jwks_path = create_local_keys(args.dir, args.kid)
+        print(f"✅ Signing key written to {os.path.join(args.dir, PRIVATE_KEY_FILE)}", file=sys.stderr)
+        print(f"✅ JWKS written to {jwks_path}", file=sys.stderr)
+        print(f"   Start the API with AUTH_JWKS_FILE={jwks_path}", file=sys.stderr)
+        return 0
+
+    try:
+        private_key, kid = load_local_signer(args.dir)
+    except FileNotFoundError:
+        print(f"❌ No local key in {args.dir}. Run: python mint_tokens.py keys", file=sys.stderr)
+        return 1
+
+    for i in range(args.count):
+        sub = args.sub if args.count == 1 else f"{args.sub}_{i}"
+        print(mint_token(private_key, kid, sub=sub, email=args.email, name=args.name, lifetime=args.ttl))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
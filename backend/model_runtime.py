@@ -0,0 +1,587 @@
+"""
+Model Runtime
+Loads the breed classifier and runs inference without importing TensorFlow
+at module import time.
+
+Runtimes (MODEL_RUNTIME):
+- "keras":  TensorFlow/Keras model at MODEL_PATH (TensorFlow imported on load)
+- "tflite": converted model at TFLITE_MODEL_PATH (see convert_model.py), run
+            with ai-edge-litert / tflite-runtime when installed, else tf.lite
+- "auto":   (default) TFLite when the converted model exists and a lightweight
+            interpreter is installed, otherwise Keras
+- "remote": the inference server process at INFERENCE_SERVER (see
+            inference_server.py); chosen automatically when that is set
+
+Threading (read when the model loads; see benchmark_threads.py to pick values):
+- MODEL_THREADS / MODEL_INTRA_OP_THREADS: threads one op may use (0 = one per
+  core); gunicorn.conf.py divides the cores between workers this way
+- MODEL_INTER_OP_THREADS: ops run concurrently (default 1 when threads are capped)
+- MODEL_CPU_AFFINITY: CPUs for the inference thread pools, e.g. "0-3" or "0,2";
+  only the threads the runtime starts are pinned, not the event loop
+- MODEL_ONEDNN: "on" / "off" sets TF_ENABLE_ONEDNN_OPTS before TensorFlow is
+  imported ("auto" leaves TensorFlow's default)
+
+After loading, warmup() pushes synthetic images through decoding, the model
+(at every WARMUP_BATCH_SIZES batch size, by default the scheduler's batch
+sizes) and the caller's response builder, so graph tracing and buffer
+allocation happen before the first real request.
+
+predict_async() batches concurrent requests for in-process models through an
+AdaptiveBatchScheduler (batch_scheduler.py) seeded with the warmup timings;
+the remote runtime is batched by the inference server instead.
+
+Test-time augmentation: predict_tta() decodes an upload once, builds the
+PREDICT_TTA_VIEWS views (the whole image, its mirror, and center / corner
+crops covering PREDICT_TTA_CROP of each side) and averages the model's
+probabilities over them. The views are submitted together, so they run as
+one batch rather than K forward passes (see benchmark_tta.py).
+
+Embeddings: models also return their penultimate layer (the input of the
+classifier head) when they have one. forward() returns each row as
+[probabilities | embedding], so the scheduler and the inference server's
+slots carry both; predict_embed_async() splits them again (see
+similarity_index.py for what they are used for).
+"""
+
+import asyncio
+import io
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from PIL import Image
+
+from batch_scheduler import LANE_ANONYMOUS, PREDICT_MAX_BATCH, AdaptiveBatchScheduler, LatencyModel, batch_buckets
+from startup_profile import startup_profile
+
+MODEL_PATH = os.getenv("MODEL_PATH", "models/best_phaseB.keras")
+TFLITE_MODEL_PATH = os.getenv("TFLITE_MODEL_PATH", "models/best_phaseB.tflite")
+MODEL_RUNTIME = os.getenv("MODEL_RUNTIME", "auto").lower()
+MODEL_THREADS = int(os.getenv("MODEL_THREADS", "0"))
+MODEL_INTRA_OP_THREADS = int(os.getenv("MODEL_INTRA_OP_THREADS", str(MODEL_THREADS)))
+MODEL_INTER_OP_THREADS = int(os.getenv("MODEL_INTER_OP_THREADS", "1" if MODEL_INTRA_OP_THREADS else "0"))
+MODEL_CPU_AFFINITY = os.getenv("MODEL_CPU_AFFINITY", "")
+MODEL_ONEDNN = os.getenv("MODEL_ONEDNN", "auto").lower()
+# Unix socket of a shared inference server; empty to run the model in this process
+INFERENCE_SERVER = os.getenv("INFERENCE_SERVER", "")
+IMAGE_SIZE = (224, 224)
+# Batch sizes to trace during warmup ("" skips warmup), and passes per size
+WARMUP_BATCH_SIZES = [
+    int(size) for size in os.getenv("WARMUP_BATCH_SIZES", ",".join(map(str, batch_buckets(PREDICT_MAX_BATCH)))).split(",")
+    if size.strip()
+]
+WARMUP_ROUNDS = int(os.getenv("WARMUP_ROUNDS", "2"))
+# Test-time augmentation views ("<crop>" or "<crop>_flip"; "flip" mirrors the whole image)
+PREDICT_TTA_VIEWS = [
+    view.strip() for view in os.getenv(
+        "PREDICT_TTA_VIEWS", "full,flip,center,center_flip,top_left,top_right,bottom_left,bottom_right"
+    ).split(",") if view.strip()
+]
+PREDICT_TTA_CROP = float(os.getenv("PREDICT_TTA_CROP", "0.875"))
+# /predict reruns with augmentation when top-1 confidence is below this (0 = only on ?tta=true)
+PREDICT_TTA_THRESHOLD = float(os.getenv("PREDICT_TTA_THRESHOLD", "0.5"))
+
+
+def preprocess_input(img_array: np.ndarray) -> np.ndarray:
+    """NumPy equivalent of keras.applications.efficientnet_v2.preprocess_input
+
+    EfficientNetV2 models rescale inside the network (include_preprocessing),
+    so Keras' preprocess_input is a pass-through: raw 0-255 float32 pixels.
+    """
+    return np.asarray(img_array, dtype=np.float32)
+
+
+def _decode(image_bytes: bytes) -> Image.Image:
+    img = Image.open(io.BytesIO(image_bytes))
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    return img
+
+
+def decode_image(image_bytes: bytes) -> Image.Image:
+    """Decode an upload to RGB (for stages that need the image itself, e.g. dog_detector.py)"""
+    try:
+        img = _decode(image_bytes)
+        img.load()
+        return img
+    except Exception as e:
+        raise ValueError(f"Image preprocessing failed: {str(e)}")
+
+
+def preprocess_image(image_bytes: bytes) -> np.ndarray:
+    """Decode an upload into a (1, 224, 224, 3) float32 batch"""
+    try:
+        img = _decode(image_bytes).resize(IMAGE_SIZE)
+        img_array = preprocess_input(np.asarray(img))
+        return np.expand_dims(img_array, axis=0)
+    except Exception as e:
+        raise ValueError(f"Image preprocessing failed: {str(e)}")
+
+
+def preprocess_views(image_bytes: bytes, views: List[str] = PREDICT_TTA_VIEWS,
+                     crop: float = PREDICT_TTA_CROP) -> np.ndarray:
+    """Decode an upload once into a (len(views), 224, 224, 3) batch of augmented views
+
+    "full" matches preprocess_image; crops are resized straight from the
+    decoded image (no intermediate copy) and each crop is resized once even
+    when its mirror is also requested.
+    """
+    try:
+        img = _decode(image_bytes)
+        width, height = img.size
+        crop_w, crop_h = width * crop, height * crop
+        boxes = {
+            "full": (0, 0, width, height),
+            "center": ((width - crop_w) / 2, (height - crop_h) / 2, (width + crop_w) / 2, (height + crop_h) / 2),
+            "top_left": (0, 0, crop_w, crop_h),
+            "top_right": (width - crop_w, 0, width, crop_h),
+            "bottom_left": (0, height - crop_h, crop_w, height),
+            "bottom_right": (width - crop_w, height - crop_h, width, height)
+        }
+
+        batch = np.empty((len(views), IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=np.float32)
+        resized = {}
+        for i, view in enumerate(views):
+            name, flip = ("full", True) if view == "flip" else (view.removesuffix("_flip"), view.endswith("_flip"))
+            if name not in resized:
+                resized[name] = np.asarray(img.resize(IMAGE_SIZE, box=boxes[name]))
+            batch[i] = resized[name][:, ::-1] if flip else resized[name]
+        return preprocess_input(batch)
+    except KeyError as e:
+        raise ValueError(f"Unknown augmentation view: {e}")
+    except Exception as e:
+        raise ValueError(f"Image preprocessing failed: {str(e)}")
+
+
+def preprocess_crops(img: Image.Image, boxes: List[Tuple[int, int, int, int]]) -> np.ndarray:
+    """A (len(boxes), 224, 224, 3) batch of regions (left, top, right, bottom) of a decoded image"""
+    batch = np.empty((len(boxes), IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=np.float32)
+    for i, box in enumerate(boxes):
+        batch[i] = np.asarray(img.resize(IMAGE_SIZE, box=tuple(box[:4])))
+    return preprocess_input(batch)
+
+
+def synthetic_image(size=(320, 240), seed: int = 0) -> bytes:
+    """A random-noise JPEG, decoded like a real upload during warmup"""
+    pixels = np.random.default_rng(seed).integers(0, 256, (size[1], size[0], 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def parse_cpu_list(value: str) -> Set[int]:
+    """CPU list in taskset/cpuset form ("0-3,6") to a set of CPU ids"""
+    cpus = set()
+    for part in value.replace(" ", "").split(","):
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-")
+            cpus.update(range(int(first), int(last) + 1))
+        else:
+            cpus.add(int(part))
+    return cpus
+
+
+class ThreadingConfig:
+    """How the inference runtime may use the CPU"""
+
+    def __init__(self, intra_op: int = MODEL_INTRA_OP_THREADS, inter_op: int = MODEL_INTER_OP_THREADS,
+                 cpu_affinity: str = MODEL_CPU_AFFINITY, onednn: str = MODEL_ONEDNN):
+        self.intra_op = intra_op
+        self.inter_op = inter_op
+        self.cpu_affinity = parse_cpu_list(cpu_affinity) if isinstance(cpu_affinity, str) else set(cpu_affinity)
+        self.onednn = onednn
+
+    def apply_onednn(self):
+        """Set TF_ENABLE_ONEDNN_OPTS (must happen before TensorFlow is imported)"""
+        if self.onednn not in ("on", "off"):
+            return
+        if "tensorflow" in sys.modules:
+            print(f"⚠️  MODEL_ONEDNN={self.onednn} ignored: TensorFlow is already imported")
+            return
+        os.environ["TF_ENABLE_ONEDNN_OPTS"] = "1" if self.onednn == "on" else "0"
+
+    def configure_tensorflow(self, tf):
+        """Size TensorFlow's op thread pools (only possible before its runtime starts)"""
+        try:
+            if self.intra_op > 0:
+                tf.config.threading.set_intra_op_parallelism_threads(self.intra_op)
+            if self.inter_op > 0:
+                tf.config.threading.set_inter_op_parallelism_threads(self.inter_op)
+        except RuntimeError as e:
+            print(f"⚠️  TensorFlow threads already configured: {e}")
+
+    @contextmanager
+    def pinned(self):
+        """Pin the calling thread while the runtime starts, so the thread pools it
+        creates inherit the affinity; the calling thread is restored afterwards"""
+        if not self.cpu_affinity or not hasattr(os, "sched_setaffinity"):
+            yield
+            return
+        previous = os.sched_getaffinity(0)
+        try:
+            os.sched_setaffinity(0, self.cpu_affinity)
+        except OSError as e:
+            print(f"⚠️  CPU affinity {sorted(self.cpu_affinity)} not applied: {e}")
+            yield
+            return
+        try:
+            yield
+        finally:
+            os.sched_setaffinity(0, previous)
+
+    def as_dict(self) -> Dict:
+        return {
+            "intra_op_threads": self.intra_op,
+            "inter_op_threads": self.inter_op,
+            "cpu_affinity": sorted(self.cpu_affinity),
+            "onednn": self.onednn
+        }
+
+
+def _lightweight_interpreter():
+    """The TFLite Interpreter class from a package lighter than TensorFlow (or None)"""
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    try:
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        return None
+
+
+def with_embedding_output(tf, model):
+    """(model with a second output: the classifier head's input, embedding width)
+
+    Falls back to (model, 0) when the head does not take a single tensor.
+    """
+    try:
+        embedding = model.layers[-1].input
+        if isinstance(embedding, (list, tuple, dict)):
+            raise ValueError("the classifier head has several inputs")
+        return tf.keras.Model(model.inputs, [model.outputs[0], embedding]), int(embedding.shape[-1])
+    except Exception as e:
+        print(f"⚠️  Model does not expose an embedding: {e}")
+        return model, 0
+
+
+class KerasModel:
+    """Keras model loaded through TensorFlow"""
+
+    name = "keras"
+
+    def __init__(self, path: str, threading_config: ThreadingConfig):
+        threading_config.apply_onednn()
+        with startup_profile.phase("tensorflow_import"):
+            import tensorflow as tf
+        threading_config.configure_tensorflow(tf)
+        with startup_profile.phase("model_load"):
+            self._model, self.embedding_dim = with_embedding_output(tf, tf.keras.models.load_model(path))
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self.predict_with_embeddings(batch)[0]
+
+    def predict_with_embeddings(self, batch: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        # predict_on_batch skips the per-call dataset/callback setup of predict()
+        outputs = self._model.predict_on_batch(batch)
+        if not self.embedding_dim:
+            return np.asarray(outputs), None
+        return np.asarray(outputs[0]), np.asarray(outputs[1])
+
+
+class TFLiteModel:
+    """Converted model run with a TFLite interpreter"""
+
+    name = "tflite"
+
+    def __init__(self, path: str, threading_config: ThreadingConfig):
+        with startup_profile.phase("tflite_import"):
+            interpreter_class = _lightweight_interpreter()
+            if interpreter_class is None:
+                threading_config.apply_onednn()
+                import tensorflow as tf
+                interpreter_class = tf.lite.Interpreter
+        with startup_profile.phase("model_load"):
+            # The file is memory-mapped, so every process serving it shares the weights
+            self._interpreter = interpreter_class(model_path=path, num_threads=threading_config.intra_op or None)
+            self._interpreter.allocate_tensors()
+        self._input = self._interpreter.get_input_details()[0]
+        # convert_model.py exports (probabilities, embedding); the embedding is the wider output
+        outputs = sorted(self._interpreter.get_output_details(), key=lambda detail: detail["shape"][-1])
+        self._output = outputs[0]
+        self._embedding = outputs[-1] if len(outputs) > 1 else None
+        self.embedding_dim = int(self._embedding["shape"][-1]) if self._embedding else 0
+        self._batch_size = int(self._input["shape"][0])
+        # The interpreter is not thread-safe
+        self._lock = threading.Lock()
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self.predict_with_embeddings(batch)[0]
+
+    def predict_with_embeddings(self, batch: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        with self._lock:
+            if batch.shape[0] != self._batch_size:
+                self._interpreter.resize_tensor_input(self._input["index"], list(batch.shape))
+                self._interpreter.allocate_tensors()
+                self._batch_size = batch.shape[0]
+            self._interpreter.set_tensor(self._input["index"], batch.astype(self._input["dtype"], copy=False))
+            self._interpreter.invoke()
+            probabilities = np.array(self._interpreter.get_tensor(self._output["index"]))
+            if self._embedding is None:
+                return probabilities, None
+            return probabilities, np.array(self._interpreter.get_tensor(self._embedding["index"]))
+
+
+class ModelRuntime:
+    """Owns the loaded model; load() is safe to call from a worker thread"""
+
+    def __init__(self, model_path: str = MODEL_PATH, tflite_path: str = TFLITE_MODEL_PATH,
+                 runtime: str = MODEL_RUNTIME, server: str = INFERENCE_SERVER):
+        self.model_path = model_path
+        self.tflite_path = tflite_path
+        self.runtime = runtime
+        self.server = server
+        self.threading = ThreadingConfig()
+        self._model = None
+        self._lock = threading.Lock()
+        self.load_ms: Optional[float] = None
+        self.error: Optional[str] = None
+
+        self.warmed = False
+        self.warmup_ms: Optional[float] = None
+        self.warmup_batches: Dict[int, List[float]] = {}
+        # Forward-pass time per batch size from the last warmup round (seeds the scheduler)
+        self.warmup_predict_ms: Dict[int, float] = {}
+        self.scheduler: Optional[AdaptiveBatchScheduler] = None
+        self.first_request_ms: Optional[float] = None
+        self.tta_requests = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def ready(self) -> bool:
+        """Loaded and warmed up: safe to route traffic here"""
+        return self.loaded and self.warmed
+
+    @property
+    def embedding_dim(self) -> int:
+        """Width of the embedding the loaded model returns (0 = none)"""
+        return int(getattr(self._model, "embedding_dim", 0) or 0)
+
+    @property
+    def runtime_name(self) -> Optional[str]:
+        return self._model.name if self._model else None
+
+    def _select(self) -> Optional[str]:
+        """Pick the runtime to load, or None when no model file is available"""
+        if self.server and self.runtime in ("auto", "remote"):
+            return "remote"
+
+        has_tflite = os.path.exists(self.tflite_path)
+        has_keras = os.path.exists(self.model_path)
+
+        if self.runtime == "tflite":
+            return "tflite" if has_tflite else None
+        if self.runtime == "keras":
+            return "keras" if has_keras else None
+        if has_tflite and (not has_keras or _lightweight_interpreter() is not None):
+            return "tflite"
+        return "keras" if has_keras else None
+
+    def preload(self):
+        """Import the inference library without starting it (gunicorn master, before fork)
+
+        TensorFlow's runtime is not fork-safe once it has started (its thread
+        pools do not survive fork), so the model itself is loaded per worker.
+        """
+        runtime = self._select()
+        with startup_profile.phase("preload_runtime"):
+            if runtime == "keras" or (runtime == "tflite" and _lightweight_interpreter() is None):
+                self.threading.apply_onednn()
+                import tensorflow  # noqa: F401
+
+    def load(self) -> bool:
+        """Load the model (blocking; run it off the event loop)"""
+        with self._lock:
+            if self._model is not None:
+                return True
+
+            started = time.perf_counter()
+            runtime = self._select()
+            if runtime is None:
+                self.error = f"Model file not found: {self.model_path}"
+                print(f"✗ {self.error}")
+                return False
+
+            try:
+                if runtime == "remote":
+                    from inference_server import RemoteModel
+                    self._model = RemoteModel(self.server)
+                else:
+                    with self.threading.pinned():
+                        if runtime == "tflite":
+                            self._model = TFLiteModel(self.tflite_path, self.threading)
+                        else:
+                            self._model = KerasModel(self.model_path, self.threading)
+            except Exception as e:
+                self.error = str(e)
+                print(f"✗ Error loading model: {e}")
+                return False
+
+            self.load_ms = round((time.perf_counter() - started) * 1000, 1)
+            self.error = None
+            path = {"remote": self.server, "tflite": self.tflite_path}.get(runtime, self.model_path)
+            print(f"✓ Model loaded successfully from {path} ({runtime}, {self.load_ms} ms)")
+            return True
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        """Class probabilities for a preprocessed batch"""
+        if self._model is None:
+            raise RuntimeError("Model not loaded")
+        return self._model.predict(batch)
+
+    def forward(self, batch: np.ndarray) -> np.ndarray:
+        """Rows of [probabilities | embedding] (just probabilities without an embedding)"""
+        if self._model is None:
+            raise RuntimeError("Model not loaded")
+        if not self.embedding_dim:
+            return self._model.predict(batch)
+        probabilities, embeddings = self._model.predict_with_embeddings(batch)
+        return np.concatenate([probabilities, embeddings], axis=1)
+
+    def latency_model(self) -> LatencyModel:
+        """A latency model seeded with the forward-pass times measured during warmup"""
+        model = LatencyModel()
+        for batch_size, elapsed_ms in self.warmup_predict_ms.items():
+            model.observe(batch_size, elapsed_ms)
+        return model
+
+    async def predict_async(self, batch: np.ndarray, lane: str = LANE_ANONYMOUS,
+                            user: Optional[str] = None) -> np.ndarray:
+        """Class probabilities from an event loop, batched with concurrent requests
+
+        `lane` is the scheduler priority lane and `user` the key for the
+        per-user quota. Raises batch_scheduler.OverloadedError when the
+        request is shed (QuotaExceededError when over the user's quota).
+        """
+        return (await self.predict_embed_async(batch, lane, user))[0]
+
+    async def predict_embed_async(self, batch: np.ndarray, lane: str = LANE_ANONYMOUS,
+                                  user: Optional[str] = None) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """(probabilities, embeddings) from an event loop; embeddings are None without an embedding"""
+        if self._model is None:
+            raise RuntimeError("Model not loaded")
+        if hasattr(self._model, "predict_async"):
+            rows = await self._model.predict_async(batch, lane, user)
+        else:
+            if self.scheduler is None:
+                self.scheduler = AdaptiveBatchScheduler(self.forward, latency_model=self.latency_model())
+            rows = await self.scheduler.submit_many(batch, lane, user)
+        if not self.embedding_dim:
+            return rows, None
+        return rows[:, :-self.embedding_dim], rows[:, -self.embedding_dim:]
+
+    async def predict_tta(self, image_bytes: bytes, base: Optional[np.ndarray] = None,
+                          lane: str = LANE_ANONYMOUS, user: Optional[str] = None,
+                          views: Optional[List[str]] = None) -> np.ndarray:
+        """Class probabilities for one upload, averaged over augmented views
+
+        The views are submitted together, so they share a batch. `base` is the
+        already-computed probabilities of the plain ("full") view, which is
+        then averaged in instead of being run again.
+        """
+        views = list(views or PREDICT_TTA_VIEWS)
+        reuse = base is not None and "full" in views
+        if reuse:
+            views.remove("full")
+
+        batch = await asyncio.to_thread(preprocess_views, image_bytes, views)
+        probabilities = await self.predict_async(batch, lane, user)
+        if reuse:
+            probabilities = np.concatenate([np.asarray(base)[None], probabilities])
+        self.tta_requests += 1
+        return probabilities.mean(axis=0)
+
+    async def close(self):
+        """Stop the scheduler and release the model's connections (remote runtime)"""
+        if self.scheduler is not None:
+            await self.scheduler.close()
+            # Its queue and events belong to this event loop; a later loop gets a new one
+            self.scheduler = None
+        if self._model is not None and hasattr(self._model, "close"):
+            self._model.close()
+
+    def warmup(self, batch_sizes: List[int] = WARMUP_BATCH_SIZES,
+               build_response: Optional[Callable[[np.ndarray], object]] = None,
+               rounds: int = WARMUP_ROUNDS) -> bool:
+        """Run synthetic batches through decode -> predict -> response building (blocking)"""
+        if not self.loaded:
+            return False
+
+        started = time.perf_counter()
+        try:
+            image = preprocess_image(synthetic_image())
+            for batch_size in batch_sizes:
+                batch = np.repeat(image, batch_size, axis=0)
+                timings = []
+                for _ in range(rounds):
+                    batch_started = time.perf_counter()
+                    probabilities = self.predict(batch)
+                    self.warmup_predict_ms[batch_size] = (time.perf_counter() - batch_started) * 1000
+                    if build_response:
+                        for row in probabilities:
+                            build_response(row)
+                    timings.append(round((time.perf_counter() - batch_started) * 1000, 1))
+                self.warmup_batches[batch_size] = timings
+        except Exception as e:
+            self.error = f"Warmup failed: {e}"
+            print(f"✗ {self.error}")
+            return False
+
+        self.warmup_ms = round((time.perf_counter() - started) * 1000, 1)
+        self.warmed = True
+        summary = ", ".join(f"batch {size}: {' -> '.join(map(str, ms))} ms"
+                            for size, ms in self.warmup_batches.items())
+        print(f"✓ Model warmed up in {self.warmup_ms} ms ({summary or 'skipped'})")
+        return True
+
+    def record_request(self, latency_ms: float):
+        """Keep the latency of the first real prediction (the cold-start cost warmup should absorb)"""
+        if self.first_request_ms is None:
+            self.first_request_ms = round(latency_ms, 1)
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self.loaded,
+            "warmed": self.warmed,
+            "runtime": self.runtime_name,
+            "embedding_dim": self.embedding_dim,
+            "configured_runtime": self.runtime,
+            "load_ms": self.load_ms,
+            "warmup_ms": self.warmup_ms,
+            "warmup_batches": {str(size): ms for size, ms in self.warmup_batches.items()},
+            "first_request_ms": self.first_request_ms,
+            "threading": self.threading.as_dict(),
+            "scheduler": self.scheduler.stats() if self.scheduler else None,
+            "tta": {
+                "views": PREDICT_TTA_VIEWS,
+                "threshold": PREDICT_TTA_THRESHOLD,
+                "requests": self.tta_requests
+            },
+            "remote": self._model.stats() if hasattr(self._model, "stats") else None,
+            "error": self.error
+        }
+
+
+# Global instance
+model_runtime = ModelRuntime()
@@ -0,0 +1,54 @@
+"""
+Pagination Helpers
+Opaque keyset cursors for history listings. A cursor encodes the
+(timestamp, id) of the last item on a page, so the next page starts right
+after it without re-reading earlier documents.
+"""
+
+import base64
+import json
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+HISTORY_DEFAULT_LIMIT = 20
+HISTORY_MAX_LIMIT = 100
+# Fields returned by the history list view (full documents via the detail fetch)
+HISTORY_LIST_FIELDS = ["breed", "confidence", "thumbnail_url", "timestamp"]
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a client sends a cursor that cannot be decoded"""
+
+
+def clamp_limit(limit: int) -> int:
+    """Keep page sizes within bounds"""
+    return max(1, min(limit, HISTORY_MAX_LIMIT))
+
+
+def _as_utc(timestamp: datetime) -> datetime:
+    # Stored timestamps are naive UTC in Mongo and aware UTC in Firestore
+    if timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.astimezone(timezone.utc)
+
+
+def encode_cursor(timestamp: datetime, item_id: str) -> str:
+    """Build an opaque cursor from the last item of a page"""
+    payload = json.dumps({"t": _as_utc(timestamp).isoformat(), "i": item_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, str]]:
+    """Turn a cursor back into (aware UTC timestamp, id); None for the first page"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        timestamp, item_id = datetime.fromisoformat(payload["t"]), payload["i"]
+        if not isinstance(item_id, str):
+            raise TypeError("cursor id must be a string")
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}") from e
+    # Hand-edited cursors may carry a naive or non-UTC timestamp
+    return _as_utc(timestamp), item_id
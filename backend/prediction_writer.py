@@ -0,0 +1,300 @@
+"""
+Prediction Write-Behind Buffer
+Accumulates prediction records and persists them in batches (Firestore batched
+writes / Mongo insert_many) on size or time thresholds. Records are appended to a
+local spool file first so they survive a crash and are replayed on startup.
+
+Each worker process spools to its own file (PREDICTION_SPOOL_PATH.<pid>) and
+holds an exclusive lock on it while alive. On startup a worker adopts the
+spools whose lock it can take (their process is gone), so several gunicorn
+workers never append to, compact or replay the same file.
+"""
+
+import asyncio
+import glob
+import json
+import os
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from metrics import metrics
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory locks (Windows): only this process's own spool is replayed
+    fcntl = None
+
+PREDICTION_FLUSH_SIZE = int(os.getenv("PREDICTION_FLUSH_SIZE", "50"))
+PREDICTION_FLUSH_INTERVAL = float(os.getenv("PREDICTION_FLUSH_INTERVAL", "2"))  # seconds
+PREDICTION_SPOOL_PATH = os.getenv("PREDICTION_SPOOL_PATH", "prediction_spool.jsonl")
+# fsync every record to also survive host (not just process) crashes
+PREDICTION_SPOOL_FSYNC = os.getenv("PREDICTION_SPOOL_FSYNC", "false").lower() == "true"
+
+
+class PredictionWriteBuffer:
+    """Write-behind buffer with a durable JSONL spool"""
+
+    def __init__(
+        self,
+        save_batch: Callable[[List[Dict]], Awaitable[bool]],
+        new_id: Callable[[], str],
+        flush_size: int = PREDICTION_FLUSH_SIZE,
+        flush_interval: float = PREDICTION_FLUSH_INTERVAL,
+        spool_path: Optional[str] = PREDICTION_SPOOL_PATH,
+        fsync: bool = PREDICTION_SPOOL_FSYNC,
+        on_flushed: Optional[Callable[[List[Dict]], Awaitable[None]]] = None
+    ):
+        self._save_batch = save_batch
+        self._new_id = new_id
+        # Called with each batch once it is persisted (e.g. cache invalidation)
+        self._on_flushed = on_flushed
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.spool_path = spool_path
+        self.fsync = fsync
+
+        self._buffer: List[Dict] = []
+        self._lock = threading.Lock()
+        self._spool = None
+        self._wake: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.enqueued = 0
+        self.flushed = 0
+        self.batches = 0
+        self.failures = 0
+        self.recovered = 0
+
+    # ---------- spool ----------
+
+    @property
+    def own_spool_path(self) -> Optional[str]:
+        """This process's spool file"""
+        return f"{self.spool_path}.{os.getpid()}" if self.spool_path else None
+
+    @staticmethod
+    def _try_lock(f) -> bool:
+        """Take the exclusive lock on an open spool; False while its owner is alive"""
+        if fcntl is None:
+            return True
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def _open_spool(self):
+        if self.spool_path and self._spool is None:
+            self._spool = open(self.own_spool_path, 'a', encoding='utf-8')
+            self._try_lock(self._spool)
+
+    def _append_to_spool(self, record: Dict):
+        if self._spool is None:
+            return
+        self._spool.write(json.dumps(record) + "\n")
+        self._spool.flush()
+        if self.fsync:
+            os.fsync(self._spool.fileno())
+
+    def _compact_spool(self):
+        """Rewrite the spool with only the records still waiting to be persisted"""
+        if not self.spool_path:
+            return
+        with self._lock:
+            path = self.own_spool_path
+            # Locked before it takes the spool's name, so no other worker can adopt it
+            f = open(f"{path}.tmp", 'w', encoding='utf-8')
+            self._try_lock(f)
+            for record in self._buffer:
+                f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+            os.replace(f"{path}.tmp", path)
+            if self._spool is not None:
+                self._spool.close()
+            self._spool = f
+
+    def _orphaned_spools(self) -> List[str]:
+        """Spools left by earlier processes: the legacy shared file and <path>.<pid> files"""
+        paths = [self.spool_path] if os.path.exists(self.spool_path) else []
+        for path in sorted(glob.glob(glob.escape(self.spool_path) + ".*")):
+            if path.rsplit(".", 1)[1].isdigit() and path != self.own_spool_path:
+                paths.append(path)
+        if fcntl is None:
+            # Without locks a live worker's spool cannot be told apart from a dead one's
+            paths = [path for path in paths if path == self.spool_path]
+        return paths
+
+    @staticmethod
+    def _read_spool(f) -> List[Dict]:
+        records = []
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                # Torn final line from a crash mid-write
+                continue
+        return records
+
+    def recover(self) -> int:
+        """Adopt the records left in the spools of processes that are gone"""
+        self._open_spool()
+        if not self.spool_path:
+            return 0
+
+        seen = {record.get("id") for record in self._buffer}
+        records = []
+        # A dead process with our pid may have left records in what is now our own spool
+        with open(self.own_spool_path, 'r', encoding='utf-8') as f:
+            for record in self._read_spool(f):
+                if record.get("id") not in seen:
+                    seen.add(record.get("id"))
+                    records.append(record)
+
+        for path in self._orphaned_spools():
+            try:
+                f = open(path, 'r', encoding='utf-8')
+            except FileNotFoundError:
+                continue
+            with f:
+                # Locked: its worker is alive. Another inode: someone else adopted it meanwhile
+                if not self._try_lock(f) or not os.path.exists(path) or \
+                        os.fstat(f.fileno()).st_ino != os.stat(path).st_ino:
+                    continue
+                adopted = []
+                for record in self._read_spool(f):
+                    if record.get("id") not in seen:
+                        seen.add(record.get("id"))
+                        adopted.append(record)
+
+                # Into our own spool before the orphan goes, so a crash here loses nothing
+                with self._lock:
+                    for record in adopted:
+                        self._append_to_spool(record)
+                    if self._spool is not None:
+                        os.fsync(self._spool.fileno())
+                os.remove(path)
+                records.extend(adopted)
+
+        with self._lock:
+            self._buffer = self._buffer + records
+        self.recovered += len(records)
+
+        if records:
+            print(f"♻️  Recovered {len(records)} unsaved prediction(s) from {self.spool_path}*")
+        return len(records)
+
+    # ---------- buffering ----------
+
+    def enqueue(self, record: Dict) -> str:
+        """Buffer a prediction record; returns its client-generated ID"""
+        record = dict(record)
+        record.setdefault("id", self._new_id())
+
+        with self._lock:
+            self._append_to_spool(record)
+            self._buffer.append(record)
+            self.enqueued += 1
+            size = len(self._buffer)
+
+        if size >= self.flush_size and self._wake is not None:
+            self._wake.set()
+
+        return record["id"]
+
+    async def flush(self):
+        """Persist everything currently buffered"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+
+        async with self._flush_lock:
+            with self._lock:
+                records = self._buffer
+                self._buffer = []
+
+            if not records:
+                return
+
+            start = time.perf_counter()
+            try:
+                saved = await self._save_batch(records)
+                if saved is False:
+                    raise RuntimeError("batch save returned False")
+            except Exception as e:
+                self.failures += 1
+                print(f"⚠️  Prediction flush failed ({len(records)} record(s)), will retry: {e}")
+                with self._lock:
+                    self._buffer = records + self._buffer
+                return
+            finally:
+                metrics.observe("predictions.flush", (time.perf_counter() - start) * 1000)
+
+            self.batches += 1
+            self.flushed += len(records)
+            await run_in_threadpool(self._compact_spool)
+
+            if self._on_flushed is not None:
+                try:
+                    await self._on_flushed(records)
+                except Exception as e:
+                    print(f"⚠️  Prediction flush callback failed: {e}")
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    def start(self):
+        """Replay the spool and start the background flusher (call from the event loop)"""
+        self.recover()
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the flusher and persist whatever is buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        await self.flush()
+        if self._spool is not None:
+            with self._lock:
+                if not self._buffer:
+                    # Nothing left to replay; removed while still locked so nobody adopts it
+                    try:
+                        os.remove(self.own_spool_path)
+                    except OSError:
+                        pass
+            self._spool.close()
+            self._spool = None
+
+    def stats(self) -> Dict:
+        """Get buffer statistics"""
+        return {
+            "buffered": len(self._buffer),
+            "enqueued": self.enqueued,
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "failures": self.failures,
+            "recovered": self.recovered,
+            "avg_batch_size": round(self.flushed / self.batches, 2) if self.batches else 0.0
+        }
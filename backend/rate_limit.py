@@ -0,0 +1,260 @@
+"""
+Rate Limiting
+Token buckets for the expensive endpoints (/predict, /similar and the
+feedback and vaccination stats), keyed by the signed-in user's id or, for
+anonymous requests, the client IP. Each route has its own budget; a request over
+budget gets a 429 with Retry-After.
+
+Budgets are "requests/seconds[:burst]": "30/60" refills 30 tokens a minute
+into a bucket of 30, "30/60:5" into a bucket of 5 (so at most 5 back to
+back). "off" disables a route's limit.
+
+Set REDIS_URL (or RATE_LIMIT_REDIS_URL) to share buckets between workers
+(requires the `redis` package); otherwise each worker keeps its own.
+"""
+
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+from fastapi import Depends, HTTPException, Request
+
+from metrics import metrics
+from response_cache import redis_location
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:
+    redis_asyncio = None
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+# Behind a proxy (Render) the client address comes from X-Forwarded-For. Only
+# the entries appended by our own proxies can be trusted (a client can send the
+# header with anything it likes in front), so the address used is the one
+# RATE_LIMIT_TRUSTED_HOPS entries from the right.
+RATE_LIMIT_TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "false").lower() == "true"
+RATE_LIMIT_TRUSTED_HOPS = int(os.getenv("RATE_LIMIT_TRUSTED_HOPS", "1"))
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", os.getenv("REDIS_URL"))
+
+ROUTE_BUDGETS = {
+    "predict": os.getenv("RATE_LIMIT_PREDICT", "30/60:10"),
+    "similar": os.getenv("RATE_LIMIT_SIMILAR", "30/60:10"),
+    "feedback_stats": os.getenv("RATE_LIMIT_FEEDBACK_STATS", "20/60"),
+    "vaccination_stats": os.getenv("RATE_LIMIT_VACCINATION_STATS", "30/60")
+}
+
+
+class Budget(NamedTuple):
+    capacity: float
+    refill_per_s: float
+
+    def describe(self) -> str:
+        return f"{self.refill_per_s * 60:g}/min, burst {self.capacity:g}"
+
+
+def parse_budget(value: str) -> Optional[Budget]:
+    """"30/60:10" -> Budget(capacity=10, refill_per_s=0.5); None when the limit is off"""
+    value = value.strip().lower()
+    if value in ("", "0", "off", "none"):
+        return None
+    rate, _, burst = value.partition(":")
+    requests, _, seconds = rate.partition("/")
+    requests = float(requests)
+    return Budget(float(burst) if burst else requests, requests / float(seconds or 1))
+
+
+class MemoryRateLimitBackend:
+    """In-process token buckets, least recently used evicted past max_keys"""
+
+    name = "memory"
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS, clock: Callable[[], float] = time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        # key -> (tokens, last refill)
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    async def acquire(self, key: str, budget: Budget, cost: float = 1) -> Tuple[bool, float, float]:
+        """Take `cost` tokens; returns (allowed, retry after seconds, tokens left)"""
+        with self._lock:
+            now = self.clock()
+            tokens, updated = self._buckets.get(key, (budget.capacity, now))
+            tokens = min(budget.capacity, tokens + (now - updated) * budget.refill_per_s)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+
+            while len(self._buckets) > self.max_keys:
+                # An evicted key comes back with a full bucket; it was idle the longest
+                self._buckets.popitem(last=False)
+                self.evictions += 1
+
+        retry_after = 0.0 if allowed else (cost - tokens) / budget.refill_per_s
+        return allowed, retry_after, tokens
+
+    def stats(self) -> Dict:
+        return {
+            "keys": len(self._buckets),
+            "evictions": self.evictions
+        }
+
+
+# Refill and take atomically on the Redis server's clock. Numbers go back as
+# strings because Redis truncates Lua numbers to integers.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(retry), tostring(tokens)}
+"""
+
+
+class RedisRateLimitBackend:
+    """Token buckets shared by every worker; idle buckets expire once full"""
+
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str = "rl:"):
+        if redis_asyncio is None:
+            raise ImportError("The 'redis' package is required when REDIS_URL is set")
+        self._redis = redis_asyncio.from_url(url)
+        self._script = self._redis.register_script(TOKEN_BUCKET_SCRIPT)
+        self.prefix = prefix
+
+    async def acquire(self, key: str, budget: Budget, cost: float = 1) -> Tuple[bool, float, float]:
+        allowed, retry_after, tokens = await self._script(
+            keys=[self.prefix + key], args=[budget.capacity, budget.refill_per_s, cost]
+        )
+        return bool(allowed), float(retry_after), float(tokens)
+
+    async def close(self):
+        await self._redis.aclose()
+
+    def stats(self) -> Dict:
+        return {}
+
+
+class RateLimiter:
+    """Per-route token-bucket budgets over a shared backend"""
+
+    def __init__(self, backend, budgets: Dict[str, Optional[Budget]], enabled: bool = True):
+        self.backend = backend
+        self.budgets = budgets
+        self.enabled = enabled
+        self.allowed: Dict[str, int] = {route: 0 for route in budgets}
+        self.limited: Dict[str, int] = {route: 0 for route in budgets}
+        self.errors = 0
+
+    async def check(self, route: str, key: str) -> Tuple[bool, float]:
+        """(allowed, retry after seconds) for one request by `key` to `route`"""
+        budget = self.budgets.get(route)
+        if not self.enabled or budget is None:
+            return True, 0.0
+        try:
+            allowed, retry_after, _ = await self.backend.acquire(f"{route}:{key}", budget)
+        except Exception as e:
+            # Limiting protects capacity; an unreachable backend must not take the API down
+            self.errors += 1
+            print(f"⚠️  Rate limiter check failed: {e}")
+            return True, 0.0
+
+        if allowed:
+            self.allowed[route] += 1
+        else:
+            self.limited[route] += 1
+            metrics.inc(f"rate_limit.{route}.limited")
+        return allowed, retry_after
+
+    async def enforce(self, route: str, key: str):
+        """Raise a 429 with Retry-After when `key` is over the route's budget"""
+        allowed, retry_after = await self.check(route, key)
+        if not allowed:
+            raise HTTPException(
+                status_code=429,
+                detail=f"Rate limit exceeded ({self.budgets[route].describe()}); try again later",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+            )
+
+    async def close(self):
+        """Release backend connections"""
+        if hasattr(self.backend, "close"):
+            await self.backend.close()
+
+    def stats(self) -> Dict:
+        return {
+            "backend": self.backend.name,
+            "enabled": self.enabled,
+            "budgets": {route: budget.describe() if budget else "off" for route, budget in self.budgets.items()},
+            "allowed": self.allowed,
+            "limited": self.limited,
+            "errors": self.errors,
+            **self.backend.stats()
+        }
+
+
+def client_key(request: Request, current_user: Optional[dict]) -> str:
+    """Who a request is charged to: the signed-in user, else the client address"""
+    if current_user and current_user.get("user_id"):
+        return f"user:{current_user['user_id']}"
+    forwarded = request.headers.get("x-forwarded-for") if RATE_LIMIT_TRUST_PROXY else None
+    if forwarded and RATE_LIMIT_TRUSTED_HOPS > 0:
+        hops = [hop.strip() for hop in forwarded.split(",")]
+        # Fewer entries than trusted proxies: the header did not come through them
+        if len(hops) >= RATE_LIMIT_TRUSTED_HOPS and hops[-RATE_LIMIT_TRUSTED_HOPS]:
+            return f"ip:{hops[-RATE_LIMIT_TRUSTED_HOPS]}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+def rate_limit(route: str, user_dependency: Callable) -> Callable:
+    """FastAPI dependency charging one request to `route`'s budget
+
+    `user_dependency` is the route's own auth dependency (get_current_user or
+    get_optional_user), so the token is only verified once per request.
+    """
+    async def dependency(request: Request, current_user: Optional[dict] = Depends(user_dependency)):
+        await rate_limiter.enforce(route, client_key(request, current_user))
+
+    return dependency
+
+
+def create_rate_limiter() -> RateLimiter:
+    """Build the limiter for the configured backend"""
+    if RATE_LIMIT_REDIS_URL:
+        try:
+            backend = RedisRateLimitBackend(RATE_LIMIT_REDIS_URL)
+            print(f"✅ Rate limiter using Redis at {redis_location(RATE_LIMIT_REDIS_URL)}")
+        except ImportError as e:
+            print(f"⚠️  {e}; falling back to per-worker rate limits")
+            backend = MemoryRateLimitBackend()
+    else:
+        backend = MemoryRateLimitBackend()
+    budgets = {route: parse_budget(value) for route, value in ROUTE_BUDGETS.items()}
+    return RateLimiter(backend, budgets, enabled=RATE_LIMIT_ENABLED)
+
+
+rate_limiter = create_rate_limiter()
+metrics.register_collector("rate_limit", rate_limiter.stats)
@@ -0,0 +1,52 @@
+"""
+Prediction Count Reconciliation
+Repairs drift between each user's maintained `total_predictions` counter and
+the real number of prediction documents (Firestore aggregation count).
+Safe to run on a schedule (e.g. a nightly cron job).
+
+Usage:
+    python reconcile_counts.py                  # all users
+    python reconcile_counts.py --user user_123  # one user
+    python reconcile_counts.py --dry-run        # report only
+"""
+
+import argparse
+import asyncio
+import sys
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from firebase_db import firebase_db, firebase_prediction_db
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Reconcile per-user prediction counters")
+    parser.add_argument("--user", action="append", dest="users", help="User ID (repeatable)")
+    parser.add_argument("--dry-run", action="store_true", help="Report drift without fixing it")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("🔢 PREDICTION COUNT RECONCILIATION")
+    print("=" * 60)
+
+    if not firebase_db.is_connected():
+        print("❌ Firebase is not connected!")
+        return 1
+
+    repairs = asyncio.run(
+        firebase_prediction_db.reconcile_prediction_counts(args.users, dry_run=args.dry_run)
+    )
+
+    for repair in repairs:
+        action = "would fix" if args.dry_run else "fixed"
+        print(f"  {repair['user_id']}: stored={repair['stored']} actual={repair['actual']} ({action})")
+
+    print(f"\n📊 Users with drift: {len(repairs)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
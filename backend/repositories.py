@@ -0,0 +1,242 @@
+"""
+Storage Repositories
+One bundle of user / prediction / feedback / vaccination repositories for the
+configured backend, so request handlers never branch on the database in use.
+
+STORAGE_BACKEND selects the backend: "firebase", "mongodb", "sqlite" (a local
+file at SQLITE_PATH) or "memory" (nothing persisted). When unset, USE_FIREBASE
+decides between Firebase and MongoDB as before.
+
+Nothing is imported or connected at import time. The selected backend is
+built on first use (or by start()), and start() runs its preparation
+(connectivity check, index creation) in a background task, retrying until
+it succeeds; `ready` reports when that has finished (see /ready).
+"""
+
+import asyncio
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+USE_FIREBASE = os.getenv("USE_FIREBASE", "true").lower() == "true"
+STORAGE_BACKEND = (os.getenv("STORAGE_BACKEND") or ("firebase" if USE_FIREBASE else "mongodb")).lower()
+# Backoff between failed preparation attempts (seconds)
+STORAGE_RETRY_INITIAL = float(os.getenv("STORAGE_RETRY_INITIAL", "1"))
+STORAGE_RETRY_MAX = float(os.getenv("STORAGE_RETRY_MAX", "30"))
+
+
+class Repositories:
+    """The repositories of one storage backend, built lazily, plus its lifecycle"""
+
+    def __init__(self, name: str, factory: Callable[[], Dict]):
+        self.name = name
+        self._factory = factory
+        self._components: Optional[Dict] = None
+        self._build_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+        self.ready = False
+        self.attempts = 0
+        self.last_error: Optional[str] = None
+        self.build_ms: Optional[float] = None
+        self.ready_ms: Optional[float] = None
+
+    def _get(self) -> Dict:
+        """Build the backend on first use"""
+        if self._components is None:
+            with self._build_lock:
+                if self._components is None:
+                    start = time.perf_counter()
+                    components = self._factory()
+                    self.build_ms = round((time.perf_counter() - start) * 1000, 1)
+                    self._components = components
+                    print(f"✅ Storage backend: {self.name} ({self.build_ms} ms)")
+        return self._components
+
+    @property
+    def users(self):
+        return self._get()["users"]
+
+    @property
+    def predictions(self):
+        return self._get()["predictions"]
+
+    @property
+    def feedback(self):
+        return self._get()["feedback"]
+
+    @property
+    def vaccinations(self):
+        return self._get()["vaccinations"]
+
+    def start(self):
+        """Build and prepare the backend in a background task (call from the event loop)"""
+        if not self.ready and (self._task is None or self._task.done()):
+            self._task = asyncio.get_running_loop().create_task(self._prepare())
+
+    async def _prepare(self):
+        started = time.perf_counter()
+        delay = STORAGE_RETRY_INITIAL
+
+        while not self.ready:
+            self.attempts += 1
+            try:
+                # Building imports the database client libraries; keep that off the event loop
+                components = await asyncio.to_thread(self._get)
+                prepare = components.get("prepare")
+                if prepare:
+                    await prepare()
+                self.ready = True
+                self.last_error = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"⚠️  Storage backend {self.name} not ready (attempt {self.attempts}): {e}; "
+                      f"retrying in {delay:g}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, STORAGE_RETRY_MAX)
+
+        self.ready_ms = round((time.perf_counter() - started) * 1000, 1)
+        print(f"✅ Storage backend {self.name} ready in {self.ready_ms} ms")
+
+    async def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Start preparation and wait for it (scripts and tests)"""
+        self.start()
+        if self._task is None:
+            return self.ready
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.ready
+
+    async def close(self):
+        """Stop preparation and release backend connections"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        if self._components is not None and self._components.get("close"):
+            await self._components["close"]()
+
+    def is_connected(self) -> bool:
+        """Whether the backend has been built and prepared"""
+        return self.ready
+
+    def status(self) -> Dict:
+        """Readiness details for /ready and /metrics"""
+        return {
+            "backend": self.name,
+            "ready": self.ready,
+            "attempts": self.attempts,
+            "last_error": self.last_error,
+            "build_ms": self.build_ms,
+            "ready_ms": self.ready_ms
+        }
+
+
+def _firebase_components() -> Dict:
+    from firebase_db import firebase_db, firebase_user_db, firebase_prediction_db
+    from feedback_db import FirebaseFeedbackDB
+    from vaccination_db import FirebaseVaccinationDB
+
+    async def prepare():
+        if not firebase_db.is_connected():
+            raise ConnectionError("Firebase is not initialized")
+
+    return {
+        "users": firebase_user_db,
+        "predictions": firebase_prediction_db,
+        "feedback": FirebaseFeedbackDB(firebase_db),
+        "vaccinations": FirebaseVaccinationDB(firebase_db),
+        "prepare": prepare
+    }
+
+
+def _mongo_components() -> Dict:
+    from database import mongodb, prediction_db, user_db
+    from feedback_db import MongoFeedbackDB
+    from vaccination_db import MongoVaccinationDB
+
+    async def prepare():
+        if not await mongodb.ping():
+            raise ConnectionError("MongoDB ping failed")
+        await prediction_db.ensure_indexes()
+        await user_db.ensure_indexes()
+
+    async def close():
+        mongodb.close()
+
+    return {
+        "users": user_db,
+        "predictions": prediction_db,
+        "feedback": MongoFeedbackDB(mongodb),
+        "vaccinations": MongoVaccinationDB(mongodb),
+        "prepare": prepare,
+        "close": close
+    }
+
+
+def _sqlite_components(path: Optional[str] = None) -> Dict:
+    from sqlite_db import (
+        SQLITE_PATH, SQLiteDB, SQLiteFeedbackDB, SQLitePredictionDB, SQLiteUserDB, SQLiteVaccinationDB
+    )
+
+    db = SQLiteDB(path or SQLITE_PATH)
+
+    async def prepare():
+        # Opens the file and creates tables/indexes off the event loop
+        await db.run(lambda conn: None)
+
+    async def close():
+        db.close()
+
+    return {
+        "users": SQLiteUserDB(db),
+        "predictions": SQLitePredictionDB(db),
+        "feedback": SQLiteFeedbackDB(db),
+        "vaccinations": SQLiteVaccinationDB(db),
+        "prepare": prepare,
+        "close": close
+    }
+
+
+def _memory_components() -> Dict:
+    from memory_db import MemoryFeedbackDB, MemoryPredictionDB, MemoryUserDB, MemoryVaccinationDB
+
+    users = MemoryUserDB()
+    return {
+        "users": users,
+        "predictions": MemoryPredictionDB(users),
+        "feedback": MemoryFeedbackDB(),
+        "vaccinations": MemoryVaccinationDB()
+    }
+
+
+BACKENDS = {
+    "firebase": _firebase_components,
+    "mongodb": _mongo_components,
+    "sqlite": _sqlite_components,
+    "memory": _memory_components
+}
+
+
+def create_repositories(backend: str = STORAGE_BACKEND) -> Repositories:
+    """Repositories for a storage backend (nothing is built until first use)"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown STORAGE_BACKEND '{backend}' (expected one of: {', '.join(BACKENDS)})")
+    return Repositories(backend, BACKENDS[backend])
+
+
+def create_sqlite_repositories(path: Optional[str] = None) -> Repositories:
+    """Repositories stored in a specific SQLite file"""
+    return Repositories("sqlite", lambda: _sqlite_components(path))
+
+
+repositories = create_repositories()
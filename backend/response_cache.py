@@ -0,0 +1,277 @@
+"""
+Per-User Response Cache
+Caches serialized /history pages and /stats responses per user. Entries are
+invalidated (write-through) whenever that user's predictions are saved or
+deleted, and are bounded by TTL, entry count and total bytes.
+
+Set REDIS_URL to share the cache between workers (requires the `redis`
+package); otherwise an in-process LRU is used.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+from fastapi.responses import Response
+
+from metrics import metrics
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:
+    redis_asyncio = None
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "60"))  # seconds
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESPONSE_CACHE_MAX_ENTRY_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRY_BYTES", str(256 * 1024)))
+REDIS_URL = os.getenv("REDIS_URL")
+
+
+class MemoryCacheBackend:
+    """In-process LRU with per-entry expiry and per-user generations"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+                 max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # (user_id, key) -> (expires_at, payload)
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._user_keys: Dict[str, set] = {}
+        # user_id -> value of the invalidation clock at its last invalidation, oldest first.
+        # Users pruned from here read _floor, which is never below a pruned generation, so
+        # a build that started before an invalidation can still never be cached.
+        self._generations: "OrderedDict[str, int]" = OrderedDict()
+        self._clock = 0
+        self._floor = 0
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _remove(self, entry_key: tuple):
+        _, payload = self._entries.pop(entry_key)
+        self._bytes -= len(payload)
+        user_keys = self._user_keys.get(entry_key[0])
+        if user_keys is not None:
+            user_keys.discard(entry_key)
+            if not user_keys:
+                del self._user_keys[entry_key[0]]
+
+    async def generation(self, user_id: str) -> int:
+        with self._lock:
+            return self._generations.get(user_id, self._floor)
+
+    async def get(self, user_id: str, generation: int, key: str) -> Optional[bytes]:
+        entry_key = (user_id, key)
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                self._remove(entry_key)
+                return None
+            self._entries.move_to_end(entry_key)
+            return entry[1]
+
+    async def set(self, user_id: str, generation: int, key: str, payload: bytes, ttl: float):
+        entry_key = (user_id, key)
+        with self._lock:
+            # Invalidated while the response was being built: don't cache stale data
+            if self._generations.get(user_id, self._floor) != generation:
+                return
+            if entry_key in self._entries:
+                self._remove(entry_key)
+
+            self._entries[entry_key] = (time.monotonic() + ttl, payload)
+            self._user_keys.setdefault(user_id, set()).add(entry_key)
+            self._bytes += len(payload)
+
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    async def invalidate(self, user_id: str):
+        with self._lock:
+            self._clock += 1
+            self._generations[user_id] = self._clock
+            self._generations.move_to_end(user_id)
+            while len(self._generations) > self.max_entries:
+                _, generation = self._generations.popitem(last=False)
+                self._floor = generation
+            for entry_key in list(self._user_keys.get(user_id, ())):
+                self._remove(entry_key)
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "generations": len(self._generations),
+            "evictions": self.evictions
+        }
+
+
+class RedisCacheBackend:
+    """Shared cache in Redis; invalidation bumps a per-user generation"""
+
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str = "rc:"):
+        if redis_asyncio is None:
+            raise ImportError("The 'redis' package is required when REDIS_URL is set")
+        self._redis = redis_asyncio.from_url(url)
+        self.prefix = prefix
+
+    def _generation_key(self, user_id: str) -> str:
+        return f"{self.prefix}{user_id}:gen"
+
+    def _entry_key(self, user_id: str, generation: int, key: str) -> str:
+        return f"{self.prefix}{user_id}:{generation}:{key}"
+
+    async def generation(self, user_id: str) -> int:
+        value = await self._redis.get(self._generation_key(user_id))
+        return int(value) if value else 0
+
+    async def get(self, user_id: str, generation: int, key: str) -> Optional[bytes]:
+        return await self._redis.get(self._entry_key(user_id, generation, key))
+
+    async def set(self, user_id: str, generation: int, key: str, payload: bytes, ttl: float):
+        # Entries of older generations are unreachable and simply expire
+        await self._redis.set(self._entry_key(user_id, generation, key), payload, ex=max(int(ttl), 1))
+
+    async def invalidate(self, user_id: str):
+        await self._redis.incr(self._generation_key(user_id))
+
+    async def close(self):
+        await self._redis.aclose()
+
+    def stats(self) -> Dict:
+        return {}
+
+
+class ResponseCache:
+    """Caches serialized JSON responses per user"""
+
+    def __init__(self, backend, ttl: float = RESPONSE_CACHE_TTL,
+                 max_entry_bytes: int = RESPONSE_CACHE_MAX_ENTRY_BYTES, enabled: bool = True):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_entry_bytes = max_entry_bytes
+        self.enabled = enabled
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.errors = 0
+        self.oversized = 0
+
+    async def get_or_build(self, user_id: str, key: str,
+                           build: Callable[[], Awaitable[Dict]], ttl: Optional[float] = None) -> Response:
+        """Return the cached response for (user_id, key), building and caching it on a miss"""
+        start = time.perf_counter()
+        generation = None
+
+        if self.enabled:
+            try:
+                generation = await self.backend.generation(user_id)
+                payload = await self.backend.get(user_id, generation, key)
+            except Exception as e:
+                # The cache is an optimization; fall through to the database
+                self.errors += 1
+                print(f"⚠️  Response cache read failed: {e}")
+                payload = None
+
+            if payload is not None:
+                self.hits += 1
+                metrics.observe("response_cache.hit", (time.perf_counter() - start) * 1000)
+                return Response(content=payload, media_type="application/json",
+                                headers={"X-Cache": "HIT"})
+
+        self.misses += 1
+        payload = json.dumps(await build(), default=str).encode()
+
+        if generation is not None:
+            if len(payload) > self.max_entry_bytes:
+                self.oversized += 1
+            else:
+                try:
+                    await self.backend.set(user_id, generation, key, payload, ttl or self.ttl)
+                except Exception as e:
+                    self.errors += 1
+                    print(f"⚠️  Response cache write failed: {e}")
+
+        metrics.observe("response_cache.miss", (time.perf_counter() - start) * 1000)
+        return Response(content=payload, media_type="application/json", headers={"X-Cache": "MISS"})
+
+    async def invalidate(self, user_id: str):
+        """Drop every cached response for user_id"""
+        if not self.enabled:
+            return
+        try:
+            await self.backend.invalidate(user_id)
+            self.invalidations += 1
+        except Exception as e:
+            self.errors += 1
+            print(f"⚠️  Response cache invalidation failed for {user_id}: {e}")
+
+    async def invalidate_many(self, user_ids: Iterable[str]):
+        """Invalidate several users (e.g. after a batched prediction flush)"""
+        for user_id in set(user_ids):
+            await self.invalidate(user_id)
+
+    async def close(self):
+        """Release backend connections"""
+        if hasattr(self.backend, "close"):
+            await self.backend.close()
+
+    def stats(self) -> Dict:
+        """Get hit ratio and estimated latency savings"""
+        lookups = self.hits + self.misses
+        hit_ms = metrics.histogram("response_cache.hit").snapshot()["avg_ms"]
+        miss_ms = metrics.histogram("response_cache.miss").snapshot()["avg_ms"]
+        return {
+            "backend": self.backend.name,
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+            "oversized": self.oversized,
+            "avg_hit_ms": hit_ms,
+            "avg_miss_ms": miss_ms,
+            "estimated_saved_ms": round(max(miss_ms - hit_ms, 0.0) * self.hits, 1),
+            **self.backend.stats()
+        }
+
+
+def redis_location(url: str) -> str:
+    """host:port (or socket path) of a Redis URL, without the credentials it may carry"""
+    parts = urlsplit(url)
+    if not parts.hostname:
+        return parts.path
+    return f"{parts.hostname}:{parts.port or 6379}"
+
+
+def create_response_cache() -> ResponseCache:
+    """Build the cache for the configured backend"""
+    if REDIS_URL:
+        try:
+            backend = RedisCacheBackend(REDIS_URL)
+            print(f"✅ Response cache using Redis at {redis_location(REDIS_URL)}")
+        except ImportError as e:
+            print(f"⚠️  {e}; falling back to the in-process response cache")
+            backend = MemoryCacheBackend()
+    else:
+        backend = MemoryCacheBackend()
+    return ResponseCache(backend, enabled=RESPONSE_CACHE_ENABLED)
+
+
+response_cache = create_response_cache()
+metrics.register_collector("response_cache", response_cache.stats)
@@ -0,0 +1,465 @@
+"""
+Similar Dogs Index
+Approximate nearest-neighbour search over the classifier's penultimate-layer
+embeddings (cosine similarity), for /similar.
+
+- Embeddings are L2-normalized and, once trained, projected with PCA to
+  SIMILAR_INDEX_DIM dimensions (1M x 256 float32 is 1 GB).
+- IVF: a spherical k-means coarse quantizer splits the vectors into nlist
+  inverted lists; a query scans only the nprobe lists whose centroids are
+  closest.
+- Until SIMILAR_INDEX_TRAIN_SIZE vectors have been added the index is an
+  exact flat scan; it trains itself on those vectors and switches to IVF.
+- Entries are gallery images (visible to everyone) or past predictions
+  (visible only to the user who made them), stored with their thumbnails.
+
+The index is loaded from / saved to SIMILAR_INDEX_PATH (an .npz plus a
+.json of entry metadata) at startup and shutdown; build_similar_index.py
+builds one from a gallery. Each worker process holds its own copy: with
+several workers a prediction is only searchable in the worker that served
+it, and the last worker to shut down is the one whose additions are saved.
+Deleting a prediction removes it from the index of the worker handling the
+delete.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from metrics import metrics
+
+SIMILAR_INDEX_PATH = os.getenv("SIMILAR_INDEX_PATH", "models/similar_index.npz")
+# PCA target dimension (0 keeps the embedding's own)
+SIMILAR_INDEX_DIM = int(os.getenv("SIMILAR_INDEX_DIM", "256"))
+# Inverted lists (0 = about 4 * sqrt(vectors at training time))
+SIMILAR_INDEX_NLIST = int(os.getenv("SIMILAR_INDEX_NLIST", "0"))
+SIMILAR_INDEX_NPROBE = int(os.getenv("SIMILAR_INDEX_NPROBE", "16"))
+SIMILAR_INDEX_TRAIN_SIZE = int(os.getenv("SIMILAR_INDEX_TRAIN_SIZE", "5000"))
+# Most matches /similar returns
+SIMILAR_MAX_RESULTS = int(os.getenv("SIMILAR_MAX_RESULTS", "50"))
+
+# Vectors per matrix multiply when assigning to lists (bounds temporary memory)
+ASSIGN_CHUNK = 65536
+# Training samples used for PCA and k-means
+MAX_TRAIN_SAMPLES = 50000
+KMEANS_ITERATIONS = 10
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def nearest_centroids(vectors: np.ndarray, centroids: np.ndarray, count: int = 1) -> np.ndarray:
+    """Indices of the `count` most similar centroids per vector, best first"""
+    result = np.empty((len(vectors), count), dtype=np.int64)
+    for start in range(0, len(vectors), ASSIGN_CHUNK):
+        scores = vectors[start:start + ASSIGN_CHUNK] @ centroids.T
+        if count == 1:
+            result[start:start + ASSIGN_CHUNK, 0] = scores.argmax(axis=1)
+            continue
+        top = np.argpartition(-scores, count - 1, axis=1)[:, :count]
+        order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+        result[start:start + ASSIGN_CHUNK] = np.take_along_axis(top, order, axis=1)
+    return result
+
+
+def spherical_kmeans(vectors: np.ndarray, k: int, iterations: int = KMEANS_ITERATIONS,
+                     seed: int = 0) -> np.ndarray:
+    """Unit-length centroids for unit vectors"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = nearest_centroids(vectors, centroids)[:, 0]
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        empty = np.bincount(assign, minlength=k) == 0
+        if empty.any():
+            # Re-seed empty lists from random vectors
+            sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        centroids = normalize(sums)
+    return centroids
+
+
+class _Slab:
+    """Growable (vectors, ids) arrays for one inverted list"""
+
+    __slots__ = ("vectors", "ids", "count")
+
+    def __init__(self, dim: int, capacity: int = 16):
+        self.vectors = np.empty((capacity, dim), dtype=np.float32)
+        self.ids = np.empty(capacity, dtype=np.int64)
+        self.count = 0
+
+    def append(self, vectors: np.ndarray, ids: np.ndarray):
+        needed = self.count + len(vectors)
+        if needed > len(self.ids):
+            capacity = max(needed, 2 * len(self.ids))
+            grown = np.empty((capacity, self.vectors.shape[1]), dtype=np.float32)
+            grown[:self.count] = self.vectors[:self.count]
+            self.vectors = grown
+            self.ids = np.resize(self.ids, capacity)
+        self.vectors[self.count:needed] = vectors
+        self.ids[self.count:needed] = ids
+        self.count = needed
+
+    def trim(self):
+        """Release the spare capacity left by growing"""
+        self.vectors = self.vectors[:self.count].copy()
+        self.ids = self.ids[:self.count].copy()
+
+    def scores(self, query: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        return self.vectors[:self.count] @ query, self.ids[:self.count]
+
+
+class IVFIndex:
+    """Inverted-file index over cosine similarity, exact until trained"""
+
+    def __init__(self, dim: int, reduce_dim: int = SIMILAR_INDEX_DIM, nlist: int = SIMILAR_INDEX_NLIST,
+                 nprobe: int = SIMILAR_INDEX_NPROBE, train_size: int = SIMILAR_INDEX_TRAIN_SIZE):
+        self.dim = dim
+        self.reduce_dim = reduce_dim if 0 < reduce_dim < dim else 0
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_size = train_size
+
+        self.mean: Optional[np.ndarray] = None
+        self.projection: Optional[np.ndarray] = None
+        self.centroids: Optional[np.ndarray] = None
+        # Before training: one list of unprojected unit vectors
+        self._lists: List[_Slab] = [_Slab(dim)]
+        self.count = 0
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def _transform(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = normalize(vectors)
+        if self.projection is not None:
+            vectors = normalize((vectors - self.mean) @ self.projection)
+        return vectors
+
+    @property
+    def needs_training(self) -> bool:
+        return not self.trained and self.count >= self.train_size
+
+    def flat_vectors(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(vectors, ids) held before training; later appends never touch these rows"""
+        flat = self._lists[0]
+        return flat.vectors[:flat.count], flat.ids[:flat.count]
+
+    def trained_copy(self, sample: np.ndarray) -> "IVFIndex":
+        """A new, empty index with these settings and a PCA projection and coarse quantizer
+        learned from sample (leaves this index untouched, so it can run without its lock)"""
+        sample = normalize(np.asarray(sample, dtype=np.float32).reshape(-1, self.dim))
+        if len(sample) > MAX_TRAIN_SAMPLES:
+            sample = sample[np.random.default_rng(0).choice(len(sample), MAX_TRAIN_SAMPLES, replace=False)]
+
+        index = IVFIndex(self.dim, self.reduce_dim, self.nlist, self.nprobe, self.train_size)
+        if self.reduce_dim:
+            index.mean = sample.mean(axis=0)
+            centered = sample - index.mean
+            # Top eigenvectors of the covariance (dim x dim): far cheaper than an SVD of the sample
+            _, components = np.linalg.eigh(centered.T @ centered)
+            index.projection = np.ascontiguousarray(components[:, ::-1][:, :self.reduce_dim])
+            sample = normalize((sample - index.mean) @ index.projection)
+
+        nlist = self.nlist or int(4 * np.sqrt(max(self.count, len(sample))))
+        nlist = max(1, min(nlist, len(sample) // 4))
+        index.centroids = spherical_kmeans(sample, nlist)
+        index._lists = [_Slab(index.centroids.shape[1]) for _ in range(nlist)]
+        return index
+
+    def train(self, sample: np.ndarray):
+        """Learn the PCA projection and the coarse quantizer, then re-file existing vectors"""
+        trained = self.trained_copy(sample)
+        # Vectors added before training are unprojected: re-file them
+        vectors, ids = self.flat_vectors()
+        self.mean, self.projection, self.centroids = trained.mean, trained.projection, trained.centroids
+        self._lists = trained._lists
+        self.count = 0
+        if len(ids):
+            self.add(vectors, ids)
+
+    def add(self, vectors: np.ndarray, ids: np.ndarray, train: bool = True):
+        """Add embeddings under integer ids (trains itself once train_size are held, unless
+        train is False and the caller trains a copy itself)"""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        if not self.trained:
+            self._lists[0].append(normalize(vectors), ids)
+            self.count += len(ids)
+            if train and self.needs_training:
+                self.train(self.flat_vectors()[0])
+            return
+
+        for start in range(0, len(ids), ASSIGN_CHUNK):
+            chunk = self._transform(vectors[start:start + ASSIGN_CHUNK])
+            chunk_ids = ids[start:start + ASSIGN_CHUNK]
+            assign = nearest_centroids(chunk, self.centroids)[:, 0]
+            order = np.argsort(assign, kind="stable")
+            bounds = np.searchsorted(assign[order], np.arange(len(self._lists) + 1))
+            for list_id in np.flatnonzero(np.diff(bounds)):
+                rows = order[bounds[list_id]:bounds[list_id + 1]]
+                self._lists[list_id].append(chunk[rows], chunk_ids[rows])
+        self.count += len(ids)
+
+    def search(self, query: np.ndarray, k: int = 10, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(scores, ids) of the k most similar vectors, best first (fewer if the index is small)"""
+        query = self._transform(np.asarray(query, dtype=np.float32).reshape(1, self.dim))
+        if self.trained:
+            probe = min(nprobe or self.nprobe, len(self._lists))
+            lists = [self._lists[i] for i in nearest_centroids(query, self.centroids, probe)[0]]
+        else:
+            lists = self._lists
+
+        parts = [slab.scores(query[0]) for slab in lists if slab.count]
+        if not parts:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+        scores = np.concatenate([scores for scores, _ in parts])
+        ids = np.concatenate([ids for _, ids in parts])
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            scores, ids = scores[top], ids[top]
+        order = np.argsort(-scores)
+        return scores[order], ids[order]
+
+    def compact(self):
+        """Trim every list to its contents (after a bulk add; growing doubles capacity)"""
+        for slab in self._lists:
+            slab.trim()
+
+    def memory_bytes(self) -> int:
+        return sum(slab.vectors.nbytes + slab.ids.nbytes for slab in self._lists)
+
+    def state(self) -> Dict[str, np.ndarray]:
+        """Arrays for np.savez (lists packed end to end)"""
+        counts = np.array([slab.count for slab in self._lists], dtype=np.int64)
+        state = {
+            "config": np.array([self.dim, self.reduce_dim, self.nlist, self.nprobe, self.train_size]),
+            "counts": counts,
+            "vectors": np.concatenate([slab.vectors[:slab.count] for slab in self._lists]),
+            "ids": np.concatenate([slab.ids[:slab.count] for slab in self._lists])
+        }
+        if self.trained:
+            state["centroids"] = self.centroids
+        if self.projection is not None:
+            state["mean"], state["projection"] = self.mean, self.projection
+        return state
+
+    @classmethod
+    def from_state(cls, state) -> "IVFIndex":
+        dim, reduce_dim, nlist, nprobe, train_size = (int(value) for value in state["config"])
+        index = cls(dim, reduce_dim, nlist, nprobe, train_size)
+        if "centroids" in state:
+            index.centroids = state["centroids"]
+        if "projection" in state:
+            index.mean, index.projection = state["mean"], state["projection"]
+
+        width = index.centroids.shape[1] if index.trained else dim
+        index._lists = []
+        offset = 0
+        for count in state["counts"]:
+            slab = _Slab(width, max(int(count), 16))
+            slab.append(state["vectors"][offset:offset + count], state["ids"][offset:offset + count])
+            index._lists.append(slab)
+            offset += int(count)
+        index.count = offset
+        return index
+
+
+class SimilarDogs:
+    """The /similar index: embeddings plus the entry each one points to"""
+
+    def __init__(self, path: str = SIMILAR_INDEX_PATH):
+        self.path = path
+        self.index: Optional[IVFIndex] = None
+        # Entry metadata by id: source, breed, image/thumbnail URLs, owner (None = gallery).
+        # Removed predictions stay as None, so ids (list positions) never shift.
+        self.entries: List[Optional[Dict]] = []
+        self._by_prediction: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._training = False
+        self._dirty = False
+        self.removed = 0
+        self.searches = 0
+        self.search_ms = 0.0
+
+    @property
+    def size(self) -> int:
+        return len(self.entries) - self.removed
+
+    def _remember(self, first: int):
+        for entry_id in range(first, len(self.entries)):
+            entry = self.entries[entry_id]
+            if entry is not None and entry.get("prediction_id"):
+                self._by_prediction[entry["prediction_id"]] = entry_id
+
+    def _claim_training(self) -> Optional[Tuple[IVFIndex, int]]:
+        """(index, vectors held) when the index is due for training and no one else trains it"""
+        if self._training or self.index is None or not self.index.needs_training:
+            return None
+        self._training = True
+        return self.index, self.index.count
+
+    def _train(self, claim: Tuple[IVFIndex, int]):
+        """Train on a snapshot outside the lock, then swap the trained index in; searches keep
+        using the flat index meanwhile and adds made during training are filed at the swap"""
+        index, held = claim
+        try:
+            vectors, ids = index.flat_vectors()
+            vectors, ids = vectors[:held], ids[:held]
+            trained = index.trained_copy(vectors)
+            trained.add(vectors, ids)
+            with self._lock:
+                if self.index is not index:
+                    return  # replaced by load() while training
+                late_vectors, late_ids = index.flat_vectors()
+                trained.add(late_vectors[held:], late_ids[held:])
+                trained.compact()
+                self.index = trained
+                self._dirty = True
+        except Exception as e:
+            print(f"❌ Similar-dogs index training failed: {e}")
+        finally:
+            with self._lock:
+                self._training = False
+
+    def add(self, embedding: np.ndarray, entry: Dict) -> int:
+        """Index one embedding; returns its id (the add that fills the training set trains the
+        index, without holding the lock)"""
+        embedding = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        with self._lock:
+            if self.index is None:
+                self.index = IVFIndex(len(embedding))
+            entry_id = len(self.entries)
+            self.entries.append(entry)
+            self._remember(entry_id)
+            self.index.add(embedding, [entry_id], train=False)
+            self._dirty = True
+            claim = self._claim_training()
+        if claim is not None:
+            self._train(claim)
+        return entry_id
+
+    def add_many(self, embeddings: np.ndarray, entries: List[Dict]):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        with self._lock:
+            if self.index is None:
+                self.index = IVFIndex(embeddings.shape[1])
+            first = len(self.entries)
+            self.entries.extend(entries)
+            self._remember(first)
+            self.index.add(embeddings, np.arange(first, first + len(entries)), train=False)
+            self.index.compact()
+            self._dirty = True
+            claim = self._claim_training()
+        if claim is not None:
+            self._train(claim)
+
+    def remove(self, prediction_id: str, user_id: str) -> bool:
+        """Stop returning a deleted prediction (its vector stays until the index is rebuilt)"""
+        with self._lock:
+            entry_id = self._by_prediction.get(prediction_id)
+            if entry_id is None or self.entries[entry_id].get("user_id") != user_id:
+                return False
+            del self._by_prediction[prediction_id]
+            self.entries[entry_id] = None
+            self.removed += 1
+            self._dirty = True
+            return True
+
+    def search(self, embedding: np.ndarray, k: int = 8, user_id: Optional[str] = None) -> List[Dict]:
+        """Most similar entries visible to user_id (gallery entries and their own predictions)"""
+        started = time.perf_counter()
+        with self._lock:
+            if self.index is None:
+                return []
+            # Over-fetch so other users' predictions can be filtered out
+            fetch = k * 4
+            while True:
+                scores, ids = self.index.search(embedding, fetch)
+                matches = [
+                    {"score": round(float(score), 4), **self.entries[entry_id]}
+                    for score, entry_id in zip(scores, ids)
+                    if self.entries[entry_id] is not None
+                    and self.entries[entry_id].get("user_id") in (None, user_id)
+                ]
+                if len(matches) >= k or len(ids) < fetch or fetch >= self.index.count:
+                    break
+                fetch *= 4
+        for match in matches:
+            match.pop("user_id", None)
+        self.searches += 1
+        self.search_ms += (time.perf_counter() - started) * 1000
+        return matches[:k]
+
+    def load(self) -> bool:
+        """Load the saved index, if any"""
+        if not os.path.exists(self.path):
+            print(f"⚠️  No similar-dogs index at {self.path}; /similar starts empty")
+            return False
+        try:
+            with np.load(self.path) as state:
+                index = IVFIndex.from_state(state)
+            with open(self.path + ".json") as f:
+                entries = json.load(f)
+        except Exception as e:
+            print(f"❌ Failed to load similar-dogs index: {e}")
+            return False
+        with self._lock:
+            self.index, self.entries, self._dirty = index, entries, False
+            self.removed = sum(entry is None for entry in entries)
+            self._by_prediction = {}
+            self._remember(0)
+        print(f"✓ Similar-dogs index loaded: {len(entries)} entries ({'IVF' if index.trained else 'flat'})")
+        return True
+
+    def save(self) -> bool:
+        """Write the index if it changed since the last load/save"""
+        with self._lock:
+            if self.index is None or not self._dirty:
+                return False
+            state, entries = self.index.state(), list(self.entries)
+            self._dirty = False
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Write then rename, so a crash never leaves a half-written index;
+            # per-process temp names keep workers saving at once from mixing files
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            np.savez(tmp + ".npz", **state)
+            with open(tmp + ".json", "w") as f:
+                json.dump(entries, f)
+            os.replace(tmp + ".npz", self.path)
+            os.replace(tmp + ".json", self.path + ".json")
+            print(f"✓ Similar-dogs index saved: {len(entries)} entries")
+            return True
+        except Exception as e:
+            print(f"❌ Failed to save similar-dogs index: {e}")
+            return False
+
+    def stats(self) -> Dict:
+        index = self.index
+        return {
+            "entries": self.size,
+            "removed": self.removed,
+            "trained": bool(index and index.trained),
+            "lists": len(index._lists) if index and index.trained else 0,
+            "dim": (index.centroids.shape[1] if index.trained else index.dim) if index else 0,
+            "memory_mb": round(index.memory_bytes() / 1e6, 1) if index else 0,
+            "searches": self.searches,
+            "avg_search_ms": round(self.search_ms / self.searches, 2) if self.searches else 0.0
+        }
+
+
+# Global instance
+similar_dogs = SimilarDogs()
+metrics.register_collector("similar", similar_dogs.stats)
@@ -0,0 +1,714 @@
+"""
+SQLite Database
+Persistent local implementation of the user, prediction, feedback and
+vaccination repositories (STORAGE_BACKEND=sqlite). Needs no external service,
+so it suits CI, offline development and end-to-end benchmarks.
+
+All statements go through one connection guarded by a lock and run in a
+worker thread, so queries never block the event loop.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from breed_stats import breed_key, group_records, summarize
+from pagination import HISTORY_DEFAULT_LIMIT, clamp_limit, decode_cursor, encode_cursor
+from user_profile import profile_updates
+from vaccination_db import VaccinationDB
+
+SQLITE_PATH = os.getenv("SQLITE_PATH", "dog_breed_predictor.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS predictions (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    breed TEXT,
+    confidence REAL,
+    image_name TEXT,
+    top_predictions TEXT,
+    image_url TEXT,
+    thumbnail_url TEXT,
+    timestamp TEXT NOT NULL
+);
+-- Serves keyset-paginated history pages and per-user counts
+CREATE INDEX IF NOT EXISTS idx_predictions_user_time ON predictions (user_id, timestamp DESC, id DESC);
+
+CREATE TABLE IF NOT EXISTS breed_stats (
+    user_id TEXT NOT NULL,
+    breed_key TEXT NOT NULL,
+    breed TEXT,
+    count INTEGER NOT NULL DEFAULT 0,
+    confidence_sum REAL NOT NULL DEFAULT 0,
+    last_seen TEXT,
+    PRIMARY KEY (user_id, breed_key)
+);
+
+CREATE TABLE IF NOT EXISTS feedback (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    type TEXT,
+    status TEXT,
+    is_private INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_feedback_user_time ON feedback (user_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_feedback_public_time ON feedback (is_private, created_at DESC);
+
+CREATE TABLE IF NOT EXISTS vaccinations (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    due_date TEXT,
+    status TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_vaccinations_user_due ON vaccinations (user_id, due_date);
+"""
+
+
+def _new_id() -> str:
+    return uuid.uuid4().hex
+
+
+def _timestamp(value: datetime) -> str:
+    """Fixed-width naive UTC text, so string order equals time order"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat(timespec="microseconds")
+
+
+def _isoformat(value: Optional[str]) -> Optional[str]:
+    """Stored timestamp -> the isoformat() the other backends return"""
+    return datetime.fromisoformat(value).isoformat() if value else None
+
+
+class SQLiteDB:
+    """One SQLite connection shared by the repositories"""
+
+    def __init__(self, path: str = SQLITE_PATH):
+        self.path = path
+        # Opened (and the schema created) on first use, in a worker thread
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        print(f"✓ SQLite database opened: {self.path}")
+
+    def _call(self, fn: Callable, *args):
+        with self._lock:
+            if self._conn is None:
+                self._connect()
+            try:
+                result = fn(self._conn, *args)
+                self._conn.commit()
+                return result
+            except Exception:
+                self._conn.rollback()
+                raise
+
+    async def run(self, fn: Callable, *args):
+        """Run fn(connection, *args) in a worker thread inside one transaction"""
+        return await asyncio.to_thread(self._call, fn, *args)
+
+    def is_connected(self) -> bool:
+        return self._conn is not None
+
+    def close(self):
+        """Close the connection"""
+        with self._lock:
+            if self._conn is None:
+                return
+            self._conn.close()
+            self._conn = None
+        print("✓ SQLite connection closed")
+
+
+class SQLiteUserDB:
+    """User profiles stored as JSON documents"""
+
+    def __init__(self, db: SQLiteDB):
+        self.db = db
+
+    async def create_user(self, user_id: str, email: str = None, name: str = None, **kwargs) -> bool:
+        """Create a user profile if it doesn't exist yet"""
+        now = _timestamp(datetime.utcnow())
+        user_data = {
+            "user_id": user_id,
+            "email": email,
+            "name": name or (email.split('@')[0] if email else None),
+            "created_at": now,
+            "updated_at": now,
+            "last_active": now,
+            "total_predictions": 0,
+            "email_verified": kwargs.get("email_verified", False),
+            "preferences": {
+                "theme": "light",
+                "notifications_enabled": True,
+                "sound_enabled": True
+            },
+            "profile": {
+                "avatar_url": kwargs.get("avatar_url"),
+                "bio": kwargs.get("bio", ""),
+                "favorite_breeds": []
+            }
+        }
+        for key, value in kwargs.items():
+            if key not in user_data:
+                user_data[key] = value
+
+        def insert(conn):
+            conn.execute("INSERT OR IGNORE INTO users (user_id, data) VALUES (?, ?)",
+                         (user_id, json.dumps(user_data, default=str)))
+            return True
+
+        return await self.db.run(insert)
+
+    async def get_user(self, user_id: str) -> Optional[Dict]:
+        """Get user by ID"""
+        def select(conn):
+            return conn.execute("SELECT data FROM users WHERE user_id = ?", (user_id,)).fetchone()
+
+        row = await self.db.run(select)
+        return json.loads(row["data"]) if row else None
+
+    async def update_user(self, user_id: str, updates: Dict) -> bool:
+        """Update profile fields (see user_profile.PROFILE_FIELDS) on an existing user"""
+        updates = profile_updates(updates)
+
+        def update(conn):
+            row = conn.execute("SELECT data FROM users WHERE user_id = ?", (user_id,)).fetchone()
+            if not row:
+                return False
+            user_data = json.loads(row["data"])
+            user_data.update(updates)
+            user_data["updated_at"] = _timestamp(datetime.utcnow())
+            conn.execute("UPDATE users SET data = ? WHERE user_id = ?",
+                         (json.dumps(user_data, default=str), user_id))
+            return True
+
+        return await self.db.run(update)
+
+    async def update_last_active(self, user_id: str) -> bool:
+        """Update user's last active timestamp"""
+        return await self.update_last_active_many([user_id])
+
+    async def update_last_active_many(self, user_ids: List[str]) -> bool:
+        """Update last active timestamp for many users in one transaction"""
+        now = _timestamp(datetime.utcnow())
+
+        def update(conn):
+            conn.executemany(
+                "UPDATE users SET data = json_set(data, '$.last_active', ?) WHERE user_id = ?",
+                [(now, user_id) for user_id in user_ids]
+            )
+            return True
+
+        return await self.db.run(update)
+
+
+class SQLitePredictionDB:
+    """Predictions plus per-user breed statistics"""
+
+    def __init__(self, db: SQLiteDB):
+        self.db = db
+
+    def new_prediction_id(self) -> str:
+        """Generate a prediction ID client-side"""
+        return _new_id()
+
+    @staticmethod
+    def _insert(conn, records: List[Dict]):
+        """Insert records (existing IDs are skipped) and update breed stats for the new ones"""
+        inserted = []
+        for record in records:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO predictions (id, user_id, breed, confidence, image_name, "
+                "top_predictions, image_url, thumbnail_url, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (record["id"], record["user_id"], record["breed"], record["confidence"],
+                 record.get("image_name"), json.dumps(record.get("top_predictions") or []),
+                 record.get("image_url"), record.get("thumbnail_url"), record["created_at"])
+            )
+            if cursor.rowcount:
+                inserted.append(record)
+
+        for user_id, histogram in group_records(inserted).items():
+            conn.executemany(
+                "INSERT INTO breed_stats (user_id, breed_key, breed, count, confidence_sum, last_seen) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (user_id, breed_key) DO UPDATE SET "
+                "count = count + excluded.count, "
+                "confidence_sum = confidence_sum + excluded.confidence_sum, "
+                "last_seen = CASE WHEN excluded.last_seen > coalesce(last_seen, '') "
+                "THEN excluded.last_seen ELSE last_seen END",
+                [(user_id, key, entry["breed"], entry["count"], entry["confidence_sum"], entry["last_seen"])
+                 for key, entry in histogram.items()]
+            )
+
+    async def save_prediction(self, user_id: str, breed: str, confidence: float,
+                              image_name: str = None, top_predictions: List = None,
+                              image_url: str = None, thumbnail_url: str = None) -> Optional[str]:
+        """Save a prediction"""
+        prediction_id = self.new_prediction_id()
+        await self.db.run(self._insert, [{
+            "id": prediction_id,
+            "user_id": user_id,
+            "breed": breed,
+            "confidence": confidence,
+            "image_name": image_name,
+            "top_predictions": top_predictions,
+            "image_url": image_url,
+            "thumbnail_url": thumbnail_url,
+            "created_at": _timestamp(datetime.utcnow())
+        }])
+        return prediction_id
+
+    async def save_predictions_batch(self, records: List[Dict]) -> bool:
+        """Save many buffered predictions in one transaction (replayed records are skipped)"""
+        rows = [{
+            **record,
+            "created_at": _timestamp(datetime.fromisoformat(record["created_at"])
+                                     if record.get("created_at") else datetime.utcnow())
+        } for record in records]
+        await self.db.run(self._insert, rows)
+        return True
+
+    @staticmethod
+    def _to_response(row) -> Dict:
+        data = dict(row)
+        data["top_predictions"] = json.loads(data["top_predictions"] or "[]")
+        data["timestamp"] = _isoformat(data["timestamp"])
+        return data
+
+    async def get_user_predictions(self, user_id: str, limit: int = 50) -> List[Dict]:
+        """Get user's prediction history"""
+        def select(conn):
+            return conn.execute(
+                "SELECT * FROM predictions WHERE user_id = ? ORDER BY timestamp DESC, id DESC LIMIT ?",
+                (user_id, limit)
+            ).fetchall()
+
+        return [self._to_response(row) for row in await self.db.run(select)]
+
+    async def get_user_predictions_page(self, user_id: str, limit: int = HISTORY_DEFAULT_LIMIT,
+                                        cursor: Optional[str] = None) -> Dict:
+        """Get one page of a user's history (list fields only, keyset cursor)"""
+        limit = clamp_limit(limit)
+        after = decode_cursor(cursor)
+
+        def select(conn):
+            query = "SELECT id, breed, confidence, thumbnail_url, timestamp FROM predictions WHERE user_id = ?"
+            params = [user_id]
+            if after:
+                query += " AND (timestamp, id) < (?, ?)"
+                params += [_timestamp(after[0]), after[1]]
+            # One extra row tells us whether another page exists
+            query += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+            return conn.execute(query, params + [limit + 1]).fetchall()
+
+        rows = await self.db.run(select)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        next_cursor = None
+        if has_more and rows:
+            next_cursor = encode_cursor(datetime.fromisoformat(rows[-1]["timestamp"]), rows[-1]["id"])
+
+        return {
+            "predictions": [{
+                "id": row["id"],
+                "breed": row["breed"],
+                "confidence": row["confidence"],
+                "thumbnail_url": row["thumbnail_url"],
+                "timestamp": _isoformat(row["timestamp"])
+            } for row in rows],
+            "next_cursor": next_cursor,
+            "has_more": has_more
+        }
+
+    async def get_prediction(self, prediction_id: str, user_id: str) -> Optional[Dict]:
+        """Get the full document for one of a user's predictions"""
+        def select(conn):
+            return conn.execute("SELECT * FROM predictions WHERE id = ? AND user_id = ?",
+                                (prediction_id, user_id)).fetchone()
+
+        row = await self.db.run(select)
+        return self._to_response(row) if row else None
+
+    async def get_prediction_count(self, user_id: str) -> int:
+        """Get total number of predictions for a user (index-only count)"""
+        def count(conn):
+            return conn.execute("SELECT COUNT(*) FROM predictions WHERE user_id = ?", (user_id,)).fetchone()[0]
+
+        return await self.db.run(count)
+
+    async def delete_prediction(self, prediction_id: str, user_id: str = None) -> bool:
+        """Delete a specific prediction
+
+        When user_id is given, only that user's prediction can be deleted.
+        """
+        def delete(conn):
+            row = conn.execute("SELECT user_id, breed, confidence FROM predictions WHERE id = ?",
+                               (prediction_id,)).fetchone()
+            if not row or (user_id and row["user_id"] != user_id):
+                return False
+
+            conn.execute("DELETE FROM predictions WHERE id = ?", (prediction_id,))
+            conn.execute(
+                "UPDATE breed_stats SET count = count - 1, confidence_sum = confidence_sum - ? "
+                "WHERE user_id = ? AND breed_key = ?",
+                (row["confidence"] or 0.0, row["user_id"], breed_key(row["breed"]))
+            )
+            return True
+
+        return await self.db.run(delete)
+
+    async def get_breed_stats(self, user_id: str) -> List[Dict]:
+        """Get breed prediction statistics for a user"""
+        def select(conn):
+            return conn.execute("SELECT * FROM breed_stats WHERE user_id = ?", (user_id,)).fetchall()
+
+        return summarize({row["breed_key"]: dict(row) for row in await self.db.run(select)})
+
+    async def list_prediction_user_ids(self) -> List[str]:
+        """Get every user ID that owns at least one prediction"""
+        def select(conn):
+            return [row[0] for row in conn.execute("SELECT DISTINCT user_id FROM predictions")]
+
+        return await self.db.run(select)
+
+    @staticmethod
+    def _histogram(conn, user_id: str) -> Dict[str, Dict]:
+        rows = conn.execute("SELECT breed, confidence, timestamp FROM predictions WHERE user_id = ?",
+                            (user_id,)).fetchall()
+        records = [{
+            "user_id": user_id,
+            "breed": row["breed"],
+            "confidence": row["confidence"],
+            "created_at": _isoformat(row["timestamp"])
+        } for row in rows]
+        return group_records(records).get(user_id, {})
+
+    @staticmethod
+    def _write_histogram(conn, user_id: str, histogram: Dict[str, Dict]):
+        conn.execute("DELETE FROM breed_stats WHERE user_id = ?", (user_id,))
+        conn.executemany(
+            "INSERT INTO breed_stats (user_id, breed_key, breed, count, confidence_sum, last_seen) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(user_id, key, entry["breed"], entry["count"], entry["confidence_sum"], entry.get("last_seen"))
+             for key, entry in histogram.items()]
+        )
+
+    async def compute_breed_histogram(self, user_id: str) -> Dict[str, Dict]:
+        """Build a user's breed histogram from their predictions"""
+        return await self.db.run(self._histogram, user_id)
+
+    async def seed_breed_stats(self, user_id: str) -> bool:
+        """Build a user's stats from their history unless they are already maintained"""
+        def seed(conn):
+            if conn.execute("SELECT 1 FROM breed_stats WHERE user_id = ? LIMIT 1", (user_id,)).fetchone():
+                return False
+            self._write_histogram(conn, user_id, self._histogram(conn, user_id))
+            return True
+
+        return await self.db.run(seed)
+
+    async def write_breed_stats(self, user_id: str, histogram: Dict[str, Dict]) -> bool:
+        """Overwrite a user's stats (used by the backfill)"""
+        def write(conn):
+            self._write_histogram(conn, user_id, histogram)
+            return True
+
+        return await self.db.run(write)
+
+
+class SQLiteFeedbackDB:
+    """Feedback entries stored as JSON documents with indexed filter columns"""
+
+    def __init__(self, db: SQLiteDB):
+        self.db = db
+
+    @staticmethod
+    def _to_response(row) -> Dict:
+        data = json.loads(row["data"])
+        data["id"] = row["id"]
+        for field in ("created_at", "updated_at", "admin_responded_at"):
+            data[field] = _isoformat(data.get(field))
+        return data
+
+    async def _select(self, where: str, params: list, limit: int) -> List[Dict]:
+        def select(conn):
+            return conn.execute(
+                f"SELECT id, data FROM feedback WHERE {where} ORDER BY created_at DESC LIMIT ?",
+                params + [limit]
+            ).fetchall()
+
+        return [self._to_response(row) for row in await self.db.run(select)]
+
+    async def _update(self, feedback_id: str, changes: Dict) -> bool:
+        def update(conn):
+            row = conn.execute("SELECT data FROM feedback WHERE id = ?", (feedback_id,)).fetchone()
+            if not row:
+                return False
+            data = json.loads(row["data"])
+            data.update(changes)
+            data["updated_at"] = _timestamp(datetime.utcnow())
+            conn.execute("UPDATE feedback SET status = ?, is_private = ?, data = ? WHERE id = ?",
+                         (data["status"], int(data["is_private"]), json.dumps(data), feedback_id))
+            return True
+
+        return await self.db.run(update)
+
+    async def submit_feedback(
+        self,
+        user_id: str,
+        feedback_type: str,
+        message: str,
+        rating: Optional[int] = None,
+        prediction_id: Optional[str] = None,
+        breed_predicted: Optional[str] = None,
+        actual_breed: Optional[str] = None,
+        is_private: bool = False,
+        metadata: Optional[Dict] = None
+    ) -> str:
+        """Submit new feedback"""
+        now = _timestamp(datetime.utcnow())
+        feedback_id = _new_id()
+        feedback_data = {
+            'user_id': user_id,
+            'type': feedback_type,
+            'message': message,
+            'rating': rating,
+            'prediction_id': prediction_id,
+            'breed_predicted': breed_predicted,
+            'actual_breed': actual_breed,
+            'is_private': is_private,
+            'status': 'pending',
+            'created_at': now,
+            'updated_at': now,
+            'metadata': metadata or {},
+            'admin_response': None,
+            'admin_responded_at': None,
+            'helpful_count': 0
+        }
+
+        def insert(conn):
+            conn.execute(
+                "INSERT INTO feedback (id, user_id, type, status, is_private, created_at, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (feedback_id, user_id, feedback_type, 'pending', int(is_private), now,
+                 json.dumps(feedback_data, default=str))
+            )
+
+        await self.db.run(insert)
+        return feedback_id
+
+    async def get_user_feedback(self, user_id: str, limit: int = 50,
+                                feedback_type: Optional[str] = None) -> List[Dict]:
+        """Get all feedback from a specific user"""
+        if feedback_type:
+            return await self._select("user_id = ? AND type = ?", [user_id, feedback_type], limit)
+        return await self._select("user_id = ?", [user_id], limit)
+
+    async def get_all_feedback(self, limit: int = 100, status: Optional[str] = None,
+                               feedback_type: Optional[str] = None) -> List[Dict]:
+        """Get all feedback (for admin)"""
+        clauses, params = ["1 = 1"], []
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if feedback_type:
+            clauses.append("type = ?")
+            params.append(feedback_type)
+        return await self._select(" AND ".join(clauses), params, limit)
+
+    async def get_public_feedback(self, limit: int = 50,
+                                  feedback_type: Optional[str] = None) -> List[Dict]:
+        """Get public feedback with the author anonymized"""
+        if feedback_type:
+            feedback_list = await self._select("is_private = 0 AND type = ?", [feedback_type], limit)
+        else:
+            feedback_list = await self._select("is_private = 0", [], limit)
+        for feedback_data in feedback_list:
+            feedback_data['user_id'] = 'anonymous'
+        return feedback_list
+
+    async def get_feedback(self, feedback_id: str) -> Optional[Dict]:
+        """Get a single feedback entry (None if it doesn't exist)"""
+        def select(conn):
+            return conn.execute("SELECT id, data FROM feedback WHERE id = ?", (feedback_id,)).fetchone()
+
+        row = await self.db.run(select)
+        return self._to_response(row) if row else None
+
+    async def update_feedback_privacy(self, feedback_id: str, is_private: bool) -> bool:
+        """Change whether a feedback entry is private"""
+        return await self._update(feedback_id, {'is_private': is_private})
+
+    async def update_feedback_status(self, feedback_id: str, status: str,
+                                     admin_response: Optional[str] = None) -> bool:
+        """Update feedback status (for admin)"""
+        changes = {'status': status}
+        if admin_response:
+            changes['admin_response'] = admin_response
+            changes['admin_responded_at'] = _timestamp(datetime.utcnow())
+        return await self._update(feedback_id, changes)
+
+    async def get_feedback_stats(self) -> Dict:
+        """Get feedback statistics"""
+        def aggregate(conn):
+            return conn.execute(
+                "SELECT type, status, is_private, json_extract(data, '$.rating') AS rating FROM feedback"
+            ).fetchall()
+
+        stats = {
+            'total': 0,
+            'by_type': {
+                'prediction_correct': 0,
+                'prediction_wrong': 0,
+                'feature': 0,
+                'bug': 0,
+                'general': 0
+            },
+            'by_status': {'pending': 0, 'reviewed': 0, 'resolved': 0},
+            'average_rating': 0,
+            'total_ratings': 0,
+            'prediction_accuracy': 0,
+            'public_feedback': 0,
+            'private_feedback': 0
+        }
+
+        ratings = []
+        for row in await self.db.run(aggregate):
+            stats['total'] += 1
+            stats['private_feedback' if row['is_private'] else 'public_feedback'] += 1
+            if row['type'] in stats['by_type']:
+                stats['by_type'][row['type']] += 1
+            if row['status'] in stats['by_status']:
+                stats['by_status'][row['status']] += 1
+            if row['rating']:
+                ratings.append(row['rating'])
+
+        if ratings:
+            stats['average_rating'] = round(sum(ratings) / len(ratings), 2)
+            stats['total_ratings'] = len(ratings)
+
+        correct = stats['by_type']['prediction_correct']
+        total_prediction_feedback = correct + stats['by_type']['prediction_wrong']
+        if total_prediction_feedback > 0:
+            stats['prediction_accuracy'] = round((correct / total_prediction_feedback) * 100, 2)
+
+        return stats
+
+
+class SQLiteVaccinationDB(VaccinationDB):
+    """Vaccination records stored as JSON documents"""
+
+    def __init__(self, db: SQLiteDB):
+        self.db = db
+
+    @staticmethod
+    def _to_response(row) -> Dict:
+        data = json.loads(row["data"])
+        data['id'] = row["id"]
+        data['created_at'] = _isoformat(data.get('created_at'))
+        data['updated_at'] = _isoformat(data.get('updated_at'))
+        return data
+
+    async def create_vaccination(
+        self,
+        user_id: str,
+        name: str,
+        due_date: str,
+        status: str = "pending",
+        last_date: Optional[str] = None,
+        notes: str = "",
+        required: bool = False,
+        pet_name: Optional[str] = None
+    ) -> str:
+        """Create a new vaccination record"""
+        now = _timestamp(datetime.utcnow())
+        vaccination_id = _new_id()
+        vaccination_data = {
+            "user_id": user_id,
+            "name": name,
+            "due_date": due_date,
+            "status": status,
+            "last_date": last_date,
+            "notes": notes,
+            "required": required,
+            "pet_name": pet_name,
+            "created_at": now,
+            "updated_at": now
+        }
+
+        def insert(conn):
+            conn.execute(
+                "INSERT INTO vaccinations (id, user_id, due_date, status, data) VALUES (?, ?, ?, ?, ?)",
+                (vaccination_id, user_id, due_date, status, json.dumps(vaccination_data))
+            )
+
+        await self.db.run(insert)
+        return vaccination_id
+
+    async def get_user_vaccinations(self, user_id: str, limit: int = 100,
+                                    status: Optional[str] = None) -> List[Dict]:
+        """Get all vaccinations for a user"""
+        def select(conn):
+            query = "SELECT id, data FROM vaccinations WHERE user_id = ?"
+            params = [user_id]
+            if status:
+                query += " AND status = ?"
+                params.append(status)
+            return conn.execute(query + " ORDER BY due_date LIMIT ?", params + [limit]).fetchall()
+
+        return [self._to_response(row) for row in await self.db.run(select)]
+
+    async def get_vaccination_by_id(self, vaccination_id: str, user_id: str) -> Optional[Dict]:
+        """Get a specific vaccination by ID (with user ownership check)"""
+        def select(conn):
+            return conn.execute("SELECT id, data FROM vaccinations WHERE id = ? AND user_id = ?",
+                                (vaccination_id, user_id)).fetchone()
+
+        row = await self.db.run(select)
+        return self._to_response(row) if row else None
+
+    async def update_vaccination(self, vaccination_id: str, user_id: str, update_data: Dict) -> bool:
+        """Update a vaccination record"""
+        def update(conn):
+            row = conn.execute("SELECT data FROM vaccinations WHERE id = ? AND user_id = ?",
+                               (vaccination_id, user_id)).fetchone()
+            if not row:
+                return False
+            data = json.loads(row["data"])
+            data.update(update_data)
+            data["updated_at"] = _timestamp(datetime.utcnow())
+            conn.execute("UPDATE vaccinations SET due_date = ?, status = ?, data = ? WHERE id = ?",
+                         (data.get("due_date"), data.get("status"), json.dumps(data, default=str),
+                          vaccination_id))
+            return True
+
+        return await self.db.run(update)
+
+    async def delete_vaccination(self, vaccination_id: str, user_id: str) -> bool:
+        """Delete a vaccination record"""
+        def delete(conn):
+            cursor = conn.execute("DELETE FROM vaccinations WHERE id = ? AND user_id = ?",
+                                  (vaccination_id, user_id))
+            return cursor.rowcount > 0
+
+        return await self.db.run(delete)
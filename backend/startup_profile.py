@@ -0,0 +1,78 @@
+"""
+Startup Profile
+Records how long each startup phase (imports, catalogs, TensorFlow import,
+model load, storage, ...) takes and when it ran, measured from the moment
+this module was first imported. Reported through /ready and /metrics and
+printed once startup has finished.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+
+class StartupProfile:
+    """Wall-clock phases of process startup (thread-safe)"""
+
+    def __init__(self, origin: Optional[float] = None):
+        self.origin = origin if origin is not None else time.perf_counter()
+        self._lock = threading.Lock()
+        self._phases: List[Dict] = []
+        self.completed_ms: Optional[float] = None
+
+    def _offset_ms(self, moment: float) -> float:
+        return round((moment - self.origin) * 1000, 1)
+
+    def record(self, name: str, started: float, ended: Optional[float] = None, ok: bool = True):
+        """Record a phase from perf_counter() timestamps"""
+        ended = ended if ended is not None else time.perf_counter()
+        with self._lock:
+            self._phases.append({
+                "name": name,
+                "start_ms": self._offset_ms(started),
+                "duration_ms": round((ended - started) * 1000, 1),
+                "ok": ok
+            })
+
+    def mark(self, name: str):
+        """Record a phase that ran from process start until now (e.g. module imports)"""
+        self.record(name, self.origin)
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time the enclosed block as one phase"""
+        started = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.record(name, started, ok=ok)
+
+    def complete(self):
+        """Mark startup as finished"""
+        self.completed_ms = self._offset_ms(time.perf_counter())
+
+    def report(self) -> Dict:
+        """Phases ordered by start time plus the total"""
+        with self._lock:
+            phases = sorted(self._phases, key=lambda p: p["start_ms"])
+        return {
+            "completed": self.completed_ms is not None,
+            "total_ms": self.completed_ms,
+            "phases": phases
+        }
+
+    def print_report(self):
+        """Print the phase breakdown"""
+        report = self.report()
+        print(f"\n⏱️  Startup profile (total {report['total_ms']} ms)")
+        for phase in report["phases"]:
+            status = "✓" if phase["ok"] else "✗"
+            print(f"  {status} {phase['name']:<20} start {phase['start_ms']:>9.1f} ms"
+                  f"   took {phase['duration_ms']:>9.1f} ms")
+
+
+# Global instance: the clock starts when the process first imports this module
+startup_profile = StartupProfile()
@@ -3,9 +3,10 @@ Sync Clerk Users to Firebase
 This script fetches all users from Clerk and syncs them to Firebase/MongoDB
 """
 
+import asyncio
 import os
-import requests
 from dotenv import load_dotenv
+from http_client import get_session
 from firebase_db import firebase_user_db, firebase_db
 from database import user_db as mongo_user_db
 from datetime import datetime
@@ -25,6 +26,7 @@ class ClerkUserSync:
             "Authorization": f"Bearer {self.secret_key}",
             "Content-Type": "application/json"
         }
+        self.session = get_session()
     
     def get_all_users(self, limit=100, offset=0):
         """Fetch all users from Clerk API"""
@@ -40,7 +42,7 @@ class ClerkUserSync:
                     "offset": offset
                 }
                 
-                response = requests.get(url, headers=self.headers, params=params)
+                response = self.session.get(url, headers=self.headers, params=params)
                 
                 if response.status_code != 200:
                     print(f"❌ Error: {response.status_code}")
@@ -72,7 +74,7 @@ class ClerkUserSync:
         """Get detailed information for a specific user"""
         try:
             url = f"{self.base_url}/users/{user_id}"
-            response = requests.get(url, headers=self.headers)
+            response = self.session.get(url, headers=self.headers)
             
             if response.status_code == 200:
                 return response.json()
@@ -131,7 +133,7 @@ class ClerkUserSync:
             print(f"❌ Error parsing user: {e}")
             return None
     
-    def sync_to_firebase(self, users):
+    async def sync_to_firebase(self, users):
         """Sync users to Firebase"""
         if not firebase_db.is_connected():
             print("❌ Firebase is not connected!")
@@ -147,7 +149,7 @@ class ClerkUserSync:
                 user_id = user_data["user_id"]
                 
                 # Check if user already exists
-                existing_user = firebase_user_db.get_user(user_id)
+                existing_user = await firebase_user_db.get_user(user_id)
                 
                 if existing_user:
                     print(f"⏭️  User {user_data['email']} already exists - skipping")
@@ -155,7 +157,7 @@ class ClerkUserSync:
                     continue
                 
                 # Create user in Firebase
-                success = firebase_user_db.create_user(
+                success = await firebase_user_db.create_user(
                     user_id=user_id,
                     email=user_data["email"],
                     name=user_data["name"],
@@ -182,7 +184,7 @@ class ClerkUserSync:
         
         return success_count
     
-    def sync_to_mongodb(self, users):
+    async def sync_to_mongodb(self, users):
         """Sync users to MongoDB"""
         print("\n🍃 Syncing users to MongoDB...")
         success_count = 0
@@ -194,7 +196,7 @@ class ClerkUserSync:
                 user_id = user_data["user_id"]
                 
                 # Check if user already exists
-                existing_user = mongo_user_db.get_user(user_id)
+                existing_user = await mongo_user_db.get_user(user_id)
                 
                 if existing_user:
                     print(f"⏭️  User {user_data['email']} already exists - skipping")
@@ -202,7 +204,7 @@ class ClerkUserSync:
                     continue
                 
                 # Create user in MongoDB
-                mongo_user_db.create_or_update_user(
+                await mongo_user_db.create_or_update_user(
                     user_id=user_id,
                     email=user_data["email"],
                     name=user_data["name"]
@@ -307,14 +309,14 @@ def main():
         choice = input("\nEnter your choice (1-6): ").strip()
         
         if choice == "1":
-            sync.sync_to_firebase(parsed_users)
+            asyncio.run(sync.sync_to_firebase(parsed_users))
         
         elif choice == "2":
-            sync.sync_to_mongodb(parsed_users)
+            asyncio.run(sync.sync_to_mongodb(parsed_users))
         
         elif choice == "3":
-            sync.sync_to_firebase(parsed_users)
-            sync.sync_to_mongodb(parsed_users)
+            asyncio.run(sync.sync_to_firebase(parsed_users))
+            asyncio.run(sync.sync_to_mongodb(parsed_users))
         
         elif choice == "4":
             filename = input("Enter filename (default: clerk_users.json): ").strip()
@@ -0,0 +1,172 @@
+"""
+Auth Test Script
+Checks the JWKS key manager (one in-flight fetch shared by concurrent
+callers, unknown-kid refetch with a cooldown), that async verification
+never refetches the JWKS on the event loop, and the verified-token cache
+(expiry before exp, LRU eviction)
+"""
+
+import asyncio
+import sys
+import threading
+import time
+
+from fastapi import HTTPException
+
+import auth
+from auth import JWKSKeyManager, VerifiedTokenCache
+from mint_tokens import build_jwks, generate_signing_key, mint_token
+
+
+class FakeFetcher:
+    """JWKS source that serves `jwks`, optionally blocking until released"""
+
+    def __init__(self, jwks):
+        self.jwks = jwks
+        self.calls = 0
+        self.threads = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self):
+        self.calls += 1
+        self.threads.append(threading.current_thread())
+        self.release.wait(5)
+        return self.jwks
+
+
+def test_refresh_coalescing():
+    """Concurrent refreshes share one fetch"""
+    print("\n🔑 Refresh coalescing")
+    key, kid = generate_signing_key()
+    fetcher = FakeFetcher(build_jwks(key, kid))
+    fetcher.release.clear()
+    manager = JWKSKeyManager(fetcher)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(manager.refresh())) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.2)
+    fetcher.release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == [True] * 5, f"Every caller should see the keys: {results}"
+    assert fetcher.calls == 1, f"Expected one fetch, got {fetcher.calls}"
+    assert manager.get_cached_key(kid) is not None
+
+
+def test_unknown_kid_refetch_and_cooldown():
+    """An unknown kid refetches once per cooldown and picks up rotated keys"""
+    print("\n🔄 Unknown kid refetch")
+    old_key, old_kid = generate_signing_key()
+    new_key, new_kid = generate_signing_key()
+    fetcher = FakeFetcher(build_jwks(old_key, old_kid))
+    manager = JWKSKeyManager(fetcher, unknown_kid_interval=0.3)
+    try:
+        assert manager.get_signing_key(old_kid) is not None
+        assert fetcher.calls == 1
+
+        # A bad kid refetches once, then the cooldown holds further fetches
+        assert manager.get_signing_key("bogus") is None
+        assert manager.get_signing_key("bogus") is None
+        assert fetcher.calls == 1, f"Cooldown should suppress refetches, got {fetcher.calls}"
+
+        # After the cooldown a rotated key is fetched on demand
+        fetcher.jwks = build_jwks(new_key, new_kid)
+        time.sleep(0.35)
+        assert manager.get_signing_key(new_kid) is not None
+        assert fetcher.calls == 2
+        assert manager.get_cached_key(old_kid) is None
+    finally:
+        manager.stop()
+
+
+def test_async_verify_stays_off_the_loop():
+    """JWKS fetches for unknown kids run in the threadpool, never on the event loop"""
+    print("\n🧵 Async verification")
+    key, kid = generate_signing_key()
+    other_key, other_kid = generate_signing_key()
+    fetcher = FakeFetcher(build_jwks(key, kid))
+    manager = JWKSKeyManager(fetcher, unknown_kid_interval=0, retry_interval=0)
+    original = auth.jwks_manager
+    auth.jwks_manager = manager
+    auth.token_cache.clear()
+    try:
+        loop_thread = threading.current_thread()
+        payload = asyncio.run(auth.averify_clerk_token(mint_token(key, kid, sub="user_a")))
+        assert payload["sub"] == "user_a"
+
+        try:
+            asyncio.run(auth.averify_clerk_token(mint_token(other_key, other_kid)))
+            raise AssertionError("Token signed with an unknown key should be rejected")
+        except HTTPException as e:
+            assert e.status_code == 401
+
+        assert fetcher.calls == 2, f"Expected one fetch per unknown kid, got {fetcher.calls}"
+        assert loop_thread not in fetcher.threads, "JWKS was fetched on the event loop"
+    finally:
+        auth.jwks_manager = original
+        auth.token_cache.clear()
+        manager.stop()
+
+
+def test_token_cache_expiry():
+    """Claims are served until expiry_margin before exp, and never cached past it"""
+    print("\n⌛ Token cache expiry")
+    cache = VerifiedTokenCache(max_size=10, expiry_margin=5)
+    now = time.time()
+
+    cache.put("fresh", {"sub": "a", "exp": now + 60})
+    cache.put("closing", {"sub": "b", "exp": now + 5.5})
+    cache.put("inside-margin", {"sub": "c", "exp": now + 3})
+    cache.put("no-exp", {"sub": "d"})
+    assert cache.get("fresh") == {"sub": "a", "exp": now + 60}
+    assert cache.get("inside-margin") is None
+    assert cache.get("no-exp") is None
+
+    time.sleep(0.6)
+    assert cache.get("closing") is None, "Entry should expire expiry_margin before exp"
+    stats = cache.stats()
+    assert (stats["size"], stats["hits"], stats["misses"]) == (1, 1, 3), stats
+
+
+def test_token_cache_eviction():
+    """Past max_size the least recently used token goes"""
+    print("\n🧹 Token cache eviction")
+    cache = VerifiedTokenCache(max_size=2)
+    exp = time.time() + 60
+    cache.put("a", {"sub": "a", "exp": exp})
+    cache.put("b", {"sub": "b", "exp": exp})
+    assert cache.get("a") is not None
+    cache.put("c", {"sub": "c", "exp": exp})
+
+    assert cache.get("b") is None, "Least recently used token should be evicted"
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+    disabled = VerifiedTokenCache(max_size=0)
+    disabled.put("a", {"sub": "a", "exp": exp})
+    assert disabled.get("a") is None
+
+
+def main():
+    """Run all tests"""
+    tests = [test_refresh_coalescing, test_unknown_kid_refetch_and_cooldown,
+             test_async_verify_stays_off_the_loop, test_token_cache_expiry, test_token_cache_eviction]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,319 @@
+"""
+Batch Scheduler Test Script
+Checks the latency model, that requests are not held at low load, that bursts
+are batched with every caller getting its own row back, that overload is
+shed with OverloadedError while served requests stay within the SLO, and that
+priority lanes share the model by weight with an optional per-user quota
+"""
+
+import asyncio
+import sys
+import time
+
+import numpy as np
+
+from batch_scheduler import (LANE_ANONYMOUS, LANE_AUTHENTICATED, AdaptiveBatchScheduler, LatencyModel,
+                             OverloadedError, QuotaExceededError, parse_lane_weights)
+
+
+class SleepModel:
+    """Forward pass of base_ms + per_item_ms per row; each output row echoes its input"""
+
+    def __init__(self, base_ms=5, per_item_ms=1):
+        self.base_ms = base_ms
+        self.per_item_ms = per_item_ms
+        self.batch_sizes = []
+
+    def predict(self, batch):
+        self.batch_sizes.append(batch.shape[0])
+        time.sleep((self.base_ms + self.per_item_ms * batch.shape[0]) / 1000)
+        return batch * 2
+
+
+def row(value):
+    return np.full((3,), value, dtype=np.float32)
+
+
+def test_latency_model():
+    """Measured sizes are averaged; unseen sizes are interpolated from a line"""
+    print("\n📈 Latency model")
+    model = LatencyModel(initial_ms=10)
+    assert model.estimate(4) == 40
+
+    model.observe(1, 12)
+    assert model.estimate(1) == 12
+    assert model.estimate(4) == 48
+
+    model.observe(8, 40)
+    estimate = model.estimate(4)
+    print(f"   1→12 ms, 8→40 ms, estimated 4→{estimate:.1f} ms")
+    assert 12 < estimate < 40
+    assert model.snapshot() == {"1": 12.0, "8": 40.0}
+
+
+def test_low_load_dispatches_immediately():
+    """A lone request is not held waiting for a batch to fill"""
+    print("\n🏃 Low load")
+
+    async def run():
+        model = SleepModel(base_ms=5)
+        scheduler = AdaptiveBatchScheduler(model.predict, slo_ms=1000, max_batch=8)
+        timings = []
+        for i in range(5):
+            start = time.perf_counter()
+            result = await scheduler.submit(row(i))
+            timings.append((time.perf_counter() - start) * 1000)
+            assert result.tolist() == [2.0 * i] * 3
+            await asyncio.sleep(0.05)
+        await scheduler.close()
+        return model, timings
+
+    model, timings = asyncio.run(run())
+    print(f"   latencies {[round(ms, 1) for ms in timings]} ms")
+    assert model.batch_sizes == [1] * 5
+    assert max(timings) < 50
+
+
+def test_burst_is_batched():
+    """Concurrent requests share padded batches and get their own rows back"""
+    print("\n🧺 Burst")
+
+    async def run():
+        model = SleepModel(base_ms=20)
+        scheduler = AdaptiveBatchScheduler(model.predict, slo_ms=2000, max_batch=8)
+        results = await asyncio.gather(*(scheduler.submit(row(i)) for i in range(20)))
+        stats = scheduler.stats()
+        await scheduler.close()
+        return model, results, stats
+
+    model, results, stats = asyncio.run(run())
+    print(f"   {stats['completed']} requests in {stats['batches']} batches, sizes {model.batch_sizes}")
+    assert [r[0] for r in results] == [2.0 * i for i in range(20)]
+    assert stats["completed"] == 20
+    assert stats["avg_batch"] > 2
+    assert set(model.batch_sizes) <= {1, 2, 4, 8}
+    assert stats["latency_model_ms"]
+
+
+def test_overload_is_shed():
+    """Past capacity requests fail fast and the served ones stay near the SLO"""
+    print("\n🚦 Overload")
+    slo_ms = 200
+
+    async def run():
+        model = SleepModel(base_ms=40, per_item_ms=5)
+        scheduler = AdaptiveBatchScheduler(model.predict, slo_ms=slo_ms, max_batch=4,
+                                           latency_model=LatencyModel(initial_ms=45))
+        served, shed = [], 0
+
+        async def one(i):
+            nonlocal shed
+            start = time.perf_counter()
+            try:
+                await scheduler.submit(row(i))
+                served.append((time.perf_counter() - start) * 1000)
+            except OverloadedError:
+                shed += 1
+
+        # ~65 requests/s of capacity, 200 requests/s offered
+        tasks = []
+        for i in range(200):
+            tasks.append(asyncio.create_task(one(i)))
+            await asyncio.sleep(0.005)
+        await asyncio.gather(*tasks)
+        stats = scheduler.stats()
+        await scheduler.close()
+        return served, shed, stats
+
+    served, shed, stats = asyncio.run(run())
+    p95 = float(np.percentile(served, 95))
+    print(f"   served {len(served)}, shed {shed} (early {stats['shed_early']}, late {stats['shed_late']}), "
+          f"p95 {p95:.0f} ms")
+    assert shed > 0 and served
+    assert shed == stats["shed_early"] + stats["shed_late"]
+    assert p95 < slo_ms * 1.25
+
+
+def test_errors_propagate():
+    """A failing forward pass fails every request in its batch, and the scheduler keeps going"""
+    print("\n💥 Errors")
+    calls = []
+
+    def predict(batch):
+        calls.append(batch.shape[0])
+        if len(calls) == 1:
+            raise RuntimeError("model exploded")
+        return batch
+
+    async def run():
+        scheduler = AdaptiveBatchScheduler(predict, slo_ms=1000, max_batch=4)
+        try:
+            await scheduler.submit(row(1))
+            assert False, "expected RuntimeError"
+        except RuntimeError as e:
+            assert "exploded" in str(e)
+        result = await scheduler.submit(row(2))
+        stats = scheduler.stats()
+        await scheduler.close()
+        return result, stats
+
+    result, stats = asyncio.run(run())
+    assert result.tolist() == [2.0] * 3
+    assert stats["errors"] == 1
+
+
+def test_lane_weights():
+    """Batches take authenticated requests by weight without starving anonymous ones"""
+    print("\n🛣️  Lane weights")
+    assert parse_lane_weights("authenticated:3") == {LANE_AUTHENTICATED: 3.0, LANE_ANONYMOUS: 1.0}
+
+    async def run():
+        model = SleepModel(base_ms=5)
+        scheduler = AdaptiveBatchScheduler(model.predict, slo_ms=5000, max_batch=4,
+                                           lane_weights={LANE_AUTHENTICATED: 4, LANE_ANONYMOUS: 1})
+        order = []
+
+        async def one(value, lane):
+            await scheduler.submit(row(value), lane)
+            order.append(lane)
+
+        # Anonymous traffic queued first, then a burst of authenticated traffic
+        await asyncio.gather(*([one(100 + i, LANE_ANONYMOUS) for i in range(20)]
+                               + [one(i, LANE_AUTHENTICATED) for i in range(20)]))
+        stats = scheduler.stats()
+        await scheduler.close()
+        return order, stats
+
+    order, stats = asyncio.run(run())
+    first = order[:20]
+    print(f"   first 20 served: {first.count(LANE_AUTHENTICATED)} authenticated, "
+          f"{first.count(LANE_ANONYMOUS)} anonymous")
+    assert first.count(LANE_AUTHENTICATED) >= 14
+    assert first.count(LANE_ANONYMOUS) >= 2
+    assert stats["lanes"][LANE_AUTHENTICATED]["completed"] == 20
+    assert stats["lanes"][LANE_ANONYMOUS]["completed"] == 20
+    assert stats["lanes"][LANE_ANONYMOUS]["queue_depth"] == 0
+
+
+def test_anonymous_shed_first():
+    """Under overload the anonymous lane absorbs most of the shedding"""
+    print("\n🚦 Lane shedding")
+
+    async def run():
+        model = SleepModel(base_ms=40, per_item_ms=5)
+        scheduler = AdaptiveBatchScheduler(model.predict, slo_ms=200, max_batch=4,
+                                           latency_model=LatencyModel(initial_ms=45))
+        outcomes = {LANE_AUTHENTICATED: [0, 0], LANE_ANONYMOUS: [0, 0]}
+
+        async def one(i, lane):
+            try:
+                await scheduler.submit(row(i), lane)
+                outcomes[lane][0] += 1
+            except OverloadedError:
+                outcomes[lane][1] += 1
+
+        tasks = []
+        for i in range(200):
+            tasks.append(asyncio.create_task(one(i, LANE_AUTHENTICATED if i % 2 else LANE_ANONYMOUS)))
+            await asyncio.sleep(0.005)
+        await asyncio.gather(*tasks)
+        stats = scheduler.stats()
+        await scheduler.close()
+        return outcomes, stats
+
+    outcomes, stats = asyncio.run(run())
+    auth_served, auth_shed = outcomes[LANE_AUTHENTICATED]
+    anon_served, anon_shed = outcomes[LANE_ANONYMOUS]
+    print(f"   authenticated served {auth_served} / shed {auth_shed}, "
+          f"anonymous served {anon_served} / shed {anon_shed}")
+    assert auth_served > 2 * anon_served
+    assert anon_served > 0
+    assert stats["lanes"][LANE_ANONYMOUS]["shed"] == anon_shed
+
+
+def test_user_quota():
+    """A user over the in-flight quota gets QuotaExceededError; others and later requests are unaffected"""
+    print("\n🎟️  User quota")
+
+    async def run():
+        model = SleepModel(base_ms=20)
+        scheduler = AdaptiveBatchScheduler(model.predict, slo_ms=5000, max_batch=8, user_max_in_flight=2)
+        results = await asyncio.gather(
+            *(scheduler.submit(row(i), LANE_AUTHENTICATED, "alice") for i in range(3)),
+            scheduler.submit(row(9), LANE_AUTHENTICATED, "bob"),
+            return_exceptions=True
+        )
+        later = await scheduler.submit(row(5), LANE_AUTHENTICATED, "alice")
+        stats = scheduler.stats()
+        await scheduler.close()
+        return results, later, stats
+
+    results, later, stats = asyncio.run(run())
+    assert isinstance(results[2], QuotaExceededError)
+    assert results[0][0] == 0.0 and results[1][0] == 2.0 and results[3][0] == 18.0
+    assert later[0] == 10.0
+    assert stats["quota_rejected"] == 1
+    assert stats["users_in_flight"] == 0
+
+
+def test_submit_many():
+    """One image's rows count once against the quota; a failed row withdraws its queued siblings"""
+    print("\n🧩 Multi-row requests")
+
+    async def run():
+        model = SleepModel(base_ms=20)
+        scheduler = AdaptiveBatchScheduler(model.predict, slo_ms=5000, max_batch=8, user_max_in_flight=1)
+        views = np.stack([row(i) for i in range(8)])
+        first = asyncio.ensure_future(scheduler.submit_many(views, LANE_AUTHENTICATED, "alice"))
+        await asyncio.sleep(0)
+        try:
+            await scheduler.submit_many(views[:2], LANE_AUTHENTICATED, "alice")
+            second = None
+        except QuotaExceededError as e:
+            second = e
+        outputs = await first
+        await scheduler.close()
+
+        def failing(batch):
+            model.batch_sizes.append(batch.shape[0])
+            raise RuntimeError("model crashed")
+
+        model.batch_sizes = []
+        scheduler = AdaptiveBatchScheduler(failing, slo_ms=5000, max_batch=2, user_max_in_flight=1)
+        try:
+            await scheduler.submit_many(views[:6], LANE_AUTHENTICATED, "alice")
+            error = None
+        except RuntimeError as e:
+            error = e
+        await asyncio.sleep(0.05)
+        stats = scheduler.stats()
+        await scheduler.close()
+        return outputs, second, error, model.batch_sizes, stats
+
+    outputs, second, error, batch_sizes, stats = asyncio.run(run())
+    assert outputs.shape == (8, 3) and outputs[:, 0].tolist() == [2.0 * i for i in range(8)]
+    assert isinstance(second, QuotaExceededError)
+    assert error is not None and batch_sizes == [2]
+    assert stats["queue_depth"] == 0 and stats["users_in_flight"] == 0
+
+
+def main():
+    """Run all tests"""
+    tests = [test_latency_model, test_low_load_dispatches_immediately, test_burst_is_batched,
+             test_overload_is_shed, test_errors_propagate, test_lane_weights, test_anonymous_shed_first,
+             test_user_quota, test_submit_many]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
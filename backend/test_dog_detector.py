@@ -0,0 +1,133 @@
+"""
+Dog Detector Test Script
+Checks that SSD detections become dog boxes (class and score filtering,
+margins, ordering), that a loaded detector feeds its interpreter correctly,
+and that crops are batched for the classifier
+"""
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+import dog_detector
+from dog_detector import Box, DogDetector, dog_boxes
+from model_runtime import preprocess_crops
+
+DOG, CAT = 17, 16
+
+
+def test_dog_boxes():
+    """Only confident dogs are kept, best first, grown by the margin and clamped to the image"""
+    print("\n📦 Dog boxes")
+    boxes = np.array([
+        [0.1, 0.1, 0.5, 0.5],    # dog
+        [0.0, 0.5, 0.5, 1.0],    # better dog at the right edge
+        [0.2, 0.2, 0.4, 0.4],    # cat
+        [0.6, 0.6, 0.9, 0.9]     # unsure dog
+    ])
+    classes = np.array([DOG, DOG, CAT, DOG], dtype=np.float32)
+    scores = np.array([0.8, 0.9, 0.95, 0.3])
+
+    dogs = dog_boxes(boxes, classes, scores, 200, 100, dog_class=DOG, min_score=0.4, margin=0.1)
+    print(f"   {dogs}")
+    assert dogs == [Box(90, 0, 200, 55, 0.9), Box(12, 6, 108, 54, 0.8)]
+    assert dog_boxes(boxes, classes, scores, 200, 100, dog_class=DOG, max_dogs=1) == dogs[:1]
+    assert dog_boxes(boxes, classes, scores, 200, 100, dog_class=DOG, min_score=0.99) == []
+    assert dogs[0].as_dict() == {"left": 90, "top": 0, "right": 200, "bottom": 55, "score": 0.9}
+
+
+class FakeInterpreter:
+    """SSD post-processed outputs: one dog and one cat, scores before classes"""
+
+    def __init__(self, model_path, num_threads=None):
+        self.inputs = []
+
+    def allocate_tensors(self):
+        pass
+
+    def get_input_details(self):
+        return [{"index": 0, "shape": np.array([1, 300, 300, 3]), "dtype": np.float32}]
+
+    def get_output_details(self):
+        return [
+            {"index": 1, "shape": np.array([1, 10, 4])},
+            {"index": 2, "shape": np.array([1, 10])},
+            {"index": 3, "shape": np.array([1, 10])},
+            {"index": 4, "shape": np.array([1])}
+        ]
+
+    def set_tensor(self, index, value):
+        self.inputs.append(value)
+
+    def invoke(self):
+        pass
+
+    def get_tensor(self, index):
+        boxes = np.zeros((1, 10, 4), dtype=np.float32)
+        boxes[0, 0] = [0.25, 0.25, 0.75, 0.75]
+        boxes[0, 1] = [0.0, 0.0, 1.0, 1.0]
+        scores = np.zeros((1, 10), dtype=np.float32)
+        scores[0, :2] = [0.7, 0.9]
+        classes = np.zeros((1, 10), dtype=np.float32)
+        classes[0, :2] = [DOG, CAT]
+        return {1: boxes, 2: scores, 3: classes, 4: np.array([2.0])}[index]
+
+
+def test_detector():
+    """load() warms the model up; detect() scales float input and finds the dog"""
+    print("\n🐕 Detector")
+    original = dog_detector._lightweight_interpreter
+    dog_detector._lightweight_interpreter = lambda: FakeInterpreter
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "detector.tflite")
+            assert not DogDetector(path).load()
+            open(path, "wb").close()
+            detector = DogDetector(path)
+            assert detector.load()
+    finally:
+        dog_detector._lightweight_interpreter = original
+
+    dogs = detector.detect(Image.new("RGB", (400, 200), color=(255, 0, 0)))
+    pixels = detector._interpreter.inputs[-1]
+    assert pixels.shape == (1, 300, 300, 3) and pixels.dtype == np.float32
+    assert pixels[0, 0, 0].tolist() == [1.0, -1.0, -1.0]
+    assert [(box.left, box.top, box.right, box.bottom) for box in dogs] == [(80, 40, 320, 160)]
+
+    detector._interpreter.get_tensor = lambda index: np.zeros((1, 10, 4) if index == 1 else (1, 10))
+    assert detector.detect(Image.new("RGB", (64, 64))) == []
+    stats = detector.stats()
+    assert stats["detections"] == 2 and stats["no_dog"] == 1 and stats["dogs"] == 1
+
+
+def test_preprocess_crops():
+    """Each box becomes one 224x224 row of the classifier batch"""
+    print("\n✂️  Crops")
+    left = np.zeros((100, 100, 3), dtype=np.uint8)
+    img = Image.fromarray(np.concatenate([left, left + 255], axis=1))
+    batch = preprocess_crops(img, [Box(0, 0, 100, 100, 0.9), (100, 0, 200, 100)])
+    assert batch.shape == (2, 224, 224, 3) and batch.dtype == np.float32
+    assert batch[0].mean() < 5 and batch[1].mean() > 250
+
+
+def main():
+    """Run all tests"""
+    tests = [test_dog_boxes, test_detector, test_preprocess_crops]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
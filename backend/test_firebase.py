@@ -3,10 +3,19 @@ Firebase Connection Test Script
 Run this to verify your Firebase setup is working correctly
 """
 
+import asyncio
 import sys
 from firebase_db import firebase_db, firebase_user_db, firebase_prediction_db
 from datetime import datetime
 
+# One loop for every test: the Firestore AsyncClient is bound to the loop it first runs on
+_loop = asyncio.new_event_loop()
+
+
+def run(coro):
+    """Run a coroutine on the shared test loop"""
+    return _loop.run_until_complete(coro)
+
 def test_connection():
     """Test Firebase connection"""
     print("=" * 60)
@@ -26,6 +35,9 @@ def test_connection():
 
 def test_user_operations():
     """Test user CRUD operations"""
+    return run(_user_operations())
+
+async def _user_operations():
     print("\n" + "=" * 60)
     print("👤 Testing User Operations")
     print("=" * 60)
@@ -36,7 +48,7 @@ def test_user_operations():
     try:
         # Create user
         print("\n1️⃣ Creating test user...")
-        success = firebase_user_db.create_user(
+        success = await firebase_user_db.create_user(
             user_id=test_user_id,
             email=test_email,
             name="Test User",
@@ -51,7 +63,7 @@ def test_user_operations():
         
         # Read user
         print("\n2️⃣ Reading user data...")
-        user = firebase_user_db.get_user(test_user_id)
+        user = await firebase_user_db.get_user(test_user_id)
         
         if user:
             print(f"✅ User retrieved: {user['email']}")
@@ -63,7 +75,7 @@ def test_user_operations():
         
         # Update user
         print("\n3️⃣ Updating user preferences...")
-        success = firebase_user_db.update_preferences(
+        success = await firebase_user_db.update_preferences(
             test_user_id,
             {
                 "theme": "dark",
@@ -79,7 +91,7 @@ def test_user_operations():
         
         # Add favorite breed
         print("\n4️⃣ Adding favorite breed...")
-        success = firebase_user_db.add_favorite_breed(test_user_id, "Golden Retriever")
+        success = await firebase_user_db.add_favorite_breed(test_user_id, "Golden Retriever")
         
         if success:
             print("✅ Favorite breed added")
@@ -88,7 +100,7 @@ def test_user_operations():
         
         # Increment prediction count
         print("\n5️⃣ Incrementing prediction count...")
-        success = firebase_user_db.increment_prediction_count(test_user_id)
+        success = await firebase_user_db.increment_prediction_count(test_user_id)
         
         if success:
             print("✅ Prediction count incremented")
@@ -97,7 +109,7 @@ def test_user_operations():
         
         # Delete user (cleanup)
         print("\n6️⃣ Cleaning up test user...")
-        success = firebase_user_db.delete_user(test_user_id)
+        success = await firebase_user_db.delete_user(test_user_id)
         
         if success:
             print("✅ Test user deleted")
@@ -112,6 +124,9 @@ def test_user_operations():
 
 def test_prediction_operations():
     """Test prediction CRUD operations"""
+    return run(_prediction_operations())
+
+async def _prediction_operations():
     print("\n" + "=" * 60)
     print("🎯 Testing Prediction Operations")
     print("=" * 60)
@@ -120,7 +135,7 @@ def test_prediction_operations():
     
     try:
         # Create user first
-        firebase_user_db.create_user(
+        await firebase_user_db.create_user(
             user_id=test_user_id,
             email=f"test_{int(datetime.now().timestamp())}@example.com",
             name="Test User"
@@ -128,7 +143,7 @@ def test_prediction_operations():
         
         # Save prediction
         print("\n1️⃣ Saving test prediction...")
-        prediction_id = firebase_prediction_db.save_prediction(
+        prediction_id = await firebase_prediction_db.save_prediction(
             user_id=test_user_id,
             breed="Labrador Retriever",
             confidence=0.95,
@@ -148,7 +163,7 @@ def test_prediction_operations():
         
         # Get predictions
         print("\n2️⃣ Retrieving predictions...")
-        predictions = firebase_prediction_db.get_user_predictions(test_user_id, limit=10)
+        predictions = await firebase_prediction_db.get_user_predictions(test_user_id, limit=10)
         
         if predictions:
             print(f"✅ Found {len(predictions)} prediction(s)")
@@ -159,12 +174,12 @@ def test_prediction_operations():
         
         # Get prediction count
         print("\n3️⃣ Getting prediction count...")
-        count = firebase_prediction_db.get_prediction_count(test_user_id)
+        count = await firebase_prediction_db.get_prediction_count(test_user_id)
         print(f"✅ Total predictions: {count}")
         
         # Get breed stats
         print("\n4️⃣ Getting breed statistics...")
-        stats = firebase_prediction_db.get_breed_stats(test_user_id)
+        stats = await firebase_prediction_db.get_breed_stats(test_user_id)
         
         if stats:
             print(f"✅ Breed statistics generated")
@@ -175,7 +190,7 @@ def test_prediction_operations():
         
         # Cleanup
         print("\n5️⃣ Cleaning up test data...")
-        firebase_user_db.delete_user(test_user_id)
+        await firebase_user_db.delete_user(test_user_id)
         print("✅ Test data cleaned up")
         
         return True
@@ -184,19 +199,22 @@ def test_prediction_operations():
         print(f"❌ Error during prediction operations: {e}")
         # Cleanup on error
         try:
-            firebase_user_db.delete_user(test_user_id)
+            await firebase_user_db.delete_user(test_user_id)
         except:
             pass
         return False
 
 def test_list_users():
     """List all users in Firebase"""
+    return run(_list_users())
+
+async def _list_users():
     print("\n" + "=" * 60)
     print("📋 Listing All Users")
     print("=" * 60)
     
     try:
-        users = firebase_user_db.get_all_users(limit=10)
+        users = await firebase_user_db.get_all_users(limit=10)
         
         if users:
             print(f"\n✅ Found {len(users)} user(s):")
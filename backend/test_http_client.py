@@ -0,0 +1,106 @@
+"""
+Shared HTTP Client Test Script
+Verifies connection reuse, retry/backoff and per-host metrics against a local stub server
+"""
+
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import http_client
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Keep-alive stub that can fail a configurable number of times"""
+
+    protocol_version = "HTTP/1.1"
+    failures_remaining = 0
+
+    def do_GET(self):
+        if self.path == "/flaky" and StubHandler.failures_remaining > 0:
+            StubHandler.failures_remaining -= 1
+            self._reply(503, b'{"error": "unavailable"}')
+            return
+        self._reply(200, b'{"ok": true}')
+
+    def _reply(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host = f"127.0.0.1:{server.server_address[1]}"
+    return server, host
+
+
+def test_sync_connection_reuse():
+    """Sequential requests on the shared session reuse one keep-alive connection"""
+    print("\n🔌 Sync connection reuse")
+    server, host = start_stub_server()
+    try:
+        http_client.reset_http_metrics()
+        session = http_client.create_session()
+
+        for _ in range(5):
+            response = session.get(f"http://{host}/ok")
+            assert response.status_code == 200
+
+        stats = http_client.get_http_metrics()[host]
+        print(f"   {stats['new_connections']} new / {stats['reused_connections']} reused")
+        assert stats["requests"] == 5
+        assert stats["new_connections"] == 1
+        assert stats["reused_connections"] == 4
+        assert stats["latency"]["count"] == 5
+        session.close()
+    finally:
+        server.shutdown()
+
+
+def test_sync_retry_backoff():
+    """Transient 503s are retried with backoff and counted"""
+    print("\n🔁 Sync retry/backoff")
+    server, host = start_stub_server()
+    try:
+        http_client.reset_http_metrics()
+        StubHandler.failures_remaining = 2
+        session = http_client.create_session()
+
+        response = session.get(f"http://{host}/flaky")
+        assert response.status_code == 200
+
+        stats = http_client.get_http_metrics()[host]
+        print(f"   retries: {stats['retries']}")
+        assert stats["retries"] == 2
+        session.close()
+    finally:
+        StubHandler.failures_remaining = 0
+        server.shutdown()
+
+
+def main():
+    """Run all tests"""
+    tests = [test_sync_connection_reuse, test_sync_retry_backoff]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
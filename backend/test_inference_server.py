@@ -0,0 +1,244 @@
+"""
+Inference Server Test Script
+Runs the inference server in a thread with a small deterministic model and
+checks that API-side clients get their own results back through the
+shared-memory rings, that concurrent clients share batches, that shed
+requests fail fast, that priority lanes and user quotas reach the server and
+that timed-out requests release their slots
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from batch_scheduler import LANE_AUTHENTICATED, OverloadedError, QuotaExceededError, batch_buckets
+from inference_server import INPUT_SHAPE, InferenceServer, RemoteModel
+
+CLASSES = 4
+
+
+class MeanModel:
+    """Each row's "probabilities" are derived from its pixel mean, so results are traceable"""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def predict(self, batch):
+        self.batch_sizes.append(batch.shape[0])
+        means = batch.reshape(batch.shape[0], -1).mean(axis=1)
+        return np.stack([means + offset for offset in range(CLASSES)], axis=1).astype(np.float32)
+
+
+def start_server(socket_path, max_batch=8, slo_ms=2000, model=None):
+    """Serve on a background loop; returns (server, stop)"""
+    server = InferenceServer(model or MeanModel(), socket_path, max_batch=max_batch, slo_ms=slo_ms)
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    task = {}
+
+    def run():
+        asyncio.set_event_loop(loop)
+        task["serve"] = loop.create_task(server.serve(started))
+        try:
+            loop.run_until_complete(task["serve"])
+        except asyncio.CancelledError:
+            pass
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    assert started.wait(10), "server did not start"
+
+    def stop():
+        loop.call_soon_threadsafe(task["serve"].cancel)
+        thread.join(10)
+
+    return server, stop
+
+
+def image(value):
+    return np.full((1,) + INPUT_SHAPE, value, dtype=np.float32)
+
+
+def test_batch_buckets():
+    """Batches are padded to powers of two, capped at the maximum"""
+    print("\n🪣 Batch buckets")
+    assert batch_buckets(1) == [1]
+    assert batch_buckets(8) == [1, 2, 4, 8]
+    assert batch_buckets(12) == [1, 2, 4, 8, 12]
+
+
+def test_round_trip():
+    """A client gets back exactly its own image's result"""
+    print("\n🔁 Round trip")
+    with tempfile.TemporaryDirectory() as tmp:
+        server, stop = start_server(os.path.join(tmp, "inference.sock"))
+        client = RemoteModel(server.socket_path, slots=4)
+        try:
+            result = client.predict(image(3.0))
+            assert result.shape == (1, CLASSES)
+            assert result[0].tolist() == [3.0, 4.0, 5.0, 6.0]
+
+            batch = np.concatenate([image(1.0), image(2.0)])
+            assert client.predict(batch)[:, 0].tolist() == [1.0, 2.0]
+        finally:
+            client.close()
+            stop()
+
+
+def test_clients_share_batches():
+    """Requests from several workers' clients are answered correctly and batched together"""
+    print("\n🧺 Shared batches")
+    with tempfile.TemporaryDirectory() as tmp:
+        server, stop = start_server(os.path.join(tmp, "inference.sock"), max_batch=8)
+        clients = [RemoteModel(server.socket_path, slots=4) for _ in range(3)]
+        try:
+            def request(i):
+                return i, clients[i % len(clients)].predict(image(float(i)))[0, 0]
+
+            with ThreadPoolExecutor(max_workers=12) as pool:
+                results = list(pool.map(request, range(48)))
+
+            assert all(value == i for i, value in results), results
+            stats = server.stats()
+            print(f"   {stats['completed']} requests in {stats['batches']} batches (avg {stats['avg_batch']}), "
+                  f"batch sizes {sorted(set(server.runtime.batch_sizes))}")
+            assert stats["clients"] == 3
+            assert stats["avg_batch"] > 1
+            assert set(server.runtime.batch_sizes) <= {1, 2, 4, 8}
+        finally:
+            for client in clients:
+                client.close()
+            stop()
+
+
+def test_predict_async():
+    """The async path resolves on the event loop without blocking it"""
+    print("\n⚡ Async predict")
+    with tempfile.TemporaryDirectory() as tmp:
+        server, stop = start_server(os.path.join(tmp, "inference.sock"))
+        client = RemoteModel(server.socket_path, slots=2)
+        try:
+            async def run():
+                # More concurrent rows than slots: later rows wait for freed slots
+                return await asyncio.gather(*(client.predict_async(image(float(i))) for i in range(6)))
+
+            results = asyncio.run(run())
+            assert [r[0, 0] for r in results] == [float(i) for i in range(6)]
+            assert client.stats()["free_slots"] == 2
+        finally:
+            client.close()
+            stop()
+
+
+class SlowModel(MeanModel):
+    def predict(self, batch):
+        time.sleep(0.2)
+        return super().predict(batch)
+
+
+def test_shed_requests():
+    """Once the server knows it cannot meet the SLO, workers get OverloadedError"""
+    print("\n🚦 Shedding")
+    with tempfile.TemporaryDirectory() as tmp:
+        server, stop = start_server(os.path.join(tmp, "inference.sock"), slo_ms=100, model=SlowModel())
+        client = RemoteModel(server.socket_path, slots=2)
+        try:
+            # Unmeasured model: accepted, and its 200 ms forward pass is learned
+            assert client.predict(image(1.0))[0, 0] == 1.0
+            try:
+                client.predict(image(2.0))
+                assert False, "expected OverloadedError"
+            except OverloadedError:
+                pass
+            assert server.stats()["shed_early"] == 1
+            assert client.stats()["free_slots"] == 2
+        finally:
+            client.close()
+            stop()
+
+
+def test_lanes_and_quota():
+    """Workers' lane and user travel with each request; over-quota users get QuotaExceededError"""
+    print("\n🛣️  Lanes and quota")
+    with tempfile.TemporaryDirectory() as tmp:
+        server, stop = start_server(os.path.join(tmp, "inference.sock"), model=SlowModel())
+        server.scheduler.user_max_in_flight = 1
+        clients = [RemoteModel(server.socket_path, slots=2) for _ in range(2)]
+        try:
+            async def run():
+                # The same user through two workers: the quota is enforced by the server
+                return await asyncio.gather(
+                    clients[0].predict_async(image(1.0), LANE_AUTHENTICATED, "alice"),
+                    clients[1].predict_async(image(2.0), LANE_AUTHENTICATED, "alice"),
+                    return_exceptions=True
+                )
+
+            results = asyncio.run(run())
+            assert sum(isinstance(r, QuotaExceededError) for r in results) == 1, results
+            lanes = server.stats()["lanes"]
+            assert lanes[LANE_AUTHENTICATED]["completed"] == 1
+            assert lanes[LANE_AUTHENTICATED]["quota_rejected"] == 1
+        finally:
+            for client in clients:
+                client.close()
+            stop()
+
+
+def test_timeouts_and_reconnect():
+    """A timed-out caller gets OverloadedError, its slot comes back with the late answer and a
+    reconnect refills the same slot queue"""
+    print("\n⏱️  Timeouts and reconnect")
+    with tempfile.TemporaryDirectory() as tmp:
+        server, stop = start_server(os.path.join(tmp, "inference.sock"), model=SlowModel())
+        client = RemoteModel(server.socket_path, slots=1, timeout=0.05)
+        try:
+            for _ in range(2):
+                # The second call finds the only slot still held by the abandoned request
+                try:
+                    asyncio.run(client.predict_async(image(1.0)))
+                    assert False, "expected OverloadedError"
+                except OverloadedError:
+                    pass
+            assert client.stats()["in_flight"] == 0
+
+            time.sleep(0.5)
+            stats = client.stats()
+            assert stats["connected"], "a late response must not kill the reader"
+            assert (stats["abandoned"], stats["free_slots"]) == (0, 1), stats
+
+            client.close()
+            time.sleep(0.2)
+            client.timeout = 5
+            assert asyncio.run(client.predict_async(image(3.0)))[0, 0] == 3.0
+            assert client.stats()["reconnects"] == 1
+            assert client.stats()["free_slots"] == 1
+        finally:
+            client.close()
+            stop()
+
+
+def main():
+    """Run all tests"""
+    tests = [test_batch_buckets, test_round_trip, test_clients_share_batches, test_predict_async,
+             test_shed_requests, test_lanes_and_quota, test_timeouts_and_reconnect]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,298 @@
+"""
+Model Runtime Test Script
+Checks preprocessing, augmentation views, embedding outputs, runtime selection,
+warmup, threading settings and the startup profile without TensorFlow or a model file
+"""
+
+import asyncio
+import io
+import os
+import sys
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+from model_runtime import (ModelRuntime, ThreadingConfig, parse_cpu_list, preprocess_image, preprocess_input,
+                           preprocess_views)
+from startup_profile import StartupProfile
+
+
+def image_bytes(mode="RGB", size=(320, 240), fmt="PNG") -> bytes:
+    buffer = io.BytesIO()
+    Image.new(mode, size, color=128 if mode == "L" else (200, 100, 50)).save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+def test_preprocess_input_is_passthrough():
+    """EfficientNetV2 preprocessing keeps raw 0-255 pixels as float32"""
+    print("\n🖼️  preprocess_input")
+    pixels = np.array([[[0, 127, 255]]], dtype=np.uint8)
+    out = preprocess_input(pixels)
+    assert out.dtype == np.float32
+    assert out.tolist() == [[[0.0, 127.0, 255.0]]]
+
+
+def test_preprocess_image():
+    """Uploads become a (1, 224, 224, 3) float32 batch, whatever their mode"""
+    print("\n🖼️  preprocess_image")
+    for mode in ("RGB", "L", "RGBA"):
+        batch = preprocess_image(image_bytes(mode))
+        assert batch.shape == (1, 224, 224, 3), batch.shape
+        assert batch.dtype == np.float32
+
+    batch = preprocess_image(image_bytes())
+    assert batch[0, 0, 0].tolist() == [200.0, 100.0, 50.0]
+
+    try:
+        preprocess_image(b"not an image")
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+
+
+def gradient_bytes(size=(320, 240)) -> bytes:
+    """Brighter to the right and to the bottom, so crops and flips are distinguishable"""
+    x = np.linspace(0, 255, size[0])[None, :]
+    y = np.linspace(0, 255, size[1])[:, None]
+    pixels = ((x + y) / 2).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(np.stack([pixels] * 3, axis=-1)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_preprocess_views():
+    """Augmented views come from one decode; "full" matches preprocess_image"""
+    print("\n🪞 Augmentation views")
+    data = gradient_bytes()
+    views = preprocess_views(data, ["full", "flip", "center", "center_flip", "top_left", "bottom_right"])
+    assert views.shape == (6, 224, 224, 3) and views.dtype == np.float32
+
+    assert np.array_equal(views[0], preprocess_image(data)[0])
+    assert np.array_equal(views[1], views[0][:, ::-1])
+    assert np.array_equal(views[3], views[2][:, ::-1])
+    assert views[4].mean() < views[2].mean() < views[5].mean()
+
+    try:
+        preprocess_views(data, ["full", "sideways"])
+        assert False, "expected ValueError"
+    except ValueError as e:
+        assert "sideways" in str(e)
+
+
+class BrightnessModel:
+    """Two "classes" scored by mean brightness, so views give different probabilities"""
+
+    name = "brightness"
+
+    def __init__(self):
+        self.shapes = []
+
+    def predict(self, batch):
+        self.shapes.append(batch.shape)
+        bright = batch.reshape(batch.shape[0], -1).mean(axis=1) / 255
+        return np.stack([bright, 1 - bright], axis=1).astype(np.float32)
+
+
+def test_predict_tta():
+    """TTA runs all views as one batch and averages; a known plain result is reused"""
+    print("\n🎯 Test-time augmentation")
+    data = gradient_bytes()
+    views = ["full", "flip", "top_left", "bottom_right"]
+    expected = BrightnessModel().predict(preprocess_views(data, views)).mean(axis=0)
+
+    runtime = ModelRuntime(server="")
+    runtime._model = BrightnessModel()
+
+    async def run():
+        full = await runtime.predict_tta(data, views=views)
+        base = (await runtime.predict_async(preprocess_image(data)))[0]
+        reused = await runtime.predict_tta(data, base, views=views)
+        await runtime.close()
+        return full, reused
+
+    full, reused = asyncio.run(run())
+    print(f"   averaged {full.round(4).tolist()}, batches {[shape[0] for shape in runtime._model.shapes]}")
+    assert np.allclose(full, expected, atol=1e-6)
+    assert np.allclose(reused, expected, atol=1e-6)
+    # One batch of four views, the plain view alone, then the three remaining views together
+    assert [shape[0] for shape in runtime._model.shapes] == [4, 1, 4]
+    assert runtime.stats()["tta"]["requests"] == 2
+
+
+class EmbeddingModel(BrightnessModel):
+    """BrightnessModel that also returns a 3-d "embedding": the mean of each channel"""
+
+    embedding_dim = 3
+
+    def predict(self, batch):
+        return self.predict_with_embeddings(batch)[0]
+
+    def predict_with_embeddings(self, batch):
+        return super().predict(batch), batch.mean(axis=(1, 2)).astype(np.float32)
+
+
+def test_predict_embeddings():
+    """Embeddings travel with the probabilities through the scheduler and are split off again"""
+    print("\n🧬 Embeddings")
+    batch = preprocess_views(gradient_bytes(), ["full", "top_left"])
+    model = EmbeddingModel()
+    probabilities, embeddings = model.predict_with_embeddings(batch)
+
+    runtime = ModelRuntime(server="")
+    runtime._model = model
+    assert runtime.embedding_dim == 3
+    assert runtime.forward(batch).shape == (2, 5)
+
+    async def run():
+        split = await runtime.predict_embed_async(batch)
+        plain = await runtime.predict_async(batch)
+        await runtime.close()
+        return split, plain
+
+    (got_probabilities, got_embeddings), plain = asyncio.run(run())
+    assert np.allclose(got_probabilities, probabilities) and np.allclose(plain, probabilities)
+    assert np.allclose(got_embeddings, embeddings)
+
+    runtime._model = BrightnessModel()
+    assert runtime.embedding_dim == 0
+    assert asyncio.run(runtime.predict_embed_async(batch))[1] is None
+
+
+def test_missing_model():
+    """Without a model file load() fails cleanly and predict() refuses"""
+    print("\n📦 Missing model")
+    with tempfile.TemporaryDirectory() as tmp:
+        runtime = ModelRuntime(os.path.join(tmp, "m.keras"), os.path.join(tmp, "m.tflite"))
+        assert not runtime.load()
+        assert not runtime.loaded and runtime.error
+    try:
+        runtime.predict(np.zeros((1, 224, 224, 3), dtype=np.float32))
+        assert False, "expected RuntimeError"
+    except RuntimeError:
+        pass
+
+
+def test_runtime_selection():
+    """auto prefers the converted model only when it can skip TensorFlow"""
+    print("\n🔀 Runtime selection")
+    with tempfile.TemporaryDirectory() as tmp:
+        keras_path, tflite_path = os.path.join(tmp, "m.keras"), os.path.join(tmp, "m.tflite")
+        open(keras_path, "wb").close()
+
+        assert ModelRuntime(keras_path, tflite_path, "auto")._select() == "keras"
+        assert ModelRuntime(keras_path, tflite_path, "tflite")._select() is None
+
+        open(tflite_path, "wb").close()
+        assert ModelRuntime(keras_path, tflite_path, "tflite")._select() == "tflite"
+        assert ModelRuntime(keras_path, tflite_path, "keras")._select() == "keras"
+
+        os.remove(keras_path)
+        assert ModelRuntime(keras_path, tflite_path, "auto")._select() == "tflite"
+
+
+class RecordingModel:
+    """Stands in for a loaded model: uniform probabilities, remembers batch shapes"""
+
+    name = "recording"
+
+    def __init__(self, classes=5):
+        self.classes = classes
+        self.shapes = []
+
+    def predict(self, batch):
+        self.shapes.append(batch.shape)
+        return np.full((batch.shape[0], self.classes), 1 / self.classes, dtype=np.float32)
+
+
+def test_warmup():
+    """Warmup runs every batch size through the model and the response builder"""
+    print("\n🔥 Warmup")
+    runtime = ModelRuntime()
+    assert not runtime.warmup([1])
+
+    runtime._model = RecordingModel()
+    built = []
+    assert runtime.warmup([1, 4], build_response=built.append, rounds=2)
+    assert runtime.ready
+    assert runtime._model.shapes == [(1, 224, 224, 3)] * 2 + [(4, 224, 224, 3)] * 2
+    assert len(built) == 2 * 1 + 2 * 4
+
+    stats = runtime.stats()
+    print(f"   warmup {stats['warmup_ms']} ms, batches {stats['warmup_batches']}")
+    assert set(stats["warmup_batches"]) == {"1", "4"}
+
+    runtime.record_request(12.34)
+    runtime.record_request(99)
+    assert runtime.stats()["first_request_ms"] == 12.3
+
+
+def test_threading_config():
+    """CPU lists parse, pinning applies only inside the block, oneDNN maps to the TF variable"""
+    print("\n🧵 Threading config")
+    assert parse_cpu_list("0-3,6") == {0, 1, 2, 3, 6}
+    assert parse_cpu_list("") == set()
+
+    if hasattr(os, "sched_getaffinity"):
+        before = os.sched_getaffinity(0)
+        pin_to = {min(before)}
+        with ThreadingConfig(cpu_affinity=",".join(map(str, pin_to))).pinned():
+            assert os.sched_getaffinity(0) == pin_to
+        assert os.sched_getaffinity(0) == before
+
+    previous = os.environ.pop("TF_ENABLE_ONEDNN_OPTS", None)
+    try:
+        ThreadingConfig(onednn="off").apply_onednn()
+        assert os.environ.get("TF_ENABLE_ONEDNN_OPTS") == ("0" if "tensorflow" not in sys.modules else None)
+    finally:
+        os.environ.pop("TF_ENABLE_ONEDNN_OPTS", None)
+        if previous is not None:
+            os.environ["TF_ENABLE_ONEDNN_OPTS"] = previous
+
+    config = ThreadingConfig(intra_op=2, inter_op=1, cpu_affinity="0-1", onednn="on").as_dict()
+    assert config == {"intra_op_threads": 2, "inter_op_threads": 1, "cpu_affinity": [0, 1], "onednn": "on"}
+
+
+def test_startup_profile():
+    """Phases are recorded in start order, failures included"""
+    print("\n⏱️  Startup profile")
+    profile = StartupProfile()
+    profile.mark("imports")
+    with profile.phase("catalogs"):
+        pass
+    try:
+        with profile.phase("model_load"):
+            raise OSError("missing")
+    except OSError:
+        pass
+
+    report = profile.report()
+    assert not report["completed"]
+    assert [p["name"] for p in report["phases"]] == ["imports", "catalogs", "model_load"]
+    assert [p["ok"] for p in report["phases"]] == [True, True, False]
+
+    profile.complete()
+    profile.print_report()
+    assert profile.report()["total_ms"] >= 0
+
+
+def main():
+    """Run all tests"""
+    tests = [test_preprocess_input_is_passthrough, test_preprocess_image, test_preprocess_views,
+             test_predict_tta, test_predict_embeddings, test_missing_model,
+             test_runtime_selection, test_warmup, test_threading_config, test_startup_profile]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""
+Pagination Test Script
+Checks that history cursors round-trip to an aware UTC (timestamp, id) and
+that malformed or tampered cursors are rejected with InvalidCursorError
+"""
+
+import base64
+import json
+import sys
+from datetime import datetime, timedelta, timezone
+
+from pagination import InvalidCursorError, clamp_limit, decode_cursor, encode_cursor
+
+
+def raw_cursor(payload) -> str:
+    """A cursor built by hand, the way a client could tamper with one"""
+    data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def test_round_trip():
+    """Naive (Mongo/SQLite) and aware (Firestore) timestamps decode to the same aware UTC value"""
+    print("\n🔁 Cursor round-trip")
+    naive = datetime(2024, 5, 1, 12, 30, 15, 123456)
+    aware = naive.replace(tzinfo=timezone.utc)
+    shifted = aware.astimezone(timezone(timedelta(hours=2)))
+
+    assert decode_cursor(encode_cursor(naive, "abc123")) == (aware, "abc123")
+    assert decode_cursor(encode_cursor(shifted, "abc123")) == (aware, "abc123")
+    assert decode_cursor(None) is None and decode_cursor("") is None
+    assert "=" not in encode_cursor(naive, "abc123")
+
+    # A hand-edited naive or offset timestamp is normalised, not compared as local time
+    assert decode_cursor(raw_cursor({"t": naive.isoformat(), "i": "x"}))[0] == aware
+    assert decode_cursor(raw_cursor({"t": shifted.isoformat(), "i": "x"}))[0].tzinfo == timezone.utc
+
+
+def test_rejects_bad_cursors():
+    """Anything that is not a cursor we issued fails with InvalidCursorError"""
+    print("\n🚫 Malformed cursors")
+    bad = [
+        "!!!not-base64!!!",
+        raw_cursor(b"\xff\xfe not json"),
+        raw_cursor(b"plain text"),
+        raw_cursor([1, 2]),
+        raw_cursor("just a string"),
+        raw_cursor({"t": "2024-05-01T12:00:00+00:00"}),
+        raw_cursor({"i": "abc"}),
+        raw_cursor({"t": "yesterday", "i": "abc"}),
+        raw_cursor({"t": 1714564800, "i": "abc"}),
+        raw_cursor({"t": "2024-05-01T12:00:00+00:00", "i": {"$gt": ""}}),
+    ]
+    for cursor in bad:
+        try:
+            decode_cursor(cursor)
+            raise AssertionError(f"Cursor should be rejected: {cursor}")
+        except InvalidCursorError:
+            pass
+
+
+def test_clamp_limit():
+    """Page sizes stay within 1..HISTORY_MAX_LIMIT"""
+    print("\n📏 Limit clamping")
+    assert [clamp_limit(n) for n in (-5, 0, 1, 20, 100, 10**6)] == [1, 1, 1, 20, 100, 100]
+
+
+def main():
+    """Run all tests"""
+    tests = [test_round_trip, test_rejects_bad_cursors, test_clamp_limit]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+Prediction Writer Test Script
+Checks that each worker spools to its own file, that spools of dead workers
+are adopted exactly once while a live worker's locked spool is left alone,
+and that compaction and a clean shutdown keep the spool consistent
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+
+from prediction_writer import PredictionWriteBuffer, fcntl
+
+
+def writer(spool_path, saved=None):
+    """Buffer that saves into `saved`, or fails every save while it is None"""
+    buffer = None
+
+    async def save_batch(records):
+        if buffer.saved is None:
+            return False
+        buffer.saved.extend(records)
+        return True
+
+    counter = iter(range(10**6))
+    buffer = PredictionWriteBuffer(save_batch, lambda: f"id-{next(counter)}", flush_size=10**6,
+                                   flush_interval=3600, spool_path=spool_path)
+    buffer.saved = saved
+    return buffer
+
+
+def write_spool(path, ids):
+    with open(path, "w", encoding="utf-8") as f:
+        for record_id in ids:
+            f.write(json.dumps({"id": record_id, "breed": "Beagle"}) + "\n")
+
+
+def spooled_ids(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["id"] for line in f if line.strip()]
+
+
+def test_orphaned_spools():
+    """Dead workers' spools (and the legacy shared file) are adopted once and removed"""
+    print("\n♻️  Orphaned spools")
+    with tempfile.TemporaryDirectory() as tmp:
+        base = os.path.join(tmp, "spool.jsonl")
+        write_spool(base, ["a", "b"])
+        write_spool(f"{base}.99999991", ["b", "c"])
+        write_spool(f"{base}.99999992", ["d"])
+
+        buffer = writer(base)
+        assert buffer.recover() == 4
+        assert sorted(record["id"] for record in buffer._buffer) == ["a", "b", "c", "d"]
+        assert sorted(spooled_ids(buffer.own_spool_path)) == ["a", "b", "c", "d"]
+        assert os.listdir(tmp) == [os.path.basename(buffer.own_spool_path)]
+
+        # Nothing is left for another worker to adopt
+        assert buffer._orphaned_spools() == []
+        buffer._spool.close()
+
+
+def test_live_spool_is_skipped():
+    """A spool still locked by its worker is neither replayed nor removed"""
+    print("\n🔒 Live spool")
+    if fcntl is None:
+        print("   fcntl unavailable, skipped")
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        base = os.path.join(tmp, "spool.jsonl")
+        live = f"{base}.99999993"
+        write_spool(live, ["x"])
+        with open(live, "a", encoding="utf-8") as owner:
+            fcntl.flock(owner.fileno(), fcntl.LOCK_EX)
+            buffer = writer(base)
+            assert buffer.recover() == 0
+            assert os.path.exists(live)
+            buffer._spool.close()
+        assert writer(base).recover() == 1
+
+
+def test_flush_and_stop():
+    """Compaction keeps only unsaved records; a clean stop removes the empty spool"""
+    print("\n💾 Flush / stop")
+    with tempfile.TemporaryDirectory() as tmp:
+        base = os.path.join(tmp, "spool.jsonl")
+        buffer = writer(base)
+        buffer.recover()
+        buffer.enqueue({"breed": "Pug"})
+        asyncio.run(buffer.flush())
+        assert spooled_ids(buffer.own_spool_path) == ["id-0"]
+
+        buffer.saved = []
+        buffer.enqueue({"breed": "Beagle"})
+        asyncio.run(buffer.flush())
+        assert [record["id"] for record in buffer.saved] == ["id-0", "id-1"]
+        assert spooled_ids(buffer.own_spool_path) == []
+
+        asyncio.run(buffer.stop())
+        assert os.listdir(tmp) == []
+
+
+def main():
+    """Run all tests"""
+    tests = [test_orphaned_spools, test_live_spool_is_skipped, test_flush_and_stop]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""
+Rate Limit Test Script
+Verifies token-bucket bursts and refill, per-key isolation, budget parsing,
+the 429 + Retry-After response and keying by user or client IP (the
+trusted X-Forwarded-For hop behind a proxy)
+"""
+
+import asyncio
+import sys
+
+from fastapi import Depends, FastAPI, Header, Request
+from fastapi.testclient import TestClient
+
+import rate_limit
+from rate_limit import Budget, MemoryRateLimitBackend, RateLimiter, parse_budget
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_parse_budget():
+    """Budgets are requests/seconds with an optional burst"""
+    print("\n📝 Budget parsing")
+    assert parse_budget("30/60") == Budget(30, 0.5)
+    assert parse_budget("30/60:5") == Budget(5, 0.5)
+    assert parse_budget("10") == Budget(10, 10)
+    assert parse_budget("off") is None
+
+
+def test_burst_then_refill():
+    """A full bucket allows a burst, then refills at the budget rate"""
+    print("\n🪣 Burst and refill")
+    clock = FakeClock()
+    backend = MemoryRateLimitBackend(clock=clock)
+    budget = Budget(3, 1.0)
+
+    async def run():
+        results = [await backend.acquire("user:a", budget) for _ in range(4)]
+        clock.now += 1.5
+        after = await backend.acquire("user:a", budget)
+        other = await backend.acquire("user:b", budget)
+        return results, after, other
+
+    results, after, other = asyncio.run(run())
+    assert [allowed for allowed, _, _ in results] == [True, True, True, False]
+    assert results[3][1] == 1.0
+    assert after[0] is True
+    assert other[0] is True
+
+
+def test_eviction_bounds_memory():
+    """Past max_keys the least recently used buckets go"""
+    print("\n🧹 Eviction")
+    backend = MemoryRateLimitBackend(max_keys=10)
+
+    async def run():
+        for i in range(25):
+            await backend.acquire(f"ip:{i}", Budget(5, 1))
+
+    asyncio.run(run())
+    assert backend.stats() == {"keys": 10, "evictions": 15}
+
+
+class BrokenBackend:
+    name = "broken"
+
+    async def acquire(self, key, budget, cost=1):
+        raise ConnectionError("redis down")
+
+    def stats(self):
+        return {}
+
+
+def test_fail_open():
+    """An unreachable backend lets requests through and counts the error"""
+    print("\n🚪 Fail open")
+    limiter = RateLimiter(BrokenBackend(), {"predict": Budget(1, 1)})
+    allowed, _ = asyncio.run(limiter.check("predict", "ip:1"))
+    assert allowed
+    assert limiter.stats()["errors"] == 1
+
+
+def test_endpoint_429():
+    """Over-budget requests get 429 with Retry-After; users and IPs have separate buckets"""
+    print("\n🚦 429 responses")
+    limiter = RateLimiter(MemoryRateLimitBackend(), {"predict": Budget(2, 0.1)})
+    original = rate_limit.rate_limiter
+    rate_limit.rate_limiter = limiter
+
+    async def optional_user(x_user: str = Header(None)):
+        return {"user_id": x_user} if x_user else None
+
+    app = FastAPI()
+
+    @app.get("/predict", dependencies=[Depends(rate_limit.rate_limit("predict", optional_user))])
+    async def predict():
+        return {"ok": True}
+
+    try:
+        client = TestClient(app)
+        anonymous = [client.get("/predict").status_code for _ in range(3)]
+        limited = client.get("/predict")
+        alice = [client.get("/predict", headers={"X-User": "alice"}).status_code for _ in range(3)]
+    finally:
+        rate_limit.rate_limiter = original
+
+    print(f"   anonymous {anonymous}, alice {alice}, Retry-After {limited.headers.get('retry-after')}")
+    assert anonymous == [200, 200, 429]
+    assert limited.status_code == 429
+    assert limited.headers["retry-after"] == "10"
+    assert alice == [200, 200, 429]
+    assert limiter.stats()["limited"]["predict"] == 3
+
+
+def test_forwarded_client_key():
+    """Behind trusted proxies the key is the hop they appended, not a spoofable leading entry"""
+    print("\n🕵️  X-Forwarded-For")
+    keys = []
+    app = FastAPI()
+
+    @app.get("/key")
+    async def key(request: Request):
+        keys.append(rate_limit.client_key(request, None))
+        return {}
+
+    client = TestClient(app)
+    originals = rate_limit.RATE_LIMIT_TRUST_PROXY, rate_limit.RATE_LIMIT_TRUSTED_HOPS
+    try:
+        rate_limit.RATE_LIMIT_TRUST_PROXY, rate_limit.RATE_LIMIT_TRUSTED_HOPS = True, 1
+        client.get("/key", headers={"X-Forwarded-For": "203.0.113.7"})
+        client.get("/key", headers={"X-Forwarded-For": "1.2.3.4, 203.0.113.7"})
+        client.get("/key", headers={"X-Forwarded-For": "5.6.7.8, 203.0.113.7"})
+        rate_limit.RATE_LIMIT_TRUSTED_HOPS = 2
+        client.get("/key", headers={"X-Forwarded-For": "1.2.3.4, 203.0.113.7, 10.0.0.2"})
+        client.get("/key", headers={"X-Forwarded-For": "203.0.113.7"})
+        rate_limit.RATE_LIMIT_TRUST_PROXY = False
+        client.get("/key", headers={"X-Forwarded-For": "203.0.113.7"})
+    finally:
+        rate_limit.RATE_LIMIT_TRUST_PROXY, rate_limit.RATE_LIMIT_TRUSTED_HOPS = originals
+
+    print(f"   {keys}")
+    assert keys[:4] == ["ip:203.0.113.7"] * 4
+    assert keys[4:] == ["ip:testclient"] * 2
+
+
+def main():
+    """Run all tests"""
+    tests = [test_parse_budget, test_burst_then_refill, test_eviction_bounds_memory, test_fail_open,
+             test_endpoint_429, test_forwarded_client_key]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
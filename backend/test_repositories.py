@@ -0,0 +1,313 @@
+"""
+Repository Contract Test Script
+Checks that a storage backend behaves the way the API handlers expect.
+Runs against the in-memory backend by default (no database needed):
+
+    python test_repositories.py                     # memory
+    python test_repositories.py --backend sqlite    # SQLite file at SQLITE_PATH
+    python test_repositories.py --backend mongodb   # real MongoDB (MONGODB_URI)
+    python test_repositories.py --backend firebase  # real Firestore
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+
+# Must be set before `repositories` builds its default instance
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+import repositories as repositories_module
+from repositories import Repositories, create_repositories, create_sqlite_repositories
+
+BACKEND = "memory"
+
+# One loop for every test: database clients are bound to the loop they first run on
+_loop = asyncio.new_event_loop()
+_repos = None
+
+
+def run(coro):
+    """Run a coroutine on the shared test loop"""
+    return _loop.run_until_complete(coro)
+
+
+def repos():
+    """Repositories for the backend under test (created on first use)"""
+    global _repos
+    if _repos is None:
+        _repos = create_repositories(BACKEND)
+        assert run(_repos.wait_ready(timeout=30)), _repos.last_error
+    return _repos
+
+
+def new_user_id() -> str:
+    return f"contract_{uuid.uuid4().hex[:12]}"
+
+
+def make_records(user_id, count, predictions):
+    """Buffered-write records with distinct, increasing timestamps"""
+    start = datetime.utcnow() - timedelta(minutes=count)
+    return [{
+        "id": predictions.new_prediction_id(),
+        "user_id": user_id,
+        "breed": "Beagle" if i % 3 else "Pug",
+        "confidence": 0.5 + i / (count * 4),
+        "thumbnail_url": f"https://example.com/{i}.jpg",
+        "created_at": (start + timedelta(seconds=i)).isoformat()
+    } for i in range(count)]
+
+
+def test_users():
+    """Users are created once, readable and updatable (profile fields only)"""
+    print("\n👤 Users")
+    users = repos().users
+    user_id = new_user_id()
+
+    async def check():
+        assert await users.get_user(user_id) is None
+        assert await users.create_user(user_id=user_id, email="dog@example.com", name="Dog Lover",
+                                       email_verified=True)
+        user = await users.get_user(user_id)
+        assert user["user_id"] == user_id
+        assert user["email"] == "dog@example.com"
+
+        assert await users.update_user(user_id, {"name": "Renamed"})
+        assert (await users.get_user(user_id))["name"] == "Renamed"
+
+        # Server-owned fields are never overwritten by a profile update
+        assert await users.update_user(user_id, {"user_id": "someone-else", "total_predictions": 999,
+                                                 "email_verified": False, "name": ["not", "a", "name"]})
+        user = await users.get_user(user_id)
+        assert user["user_id"] == user_id and user["name"] == "Renamed"
+        assert user.get("total_predictions", 0) == 0 and user["email_verified"] is True
+        assert await users.update_last_active_many([user_id]) is not False
+
+    run(check())
+
+
+def test_prediction_pages():
+    """Keyset pages are newest first, complete and non-overlapping"""
+    print("\n📜 Prediction pages")
+    predictions = repos().predictions
+    user_id = new_user_id()
+    records = make_records(user_id, 25, predictions)
+
+    async def check():
+        assert await predictions.save_predictions_batch(records)
+        # Replaying the same records (spool recovery) must not duplicate them
+        assert await predictions.save_predictions_batch(records[:5])
+
+        seen, cursor = [], None
+        while True:
+            page = await predictions.get_user_predictions_page(user_id, limit=10, cursor=cursor)
+            seen.extend(item["id"] for item in page["predictions"])
+            if not page["has_more"]:
+                assert page["next_cursor"] is None
+                break
+            cursor = page["next_cursor"]
+
+        print(f"   {len(seen)} predictions across pages")
+        assert seen == [record["id"] for record in reversed(records)]
+        assert await predictions.get_prediction_count(user_id) == 25
+
+    run(check())
+
+
+def test_partial_batch_replay():
+    """Retrying a batch whose first records already committed does not count them twice"""
+    print("\n🔁 Partial batch replay")
+    predictions = repos().predictions
+    user_id = new_user_id()
+    records = make_records(user_id, 9, predictions)
+
+    async def check():
+        await repos().users.create_user(user_id=user_id, email="replay@example.com", name="Replay")
+        # The first chunk committed, then the write failed and the whole batch is retried
+        assert await predictions.save_predictions_batch(records[:4])
+        assert await predictions.save_predictions_batch(records)
+        assert await predictions.save_predictions_batch(records[2:6])
+
+        assert await predictions.get_prediction_count(user_id) == 9
+        counts = {stat["breed"]: stat["count"] for stat in await predictions.get_breed_stats(user_id)}
+        assert counts == {"Beagle": 6, "Pug": 3}, counts
+
+    run(check())
+
+
+def test_prediction_ownership():
+    """Only the owner can read or delete a prediction"""
+    print("\n🔒 Prediction ownership")
+    predictions = repos().predictions
+    owner, other = new_user_id(), new_user_id()
+    record = make_records(owner, 1, predictions)[0]
+
+    async def check():
+        await predictions.save_predictions_batch([record])
+        assert (await predictions.get_prediction(record["id"], owner))["breed"] == record["breed"]
+        assert await predictions.get_prediction(record["id"], other) is None
+
+        assert not await predictions.delete_prediction(record["id"], user_id=other)
+        assert await predictions.delete_prediction(record["id"], user_id=owner)
+        assert await predictions.get_prediction(record["id"], owner) is None
+
+    run(check())
+
+
+def test_breed_stats():
+    """Breed statistics follow saves and deletes; the backfill does not overwrite them"""
+    print("\n📊 Breed stats")
+    predictions = repos().predictions
+    user_id = new_user_id()
+    records = make_records(user_id, 6, predictions)
+
+    async def check():
+        await predictions.save_predictions_batch(records)
+        counts = {stat["breed"]: stat["count"] for stat in await predictions.get_breed_stats(user_id)}
+        assert counts == {"Beagle": 4, "Pug": 2}, counts
+
+        await predictions.delete_prediction(records[0]["id"], user_id=user_id)
+        counts = {stat["breed"]: stat["count"] for stat in await predictions.get_breed_stats(user_id)}
+        assert counts == {"Beagle": 4, "Pug": 1}, counts
+
+        # The backfill leaves maintained stats alone unless asked to rebuild them
+        assert not await predictions.seed_breed_stats(user_id)
+        counts = {stat["breed"]: stat["count"] for stat in await predictions.get_breed_stats(user_id)}
+        assert counts == {"Beagle": 4, "Pug": 1}, counts
+        stale = {"beagle": {"breed": "Beagle", "count": 1, "confidence_sum": 0.9, "last_seen": None}}
+        assert await predictions.write_breed_stats(user_id, stale)
+        assert await predictions.write_breed_stats(user_id, await predictions.compute_breed_histogram(user_id))
+        counts = {stat["breed"]: stat["count"] for stat in await predictions.get_breed_stats(user_id)}
+        assert counts == {"Beagle": 4, "Pug": 1}, counts
+
+    run(check())
+
+
+def test_feedback():
+    """Public feedback is anonymized and privacy can be changed"""
+    print("\n💬 Feedback")
+    feedback = repos().feedback
+    user_id = new_user_id()
+    marker = uuid.uuid4().hex
+
+    async def check():
+        feedback_id = await feedback.submit_feedback(
+            user_id=user_id, feedback_type="general", message=marker, rating=5
+        )
+        assert feedback_id
+
+        entry = await feedback.get_feedback(feedback_id)
+        assert entry["user_id"] == user_id
+        assert [f["id"] for f in await feedback.get_user_feedback(user_id)] == [feedback_id]
+
+        public = [f for f in await feedback.get_public_feedback(limit=100) if f["message"] == marker]
+        assert public and public[0]["user_id"] == "anonymous"
+
+        assert await feedback.update_feedback_privacy(feedback_id, True)
+        public = [f for f in await feedback.get_public_feedback(limit=100) if f["message"] == marker]
+        assert not public
+
+    run(check())
+
+
+def test_vaccinations():
+    """Vaccination records are scoped to their owner"""
+    print("\n💉 Vaccinations")
+    vaccinations = repos().vaccinations
+    owner, other = new_user_id(), new_user_id()
+    due = (datetime.now() + timedelta(days=7)).strftime('%Y-%m-%d')
+
+    async def check():
+        vaccination_id = await vaccinations.create_vaccination(user_id=owner, name="Rabies", due_date=due)
+        assert vaccination_id
+        assert await vaccinations.get_vaccination_by_id(vaccination_id, other) is None
+        assert not await vaccinations.update_vaccination(vaccination_id, other, {"status": "completed"})
+
+        assert await vaccinations.update_vaccination(vaccination_id, owner, {"status": "completed"})
+        stats = await vaccinations.get_vaccination_stats(owner)
+        assert stats["total"] == 1 and stats["completed"] == 1
+        assert len(await vaccinations.get_upcoming_vaccinations(owner, days=30)) == 1
+
+        assert not await vaccinations.delete_vaccination(vaccination_id, other)
+        assert await vaccinations.delete_vaccination(vaccination_id, owner)
+
+    run(check())
+
+
+def test_sqlite_persistence():
+    """SQLite data survives a reopen and keeps pages, counts and stats"""
+    print("\n💾 SQLite persistence")
+    user_id = new_user_id()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "repositories.db")
+
+        first = create_sqlite_repositories(path)
+        records = make_records(user_id, 12, first.predictions)
+        run(first.predictions.save_predictions_batch(records))
+        run(first.close())
+
+        reopened = create_sqlite_repositories(path)
+        page = run(reopened.predictions.get_user_predictions_page(user_id, limit=5))
+        count = run(reopened.predictions.get_prediction_count(user_id))
+        stats = run(reopened.predictions.get_breed_stats(user_id))
+        run(reopened.close())
+
+    assert [item["id"] for item in page["predictions"]] == [r["id"] for r in reversed(records)][:5]
+    assert page["has_more"] and count == 12
+    assert sum(stat["count"] for stat in stats) == 12
+
+
+def test_background_prepare_retries():
+    """Preparation retries in the background until the backend is ready"""
+    print("\n⏳ Background preparation")
+    attempts = {"count": 0}
+
+    async def prepare():
+        attempts["count"] += 1
+        if attempts["count"] < 3:
+            raise ConnectionError("database still starting")
+
+    delay = repositories_module.STORAGE_RETRY_INITIAL
+    repositories_module.STORAGE_RETRY_INITIAL = 0.01
+    try:
+        flaky = Repositories("flaky", lambda: {"prepare": prepare})
+        assert not flaky.ready
+        assert run(flaky.wait_ready(timeout=5))
+    finally:
+        repositories_module.STORAGE_RETRY_INITIAL = delay
+
+    status = flaky.status()
+    print(f"   ready after {status['attempts']} attempts ({status['ready_ms']} ms)")
+    assert status["attempts"] == 3 and status["last_error"] is None
+
+
+def main():
+    """Run all tests"""
+    global BACKEND
+    parser = argparse.ArgumentParser(description="Run the repository contract tests")
+    parser.add_argument("--backend", default=BACKEND, choices=["memory", "sqlite", "mongodb", "firebase"])
+    BACKEND = parser.parse_args().backend
+    print(f"🗄️  Backend: {BACKEND}")
+
+    tests = [test_users, test_prediction_pages, test_partial_batch_replay, test_prediction_ownership, test_breed_stats,
+             test_feedback, test_vaccinations, test_sqlite_persistence, test_background_prepare_retries]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    run(repos().close())
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
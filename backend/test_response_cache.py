@@ -0,0 +1,145 @@
+"""
+Response Cache Test Script
+Verifies hits, write-through invalidation, stale-build protection, size limits
+and that per-user invalidation generations stay bounded
+"""
+
+import asyncio
+import sys
+
+from response_cache import MemoryCacheBackend, ResponseCache
+
+
+def make_builder():
+    calls = {"count": 0}
+
+    async def build():
+        calls["count"] += 1
+        return {"call": calls["count"]}
+
+    return build, calls
+
+
+def test_hit_after_miss():
+    """Second read for the same user/key is served from the cache"""
+    print("\n💾 Hit after miss")
+
+    async def run():
+        cache = ResponseCache(MemoryCacheBackend())
+        build, calls = make_builder()
+        first = await cache.get_or_build("user_1", "stats", build)
+        second = await cache.get_or_build("user_1", "stats", build)
+        return first, second, calls, cache.stats()
+
+    first, second, calls, stats = asyncio.run(run())
+    print(f"   hits={stats['hits']} misses={stats['misses']}")
+    assert first.headers["x-cache"] == "MISS"
+    assert second.headers["x-cache"] == "HIT"
+    assert first.body == second.body
+    assert calls["count"] == 1
+
+
+def test_invalidation():
+    """Invalidating a user drops only that user's entries"""
+    print("\n🧹 Invalidation")
+
+    async def run():
+        cache = ResponseCache(MemoryCacheBackend())
+        build, calls = make_builder()
+        await cache.get_or_build("user_1", "stats", build)
+        await cache.get_or_build("user_2", "stats", build)
+        await cache.invalidate_many(["user_1"])
+        after_1 = await cache.get_or_build("user_1", "stats", build)
+        after_2 = await cache.get_or_build("user_2", "stats", build)
+        return after_1, after_2, calls
+
+    after_1, after_2, calls = asyncio.run(run())
+    assert after_1.headers["x-cache"] == "MISS"
+    assert after_2.headers["x-cache"] == "HIT"
+    assert calls["count"] == 3
+
+
+def test_stale_build_not_cached():
+    """A response built across an invalidation is served but not cached"""
+    print("\n⏱️  Stale build")
+
+    async def run():
+        cache = ResponseCache(MemoryCacheBackend())
+
+        async def racing_build():
+            await cache.invalidate("user_1")
+            return {"stale": True}
+
+        await cache.get_or_build("user_1", "history", racing_build)
+        build, _ = make_builder()
+        return await cache.get_or_build("user_1", "history", build)
+
+    response = asyncio.run(run())
+    assert response.headers["x-cache"] == "MISS"
+
+
+def test_size_limits():
+    """Entry count and per-entry size limits are enforced"""
+    print("\n📏 Size limits")
+
+    async def run():
+        cache = ResponseCache(MemoryCacheBackend(max_entries=2), max_entry_bytes=64)
+        build, _ = make_builder()
+        for i in range(4):
+            await cache.get_or_build("user_1", f"history:{i}", build)
+
+        async def big_build():
+            return {"payload": "x" * 128}
+
+        await cache.get_or_build("user_1", "big", big_build)
+        return cache.stats()
+
+    stats = asyncio.run(run())
+    print(f"   entries={stats['entries']} evictions={stats['evictions']} oversized={stats['oversized']}")
+    assert stats["entries"] == 2
+    assert stats["evictions"] == 2
+    assert stats["oversized"] == 1
+
+
+def test_generations_pruned():
+    """Invalidation bookkeeping stays bounded without letting a stale build be cached"""
+    print("\n🧹 Generation pruning")
+
+    async def run():
+        backend = MemoryCacheBackend(max_entries=2)
+        cache = ResponseCache(backend)
+        started = await backend.generation("user_0")
+        for i in range(5):
+            await cache.invalidate(f"user_{i}")
+
+        # user_0's generation was pruned: its stale build must still be rejected
+        await backend.set("user_0", started, "history", b"stale", 60)
+        build, _ = make_builder()
+        first = await cache.get_or_build("user_0", "history", build)
+        second = await cache.get_or_build("user_0", "history", build)
+        return first, second, cache.stats()
+
+    first, second, stats = asyncio.run(run())
+    assert stats["generations"] == 2
+    assert first.headers["x-cache"] == "MISS" and second.headers["x-cache"] == "HIT"
+
+
+def main():
+    """Run all tests"""
+    tests = [test_hit_after_miss, test_invalidation, test_stale_build_not_cached, test_size_limits,
+             test_generations_pruned]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""
+Similarity Index Test Script
+Checks exact search before training, IVF recall once trained, save/load
+round trips, that users only see gallery entries and their own predictions,
+that training does not block searches and that deleted predictions go away
+"""
+
+import os
+import sys
+import tempfile
+import threading
+
+import numpy as np
+
+import similarity_index
+from similarity_index import IVFIndex, SimilarDogs, normalize
+
+
+def clustered(count, dim=64, clusters=50, seed=0):
+    """Unit vectors around random centers"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim))
+    return normalize(centers[rng.integers(0, clusters, count)] + 0.3 * rng.standard_normal((count, dim)))
+
+
+def exact(vectors, query, k):
+    return set(np.argsort(-(vectors @ normalize(query)))[:k].tolist())
+
+
+def test_flat_is_exact():
+    """Below the training size the index is an exact scan"""
+    print("\n📏 Flat search")
+    vectors = clustered(500)
+    index = IVFIndex(64, reduce_dim=0, train_size=1000)
+    index.add(vectors, np.arange(500))
+    assert not index.trained
+
+    query = vectors[7] + 0.01
+    scores, ids = index.search(query, 10)
+    assert set(ids.tolist()) == exact(vectors, query, 10)
+    assert ids[0] == 7 and np.all(np.diff(scores) <= 0)
+    assert len(index.search(query, 1000)[1]) == 500
+
+
+def test_ivf_recall():
+    """Once trained (here with PCA) a few probed lists find almost all true neighbours"""
+    print("\n🔎 IVF recall")
+    vectors = clustered(4000)
+    index = IVFIndex(64, reduce_dim=32, nlist=40, nprobe=8, train_size=2000)
+    index.add(vectors[:1000], np.arange(1000))
+    index.add(vectors[1000:], np.arange(1000, 4000))
+    assert index.trained and index.count == 4000
+    assert index.centroids.shape == (40, 32)
+
+    queries = clustered(50, seed=1)
+    truth = [index.search(query, 10, nprobe=40)[1] for query in queries]
+    found = [index.search(query, 10)[1] for query in queries]
+    recall = np.mean([len(set(a.tolist()) & set(b.tolist())) / 10 for a, b in zip(found, truth)])
+    print(f"   recall@10 with 8 of 40 lists: {recall:.3f}")
+    assert recall > 0.9
+
+
+def test_save_and_load():
+    """The saved index answers exactly like the one it came from"""
+    print("\n💾 Save / load")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "index.npz")
+        dogs = SimilarDogs(path)
+        vectors = clustered(300)
+        dogs.add_many(vectors, [{"breed": f"dog {i}", "user_id": None} for i in range(300)])
+        assert dogs.save()
+        assert not dogs.save()
+
+        loaded = SimilarDogs(path)
+        assert loaded.load()
+        assert loaded.size == 300
+        assert loaded.search(vectors[3], 5) == dogs.search(vectors[3], 5)
+        assert loaded.search(vectors[3], 1)[0]["breed"] == "dog 3"
+
+        assert not SimilarDogs(os.path.join(tmp, "missing.npz")).load()
+
+
+def test_visibility():
+    """Gallery entries are public; predictions are only returned to their owner"""
+    print("\n🔒 Visibility")
+    dogs = SimilarDogs("unused.npz")
+    vector = clustered(1)[0]
+    dogs.add(vector, {"source": "gallery", "user_id": None})
+    for i in range(20):
+        dogs.add(vector, {"source": "prediction", "prediction_id": f"alice-{i}", "user_id": "alice"})
+    dogs.add(vector, {"source": "prediction", "prediction_id": "bob-0", "user_id": "bob"})
+
+    anonymous = dogs.search(vector, 5)
+    bob = dogs.search(vector, 5, "bob")
+    alice = dogs.search(vector, 5, "alice")
+    assert [match["source"] for match in anonymous] == ["gallery"]
+    assert sorted(match.get("prediction_id", "gallery") for match in bob) == ["bob-0", "gallery"]
+    assert len(alice) == 5
+    assert all("user_id" not in match for match in anonymous + bob + alice)
+    assert dogs.stats()["searches"] == 3
+
+
+def test_training_off_the_lock():
+    """Searches and adds keep working while the add that filled the training set trains"""
+    print("\n🧠 Background training")
+    dogs = SimilarDogs("unused.npz")
+    dogs.index = IVFIndex(64, reduce_dim=0, nlist=8, train_size=200)
+    vectors = clustered(260)
+    dogs.add_many(vectors[:199], [{"user_id": None} for _ in range(199)])
+
+    started, release = threading.Event(), threading.Event()
+    kmeans = similarity_index.spherical_kmeans
+
+    def blocking_kmeans(*args, **kwargs):
+        started.set()
+        assert release.wait(10)
+        return kmeans(*args, **kwargs)
+
+    similarity_index.spherical_kmeans = blocking_kmeans
+    try:
+        trainer = threading.Thread(target=dogs.add, args=(vectors[199], {"user_id": None}))
+        trainer.start()
+        assert started.wait(10)
+
+        # The lock is free: the flat index answers and takes new vectors meanwhile
+        assert dogs.search(vectors[5], 1)[0]["score"] > 0.99
+        for i in range(200, 260):
+            dogs.add(vectors[i], {"id": i, "user_id": None})
+        assert not dogs.stats()["trained"]
+
+        release.set()
+        trainer.join(10)
+    finally:
+        similarity_index.spherical_kmeans = kmeans
+
+    assert dogs.stats()["trained"] and dogs.index.count == 260
+    assert dogs.search(vectors[250], 1)[0]["id"] == 250, "Vectors added during training were lost"
+
+
+def test_remove_prediction():
+    """A deleted prediction is no longer returned, and only its owner can remove it"""
+    print("\n🗑️  Remove prediction")
+    with tempfile.TemporaryDirectory() as tmp:
+        dogs = SimilarDogs(os.path.join(tmp, "index.npz"))
+        vector = clustered(1)[0]
+        dogs.add(vector, {"source": "prediction", "prediction_id": "p1", "user_id": "alice"})
+        dogs.add(vector, {"source": "prediction", "prediction_id": "p2", "user_id": "alice"})
+
+        assert not dogs.remove("p1", "bob")
+        assert dogs.remove("p1", "alice")
+        assert not dogs.remove("p1", "alice")
+        assert [match["prediction_id"] for match in dogs.search(vector, 5, "alice")] == ["p2"]
+        assert dogs.size == 1
+
+        assert dogs.save()
+        loaded = SimilarDogs(dogs.path)
+        assert loaded.load() and loaded.size == 1
+        assert loaded.remove("p2", "alice")
+        assert loaded.search(vector, 5, "alice") == []
+
+
+def main():
+    """Run all tests"""
+    tests = [test_flat_is_exact, test_ivf_recall, test_save_and_load, test_visibility,
+             test_training_off_the_lock, test_remove_prediction]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
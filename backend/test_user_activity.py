@@ -0,0 +1,100 @@
+"""
+User Activity Test Script
+Checks the known-user cache (TTL expiry, LRU bound) and that the last_active
+coalescer writes each user once per flush and survives a failing flush
+"""
+
+import asyncio
+import sys
+import time
+
+from user_activity import KnownUserCache, LastActiveCoalescer
+
+
+def test_known_user_ttl_and_eviction():
+    """Known users expire after the TTL and the set stays within max_size"""
+    print("\n👤 Known users")
+    cache = KnownUserCache(ttl=0.2, max_size=2)
+    cache.add("a")
+    cache.add("b")
+    assert cache.contains("a")
+    cache.add("c")
+
+    assert not cache.contains("b"), "Least recently used user should be evicted"
+    assert cache.contains("a") and cache.contains("c")
+
+    time.sleep(0.25)
+    assert not cache.contains("a"), "User should expire after the TTL"
+    stats = cache.stats()
+    assert (stats["size"], stats["hits"], stats["misses"]) == (1, 3, 2), stats
+
+
+def test_last_active_coalescing():
+    """Many touches of the same users become one batched write per flush"""
+    print("\n🕒 last_active coalescing")
+    writes = []
+
+    async def flush_fn(user_ids):
+        writes.append(sorted(user_ids))
+
+    coalescer = LastActiveCoalescer(flush_fn, interval=3600)
+
+    async def run():
+        for _ in range(5):
+            coalescer.touch("a")
+            coalescer.touch("b")
+        await coalescer.flush()
+        await coalescer.flush()
+        coalescer.touch("a")
+        await coalescer.stop()
+
+    asyncio.run(run())
+    assert writes == [["a", "b"], ["a"]], writes
+    stats = coalescer.stats()
+    assert (stats["flushes"], stats["users_written"], stats["writes_saved"]) == (2, 3, 8), stats
+
+
+def test_last_active_flush_failure():
+    """A failed flush is counted and dropped; later touches are written normally"""
+    print("\n⚠️  last_active flush failure")
+    writes = []
+
+    async def flush_fn(user_ids):
+        if not writes:
+            writes.append(None)
+            raise ConnectionError("database unavailable")
+        writes.append(sorted(user_ids))
+
+    coalescer = LastActiveCoalescer(flush_fn, interval=3600)
+
+    async def run():
+        coalescer.touch("a")
+        await coalescer.flush()
+        assert coalescer.stats()["pending"] == 0
+        coalescer.touch("b")
+        await coalescer.flush()
+
+    asyncio.run(run())
+    assert writes == [None, ["b"]], writes
+    stats = coalescer.stats()
+    assert (stats["failures"], stats["flushes"], stats["users_written"]) == (1, 1, 1), stats
+
+
+def main():
+    """Run all tests"""
+    tests = [test_known_user_ttl_and_eviction, test_last_active_coalescing, test_last_active_flush_failure]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""
+User Activity Module
+Known-user TTL cache and write-coalescing last_active updater, so authenticated
+requests normally need no database calls before doing real work
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, List, Optional
+
+from metrics import metrics
+
+KNOWN_USER_TTL = float(os.getenv("KNOWN_USER_TTL", "900"))  # seconds
+KNOWN_USER_CACHE_SIZE = int(os.getenv("KNOWN_USER_CACHE_SIZE", "50000"))
+LAST_ACTIVE_FLUSH_INTERVAL = float(os.getenv("LAST_ACTIVE_FLUSH_INTERVAL", "60"))  # seconds
+
+
+class KnownUserCache:
+    """TTL + LRU set of user IDs known to exist in the database"""
+
+    def __init__(self, ttl: float = KNOWN_USER_TTL, max_size: int = KNOWN_USER_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def contains(self, user_id: str) -> bool:
+        """Check whether user_id was confirmed to exist within the TTL"""
+        with self._lock:
+            expires_at = self._entries.get(user_id)
+            if expires_at is None or expires_at <= time.monotonic():
+                if expires_at is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return False
+
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return True
+
+    def add(self, user_id: str):
+        """Mark user_id as existing"""
+        with self._lock:
+            self._entries[user_id] = time.monotonic() + self.ttl
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Get cache statistics"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+class LastActiveCoalescer:
+    """Buffers last_active touches and writes each user at most once per interval"""
+
+    def __init__(self, flush_fn: Callable[[List[str]], Awaitable[object]], interval: float = LAST_ACTIVE_FLUSH_INTERVAL):
+        self._flush_fn = flush_fn
+        self.interval = interval
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+        self.touches = 0
+        self.flushes = 0
+        self.users_written = 0
+        self.failures = 0
+
+    def touch(self, user_id: str):
+        """Record activity for user_id; no I/O"""
+        with self._lock:
+            self._pending.add(user_id)
+            self.touches += 1
+
+    def _drain(self) -> List[str]:
+        with self._lock:
+            user_ids = list(self._pending)
+            self._pending.clear()
+        return user_ids
+
+    async def flush(self):
+        """Write all pending users in one batch"""
+        user_ids = self._drain()
+        if not user_ids:
+            return
+
+        start = time.perf_counter()
+        try:
+            await self._flush_fn(user_ids)
+            self.flushes += 1
+            self.users_written += len(user_ids)
+        except Exception as e:
+            # last_active is best-effort; the next touch will schedule the user again
+            self.failures += 1
+            print(f"⚠️  last_active flush failed for {len(user_ids)} user(s): {e}")
+        finally:
+            metrics.observe("user_activity.last_active_flush", (time.perf_counter() - start) * 1000)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    def start(self):
+        """Start the background flush task (call from the running event loop)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the background task and flush whatever is pending"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        """Get coalescing statistics"""
+        return {
+            "pending": len(self._pending),
+            "touches": self.touches,
+            "flushes": self.flushes,
+            "users_written": self.users_written,
+            "failures": self.failures,
+            "writes_saved": max(self.touches - self.users_written - len(self._pending), 0)
+        }
+
@@ -0,0 +1,20 @@
+"""
+User Profile Helpers
+The user-document fields a profile update may write. Everything else on a
+user (user_id, created_at, total_predictions, email_verified, last_active...)
+is maintained by the server and never taken from an update.
+"""
+
+from typing import Dict
+
+PROFILE_FIELDS = ("email", "name")
+PROFILE_VALUE_MAX_LENGTH = 200
+
+
+def profile_updates(updates: Dict) -> Dict:
+    """Keep only profile fields with string (or null) values"""
+    return {
+        field: value for field, value in (updates or {}).items()
+        if field in PROFILE_FIELDS
+        and (value is None or (isinstance(value, str) and len(value) <= PROFILE_VALUE_MAX_LENGTH))
+    }
@@ -49,9 +49,16 @@ export const useAPI = () => {
       });
     },
 
-    // Get prediction history
-    getPredictionHistory: async (limit = 50) => {
-      return makeRequest(`/history?limit=${limit}`);
+    // Get prediction history (pass the previous page's next_cursor for more)
+    getPredictionHistory: async (limit = 50, cursor = null) => {
+      const params = new URLSearchParams({ limit });
+      if (cursor) params.append('cursor', cursor);
+      return makeRequest(`/history?${params.toString()}`);
+    },
+
+    // Get a single prediction with full details
+    getPredictionDetail: async (predictionId) => {
+      return makeRequest(`/history/${encodeURIComponent(predictionId)}`);
     },
 
     // Get user statistics